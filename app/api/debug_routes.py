@@ -0,0 +1,24 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.profiler import sampling_profiler
+from app.core.settings import settings
+
+router = APIRouter(tags=["debug"])
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0, description="Длительность профилирования (сек)"),
+    interval: float = Query(default=0.01, ge=0.001, le=1.0, description="Интервал между сэмплами (сек)"),
+) -> PlainTextResponse:
+    """Профиль живого трафика в формате folded stacks (для flamegraph.pl / speedscope)."""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is disabled")
+
+    result = await asyncio.to_thread(sampling_profiler.profile, min(seconds, settings.PROFILER_MAX_SECONDS), interval)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Profiling is already running")
+    return PlainTextResponse(result)
@@ -1,9 +1,21 @@
+from typing import Any
+
 from fastapi import APIRouter
 
+from app.core.sync_lock import sync_lock
+from app.core.warmup import warmup_state
+from app.services.import_jobs import import_jobs
+
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health")
-async def health() -> dict[str, str]:
+async def health() -> dict[str, Any]:
     """Проверка статуса приложения."""
-    return {"status": "ok"}
+    return {"status": "ok", "redis": sync_lock.health()}
+
+
+@router.get("/ready")
+async def ready() -> dict[str, Any]:
+    """Готовность приложения принимать запросы, результат прогрева клиентов и состояние автоимпорта при старте."""
+    return {"status": "ready", "warmup": warmup_state, "startup_import": import_jobs.startup_state}
@@ -1,22 +1,48 @@
 import logging
+from typing import Any
 
 from fastapi import APIRouter, HTTPException, status
 
-from app.services.import_service import import_existing_rows
+from app.services.import_jobs import import_jobs
+from app.services.import_state import import_state
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["import"])
 
 
-@router.post("/import")
-async def import_rows() -> dict[str, int]:
-    """Импорт всех строк из Google Sheets."""
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_rows(full: bool = False) -> dict[str, Any]:
+    """
+    Запуск фонового импорта строк из Google Sheets.
+
+    По умолчанию импорт инкрементальный; full=true сбрасывает отметку и читает таблицу целиком.
+    """
     try:
-        return await import_existing_rows()
+        if full:
+            await import_state.reset()
+        return await import_jobs.start()
     except Exception as e:
         logger.error("Ошибка импорта: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
+
+
+@router.get("/import/{job_id}")
+async def import_status(job_id: str) -> dict[str, Any]:
+    """Прогресс задачи импорта: счетчики, скорость и оценка оставшегося времени."""
+    job = await import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
+
+
+@router.post("/import/{job_id}/cancel")
+async def cancel_import(job_id: str) -> dict[str, Any]:
+    """Отмена задачи импорта после текущей пачки строк."""
+    job = await import_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
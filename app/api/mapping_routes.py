@@ -0,0 +1,22 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, status
+
+from app.core.sheets_client import sheets_client
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["mapping"])
+
+
+@router.post("/mapping/rebuild")
+async def rebuild_mapping() -> dict[str, int]:
+    """Перестроение локальной связки строка ↔ сделка ↔ контакт по таблице."""
+    try:
+        return {"rows": await sheets_client.rebuild_mapping()}
+    except Exception as e:
+        logger.error("Ошибка перестроения связки строк: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        ) from e
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import APIRouter, status
+
+from app.services.reconcile_service import reconciler
+
+router = APIRouter(tags=["reconcile"])
+
+
+@router.post("/reconcile", status_code=status.HTTP_202_ACCEPTED)
+async def start_reconcile() -> dict[str, Any]:
+    """Запуск сверки таблицы и AmoCRM в фоне."""
+    started = await reconciler.trigger()
+    return {"started": started, **reconciler.state}
+
+
+@router.get("/reconcile")
+async def reconcile_status() -> dict[str, Any]:
+    """Состояние и результат последней сверки."""
+    return reconciler.state
@@ -2,8 +2,8 @@ from typing import Any
 
 from fastapi import APIRouter, Header
 
-from app.models.webhook_row import WebhookRow
-from app.services.sheets_service import process_webhook_sheets
+from app.models.webhook_row import WebhookBatch, WebhookRow
+from app.services.sheets_service import process_webhook_sheets, process_webhook_sheets_batch
 
 router = APIRouter(tags=["webhooks"])
 
@@ -15,3 +15,12 @@ async def webhook_sheets(
 ) -> dict[str, Any]:
     """Обработка вебхука от Google Sheets."""
     return await process_webhook_sheets(payload, x_webhook_secret)
+
+
+@router.post("/webhook/sheets/batch")
+async def webhook_sheets_batch(
+    payload: WebhookBatch,
+    x_webhook_secret: str = Header(...),
+) -> dict[str, Any]:
+    """Обработка пакетного вебхука от Google Sheets (вставка или протягивание нескольких строк)."""
+    return await process_webhook_sheets_batch(payload, x_webhook_secret)
@@ -1,17 +1,38 @@
 import asyncio
+import calendar
+import functools
 import logging
-import os
-from typing import Any
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, Concatenate, ParamSpec, TypeVar
 
 from amocrm.v2 import Contact as _Contact  # type: ignore[import-untyped]
 from amocrm.v2 import Lead as AmoLead  # type: ignore[import-untyped]
-from amocrm.v2 import Pipeline, custom_field, tokens  # type: ignore[import-untyped]
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential  # type: ignore[import-untyped]
-
+from amocrm.v2 import Pipeline, custom_field  # type: ignore[import-untyped]
+from amocrm.v2.entity.contact import ContactsInteraction  # type: ignore[import-untyped]
+from amocrm.v2.entity.lead import LeadsInteraction  # type: ignore[import-untyped]
+from amocrm.v2.entity.pipeline import PipelinesInteraction  # type: ignore[import-untyped]
+from amocrm.v2.exceptions import ValidationError  # type: ignore[import-untyped]
+from amocrm.v2.filters import SingleListFilter  # type: ignore[import-untyped]
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential  # type: ignore[import-untyped]
+
+from app.core.amocrm_tokens import amo_token_manager
+from app.core.concurrency import ExecutorSaturated
+from app.core.executors import amocrm_executor
+from app.core.metrics import count_retry, timed
 from app.core.settings import settings
+from app.core.utils import normalize_phone
 
 logger = logging.getLogger(__name__)
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Максимум сущностей на странице ответа AmoCRM API v4
+PAGE_SIZE = 250
+# Максимум сущностей в одном PATCH-запросе
+UPDATE_BATCH_SIZE = 50
+
 
 class Contact(_Contact):  # type: ignore[misc]
     """Контакт с кастомными полями."""
@@ -20,57 +41,408 @@ class Contact(_Contact):  # type: ignore[misc]
     email = custom_field.ContactEmailField("Email")
 
 
-def init_token_manager() -> None:
-    """Инициализация менеджера токенов AmoCRM."""
-    subdomain = settings.AMO_BASE_URL
+def _with_tokens(
+    func: Callable[Concatenate["AmoCRMClient", P], Awaitable[R]],
+) -> Callable[Concatenate["AmoCRMClient", P], Awaitable[R]]:
+    """Декоратор метода клиента: перед первым вызовом API инициализируются токены."""
+
+    @functools.wraps(func)
+    async def wrapper(self: "AmoCRMClient", *args: P.args, **kwargs: P.kwargs) -> R:
+        await self.ensure_tokens()
+        return await func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _custom_field_value(data: dict[str, Any], code: str) -> str | None:
+    """Значение поля контакта (PHONE/EMAIL) из ответа API: рабочее или первое."""
+    for field in data.get("custom_fields_values") or []:
+        if field.get("field_code") != code:
+            continue
+        values = field.get("values") or []
+        for value in values:
+            if value.get("enum_code") == "WORK":
+                return str(value.get("value"))
+        if values:
+            return str(values[0].get("value"))
+    return None
+
+
+def _lead_from_api(data: dict[str, Any], status_names: dict[int, str]) -> dict[str, Any]:
+    """Данные сделки из ответа API в формате get_lead_info."""
+    contacts = data.get("_embedded", {}).get("contacts") or []
+    return {
+        "id": data["id"],
+        "name": data.get("name"),
+        "price": data.get("price"),
+        "status_id": data.get("status_id"),
+        "status_name": status_names.get(data.get("status_id")),  # type: ignore[arg-type]
+        "pipeline_id": data.get("pipeline_id"),
+        "contact_id": contacts[0]["id"] if contacts else None,
+        "contact_name": None,
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def _custom_field_values(data: dict[str, Any], code: str) -> list[dict[str, Any]]:
+    """Все значения поля контакта (PHONE/EMAIL) из ответа API: [{value, enum_code}]."""
+    for field in data.get("custom_fields_values") or []:
+        if field.get("field_code") == code:
+            return [
+                {"value": str(value["value"]), "enum_code": value.get("enum_code")}
+                for value in field.get("values") or []
+                if value.get("value")
+            ]
+    return []
+
+
+def _merged_values(value: str, current: list[dict[str, Any]], key: Callable[[str], Any]) -> list[dict[str, Any]]:
+    """Новое значение рабочим (WORK) и остальные значения поля; прежнее рабочее значение становится OTHER."""
+    values = [{"value": value, "enum_code": "WORK"}]
+    for item in current:
+        if key(item["value"]) != key(value):
+            enum_code = item.get("enum_code")
+            values.append({"value": item["value"], "enum_code": enum_code if enum_code not in (None, "WORK") else "OTHER"})
+    return values
+
+
+def contact_fields_update(
+    phone: str | None, email: str | None, current: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Значения custom_fields_values для записи телефона и email контакта.
+
+    PATCH заменяет все значения поля, поэтому остальные телефоны и адреса контакта сохраняются:
+    новое значение становится рабочим (его читает _custom_field_value), остальные дописываются после него.
+
+    Args:
+        phone: Новый телефон или None
+        email: Новый email или None
+        current: Контакт из get_contacts_by_ids (phones, emails) - текущие значения полей
+
+    Returns:
+        list[dict[str, Any]]: custom_fields_values для update_contacts
+    """
+    current = current or {}
+    fields = []
+    if phone:
+        values = _merged_values(phone, current.get("phones") or [], lambda value: normalize_phone(value) or value)
+        fields.append({"field_code": "PHONE", "values": values})
+    if email:
+        values = _merged_values(email, current.get("emails") or [], lambda value: value.strip().lower())
+        fields.append({"field_code": "EMAIL", "values": values})
+    return fields
+
+
+class AmoCRMClient:
+    """Клиент для взаимодействия с AmoCRM API."""
+
+    def __init__(self) -> None:
+        """Инициализация клиента AmoCRM (без обращений к API и чтения настроек)."""
+        self._leads_api = LeadsInteraction()
+        self._contacts_api = ContactsInteraction()
+        self._status_names: dict[int, str] | None = None
+        self._tokens_ready = False
+        self._tokens_lock = asyncio.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """URL аккаунта AmoCRM."""
+        return settings.AMO_BASE_URL
+
+    @property
+    def pipeline_id(self) -> int:
+        """ID воронки для новых сделок."""
+        return settings.AMO_PIPELINE_ID
+
+    @property
+    def status_id(self) -> int:
+        """ID статуса для новых сделок."""
+        return settings.AMO_STATUS_ID
+
+    async def ensure_tokens(self) -> None:
+        """Однократная инициализация токенов (общие токены из Redis или обмен auth_code в потоке)."""
+        if self._tokens_ready:
+            return
+        async with self._tokens_lock:
+            if not self._tokens_ready:
+                await amo_token_manager.initialize()
+                self._tokens_ready = True
+
+    async def warm_up(self) -> None:
+        """Прогрев при старте: токены и справочник статусов воронок."""
+        await self.ensure_tokens()
+        await self.get_status_names()
+
+    @timed("amocrm")
+    @_with_tokens
+    async def get_status_names(self) -> dict[int, str]:
+        """
+        Названия статусов всех воронок (загружаются один раз).
+
+        Returns:
+            dict[int, str]: Словарь {status_id: название}
+        """
+        if self._status_names is None:
 
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    token_dir = os.path.join(BASE_DIR, ".amocrm_tokens")
+            def load_statuses() -> dict[int, str]:
+                names = {}
+                for pipeline in PipelinesInteraction().get_all():
+                    for item in pipeline.get("_embedded", {}).get("statuses", []):
+                        names[item["id"]] = item["name"]
+                return names
 
-    os.makedirs(token_dir, exist_ok=True)
+            self._status_names = await amocrm_executor.run(load_statuses)
+        return self._status_names
 
-    tokens.default_token_manager(
-        client_id=settings.AMO_CLIENT_ID,
-        client_secret=settings.AMO_CLIENT_SECRET,
-        subdomain=subdomain,
-        redirect_url=settings.AMO_REDIRECT_URI,
-        storage=tokens.FileTokensStorage(token_dir),
+    @retry(
+        retry=retry_if_not_exception_type(ExecutorSaturated),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
+    async def get_leads_by_ids(self, lead_ids: list[int]) -> dict[int, dict[str, Any]]:
+        """
+        Пакетное получение сделок по списку ID (по PAGE_SIZE на запрос).
 
-    access_path = os.path.join(token_dir, "access_token.txt")
-    refresh_path = os.path.join(token_dir, "refresh_token.txt")
+        Args:
+            lead_ids: ID сделок
 
-    if os.path.exists(access_path) and os.path.exists(refresh_path):
-        logger.info("Найдены сохранённые токены — используем их.")
-    else:
-        try:
-            logger.info("Нет сохранённых токенов — инициализация через auth_code...")
-            tokens.default_token_manager.init(code=settings.AMO_AUTH_CODE, skip_error=True)
-            logger.info("Первичная инициализация выполнена, токены сохранены.")
-        except Exception as e:
-            logger.warning(
-                "Не удалось инициализировать токены через auth_code: %s. Токены будут обновлены при первом запросе.", e
-            )
+        Returns:
+            dict[int, dict[str, Any]]: {lead_id: данные как в get_lead_info}; удаленные сделки отсутствуют
+        """
+        ids = list(dict.fromkeys(lead_ids))
+        if not ids:
+            return {}
+        status_names = await self.get_status_names()
+
+        def load_leads() -> list[dict[str, Any]]:
+            result = []
+            for start in range(0, len(ids), PAGE_SIZE):
+                batch_filter = SingleListFilter("id")(ids[start : start + PAGE_SIZE])
+                result.extend(self._leads_api.get_all(include=["contacts"], filters=(batch_filter,)))
+            return result
+
+        leads = {data["id"]: _lead_from_api(data, status_names) for data in await amocrm_executor.run(load_leads)}
+        logger.info("Получено %s из %s сделок пакетно", len(leads), len(ids))
+        return leads
 
+    @retry(
+        retry=retry_if_not_exception_type(ExecutorSaturated),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True,
+        before_sleep=count_retry("amocrm"),
+    )
+    @timed("amocrm")
+    @_with_tokens
+    async def get_leads_page(self, since: int, until: int, page: int) -> tuple[list[dict[str, Any]], bool]:
+        """
+        Страница сделок, измененных в интервале [since, until], по возрастанию updated_at.
 
-init_token_manager()
+        Args:
+            since: Unix-время, включительно
+            until: Unix-время, включительно
+            page: Номер страницы (с 1)
 
+        Returns:
+            tuple[list[dict[str, Any]], bool]: Сделки в формате get_lead_info и есть ли следующая страница
+        """
+        status_names = await self.get_status_names()
+        params = {
+            "page": page,
+            "limit": PAGE_SIZE,
+            "order[updated_at]": "asc",
+            "filter[updated_at][from]": since,
+            "filter[updated_at][to]": until,
+        }
+
+        def load_page() -> dict[str, Any] | None:
+            response, _ = self._leads_api.request("get", "leads", params=params, include=["contacts"])
+            return response  # type: ignore[no-any-return]
+
+        response = await amocrm_executor.run(load_page)
+        if not response:
+            return [], False
+        leads = [_lead_from_api(data, status_names) for data in response["_embedded"]["leads"]]
+        return leads, "next" in response.get("_links", {})
+
+    async def get_leads_updated_since(self, since: int) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Сделки, измененные начиная с момента since, по возрастанию updated_at - постранично.
 
-class AmoCRMClient:
-    """Клиент для взаимодействия с AmoCRM API."""
+        Следующая страница запрашивается, когда вызывающий код обработал предыдущую. Страница
+        запрашивается от самой новой версии предыдущей (граница включительная), поэтому сделки,
+        измененные во время опроса, не сдвигают еще не полученные страницы; повторы отсекает
+        дедупликация по версии.
 
-    def __init__(self) -> None:
-        """Инициализация клиента AmoCRM."""
-        self.base_url = settings.AMO_BASE_URL
-        self.pipeline_id = settings.AMO_PIPELINE_ID
-        self.status_id = settings.AMO_STATUS_ID
+        Args:
+            since: Unix-время, включительно
+
+        Yields:
+            list[dict[str, Any]]: Сделки страницы (до PAGE_SIZE) в формате get_lead_info
+        """
+        until = int(time.time()) + 60
+        page = 1
+        while True:
+            leads, has_next = await self.get_leads_page(since, until, page)
+            if leads:
+                logger.info("Получено %s сделок, измененных с %s (страница %s)", len(leads), since, page)
+                yield leads
+            if not has_next:
+                return
+            newest = max((int(lead.get("updated_at") or since) for lead in leads), default=since)
+            since, page = (newest, 1) if newest > since else (since, page + 1)
+
+    @retry(
+        retry=retry_if_not_exception_type(ExecutorSaturated),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True,
+        before_sleep=count_retry("amocrm"),
+    )
+    @timed("amocrm")
+    @_with_tokens
+    async def get_contacts_by_ids(self, contact_ids: list[int]) -> dict[int, dict[str, Any]]:
+        """
+        Пакетное получение контактов по списку ID (по PAGE_SIZE на запрос).
+
+        Args:
+            contact_ids: ID контактов
+
+        Returns:
+            dict[int, dict[str, Any]]: {contact_id: данные как в get_contact_info и все значения
+                телефонов и email (phones, emails) для contact_fields_update}
+        """
+        ids = list(dict.fromkeys(contact_ids))
+        if not ids:
+            return {}
+
+        def load_contacts() -> list[dict[str, Any]]:
+            result = []
+            for start in range(0, len(ids), PAGE_SIZE):
+                batch_filter = SingleListFilter("id")(ids[start : start + PAGE_SIZE])
+                result.extend(self._contacts_api.get_all(filters=(batch_filter,)))
+            return result
+
+        contacts = {
+            data["id"]: {
+                "id": data["id"],
+                "name": data.get("name"),
+                "phone": _custom_field_value(data, "PHONE"),
+                "email": _custom_field_value(data, "EMAIL"),
+                "phones": _custom_field_values(data, "PHONE"),
+                "emails": _custom_field_values(data, "EMAIL"),
+            }
+            for data in await amocrm_executor.run(load_contacts)
+        }
+        logger.info("Получено %s из %s контактов пакетно", len(contacts), len(ids))
+        return contacts
+
+    async def _patch_batches(self, api: Any, path: str, updates: list[dict[str, Any]]) -> None:
+        """PATCH-запросы по UPDATE_BATCH_SIZE сущностей."""
+
+        def patch_sync() -> None:
+            for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+                response, status = api.request("patch", path, data=updates[start : start + UPDATE_BATCH_SIZE])
+                if status == 400:
+                    raise ValidationError(response)
+
+        await amocrm_executor.run(patch_sync)
+
+    @timed("amocrm")
+    @_with_tokens
+    async def create_leads(self, leads: list[dict[str, Any]]) -> list[int]:
+        """
+        Пакетное создание сделок в воронке AMO_PIPELINE_ID (POST по UPDATE_BATCH_SIZE сделок).
+
+        Без повторов: повтор POST после обрыва соединения создал бы дубли всей пачки.
+
+        Args:
+            leads: Список {"name": ..., "price": ..., "contact_id": ...}
+
+        Returns:
+            list[int]: ID созданных сделок в порядке leads
+        """
+        body = [
+            {
+                "name": lead["name"],
+                "price": int(lead.get("price") or 0),
+                "pipeline_id": self.pipeline_id,
+                "status_id": self.status_id,
+                "_embedded": {"contacts": [{"id": lead["contact_id"]}]},
+            }
+            for lead in leads
+        ]
+
+        def post_sync() -> list[int]:
+            lead_ids: list[int] = []
+            for start in range(0, len(body), UPDATE_BATCH_SIZE):
+                response, status = self._leads_api.request("post", "leads", data=body[start : start + UPDATE_BATCH_SIZE])
+                if status == 400:
+                    raise ValidationError(response)
+                lead_ids.extend(item["id"] for item in response["_embedded"]["leads"])
+            return lead_ids
+
+        if not body:
+            return []
+        lead_ids = await amocrm_executor.run(post_sync)
+        logger.info("Пакетно создано %s сделок: %s", len(lead_ids), lead_ids)
+        return lead_ids
+
+    @retry(
+        retry=retry_if_not_exception_type(ExecutorSaturated),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True,
+        before_sleep=count_retry("amocrm"),
+    )
+    @timed("amocrm")
+    @_with_tokens
+    async def update_leads(self, updates: list[dict[str, Any]]) -> None:
+        """
+        Пакетное обновление сделок.
+
+        Args:
+            updates: Список {"id": lead_id, поле: значение} в формате API v4
+        """
+        if updates:
+            await self._patch_batches(self._leads_api, "leads", updates)
+            logger.info("Пакетно обновлено %s сделок", len(updates))
+
+    @retry(
+        retry=retry_if_not_exception_type(ExecutorSaturated),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True,
+        before_sleep=count_retry("amocrm"),
+    )
+    @timed("amocrm")
+    @_with_tokens
+    async def update_contacts(self, updates: list[dict[str, Any]]) -> None:
+        """
+        Пакетное обновление контактов.
+
+        Args:
+            updates: Список {"id": contact_id, поле: значение} в формате API v4
+                (телефон и email - через contact_fields_update)
+        """
+        if updates:
+            await self._patch_batches(self._contacts_api, "contacts", updates)
+            logger.info("Пакетно обновлено %s контактов", len(updates))
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def find_contact(
         self, phone: str | None = None, email: str | None = None, name: str | None = None
     ) -> dict[str, Any] | None:
@@ -88,7 +460,7 @@ class AmoCRMClient:
         """
         try:
             if email:
-                contacts = await asyncio.to_thread(lambda: list(Contact.objects.filter(query=email)))
+                contacts = await amocrm_executor.run(lambda: list(Contact.objects.filter(query=email)))
                 logger.info("Найдено %s контактов по email %s", len(contacts), email)
 
                 if len(contacts) == 1:
@@ -127,7 +499,7 @@ class AmoCRMClient:
                     }
 
             if phone:
-                contacts = await asyncio.to_thread(lambda: list(Contact.objects.filter(query=phone)))
+                contacts = await amocrm_executor.run(lambda: list(Contact.objects.filter(query=phone)))
                 if contacts:
                     contact = contacts[0]
                     logger.info("Найден контакт по телефону %s: id=%s", phone, contact.id)
@@ -146,15 +518,18 @@ class AmoCRMClient:
             raise
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def update_contact(self, contact_id: int, name: str, phone: str | None = None, email: str | None = None) -> int:
         """Обновление существующего контакта."""
         try:
-            contact = await asyncio.to_thread(Contact.objects.get, contact_id)
+            contact = await amocrm_executor.run(Contact.objects.get, contact_id)
 
             updated = False
 
@@ -171,7 +546,7 @@ class AmoCRMClient:
                 updated = True
 
             if updated:
-                await asyncio.to_thread(contact.save)
+                await amocrm_executor.run(contact.save)
                 logger.info("Обновлён контакт: id=%s, name=%s, phone=%s, email=%s", contact_id, name, phone, email)
             else:
                 logger.info("Контакт не изменился: id=%s", contact_id)
@@ -183,18 +558,21 @@ class AmoCRMClient:
             raise
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def upsert_contact(self, name: str, phone: str | None = None, email: str | None = None) -> int:
         """Создание или обновление контакта."""
         try:
             existing = await self.find_contact(phone=phone, email=email, name=name)
             if existing:
                 contact_id = existing["id"]
-                contact = await asyncio.to_thread(Contact.objects.get, contact_id)
+                contact = await amocrm_executor.run(Contact.objects.get, contact_id)
 
                 updated = False
 
@@ -211,7 +589,7 @@ class AmoCRMClient:
                     updated = True
 
                 if updated:
-                    await asyncio.to_thread(contact.save)
+                    await amocrm_executor.run(contact.save)
                     logger.info("Обновлён контакт: id=%s, name=%s, phone=%s, email=%s", contact_id, name, phone, email)
                 else:
                     logger.info("Контакт не изменился: id=%s", contact_id)
@@ -228,7 +606,7 @@ class AmoCRMClient:
                 contact.save()
                 return contact.id
 
-            new_contact_id = await asyncio.to_thread(create_contact)
+            new_contact_id = await amocrm_executor.run(create_contact)
             logger.info("Создан новый контакт: id=%s, name=%s, phone=%s, email=%s", new_contact_id, name, phone, email)
             return new_contact_id
 
@@ -237,11 +615,14 @@ class AmoCRMClient:
             raise
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def find_lead(  # pylint: disable=too-many-branches
         self,
         email: str | None = None,
@@ -262,7 +643,7 @@ class AmoCRMClient:
         try:
             if lead_id:
                 try:
-                    lead = await asyncio.to_thread(AmoLead.objects.get, lead_id)
+                    lead = await amocrm_executor.run(AmoLead.objects.get, lead_id)
                     logger.info("Найдена сделка по lead_id=%s", lead_id)
                     return {
                         "id": lead.id,
@@ -299,7 +680,7 @@ class AmoCRMClient:
                         continue
                 return contact_leads
 
-            contact_leads = await asyncio.to_thread(find_leads_for_contact)
+            contact_leads = await amocrm_executor.run(find_leads_for_contact)
 
             if not contact_leads:
                 logger.info("Сделки для контакта id=%s не найдены", contact_id)
@@ -339,11 +720,14 @@ class AmoCRMClient:
             raise
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def create_lead(
         self,
         name: str,
@@ -378,7 +762,7 @@ class AmoCRMClient:
                 lead.save()
                 return lead.id
 
-            lead_id = await asyncio.to_thread(create_lead_sync)
+            lead_id = await amocrm_executor.run(create_lead_sync)
             logger.info(
                 "Создана сделка: id=%s, name=%s, price=%s, pipeline=%s, status=%s, contact=%s",
                 lead_id,
@@ -394,11 +778,14 @@ class AmoCRMClient:
             raise
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def upsert_lead(  # pylint: disable=too-many-positional-arguments
         self,
         name: str,
@@ -443,7 +830,7 @@ class AmoCRMClient:
 
                     return lead_id_found, updated
 
-                lead_id_result, was_updated = await asyncio.to_thread(update_lead_sync)
+                lead_id_result, was_updated = await amocrm_executor.run(update_lead_sync)
 
                 if was_updated:
                     logger.info("Обновлена сделка: id=%s, name=%s, price=%s", lead_id_result, name, budget)
@@ -473,11 +860,14 @@ class AmoCRMClient:
         return f"{self.base_url}/leads/detail/{lead_id}"
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def get_contact_info(self, contact_id: int) -> dict[str, Any] | None:
         """
         Получение полной информации о контакте.
@@ -513,7 +903,7 @@ class AmoCRMClient:
                     "email": email,
                 }
 
-            contact_data = await asyncio.to_thread(get_contact_data)
+            contact_data = await amocrm_executor.run(get_contact_data)
 
             logger.info(
                 "Получена информация о контакте: id=%s, name=%s, phone=%s, email=%s",
@@ -530,11 +920,14 @@ class AmoCRMClient:
             return None
 
     @retry(
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_not_exception_type(ExecutorSaturated),
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         reraise=True,
+        before_sleep=count_retry("amocrm"),
     )
+    @timed("amocrm")
+    @_with_tokens
     async def get_lead_info(self, lead_id: int) -> dict[str, Any] | None:
         """
         Получение полной информации о сделке.
@@ -567,6 +960,7 @@ class AmoCRMClient:
                 except Exception as e:
                     logger.debug("Не удалось получить контакты сделки %s: %s", lead_id, e)
 
+                updated_at = lead.updated_at
                 return {
                     "id": lead.id,
                     "name": lead.name,
@@ -576,9 +970,10 @@ class AmoCRMClient:
                     "pipeline_id": pipeline_id,
                     "contact_id": contact_id,
                     "contact_name": contact_name,
+                    "updated_at": calendar.timegm(updated_at.utctimetuple()) if updated_at else None,
                 }
 
-            lead_data = await asyncio.to_thread(get_lead_data)
+            lead_data = await amocrm_executor.run(get_lead_data)
 
             logger.info(
                 "Получена информация о сделке: id=%s, name=%s, price=%s, status=%s, contact_id=%s",
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any
+
+import jwt
+from amocrm.v2 import tokens  # type: ignore[import-untyped]
+
+from app.core.metrics import timed
+from app.core.settings import settings
+from app.core.sync_lock import sync_lock
+from app.core.tracing import to_thread
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_LEASE = "amocrm_token_refresh"
+# Время жизни блокировки обновления токенов (сек)
+REFRESH_LEASE_TTL = 30
+# Интервал проверки общих токенов, пока обновление выполняет другой воркер (сек)
+REFRESH_WAIT_INTERVAL = 0.5
+
+TOKEN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".amocrm_tokens")
+# Общие для всех воркеров и узлов токены AmoCRM (хэш access_token, refresh_token)
+AMOCRM_TOKENS_KEY = "amocrm:tokens"
+
+
+def token_expires_at(token: str | None) -> float | None:
+    """Время истечения access token (exp из JWT); None, если токена нет или он не JWT."""
+    if not token:
+        return None
+    try:
+        return float(jwt.decode(token, options={"verify_signature": False})["exp"])
+    except Exception:
+        return None
+
+
+@timed("redis")
+async def get_shared_tokens() -> tuple[str, str] | None:
+    """
+    Общие токены AmoCRM из Redis.
+
+    Returns:
+        tuple[str, str] | None: (access_token, refresh_token) или None, если токенов нет или Redis недоступен
+    """
+
+    async def redis_op(client: Any) -> tuple[str, str] | None:
+        stored = await client.hgetall(AMOCRM_TOKENS_KEY)
+        if stored.get("access_token") and stored.get("refresh_token"):
+            return stored["access_token"], stored["refresh_token"]
+        return None
+
+    async def local_op() -> tuple[str, str] | None:
+        return None
+
+    return await sync_lock.run("прочитать токены AmoCRM", redis_op, local_op)
+
+
+@timed("redis")
+async def save_shared_tokens(access_token: str, refresh_token: str) -> None:
+    """Сохранить токены AmoCRM в Redis для всех воркеров и узлов (без Redis токены остаются локальными)."""
+
+    async def redis_op(client: Any) -> None:
+        await client.hset(AMOCRM_TOKENS_KEY, mapping={"access_token": access_token, "refresh_token": refresh_token})
+
+    async def local_op() -> None:
+        return None
+
+    await sync_lock.run("сохранить токены AmoCRM", redis_op, local_op)
+
+
+class SharedTokensStorage(tokens.TokensStorage):  # type: ignore[misc]
+    """
+    Хранилище токенов для amocrm.v2: токены в памяти процесса, копия в файлах .amocrm_tokens/.
+
+    Библиотека читает access token на каждом запросе из потоков to_thread - чтение идет из памяти.
+    Общая копия для всех воркеров и узлов хранится в Redis и обновляется AmoTokenManager.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Инициализация хранилища.
+
+        Args:
+            directory: Каталог файловой копии токенов
+        """
+        self._file = tokens.FileTokensStorage(directory)
+        self._tokens: tuple[str, str] | None = None
+        self.expires_at: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def load(self, access_token: str, refresh_token: str) -> None:
+        """Заменить токены в памяти и файловой копии (без записи в Redis)."""
+        self._tokens = (access_token, refresh_token)
+        self.expires_at = token_expires_at(access_token)
+        self._file.save_tokens(access_token, refresh_token)
+
+    def load_from_file(self) -> bool:
+        """Загрузить токены из файловой копии; False, если файлов нет."""
+        access_token, refresh_token = self._file.get_access_token(), self._file.get_refresh_token()
+        if not access_token or not refresh_token:
+            return False
+        self._tokens = (access_token, refresh_token)
+        self.expires_at = token_expires_at(access_token)
+        return True
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Цикл событий для публикации токенов, сохраненных библиотекой из потока."""
+        self._loop = loop
+
+    def get_access_token(self) -> str | None:
+        return self._tokens[0] if self._tokens else None
+
+    def get_refresh_token(self) -> str | None:
+        return self._tokens[1] if self._tokens else None
+
+    def save_tokens(self, access_token: str, refresh_token: str) -> None:
+        """Сохранение библиотекой (обмен auth_code или обновление истекшего токена на запросе)."""
+        self.load(access_token, refresh_token)
+        if self._loop is not None and self._loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not self._loop:
+                asyncio.run_coroutine_threadsafe(save_shared_tokens(access_token, refresh_token), self._loop)
+
+
+class AmoTokenManager:
+    """
+    Токены AmoCRM, общие для всех воркеров и узлов.
+
+    Токены хранятся в Redis и кэшируются в памяти процесса. Обновление выполняется заранее,
+    за AMO_TOKEN_REFRESH_MARGIN секунд до истечения access token, фоновой задачей: внутри процесса
+    одно обновление за раз, между процессами - под арендой amocrm_token_refresh в Redis. Остальные
+    воркеры ждут и берут новые токены из Redis, поэтому refresh token не обновляется дважды
+    и не инвалидируется другим узлом.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация менеджера."""
+        self.storage = SharedTokensStorage(TOKEN_DIR)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._refresh_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+
+    def _configure(self) -> None:
+        """Настройка менеджера токенов библиотеки (без обращений к API)."""
+        os.makedirs(TOKEN_DIR, exist_ok=True)
+        tokens.default_token_manager(
+            client_id=settings.AMO_CLIENT_ID,
+            client_secret=settings.AMO_CLIENT_SECRET,
+            subdomain=settings.AMO_BASE_URL,
+            redirect_url=settings.AMO_REDIRECT_URI,
+            storage=self.storage,
+        )
+
+    def _init_local(self) -> None:
+        """Токены из файловой копии или первичный обмен AMO_AUTH_CODE (в потоке)."""
+        if self.storage.load_from_file():
+            logger.info("Найдены сохранённые токены — используем их.")
+            return
+        try:
+            logger.info("Нет сохранённых токенов — инициализация через auth_code...")
+            tokens.default_token_manager.init(code=settings.AMO_AUTH_CODE, skip_error=True)
+            logger.info("Первичная инициализация выполнена, токены сохранены.")
+        except Exception as e:
+            logger.warning(
+                "Не удалось инициализировать токены через auth_code: %s. Токены будут обновлены при первом запросе.", e
+            )
+
+    async def _load_shared(self) -> bool:
+        """Взять токены из Redis, если они отличаются от токенов в памяти; False, если в Redis токенов нет."""
+        shared = await get_shared_tokens()
+        if shared is None:
+            return False
+        if shared[0] != self.storage.get_access_token():
+            await to_thread(self.storage.load, *shared)
+            logger.info("Токены AmoCRM обновлены из Redis")
+        return True
+
+    async def initialize(self) -> None:
+        """
+        Инициализация токенов: из Redis, иначе из файловой копии или обменом AMO_AUTH_CODE.
+
+        Токены, полученные локально, публикуются в Redis для остальных воркеров и узлов.
+        """
+        self._configure()
+        self.storage.bind_loop(asyncio.get_running_loop())
+        if await self._load_shared():
+            logger.info("Используются общие токены AmoCRM из Redis")
+        else:
+            await to_thread(self._init_local)
+            access_token, refresh_token = self.storage.get_access_token(), self.storage.get_refresh_token()
+            if access_token and refresh_token:
+                await save_shared_tokens(access_token, refresh_token)
+        await self.refresh_if_needed()
+
+    def _needs_refresh(self) -> bool:
+        expires_at = self.storage.expires_at
+        return expires_at is not None and expires_at - time.time() <= settings.AMO_TOKEN_REFRESH_MARGIN
+
+    async def refresh_if_needed(self) -> bool:
+        """
+        Обновить токены, если access token истекает в течение AMO_TOKEN_REFRESH_MARGIN секунд.
+
+        Returns:
+            bool: True если токены обновлены этим процессом
+        """
+        if not self._needs_refresh():
+            return False
+        async with self._refresh_lock:
+            await self._load_shared()
+            if not self._needs_refresh():
+                return False
+            leased = await sync_lock.acquire_lease(TOKEN_REFRESH_LEASE, self._owner, REFRESH_LEASE_TTL)
+            if not leased and sync_lock.is_healthy:
+                await self._wait_shared_refresh()
+                return False
+            # Без Redis аренда не выдается, но и токены не общие: процесс обновляет свои токены сам
+            try:
+                await self._load_shared()
+                if not self._needs_refresh():
+                    return False
+                access_token, refresh_token = await to_thread(
+                    tokens.default_token_manager._get_new_tokens  # pylint: disable=protected-access
+                )
+                await to_thread(self.storage.load, access_token, refresh_token)
+                await save_shared_tokens(access_token, refresh_token)
+                logger.info("Токены AmoCRM обновлены, access token действителен до %s", self.storage.expires_at)
+                return True
+            finally:
+                await sync_lock.release_lease(TOKEN_REFRESH_LEASE, self._owner)
+
+    async def _wait_shared_refresh(self) -> None:
+        """Дождаться новых токенов от воркера, который держит аренду обновления."""
+        deadline = time.monotonic() + REFRESH_LEASE_TTL
+        while time.monotonic() < deadline and self._needs_refresh():
+            await asyncio.sleep(REFRESH_WAIT_INTERVAL)
+            await self._load_shared()
+        if self._needs_refresh():
+            logger.warning("Токены AmoCRM не обновлены другим воркером за %s сек", REFRESH_LEASE_TTL)
+
+    async def _loop(self) -> None:
+        """Периодическая проверка срока действия токенов."""
+        interval = max(min(settings.AMO_TOKEN_REFRESH_MARGIN / 4, 60.0), 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_if_needed()
+            except Exception as e:
+                logger.error("Ошибка обновления токенов AmoCRM: %s", e, exc_info=True)
+
+    def start(self) -> None:
+        """Запустить фоновое обновление токенов."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить фоновое обновление токенов."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+amo_token_manager = AmoTokenManager()
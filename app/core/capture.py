@@ -0,0 +1,242 @@
+import base64
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import IO, Any
+from urllib.parse import parse_qsl, urlencode
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Пути, запросы к которым записываются
+CAPTURE_PREFIX = "/webhook/"
+# Заменяет значения секретов в файле записи
+REDACTED = "***"
+# Заголовки, которые не нужны для воспроизведения (их задает клиент повтора)
+_SKIPPED_HEADERS = frozenset({"host", "content-length", "connection", "accept-encoding", "keep-alive"})
+# Записей в очереди к потоку записи; при переполнении запись отбрасывается, а не задерживает запрос
+_QUEUE_SIZE = 10_000
+# Последний сегмент имени поля формы: account[_links][self] -> self
+_LAST_SEGMENT = re.compile(r"\[([^\[\]]*)\]$")
+
+
+def _redacted_names() -> set[str]:
+    return {name.strip().lower() for name in settings.WEBHOOK_CAPTURE_REDACT_HEADERS.split(",") if name.strip()}
+
+
+def _is_redacted(name: str, redacted: set[str]) -> bool:
+    """Скрывается ли значение поля: по имени целиком или по последнему сегменту имени поля формы."""
+    name = name.lower()
+    segment = _LAST_SEGMENT.search(name)
+    return name in redacted or (segment is not None and segment.group(1) in redacted)
+
+
+def _redact_pairs(pairs: list[tuple[str, str]], redacted: set[str]) -> list[tuple[str, str]]:
+    return [(name, REDACTED if _is_redacted(name, redacted) else value) for name, value in pairs]
+
+
+def _redact_json(value: Any, redacted: set[str]) -> Any:
+    """JSON с замененными значениями ключей из redacted (на любой глубине)."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if _is_redacted(str(key), redacted) else _redact_json(item, redacted)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact_json(item, redacted) for item in value]
+    return value
+
+
+def _redact_body(text: str, content_type: str, redacted: set[str]) -> str:
+    """
+    Тело с замененными значениями полей из redacted: ключей JSON и полей form-urlencoded.
+
+    Тело без таких полей (и тело других типов) возвращается без изменений, байт в байт.
+    """
+    if "application/json" in content_type:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text
+        cleaned = _redact_json(data, redacted)
+        return text if cleaned == data else json.dumps(cleaned, ensure_ascii=False)
+    if "application/x-www-form-urlencoded" in content_type:
+        pairs = parse_qsl(text, keep_blank_values=True)
+        cleaned_pairs = _redact_pairs(pairs, redacted)
+        return text if cleaned_pairs == pairs else urlencode(cleaned_pairs, safe="*[]")
+    return text
+
+
+def capture_record(
+    arrived: float, method: str, path: str, query: str, headers: list[tuple[str, str]], body: bytes
+) -> dict[str, Any]:
+    """
+    Запись одного запроса без секретов.
+
+    Значения заголовков, параметров запроса и полей тела (ключей JSON, полей формы) с именами из
+    WEBHOOK_CAPTURE_REDACT_HEADERS заменяются на "***". Тело хранится строкой UTF-8 (b) или, если не
+    декодируется, base64 (b64).
+
+    Args:
+        arrived: Время прихода запроса (unix time)
+        method: HTTP-метод
+        path: Путь
+        query: Строка параметров запроса
+        headers: Заголовки (имя в нижнем регистре, значение)
+        body: Тело запроса
+
+    Returns:
+        dict[str, Any]: Запись {t, m, p, q, h, b | b64}
+    """
+    redacted = _redacted_names()
+    if query:
+        query = urlencode(_redact_pairs(parse_qsl(query, keep_blank_values=True), redacted), safe="*")
+    record: dict[str, Any] = {
+        "t": round(arrived, 6),
+        "m": method,
+        "p": path,
+        "q": query,
+        "h": {
+            name: REDACTED if name in redacted else value for name, value in headers if name not in _SKIPPED_HEADERS
+        },
+    }
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        record["b64"] = base64.b64encode(body).decode("ascii")
+    else:
+        content_type = next((value for name, value in headers if name == "content-type"), "")
+        record["b"] = _redact_body(text, content_type.lower(), redacted)
+    return record
+
+
+def record_body(record: dict[str, Any]) -> bytes:
+    """Тело запроса из записи."""
+    if "b64" in record:
+        return base64.b64decode(record["b64"])
+    return str(record.get("b", "")).encode("utf-8")
+
+
+class WebhookCapture:
+    """
+    Запись входящих вебхуков в файл JSON Lines (по строке на запрос, только дописывание).
+
+    Файл воспроизводится benchmarks.replay против приложения с заглушками AmoCRM и Google Sheets:
+    так настройки пулов, лимитов и пакетирования проверяются на реальном потоке правок, массовых
+    изменениях сделок и повторных доставках. Запись включается WEBHOOK_CAPTURE_FILE и
+    останавливается, когда файл достигает WEBHOOK_CAPTURE_MAX_MB.
+
+    Как и вывод логов (см. logs.py), запись в файл выполняет отдельный поток: write только ставит
+    запись в очередь и не ждет диска. При переполнении очереди запись отбрасывается.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация записи (файл и поток записи запускаются при первом запросе)."""
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(maxsize=_QUEUE_SIZE)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._full = False
+        self._dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Включена ли запись."""
+        return bool(settings.WEBHOOK_CAPTURE_FILE) and not self._full
+
+    @property
+    def path(self) -> Path:
+        """Путь до файла записи."""
+        return Path(settings.STATE_DIR) / settings.WEBHOOK_CAPTURE_FILE
+
+    def write(self, record: dict[str, Any]) -> None:
+        """
+        Поставить запись в очередь потока записи.
+
+        Args:
+            record: Запись запроса (capture_record)
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, args=(self.path,), name="webhook-capture", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+    def _writer(self, path: Path) -> None:
+        """Поток записи: дописывает записи из очереди в файл до None в очереди или заполнения файла."""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file: IO[str] = open(path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        except OSError as e:
+            logger.warning("Не удалось открыть файл записи вебхуков %s: %s", path, e)
+            self._full = True
+            return
+        logger.info("Запись вебхуков в %s", path)
+        with file:
+            size = file.tell()
+            while (record := self._queue.get()) is not None:
+                line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+                line_size = len(line.encode("utf-8"))
+                if size + line_size > settings.WEBHOOK_CAPTURE_MAX_MB * 2**20:
+                    self._full = True
+                    logger.warning(
+                        "Файл записи вебхуков %s достиг %s МБ, запись остановлена", path, settings.WEBHOOK_CAPTURE_MAX_MB
+                    )
+                    return
+                try:
+                    file.write(line)
+                    file.flush()
+                except OSError as e:
+                    logger.warning("Не удалось записать вебхук в %s: %s", path, e)
+                    continue
+                size += line_size
+
+    def close(self) -> None:
+        """Дописать записи из очереди и остановить поток записи."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        if thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+        self._queue = queue.Queue(maxsize=_QUEUE_SIZE)
+        if self._dropped:
+            logger.warning("Не записано вебхуков из-за переполнения очереди записи: %s", self._dropped)
+            self._dropped = 0
+
+
+webhook_capture = WebhookCapture()
+
+
+async def capture_webhooks(request: Any, call_next: Callable[[Any], Awaitable[Any]]) -> Any:
+    """
+    HTTP middleware: запись запросов /webhook/* до обработки (время прихода, заголовки, тело).
+
+    Тело читается здесь и передается обработчику из кэша запроса; в файл запись пишет поток записи,
+    поэтому ни диск, ни ошибка записи не влияют на обработку.
+    """
+    if not webhook_capture.enabled or not request.url.path.startswith(CAPTURE_PREFIX):
+        return await call_next(request)
+
+    arrived = time.time()
+    body = await request.body()
+    webhook_capture.write(
+        capture_record(
+            arrived,
+            request.method,
+            request.url.path,
+            request.url.query,
+            [(name.decode("latin-1"), value.decode("latin-1")) for name, value in request.scope["headers"]],
+            body,
+        )
+    )
+    return await call_next(request)
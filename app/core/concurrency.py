@@ -0,0 +1,259 @@
+import asyncio
+import functools
+import logging
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple, ParamSpec, TypeVar
+
+from amocrm.v2.exceptions import AmoApiException  # type: ignore[import-untyped]
+from gspread.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_AMO_STATUS_RE = re.compile(r"Wrong status (\d{3})")
+
+# Все созданные ограничители (для метрик)
+limiters: list["AdaptiveLimiter"] = []
+
+INTERACTIVE = "interactive"
+# Классы исходящей работы по убыванию приоритета: вебхуки, опросы изменений, сверка, импорт
+WORK_CLASSES = (INTERACTIVE, "poll", "reconcile", "import")
+
+_work_class: ContextVar[str] = ContextVar("work_class", default=INTERACTIVE)
+
+
+def current_work_class() -> str:
+    """Класс текущей работы (по умолчанию interactive - обработка вебхука)."""
+    return _work_class.get()
+
+
+@contextmanager
+def work_class(name: str) -> Iterator[None]:
+    """
+    Выполнение блока с классом работы name: вызовы AmoCRM и Sheets внутри него планируются
+    с приоритетом этого класса.
+
+    Args:
+        name: Класс работы из WORK_CLASSES
+    """
+    token = _work_class.set(name)
+    try:
+        yield
+    finally:
+        _work_class.reset(token)
+
+
+def background(name: str) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """
+    Декоратор async-функции фоновой задачи: выполнение с классом работы name.
+
+    Args:
+        name: Класс работы (poll, reconcile, import)
+    """
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with work_class(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ExecutorSaturated(Exception):
+    """Пул потоков внешней системы заполнен: вызов отклонен без ожидания (сброс нагрузки)."""
+
+    def __init__(self, executor: str, retry_after: float) -> None:
+        """
+        Инициализация исключения.
+
+        Args:
+            executor: Имя пула (amocrm, sheets)
+            retry_after: Через сколько секунд имеет смысл повторить запрос
+        """
+        super().__init__(f"Пул потоков {executor} перегружен")
+        self.executor = executor
+        self.retry_after = retry_after
+
+
+def error_status(error: BaseException) -> int | None:
+    """
+    HTTP-статус ответа AmoCRM или Google Sheets из исключения вызова API.
+
+    Args:
+        error: Исключение вызова API
+
+    Returns:
+        int | None: Статус ответа или None, если исключение не содержит ответа API
+    """
+    if isinstance(error, ExecutorSaturated):
+        return 503
+    if isinstance(error, APIError):
+        return int(error.response.status_code)
+    if isinstance(error, AmoApiException) and error.args:
+        match = _AMO_STATUS_RE.search(str(error.args[0]))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+class LimiterConfig(NamedTuple):
+    """Границы адаптивного ограничителя."""
+
+    initial: int
+    minimum: int
+    maximum: int
+    latency_target: float
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Признак перегрузки API: ответ 429 или 5xx от AmoCRM или Google Sheets либо заполненный пул потоков.
+
+    Args:
+        error: Исключение вызова API
+
+    Returns:
+        bool: True если API просит снизить нагрузку
+    """
+    status = error_status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class AdaptiveLimiter:
+    """
+    Адаптивное ограничение параллелизма (AIMD).
+
+    Лимит растет на 1 после каждых `limit` успешных вызовов с задержкой не выше целевой и
+    уменьшается вдвое при 429/5xx или задержке выше целевой. После снижения следующее снижение
+    возможно не раньше чем через latency_target секунд - ответы на запросы, начатые до снижения,
+    не должны снижать лимит повторно.
+    """
+
+    def __init__(self, name: str, config: Callable[[], LimiterConfig]) -> None:
+        """
+        Инициализация ограничителя.
+
+        Args:
+            name: Имя для логов
+            config: Функция, возвращающая границы лимита (вызывается при первом использовании,
+                чтобы импорт модуля не читал настройки)
+        """
+        self.name = name
+        self._config_factory = config
+        self._config: LimiterConfig | None = None
+        self._limit: int | None = None
+        self.in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self._interactive_waiting = 0
+        limiters.append(self)
+
+    @property
+    def config(self) -> LimiterConfig:
+        """Границы лимита."""
+        if self._config is None:
+            self._config = self._config_factory()
+        return self._config
+
+    @property
+    def minimum(self) -> int:
+        """Минимальный лимит."""
+        return self.config.minimum
+
+    @property
+    def maximum(self) -> int:
+        """Максимальный лимит."""
+        return self.config.maximum
+
+    @property
+    def latency_target(self) -> float:
+        """Целевая задержка вызова (сек)."""
+        return self.config.latency_target
+
+    @property
+    def limit(self) -> int:
+        """Текущий лимит параллелизма."""
+        if self._limit is None:
+            self._limit = max(self.minimum, min(self.config.initial, self.maximum))
+        return self._limit
+
+    @limit.setter
+    def limit(self, value: int) -> None:
+        self._limit = value
+
+    async def acquire(self) -> None:
+        """Дождаться свободного слота (пока слот ждет вебхук, фоновые задачи слоты не получают)."""
+        interactive = current_work_class() == INTERACTIVE
+        async with self._condition:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: self.in_flight < self.limit and (interactive or not self._interactive_waiting)
+                )
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                    self._condition.notify_all()
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool = False) -> None:
+        """
+        Освободить слот и скорректировать лимит.
+
+        Args:
+            latency: Длительность вызова (сек)
+            overloaded: API ответил 429/5xx
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if overloaded or latency > self.latency_target:
+                self._decrease(overloaded, latency)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+                    logger.debug("Лимит параллелизма %s увеличен до %s", self.name, self.limit)
+            self._condition.notify_all()
+
+    def _decrease(self, overloaded: bool, latency: float) -> None:
+        now = time.monotonic()
+        self._successes = 0
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        new_limit = max(self.minimum, self.limit // 2)
+        if new_limit != self.limit:
+            logger.info(
+                "Лимит параллелизма %s снижен %s -> %s (%s)",
+                self.name,
+                self.limit,
+                new_limit,
+                "перегрузка API" if overloaded else f"задержка {latency:.2f} сек",
+            )
+            self.limit = new_limit
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Выполнение вызова в слоте; исключения перегрузки снижают лимит."""
+        await self.acquire()
+        started = time.monotonic()
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload_error(e)
+            raise
+        finally:
+            await self.release(time.monotonic() - started, overloaded)
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.core.concurrency import INTERACTIVE, WORK_CLASSES, ExecutorSaturated, current_work_class
+from app.core.metrics import EXECUTOR_QUEUE_WAIT, EXECUTOR_REJECTED, Gauge, LabelValues, registry
+from app.core.settings import settings
+from app.core.tracing import run_in_executor
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+class BoundedExecutor:
+    """
+    Отдельный пул потоков внешней системы с ограниченной очередью и приоритетами.
+
+    Медленные вызовы одной системы (поиск в AmoCRM под импортом) не занимают потоки другой
+    (запись в Google Sheets для вебхуков). Вызовы ждут свободный поток в очереди пула, а не в очереди
+    ThreadPoolExecutor, и получают его по приоритету класса работы (см. WORK_CLASSES): вебхуки впереди
+    опросов, сверки и импорта. Фоновые классы вместе занимают не больше EXECUTOR_BACKGROUND_MAX_SHARE
+    потоков и гарантированно получают EXECUTOR_BACKGROUND_MIN_SHARE, даже если вебхуки ждут.
+
+    Если впереди вызова (в работе и в очереди с тем же или более высоким приоритетом) уже
+    workers + queue_size вызовов, он сразу отклоняется исключением ExecutorSaturated: вебхук получает
+    503 с Retry-After, а AdaptiveLimiter фоновых задач снижает параллелизм.
+    """
+
+    def __init__(self, name: str, workers: Callable[[], int], queue_size: Callable[[], int]) -> None:
+        """
+        Инициализация пула (потоки создаются при первом вызове).
+
+        Args:
+            name: Имя пула для метрик и логов
+            workers: Функция, возвращающая число потоков
+            queue_size: Функция, возвращающая максимум вызовов в очереди сверх числа потоков
+        """
+        self.name = name
+        self._workers = workers
+        self._queue_size = queue_size
+        self._executor: ThreadPoolExecutor | None = None
+        self.pending: Counter[str] = Counter()
+        self.running: Counter[str] = Counter()
+        self._waiters: dict[str, deque[asyncio.Future[None]]] = {name: deque() for name in WORK_CLASSES}
+
+    @property
+    def workers(self) -> int:
+        """Число потоков."""
+        return max(self._workers(), 1)
+
+    @property
+    def capacity(self) -> int:
+        """Максимум вызовов в работе и в очереди."""
+        return self.workers + max(self._queue_size(), 0)
+
+    @property
+    def background_max(self) -> int:
+        """Максимум потоков, занятых фоновыми задачами."""
+        return max(int(self.workers * settings.EXECUTOR_BACKGROUND_MAX_SHARE), 1)
+
+    @property
+    def background_min(self) -> int:
+        """Потоки, гарантированные фоновым задачам."""
+        return min(max(int(self.workers * settings.EXECUTOR_BACKGROUND_MIN_SHARE), 1), self.background_max)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Пул потоков."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-executor")
+        return self._executor
+
+    def saturated(self, work: str | None = None) -> bool:
+        """Заполнен ли пул для класса работы work (учитываются вызовы того же и более высокого приоритета)."""
+        rank = WORK_CLASSES.index(work or current_work_class())
+        return sum(self.pending[name] for name in WORK_CLASSES[: rank + 1]) >= self.capacity
+
+    def _next_class(self) -> str | None:
+        """Класс работы, который получает освободившийся поток."""
+        running = sum(self.running.values())
+        if running >= self.workers:
+            return None
+        background_running = running - self.running[INTERACTIVE]
+        background_waiting = [name for name in WORK_CLASSES[1:] if self._waiters[name]]
+        if background_waiting and background_running < self.background_min:
+            return background_waiting[0]
+        if self._waiters[INTERACTIVE]:
+            return INTERACTIVE
+        if background_waiting and background_running < self.background_max:
+            return background_waiting[0]
+        return None
+
+    def _dispatch(self) -> None:
+        """Раздать свободные потоки ожидающим вызовам по приоритету."""
+        while (work := self._next_class()) is not None:
+            waiter = self._waiters[work].popleft()
+            if waiter.done():
+                continue
+            self.running[work] += 1
+            waiter.set_result(None)
+
+    async def _acquire(self, work: str) -> None:
+        """Дождаться свободного потока."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[work].append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(work)
+            else:
+                waiter.cancel()
+            raise
+
+    def _release(self, work: str) -> None:
+        self.running[work] -= 1
+        self._dispatch()
+
+    async def run(self, func: Callable[..., R], /, *args: Any) -> R:
+        """
+        Выполнить синхронную функцию в пуле с приоритетом текущего класса работы.
+
+        Args:
+            func: Синхронная функция
+            *args: Позиционные аргументы
+
+        Returns:
+            R: Результат функции
+
+        Raises:
+            ExecutorSaturated: Пул заполнен
+        """
+        work = current_work_class()
+        if self.saturated(work):
+            EXECUTOR_REJECTED.inc(executor=self.name)
+            logger.warning("Пул потоков %s заполнен (%s вызовов), вызов %s отклонен", self.name, self.pending.total(), work)
+            raise ExecutorSaturated(self.name, settings.EXECUTOR_RETRY_AFTER)
+
+        self.pending[work] += 1
+        submitted = time.perf_counter()
+        try:
+            await self._acquire(work)
+            EXECUTOR_QUEUE_WAIT.observe(time.perf_counter() - submitted, executor=self.name, work_class=work)
+            try:
+                return await run_in_executor(self.executor, func, *args)
+            finally:
+                self._release(work)
+        finally:
+            self.pending[work] -= 1
+
+    def shutdown(self) -> None:
+        """Остановить потоки пула (вызовы в работе завершаются)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+amocrm_executor = BoundedExecutor(
+    "amocrm",
+    lambda: settings.AMO_EXECUTOR_WORKERS,
+    lambda: settings.AMO_EXECUTOR_QUEUE_SIZE,
+)
+sheets_executor = BoundedExecutor(
+    "sheets",
+    lambda: settings.SHEETS_EXECUTOR_WORKERS,
+    lambda: settings.SHEETS_EXECUTOR_QUEUE_SIZE,
+)
+executors = [amocrm_executor, sheets_executor]
+
+
+def _executor_tasks() -> dict[LabelValues, float]:
+    """Вызовы в пулах внешних систем и очередь пула asyncio.to_thread по умолчанию."""
+    values: dict[LabelValues, float] = {}
+    for executor in executors:
+        for work in WORK_CLASSES:
+            values[(executor.name, f"running_{work}")] = executor.running[work]
+            values[(executor.name, f"waiting_{work}")] = executor.pending[work] - executor.running[work]
+        values[(executor.name, "capacity")] = executor.capacity
+    default = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    if default is not None:
+        values[("default", "queued")] = default._work_queue.qsize()  # pylint: disable=protected-access
+        values[("default", "threads")] = len(default._threads)  # pylint: disable=protected-access
+    return values
+
+
+registry.register(
+    Gauge(
+        "executor_tasks",
+        "Пулы потоков: вызовы в работе (running_*) и в очереди (waiting_*) по классам работы и предел (capacity) "
+        "для amocrm и sheets, очередь (queued) и потоки (threads) пула asyncio.to_thread (default)",
+        ("executor", "state"),
+        _executor_tasks,
+    )
+)
+
+
+def check_capacity() -> None:
+    """
+    Проверка перед обработкой вебхука: при заполненном пуле запрос отклоняется сразу, до начала работы.
+
+    Raises:
+        ExecutorSaturated: Один из пулов заполнен
+    """
+    for executor in executors:
+        if executor.saturated():
+            EXECUTOR_REJECTED.inc(executor=executor.name)
+            raise ExecutorSaturated(executor.name, settings.EXECUTOR_RETRY_AFTER)
@@ -0,0 +1,71 @@
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from app.core.settings import settings
+from app.core.tracing import to_thread
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LocalDB:
+    """Локальная база SQLite в режиме WAL для состояния, которое должно пережить перезапуск."""
+
+    def __init__(self, filename: str, schema: str) -> None:
+        """
+        Инициализация базы.
+
+        Args:
+            filename: Имя файла базы в каталоге STATE_DIR
+            schema: SQL-скрипт создания таблиц и индексов (идемпотентный)
+        """
+        self.filename = filename
+        self._schema = schema
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """Путь до файла базы."""
+        return Path(settings.STATE_DIR) / self.filename
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(self._schema)
+            self._conn = conn
+            logger.info("Открыта локальная база %s", self.path)
+        return self._conn
+
+    def run_sync(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнение функции с соединением в одной транзакции (в текущем потоке)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                result = func(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    async def run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнение функции с соединением в одной транзакции в отдельном потоке."""
+        return await to_thread(self.run_sync, func)
+
+    def close(self) -> None:
+        """Закрыть соединение."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
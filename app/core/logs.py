@@ -0,0 +1,192 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from app.core.metrics import LOG_RECORDS_DROPPED
+from app.core.settings import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Логгеры uvicorn со своими обработчиками: их записи тоже идут через очередь
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+# Аргументы этих типов не меняются после вызова logger.info: сообщение форматируется в потоке вывода
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+# Стандартные атрибуты LogRecord (остальные - поля extra=...)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, сообщение, поля extra и исключение."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Семплирование и ограничение частоты записей INFO и ниже; WARNING и выше проходят всегда.
+
+    Семплирование (LOG_SAMPLING) пропускает долю записей модуля по самому длинному совпавшему
+    префиксу имени логгера. Ограничение (LOG_RATE_LIMIT) пропускает не больше N записей с одним шаблоном
+    сообщения в секунду на модуль; к первой записи следующей секунды добавляется число пропущенных.
+    """
+
+    def __init__(self, sampling: str, rate_limit: int) -> None:
+        """
+        Инициализация фильтра.
+
+        Args:
+            sampling: Доли по префиксам логгеров: 'app.services.sheets_service=0.1,app.core=0.5'
+            rate_limit: Записей с одним шаблоном в секунду на модуль (0 - без ограничения)
+        """
+        super().__init__()
+        self.rates = parse_sampling(sampling)
+        self.rate_limit = rate_limit
+        self._ratios: dict[str, float] = {}
+        self._windows: dict[tuple[str, str | None], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def ratio(self, name: str) -> float:
+        """Доля пропускаемых записей логгера name."""
+        ratio = self._ratios.get(name)
+        if ratio is None:
+            matched = [prefix for prefix in self.rates if name == prefix or name.startswith(f"{prefix}.")]
+            ratio = self.rates[max(matched, key=len)] if matched else 1.0
+            self._ratios[name] = ratio
+        return ratio
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        ratio = self.ratio(record.name)
+        if ratio < 1.0 and random.random() >= ratio:
+            LOG_RECORDS_DROPPED.inc(reason="sampled")
+            return False
+        if self.rate_limit <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            template = record.msg if isinstance(record.msg, str) else None
+            window = self._windows.setdefault((record.name, template), [now, 0, 0])
+            if now - window[0] >= 1.0:
+                suppressed = int(window[2])
+                window[:] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= self.rate_limit:
+                window[2] += 1
+                LOG_RECORDS_DROPPED.inc(reason="rate_limited")
+                return False
+            window[1] += 1
+        if suppressed:
+            record.msg = f"{record.getMessage()} (пропущено похожих записей: {suppressed})"
+            record.args = None
+        return True
+
+
+class LoopSafeQueueHandler(QueueHandler):
+    """
+    QueueHandler для цикла событий: вывод и, по возможности, форматирование - в потоке QueueListener.
+
+    Стандартный QueueHandler форматирует сообщение в вызывающем потоке; здесь записи с аргументами
+    неизменяемых типов передаются как есть, и payload'ы форматируются уже в потоке вывода. При переполнении
+    очереди запись отбрасывается (счетчик log_records_dropped_total), а не блокирует цикл событий.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not args or (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            return record
+        # Изменяемые аргументы (словари, модели) могут поменяться до вывода - сообщение фиксируется сейчас
+        prepared = copy.copy(record)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+def parse_sampling(value: str) -> dict[str, float]:
+    """
+    Доли семплирования по префиксам логгеров.
+
+    Args:
+        value: Строка 'app.services.sheets_service=0.1,app.core=0.5'
+
+    Returns:
+        dict[str, float]: {префикс: доля от 0 до 1}
+    """
+    rates = {}
+    for part in value.split(","):
+        name, _, ratio = part.partition("=")
+        if name.strip() and ratio.strip():
+            rates[name.strip()] = min(max(float(ratio), 0.0), 1.0)
+    return rates
+
+
+def configure_logging() -> None:
+    """
+    Настройка логирования приложения: записи уходят в очередь, вывод в stderr - в отдельном потоке.
+
+    Запись в лог из цикла событий не ждет stderr и сборщика логов. Формат - LOG_FORMAT (text или json),
+    семплирование и ограничение частоты - LOG_SAMPLING и LOG_RATE_LIMIT. Повторный вызов перенастраивает логирование.
+    """
+    global _listener  # pylint: disable=global-statement
+    stop_logging()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    records: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=max(settings.LOG_QUEUE_SIZE, 0))
+    handler = LoopSafeQueueHandler(records)
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLING, settings.LOG_RATE_LIMIT))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level_value)
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Вывести записи из очереди и остановить поток вывода."""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
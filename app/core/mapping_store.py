@@ -0,0 +1,169 @@
+import logging
+import sqlite3
+import time
+from typing import Any
+
+from app.core.local_db import LocalDB
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS row_mapping (
+    row_index INTEGER PRIMARY KEY,
+    deal_id TEXT,
+    contact_id TEXT,
+    external_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS row_mapping_deal_id ON row_mapping (deal_id);
+CREATE INDEX IF NOT EXISTS row_mapping_contact_id ON row_mapping (contact_id);
+CREATE INDEX IF NOT EXISTS row_mapping_external_id ON row_mapping (external_id);
+"""
+
+# Колонка таблицы -> колонка row_mapping
+_COLUMNS = {
+    "amo_deal_id": "deal_id",
+    "amo_contact_id": "contact_id",
+    "external_id": "external_id",
+}
+
+
+def _clean(value: Any) -> str | None:
+    text = str(value).strip() if value is not None else ""
+    return text or None
+
+
+class MappingStore:
+    """
+    Локальная связка строка ↔ сделка ↔ контакт ↔ external_id.
+
+    Обновляется при каждой записи ID в таблицу и может быть перестроена по таблице целиком,
+    поэтому поиск строки по сделке/контакту/external_id не требует чтения таблицы.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация хранилища."""
+        self._db = LocalDB("mapping.sqlite3", _SCHEMA)
+
+    async def record(self, rows: dict[int, dict[str, Any]]) -> None:
+        """
+        Сохранить ID, записанные в строки таблицы.
+
+        Учитываются только колонки amo_deal_id, amo_contact_id и external_id;
+        сделка и external_id снимаются с других строк, где они были раньше.
+
+        Args:
+            rows: Словарь {номер_строки: {название_колонки: значение}}
+        """
+        updates = {
+            row_index: {_COLUMNS[col]: _clean(value) for col, value in mapping.items() if col in _COLUMNS}
+            for row_index, mapping in rows.items()
+        }
+        updates = {row_index: values for row_index, values in updates.items() if values}
+        if not updates:
+            return
+        now = time.time()
+
+        def record_sync(conn: sqlite3.Connection) -> None:
+            for row_index, values in updates.items():
+                for column in ("deal_id", "external_id"):
+                    if values.get(column):
+                        conn.execute(
+                            f"UPDATE row_mapping SET {column} = NULL WHERE {column} = ? AND row_index != ?",
+                            (values[column], row_index),
+                        )
+                conn.execute(
+                    "INSERT OR IGNORE INTO row_mapping (row_index, updated_at) VALUES (?, ?)", (row_index, now)
+                )
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                conn.execute(
+                    f"UPDATE row_mapping SET {assignments}, updated_at = ? WHERE row_index = ?",
+                    (*values.values(), now, row_index),
+                )
+
+        await self._db.run(record_sync)
+
+    async def rebuild(self, rows: list[dict[str, Any]]) -> int:
+        """
+        Перестроить связку по строкам таблицы (результат read_all_rows).
+
+        Args:
+            rows: Строки таблицы, начиная со строки 2
+
+        Returns:
+            int: Количество строк с ID
+        """
+        now = time.time()
+        records = []
+        for row_index, row in enumerate(rows, start=2):
+            values = [_clean(row.get(col)) for col in _COLUMNS]
+            if any(values):
+                records.append((row_index, *values, now))
+
+        def rebuild_sync(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM row_mapping")
+            conn.executemany(
+                "INSERT INTO row_mapping (row_index, deal_id, contact_id, external_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+
+        await self._db.run(rebuild_sync)
+        logger.info("Локальная связка строк перестроена: %s строк с ID", len(records))
+        return len(records)
+
+    async def get_row(self, row_index: int) -> dict[str, str | None] | None:
+        """
+        Получить ID строки.
+
+        Returns:
+            dict[str, str | None] | None: {"amo_deal_id", "amo_contact_id", "external_id"} или None
+        """
+
+        def get_sync(conn: sqlite3.Connection) -> dict[str, str | None] | None:
+            row = conn.execute(
+                "SELECT deal_id, contact_id, external_id FROM row_mapping WHERE row_index = ?", (row_index,)
+            ).fetchone()
+            if row is None:
+                return None
+            return {col: row[column] for col, column in _COLUMNS.items()}
+
+        return await self._db.run(get_sync)
+
+    async def _find_rows(self, column: str, value: int | str) -> list[int]:
+        def find_sync(conn: sqlite3.Connection) -> list[int]:
+            rows = conn.execute(
+                f"SELECT row_index FROM row_mapping WHERE {column} = ? ORDER BY row_index", (str(value),)
+            ).fetchall()
+            return [row["row_index"] for row in rows]
+
+        return await self._db.run(find_sync)
+
+    async def find_row_by_deal_id(self, deal_id: int | str) -> int | None:
+        """Поиск строки по ID сделки."""
+        rows = await self._find_rows("deal_id", deal_id)
+        return rows[0] if rows else None
+
+    async def find_row_by_external_id(self, external_id: str) -> int | None:
+        """Поиск строки по external_id."""
+        rows = await self._find_rows("external_id", external_id)
+        return rows[0] if rows else None
+
+    async def find_rows_by_contact_id(self, contact_id: int | str) -> list[int]:
+        """Поиск строк по ID контакта."""
+        return await self._find_rows("contact_id", contact_id)
+
+    async def forget_rows(self, row_indices: list[int]) -> None:
+        """Удалить устаревшие записи строк."""
+
+        def forget_sync(conn: sqlite3.Connection) -> None:
+            conn.executemany("DELETE FROM row_mapping WHERE row_index = ?", [(row_index,) for row_index in row_indices])
+
+        await self._db.run(forget_sync)
+
+    def close(self) -> None:
+        """Закрыть базу."""
+        self._db.close()
+
+
+mapping_store = MappingStore()
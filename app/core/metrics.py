@@ -0,0 +1,316 @@
+import functools
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, ParamSpec, TypeVar
+
+from app.core.concurrency import ExecutorSaturated, error_status, limiters
+from app.core.tracing import add_event, span
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Границы корзин гистограмм длительности (сек)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Базовая метрика с набором меток."""
+
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        """Строки значений в текстовом формате Prometheus."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Метрика в текстовом формате Prometheus."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Счетчик."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Увеличить счетчик."""
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Текущее значение счетчика."""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Значение, вычисляемое при каждом чтении метрик."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], dict[LabelValues, float]] | None = None,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self._function = function
+
+    def samples(self) -> list[str]:
+        try:
+            values = self._function() if self._function else {}
+        except Exception as e:
+            logger.debug("Не удалось вычислить метрику %s: %s", self.name, e)
+            values = {}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Гистограмма длительностей."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = (*sorted(buckets), math.inf)
+        # {метки: [счетчики корзин..., сумма]}
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Добавить наблюдение."""
+        key = self._key(labels)
+        counts = self._values.setdefault(key, [0.0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += value
+
+    def count(self, **labels: Any) -> int:
+        """Количество наблюдений."""
+        counts = self._values.get(self._key(labels))
+        return int(counts[-2]) if counts else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(counts[-2])}")
+        return lines
+
+
+class Registry:
+    """Реестр метрик приложения."""
+
+    def __init__(self) -> None:
+        """Инициализация реестра."""
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        """Зарегистрировать метрику (повторная регистрация имени возвращает существующую)."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+UPSTREAM_REQUESTS: Counter = registry.register(
+    Counter(
+        "upstream_requests_total",
+        "Вызовы AmoCRM, Google Sheets и Redis по операциям и результату (ok, throttled, error)",
+        ("backend", "operation", "outcome"),
+    )
+)
+UPSTREAM_DURATION: Histogram = registry.register(
+    Histogram(
+        "upstream_request_duration_seconds",
+        "Длительность вызовов AmoCRM, Google Sheets и Redis по операциям",
+        ("backend", "operation"),
+    )
+)
+UPSTREAM_RETRIES: Counter = registry.register(
+    Counter("upstream_retries_total", "Повторы вызовов после ошибки (tenacity)", ("backend", "operation"))
+)
+WEBHOOK_DURATION: Histogram = registry.register(
+    Histogram(
+        "webhook_duration_seconds",
+        "Полная длительность обработки вебхука",
+        ("source", "outcome"),
+    )
+)
+WEBHOOK_SKIPPED: Counter = registry.register(
+    Counter("webhook_skipped_total", "Пропущенные вебхуки и строки по причине", ("source", "reason"))
+)
+EXECUTOR_REJECTED: Counter = registry.register(
+    Counter("executor_rejected_total", "Вызовы, отклоненные заполненным пулом потоков (сброс нагрузки)", ("executor",))
+)
+EXECUTOR_QUEUE_WAIT: Histogram = registry.register(
+    Histogram(
+        "executor_queue_wait_seconds",
+        "Ожидание свободного потока в пуле внешней системы по классу работы",
+        ("executor", "work_class"),
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+    )
+)
+LOG_RECORDS_DROPPED: Counter = registry.register(
+    Counter(
+        "log_records_dropped_total",
+        "Записи лога, не выведенные по причине (sampled, rate_limited, queue_full)",
+        ("reason",),
+    )
+)
+
+
+def _limiter_values() -> dict[LabelValues, float]:
+    """Текущий лимит и занятые слоты адаптивных ограничителей параллелизма."""
+    values: dict[LabelValues, float] = {}
+    for limiter in limiters:
+        values[(limiter.name, "limit")] = limiter.limit
+        values[(limiter.name, "in_flight")] = limiter.in_flight
+    return values
+
+
+registry.register(
+    Gauge(
+        "concurrency_limiter",
+        "Адаптивные ограничители параллелизма: текущий лимит (limit) и занятые слоты (in_flight)",
+        ("limiter", "value"),
+        _limiter_values,
+    )
+)
+
+
+def outcome_of(error: BaseException | None) -> str:
+    """Результат вызова для метки outcome: ok, throttled (429), rejected (пул потоков заполнен) или error."""
+    if error is None:
+        return "ok"
+    if isinstance(error, ExecutorSaturated):
+        return "rejected"
+    return "throttled" if error_status(error) == 429 else "error"
+
+
+def timed(backend: str) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """
+    Декоратор async-метода клиента: счетчик вызовов по результату, гистограмма длительности
+    и спан "{backend}.{операция}" в дереве трассировки запроса.
+
+    Под @retry декоратор измеряет каждую попытку отдельно.
+
+    Args:
+        backend: Имя внешней системы (amocrm, sheets, redis)
+    """
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        operation = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            started = time.perf_counter()
+            error: BaseException | None = None
+            try:
+                with span(f"{backend}.{operation}"):
+                    return await func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                UPSTREAM_DURATION.observe(time.perf_counter() - started, backend=backend, operation=operation)
+                UPSTREAM_REQUESTS.inc(backend=backend, operation=operation, outcome=outcome_of(error))
+
+        return wrapper
+
+    return decorator
+
+
+def count_retry(backend: str) -> Callable[[Any], None]:
+    """
+    Колбэк before_sleep для tenacity: счетчик повторов по операции и событие ожидания в трассировке.
+
+    Args:
+        backend: Имя внешней системы
+    """
+
+    def before_sleep(retry_state: Any) -> None:
+        operation = getattr(retry_state.fn, "__name__", "unknown")
+        UPSTREAM_RETRIES.inc(backend=backend, operation=operation)
+        sleep = getattr(retry_state.next_action, "sleep", None)
+        add_event(f"retry {backend}.{operation}", attempt=retry_state.attempt_number, sleep_s=sleep)
+
+    return before_sleep
+
+
+def observe_webhook(source: str, started: float, result: dict[str, Any] | None, outcome: str | None = None) -> None:
+    """
+    Учесть обработку вебхука: длительность и причину пропуска.
+
+    Args:
+        source: Источник вебхука (sheets, sheets_batch, amocrm)
+        started: Время начала обработки (time.perf_counter())
+        result: Ответ обработчика; None - обработка завершилась ошибкой
+        outcome: Исход (ok, skipped, error), если он уже известен (пакетный вебхук учитывает пропуски по строкам)
+    """
+    if outcome is None and result is None:
+        outcome = "error"
+    elif outcome is None and result is not None:
+        reason = result.get("skipped") or result.get("message")
+        if reason:
+            WEBHOOK_SKIPPED.inc(source=source, reason=reason)
+        outcome = "skipped" if reason else "ok"
+    WEBHOOK_DURATION.observe(time.perf_counter() - started, source=source, outcome=outcome)
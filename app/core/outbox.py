@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any
+
+from app.core.local_db import LocalDB
+from app.core.settings import settings
+from app.core.sheets_client import sheets_client
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    row_index INTEGER PRIMARY KEY,
+    mapping TEXT NOT NULL,
+    deal_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_deal_id ON outbox (deal_id);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt_at ON outbox (next_attempt_at);
+"""
+
+
+class SheetsOutbox:
+    """
+    Outbox записи результатов в Google Sheets.
+
+    Связка "строка ↔ сделка/контакт" сохраняется локально до записи в таблицу.
+    Если запись в таблицу не удалась (квота, таймаут), фоновая задача повторяет ее пакетами,
+    а поиск существующей сделки по строке сначала смотрит в outbox - так повторный вебхук
+    или импорт не создает дубль контакта и сделки.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация outbox."""
+        self._db = LocalDB("outbox.sqlite3", _SCHEMA)
+        self._flush_task: asyncio.Task[None] | None = None
+
+    async def add(self, row_index: int, mapping: dict[str, Any]) -> dict[str, Any]:
+        """
+        Сохранить значения для записи в строку (объединяются с еще не записанными).
+
+        Args:
+            row_index: Номер строки в таблице
+            mapping: Словарь {название_колонки: значение}
+
+        Returns:
+            dict[str, Any]: Все не записанные значения строки с учетом новых
+        """
+        return (await self.add_many({row_index: mapping}))[row_index]
+
+    async def add_many(self, rows: dict[int, dict[str, Any]]) -> dict[int, dict[str, Any]]:
+        """
+        Сохранить значения для записи в несколько строк одной транзакцией.
+
+        Args:
+            rows: Словарь {номер_строки: {название_колонки: значение}}
+
+        Returns:
+            dict[int, dict[str, Any]]: Все не записанные значения строк с учетом новых
+        """
+        now = time.time()
+
+        def add_sync(conn: sqlite3.Connection) -> dict[int, dict[str, Any]]:
+            merged_rows = {}
+            for row_index, mapping in rows.items():
+                row = conn.execute("SELECT mapping FROM outbox WHERE row_index = ?", (row_index,)).fetchone()
+                merged = {**json.loads(row["mapping"]), **mapping} if row else dict(mapping)
+                conn.execute(
+                    "INSERT OR REPLACE INTO outbox "
+                    "(row_index, mapping, deal_id, attempts, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, 0, ?, ?)",
+                    (
+                        row_index,
+                        json.dumps(merged, ensure_ascii=False),
+                        merged.get("amo_deal_id"),
+                        now + settings.OUTBOX_RETRY_DELAY,
+                        now,
+                    ),
+                )
+                merged_rows[row_index] = merged
+            return merged_rows
+
+        if not rows:
+            return {}
+        return await self._db.run(add_sync)
+
+    async def complete(self, written: dict[int, dict[str, Any]]) -> None:
+        """
+        Удалить записанные в таблицу строки из outbox.
+
+        Строка удаляется, только если в outbox те же значения, что были записаны: значения,
+        добавленные во время записи, остаются до следующей записи.
+
+        Args:
+            written: Записанные значения {номер_строки: {название_колонки: значение}}
+        """
+        if not written:
+            return
+
+        def complete_sync(conn: sqlite3.Connection) -> None:
+            for row_index, mapping in written.items():
+                row = conn.execute("SELECT mapping FROM outbox WHERE row_index = ?", (row_index,)).fetchone()
+                if row and json.loads(row["mapping"]) == json.loads(json.dumps(mapping, ensure_ascii=False)):
+                    conn.execute("DELETE FROM outbox WHERE row_index = ?", (row_index,))
+
+        await self._db.run(complete_sync)
+
+    async def get_pending(self, row_index: int) -> dict[str, Any] | None:
+        """
+        Получить еще не записанные в таблицу значения строки.
+
+        Args:
+            row_index: Номер строки в таблице
+
+        Returns:
+            dict[str, Any] | None: Словарь {название_колонки: значение} или None
+        """
+
+        def get_sync(conn: sqlite3.Connection) -> dict[str, Any] | None:
+            row = conn.execute("SELECT mapping FROM outbox WHERE row_index = ?", (row_index,)).fetchone()
+            return json.loads(row["mapping"]) if row else None
+
+        return await self._db.run(get_sync)
+
+    async def pending_rows(self) -> dict[int, dict[str, Any]]:
+        """Все строки, ожидающие записи в таблицу."""
+
+        def pending_sync(conn: sqlite3.Connection) -> dict[int, dict[str, Any]]:
+            rows = conn.execute("SELECT row_index, mapping FROM outbox").fetchall()
+            return {row["row_index"]: json.loads(row["mapping"]) for row in rows}
+
+        return await self._db.run(pending_sync)
+
+    async def find_row_by_deal_id(self, deal_id: int | str) -> int | None:
+        """Поиск строки с еще не записанным amo_deal_id."""
+
+        def find_sync(conn: sqlite3.Connection) -> int | None:
+            row = conn.execute("SELECT row_index FROM outbox WHERE deal_id = ?", (str(deal_id),)).fetchone()
+            return row["row_index"] if row else None
+
+        return await self._db.run(find_sync)
+
+    @traced("outbox.write")
+    async def write(self, row_index: int, mapping: dict[str, Any]) -> bool:
+        """
+        Записать значения в строку через outbox.
+
+        Значения сохраняются в outbox, затем в таблицу пишутся вместе с еще не записанными значениями
+        строки (например, amo_deal_id после неудачной записи). При ошибке записи они остаются
+        в outbox и будут записаны фоновой задачей.
+
+        Args:
+            row_index: Номер строки в таблице
+            mapping: Словарь {название_колонки: значение}
+
+        Returns:
+            bool: True если значения сразу записаны в таблицу
+        """
+        merged = await self.add(row_index, mapping)
+        try:
+            await sheets_client.update_cells(row_index=row_index, mapping=merged)
+        except Exception as e:
+            logger.warning("Не удалось записать строку %s в таблицу, запись отложена в outbox: %s", row_index, e)
+            return False
+
+        await self.complete({row_index: merged})
+        return True
+
+    @traced("outbox.write_many")
+    async def write_many(self, rows: dict[int, dict[str, Any]]) -> bool:
+        """
+        Записать значения в несколько строк через outbox одним пакетным запросом к таблице.
+
+        Args:
+            rows: Словарь {номер_строки: {название_колонки: значение}}
+
+        Returns:
+            bool: True если значения сразу записаны в таблицу
+        """
+        if not rows:
+            return True
+        merged = await self.add_many(rows)
+        try:
+            await sheets_client.update_rows(merged)
+        except Exception as e:
+            logger.warning("Не удалось записать строки %s в таблицу, запись отложена в outbox: %s", sorted(rows), e)
+            return False
+
+        await self.complete(merged)
+        return True
+
+    async def flush(self) -> int:
+        """
+        Записать в таблицу одним пакетом строки, у которых подошло время повтора.
+
+        Returns:
+            int: Количество записанных строк
+        """
+        now = time.time()
+
+        def due_sync(conn: sqlite3.Connection) -> dict[int, dict[str, Any]]:
+            rows = conn.execute(
+                "SELECT row_index, mapping FROM outbox WHERE next_attempt_at <= ? ORDER BY row_index LIMIT ?",
+                (now, settings.OUTBOX_BATCH_SIZE),
+            ).fetchall()
+            return {row["row_index"]: json.loads(row["mapping"]) for row in rows}
+
+        due = await self._db.run(due_sync)
+        if not due:
+            return 0
+
+        try:
+            await sheets_client.update_rows(due)
+        except Exception as e:
+            logger.warning("Не удалось записать %s строк из outbox: %s", len(due), e)
+
+            def fail_sync(conn: sqlite3.Connection) -> None:
+                conn.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                    "next_attempt_at = ? + ? * (1 << MIN(attempts, 6)) WHERE row_index = ?",
+                    [(str(e)[:200], now, settings.OUTBOX_RETRY_DELAY, row_index) for row_index in due],
+                )
+
+            await self._db.run(fail_sync)
+            return 0
+
+        await self.complete(due)
+        logger.info("Записано из outbox %s строк: %s", len(due), sorted(due))
+        return len(due)
+
+    async def _flush_loop(self) -> None:
+        """Фоновая запись outbox в таблицу."""
+        while True:
+            try:
+                while await self.flush():
+                    pass
+            except Exception as e:
+                logger.error("Ошибка фоновой записи outbox: %s", e, exc_info=True)
+            await asyncio.sleep(settings.OUTBOX_FLUSH_INTERVAL)
+
+    def start(self) -> None:
+        """Запустить фоновую запись outbox."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Остановить фоновую запись outbox."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        self._db.close()
+
+
+sheets_outbox = SheetsOutbox()
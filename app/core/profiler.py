@@ -0,0 +1,83 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+# Максимальная глубина стека в одном сэмпле
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded_stack(thread_name: str, frame: FrameType | None) -> str:
+    """Стек потока в формате folded (от корня к листу через ';')."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик живого трафика.
+
+    Раз в interval секунд снимаются стеки всех потоков (sys._current_frames) - и цикла событий,
+    и пула asyncio.to_thread. Результат - строки "стек количество" в формате folded stacks,
+    который принимают flamegraph.pl, speedscope и inferno.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация профилировщика."""
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Идет ли профилирование."""
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float) -> str | None:
+        """
+        Снять профиль (блокирует вызывающий поток на seconds секунд).
+
+        Args:
+            seconds: Длительность профилирования
+            interval: Интервал между сэмплами
+
+        Returns:
+            str | None: Стеки в формате folded или None, если профилирование уже идет
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            own_thread = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter[str] = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                    if thread_id == own_thread:
+                        continue
+                    if thread_id not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    stacks[_folded_stack(names.get(thread_id, str(thread_id)), frame)] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+
+        logger.info("Профилирование завершено: %s сэмплов, %s уникальных стеков", samples, len(stacks))
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+sampling_profiler = SamplingProfiler()
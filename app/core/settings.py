@@ -1,12 +1,12 @@
 import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Literal
 
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
-load_dotenv()
-
 
 class Settings(BaseSettings):
 
@@ -57,13 +57,139 @@ class Settings(BaseSettings):
     APP_HOST: str = Field(default="0.0.0.0", description="Хост FastAPI-приложения")
     APP_PORT: int = Field(default=8080, description="Порт приложения")
     LOG_LEVEL: str = Field(default="INFO", description="Уровень логирования")
+    LOG_FORMAT: Literal["text", "json"] = Field(
+        default="text",
+        description="Формат логов: text или json (строка JSON на запись)",
+    )
+    LOG_QUEUE_SIZE: int = Field(
+        default=10000,
+        description="Максимум записей лога в очереди к потоку вывода; при переполнении записи отбрасываются",
+    )
+    LOG_RATE_LIMIT: int = Field(
+        default=0,
+        description="Максимум записей INFO и ниже с одним шаблоном сообщения в секунду на модуль; 0 - без ограничения",
+    )
+    LOG_SAMPLING: str = Field(
+        default="",
+        description="Доля записей INFO и ниже по модулям (префикс логгера): 'app.services.sheets_service=0.1,app.core=0.5'",
+    )
     WEBHOOK_SECRET: str = Field(..., description="Секрет для проверки подписи вебхука")
 
-    REDIS_HOST: str = Field(default="localhost", description="Хост Redis сервера")
+    REDIS_HOST: str = Field(
+        default="localhost",
+        description="Хост Redis сервера; пустое значение - без Redis (один процесс, блокировки и аренды локальные)",
+    )
     REDIS_PORT: int = Field(default=6379, description="Порт Redis сервера")
     REDIS_DB: int = Field(default=0, description="Номер базы данных Redis")
     REDIS_PASSWORD: str | None = Field(default=None, description="Пароль для Redis (опционально)")
-    SYNC_LOCK_TTL: int = Field(default=10, description="Время блокировки синхронизации в секундах")
+    REDIS_MAX_CONNECTIONS: int = Field(default=50, description="Максимальный размер пула соединений Redis")
+    REDIS_RECONNECT_MIN_DELAY: float = Field(default=1.0, description="Начальная задержка переподключения к Redis (сек)")
+    REDIS_RECONNECT_MAX_DELAY: float = Field(default=30.0, description="Максимальная задержка переподключения к Redis (сек)")
+    SYNC_ECHO_TTL: int = Field(
+        default=3600,
+        description="Время хранения значений, записанных из AmoCRM, для распознавания эхо-вебхуков (сек)",
+    )
+    LEAD_CREATION_LOCK_TTL: int = Field(default=10, description="Время блокировки создания сделки для строки в секундах")
+
+    STATE_DIR: str = Field(default=".state", description="Каталог локального состояния (SQLite базы)")
+    OUTBOX_FLUSH_INTERVAL: float = Field(default=5.0, description="Интервал повторной записи outbox в таблицу (сек)")
+    OUTBOX_RETRY_DELAY: float = Field(default=10.0, description="Начальная задержка повтора записи из outbox (сек)")
+    OUTBOX_BATCH_SIZE: int = Field(default=100, description="Максимум строк в одной пакетной записи outbox")
+
+    IMPORT_CHUNK_SIZE: int = Field(default=50, description="Размер пачки строк импорта (чекпоинт после каждой)")
+    IMPORT_JOB_STALE_AFTER: float = Field(
+        default=120.0,
+        description="Через сколько секунд без чекпоинта задача импорта считается прерванной и продолжается",
+    )
+    IMPORT_CONCURRENCY_INITIAL: int = Field(default=2, description="Начальный параллелизм импорта")
+    IMPORT_CONCURRENCY_MIN: int = Field(default=1, description="Минимальный параллелизм импорта")
+    IMPORT_CONCURRENCY_MAX: int = Field(default=10, description="Максимальный параллелизм импорта")
+    IMPORT_LATENCY_TARGET: float = Field(
+        default=5.0,
+        description="Целевая длительность обработки строки импорта (сек); выше - параллелизм снижается",
+    )
+    IMPORT_ON_STARTUP: bool = Field(default=True, description="Запускать автоимпорт строк при старте приложения")
+    IMPORT_LEADER_LEASE_TTL: int = Field(
+        default=30,
+        description="TTL аренды лидера автоимпорта (сек); импорт при старте выполняет только лидер",
+    )
+
+    RECONCILE_INTERVAL: float = Field(
+        default=0.0,
+        description="Интервал фоновой сверки таблицы и AmoCRM (сек); 0 - только по запросу POST /reconcile (по умолчанию)",
+    )
+    RECONCILE_CHUNK_SIZE: int = Field(default=500, description="Строк таблицы в одной пачке сверки")
+    RECONCILE_CONFLICT_WINNER: Literal["amocrm", "sheets"] = Field(
+        default="amocrm",
+        description="Чьи значения применяются, если строка изменилась и в таблице, и в AmoCRM",
+    )
+    AMO_POLL_INTERVAL: float = Field(
+        default=0.0,
+        description="Интервал опроса AmoCRM по updated_at (сек) как резерва вебхуков; 0 - выключен (по умолчанию)",
+    )
+    SHEETS_POLL_INTERVAL: float = Field(
+        default=0.0,
+        description="Интервал опроса изменений таблицы (сек) вместо вебхуков Apps Script; 0 - выключен",
+    )
+    SHEETS_POLL_CHUNK_SIZE: int = Field(
+        default=1000,
+        description="Строк таблицы в одном диапазоне при опросе изменений",
+    )
+    TRACE_SLOW_REQUEST_THRESHOLD: float = Field(
+        default=10.0,
+        description="Запросы дольше порога (сек) пишутся в лог с деревом спанов; 0 - трассировка выключена",
+    )
+    PROFILER_ENABLED: bool = Field(
+        default=False,
+        description="Включить эндпоинт семплирующего профилировщика GET /debug/profile",
+    )
+    PROFILER_MAX_SECONDS: float = Field(
+        default=60.0,
+        description="Максимальная длительность одного профилирования (сек)",
+    )
+    WARMUP_TIMEOUT: float = Field(
+        default=15.0,
+        description="Таймаут каждого шага прогрева клиентов при старте (сек)",
+    )
+    AMO_TOKEN_REFRESH_MARGIN: float = Field(
+        default=600.0,
+        description="За сколько секунд до истечения access token AmoCRM обновлять токены в фоне",
+    )
+    AMO_EXECUTOR_WORKERS: int = Field(default=8, description="Потоков в пуле вызовов AmoCRM")
+    AMO_EXECUTOR_QUEUE_SIZE: int = Field(
+        default=64,
+        description="Максимум вызовов AmoCRM в очереди сверх числа потоков; дальше - отказ (503)",
+    )
+    SHEETS_EXECUTOR_WORKERS: int = Field(default=8, description="Потоков в пуле вызовов Google Sheets")
+    SHEETS_EXECUTOR_QUEUE_SIZE: int = Field(
+        default=64,
+        description="Максимум вызовов Google Sheets в очереди сверх числа потоков; дальше - отказ (503)",
+    )
+    EXECUTOR_RETRY_AFTER: float = Field(
+        default=5.0,
+        description="Значение Retry-After (сек) в ответе 503 при заполненном пуле потоков",
+    )
+    EXECUTOR_BACKGROUND_MAX_SHARE: float = Field(
+        default=0.75,
+        description="Максимальная доля потоков пула для импорта, сверки и опросов (остальное - вебхукам)",
+    )
+    EXECUTOR_BACKGROUND_MIN_SHARE: float = Field(
+        default=0.25,
+        description="Доля потоков пула, гарантированная импорту, сверке и опросам при потоке вебхуков",
+    )
+    WEBHOOK_CAPTURE_FILE: str = Field(
+        default="",
+        description="Файл записи входящих /webhook/* для воспроизведения (относительно STATE_DIR); пусто - выключено",
+    )
+    WEBHOOK_CAPTURE_MAX_MB: float = Field(
+        default=100.0,
+        description="Максимальный размер файла записи вебхуков (МБ); дальше запись останавливается",
+    )
+    WEBHOOK_CAPTURE_REDACT_HEADERS: str = Field(
+        default="x-webhook-secret,authorization,cookie",
+        description="Заголовки, параметры запроса и поля тела (JSON, форма) через запятую, значения которых не пишутся "
+        "в файл записи",
+    )
 
     model_config = {
         "env_file": ".env",
@@ -73,11 +199,36 @@ class Settings(BaseSettings):
 
     @property
     def log_level_value(self) -> int:
-        """Возвращает числовой уровень логирования для logging.basicConfig."""
+        """Возвращает числовой уровень логирования для configure_logging."""
         return getattr(logging, self.LOG_LEVEL.upper(), logging.INFO)
 
 
-settings = Settings()  # type: ignore[call-arg]
-if not Path(settings.GOOGLE_SERVICE_ACCOUNT_JSON).is_absolute():
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Настройки приложения (читаются из окружения и .env при первом обращении).
+
+    Returns:
+        Settings: Настройки с абсолютными путями до файлов
+    """
+    load_dotenv()
+    loaded = Settings()  # type: ignore[call-arg]
     base_path = Path(__file__).parent.parent.parent
-    settings.GOOGLE_SERVICE_ACCOUNT_JSON = str(base_path / settings.GOOGLE_SERVICE_ACCOUNT_JSON)
+    if not Path(loaded.GOOGLE_SERVICE_ACCOUNT_JSON).is_absolute():
+        loaded.GOOGLE_SERVICE_ACCOUNT_JSON = str(base_path / loaded.GOOGLE_SERVICE_ACCOUNT_JSON)
+    if not Path(loaded.STATE_DIR).is_absolute():
+        loaded.STATE_DIR = str(base_path / loaded.STATE_DIR)
+    return loaded
+
+
+class _LazySettings:
+    """Обращения к атрибутам передаются в get_settings(): импорт модулей не читает окружение."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_settings(), name, value)
+
+
+settings: Settings = _LazySettings()  # type: ignore[assignment]
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import threading
 from typing import Any
@@ -6,23 +5,78 @@ from typing import Any
 import gspread
 from google.oauth2.service_account import Credentials
 
+from app.core.executors import sheets_executor
+from app.core.mapping_store import mapping_store
+from app.core.metrics import timed
 from app.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Максимум диапазонов в одном запросе batch_get
+READ_BATCH_SIZE = 500
+
+
+def rows_to_dicts(values: list[list[str]]) -> list[dict[str, Any]]:
+    """
+    Значения листа в список словарей: первая строка - заголовки.
+
+    Короткие строки дополняются пустыми значениями, значения правее последнего заголовка отбрасываются.
+
+    Args:
+        values: Значения листа (get_all_values)
+
+    Returns:
+        list[dict[str, Any]]: Список словарей, где ключи - названия колонок
+    """
+    if not values:
+        return []
+    headers = values[0]
+    width = len(headers)
+    return [dict(zip(headers, row if len(row) >= width else row + [""] * (width - len(row)))) for row in values[1:]]
+
+
+def find_value_row(col_values: list[Any], value: str) -> int | None:
+    """
+    Номер первой строки с значением value в колонке (col_values[0] - заголовок).
+
+    Args:
+        col_values: Значения колонки (col_values)
+        value: Искомое значение
+
+    Returns:
+        int | None: Номер строки (начиная с 2) или None
+    """
+    try:
+        return col_values.index(value, 1) + 1
+    except ValueError:
+        return None
+
 
 class SheetsClient:
     """Клиент для взаимодействия с Google Sheets."""
 
     def __init__(self) -> None:
-        """Инициализация клиента Google Sheets."""
-        self.spreadsheet_id = settings.GOOGLE_SPREADSHEET_ID
-        self.worksheet_name = settings.GOOGLE_WORKSHEET_NAME
+        """Инициализация клиента Google Sheets (авторизация - при прогреве или первом запросе)."""
         self._client: gspread.Client | None = None
         self._worksheet: gspread.Worksheet | None = None
         self._headers: list[str] = []
         self._init_lock = threading.Lock()
 
+    @property
+    def spreadsheet_id(self) -> str:
+        """ID Google-таблицы."""
+        return settings.GOOGLE_SPREADSHEET_ID
+
+    @property
+    def worksheet_name(self) -> str:
+        """Имя листа."""
+        return settings.GOOGLE_WORKSHEET_NAME
+
+    @property
+    def sheet_key(self) -> str:
+        """Ключ листа в хранилище сопоставлений."""
+        return f"{self.spreadsheet_id}/{self.worksheet_name}"
+
     def _get_credentials(self) -> Credentials:
         """
         Получение credentials из service account JSON файла.
@@ -61,6 +115,11 @@ class SheetsClient:
 
         return self._worksheet
 
+    async def warm_up(self) -> None:
+        """Прогрев при старте: авторизация сервисного аккаунта, открытие листа и загрузка заголовков."""
+        await sheets_executor.run(self._get_worksheet)
+
+    @timed("sheets")
     async def read_all_rows(self) -> list[dict[str, Any]]:
         """
         Чтение всех строк таблицы как список словарей.
@@ -78,25 +137,117 @@ class SheetsClient:
 
             if not all_values:
                 logger.warning("Таблица пустая")
-                return []
 
-            headers = all_values[0]
-            rows = all_values[1:]
+            return rows_to_dicts(all_values)
+
+        result = await sheets_executor.run(read_rows_sync)
+        logger.info("Прочитано %s строк из таблицы", len(result))
+        return result
+
+    def _last_column(self) -> str:
+        """Буква последней колонки с заголовком."""
+        return gspread.utils.rowcol_to_a1(1, max(len(self._headers), 1)).rstrip("0123456789")
+
+    def _row_dict(self, values: list[str]) -> dict[str, Any]:
+        """Преобразование значений строки в словарь по заголовкам."""
+        return {header: values[i] if i < len(values) else "" for i, header in enumerate(self._headers)}
+
+    @timed("sheets")
+    async def read_rows_from(self, start_row: int, end_row: int | None = None) -> dict[int, dict[str, Any]]:
+        """
+        Чтение строк от start_row до end_row (или до конца таблицы) одним диапазоном.
+
+        Args:
+            start_row: Номер первой строки (>= 2)
+            end_row: Номер последней строки включительно; None - до конца таблицы
+
+        Returns:
+            dict[int, dict[str, Any]]: Словарь {номер_строки: {название_колонки: значение}}
+        """
+
+        def read_rows_sync() -> dict[int, dict[str, Any]]:
+            worksheet = self._get_worksheet()
+            values = worksheet.get(f"A{start_row}:{self._last_column()}{end_row or ''}")
+            return {start_row + i: self._row_dict(row) for i, row in enumerate(values)}
+
+        result = await sheets_executor.run(read_rows_sync)
+        logger.info("Прочитано %s строк таблицы начиная со строки %s", len(result), start_row)
+        return result
 
-            result: list[dict[str, Any]] = []
-            for row in rows:
-                while len(row) < len(headers):
-                    row.append("")
+    @timed("sheets")
+    async def get_row_count(self) -> int:
+        """
+        Число строк листа по свежим метаданным таблицы (включая пустые строки в конце).
+
+        Sheets API не возвращает пустые строки в конце диапазона, поэтому короткий или пустой ответ
+        read_rows_from не означает конец таблицы: чтение по частям идет до этого числа строк.
+
+        Returns:
+            int: Число строк листа вместе со строкой заголовков
+        """
 
-                row_dict = {headers[i]: row[i] for i in range(len(headers))}
-                result.append(row_dict)
+        def row_count_sync() -> int:
+            worksheet = self._get_worksheet()
+            metadata = worksheet.spreadsheet.fetch_sheet_metadata({"fields": "sheets.properties"})
+            for sheet in metadata.get("sheets", []):
+                properties = sheet.get("properties", {})
+                if properties.get("sheetId") == worksheet.id:
+                    return int(properties.get("gridProperties", {}).get("rowCount", worksheet.row_count))
+            return int(worksheet.row_count)
+
+        return await sheets_executor.run(row_count_sync)
 
+    @timed("sheets")
+    async def read_rows_at(self, row_indices: list[int]) -> dict[int, dict[str, Any]]:
+        """
+        Чтение отдельных строк запросами batch_get (до READ_BATCH_SIZE диапазонов в запросе).
+
+        Args:
+            row_indices: Номера строк (>= 2)
+
+        Returns:
+            dict[int, dict[str, Any]]: Словарь {номер_строки: {название_колонки: значение}}
+        """
+        if not row_indices:
+            return {}
+
+        def read_rows_sync() -> dict[int, dict[str, Any]]:
+            worksheet = self._get_worksheet()
+            last_column = self._last_column()
+            result: dict[int, dict[str, Any]] = {}
+            for start in range(0, len(row_indices), READ_BATCH_SIZE):
+                batch = row_indices[start : start + READ_BATCH_SIZE]
+                ranges = [f"A{row_index}:{last_column}{row_index}" for row_index in batch]
+                for row_index, values in zip(batch, worksheet.batch_get(ranges)):
+                    result[row_index] = self._row_dict(values[0] if values else [])
             return result
 
-        result = await asyncio.to_thread(read_rows_sync)
-        logger.info("Прочитано %s строк из таблицы", len(result))
+        result = await sheets_executor.run(read_rows_sync)
+        logger.info("Прочитано %s отдельных строк таблицы", len(result))
         return result
 
+    def _cell_updates(self, row_index: int, mapping: dict[str, Any]) -> list[dict[str, Any]]:
+        """Преобразование {название_колонки: значение} в диапазоны batch_update."""
+        headers = self._headers
+
+        updates: list[dict[str, Any]] = []
+        for col_name, value in mapping.items():
+            if col_name not in headers:
+                logger.warning("Колонка '%s' не найдена в заголовках", col_name)
+                continue
+
+            col_index = headers.index(col_name) + 1
+            cell_address = gspread.utils.rowcol_to_a1(row_index, col_index)
+
+            updates.append(
+                {
+                    "range": cell_address,
+                    "values": [[str(value)]],
+                }
+            )
+        return updates
+
+    @timed("sheets")
     async def update_cells(self, row_index: int, mapping: dict[str, Any]) -> None:
         """
         Обновление ячеек в строке по названиям колонок.
@@ -110,37 +261,69 @@ class SheetsClient:
 
         def update_cells_sync() -> int:
             worksheet = self._get_worksheet()
-            headers = self._headers
+            updates = self._cell_updates(row_index, mapping)
 
-            updates: list[dict[str, Any]] = []
-            for col_name, value in mapping.items():
-                if col_name not in headers:
-                    logger.warning("Колонка '%s' не найдена в заголовках", col_name)
-                    continue
+            if updates:
+                worksheet.batch_update(updates)
+
+            return len(updates)
 
-                col_index = headers.index(col_name) + 1
-                cell_address = gspread.utils.rowcol_to_a1(row_index, col_index)
+        update_count = await sheets_executor.run(update_cells_sync)
+        if update_count > 0:
+            logger.info("Обновлено %s ячеек в строке %s", update_count, row_index)
+            await self._record_mapping({row_index: mapping})
 
-                updates.append(
-                    {
-                        "range": cell_address,
-                        "values": [[str(value)]],
-                    }
-                )
+    @timed("sheets")
+    async def update_rows(self, rows: dict[int, dict[str, Any]]) -> None:
+        """
+        Обновление ячеек в нескольких строках одним запросом batch_update.
+
+        Args:
+            rows: Словарь {номер_строки: {название_колонки: значение}}
+        """
+        if any(row_index < 2 for row_index in rows):
+            raise ValueError("row_index должен быть >= 2 (строка 1 - заголовки)")
+
+        def update_rows_sync() -> int:
+            worksheet = self._get_worksheet()
+            updates: list[dict[str, Any]] = []
+            for row_index, mapping in rows.items():
+                updates.extend(self._cell_updates(row_index, mapping))
 
             if updates:
                 worksheet.batch_update(updates)
 
             return len(updates)
 
-        update_count = await asyncio.to_thread(update_cells_sync)
+        update_count = await sheets_executor.run(update_rows_sync)
         if update_count > 0:
-            logger.info("Обновлено %s ячеек в строке %s", update_count, row_index)
+            logger.info("Обновлено %s ячеек в %s строках", update_count, len(rows))
+            await self._record_mapping(rows)
+
+    async def _record_mapping(self, rows: dict[int, dict[str, Any]]) -> None:
+        """Обновление локальной связки строк после записи ID в таблицу."""
+        try:
+            await mapping_store.record(rows)
+        except Exception as e:
+            logger.warning("Не удалось обновить локальную связку строк %s: %s", sorted(rows), e)
+
+    async def rebuild_mapping(self) -> int:
+        """
+        Перестроение локальной связки строк по таблице.
 
+        Returns:
+            int: Количество строк с ID
+        """
+        rows = await self.read_all_rows()
+        return await mapping_store.rebuild(rows)
+
+    @timed("sheets")
     async def find_row_by_deal_id(self, deal_id: int | str) -> int | None:
         """
         Поиск номера строки по amo_deal_id.
 
+        Сначала используется локальная связка строк, затем колонка amo_deal_id таблицы.
+
         Args:
             deal_id: ID сделки из AmoCRM
 
@@ -157,26 +340,28 @@ class SheetsClient:
                 return None
 
             col_index = headers.index("amo_deal_id") + 1
-            col_values = worksheet.col_values(col_index)
-
-            deal_id_str = str(deal_id)
-            for i, value in enumerate(col_values[1:], start=2):
-                if value == deal_id_str:
-                    return i
+            return find_value_row(worksheet.col_values(col_index), str(deal_id))
 
-            return None
+        row_index = await mapping_store.find_row_by_deal_id(deal_id)
+        if row_index:
+            logger.info("Найдена строка %s с amo_deal_id=%s в локальной связке", row_index, deal_id)
+            return row_index
 
-        row_index = await asyncio.to_thread(find_row_sync)
+        row_index = await sheets_executor.run(find_row_sync)
         if row_index:
             logger.info("Найдена строка %s с amo_deal_id=%s", row_index, deal_id)
+            await self._record_mapping({row_index: {"amo_deal_id": deal_id}})
         else:
             logger.info("Строка с amo_deal_id=%s не найдена", deal_id)
         return row_index
 
+    @timed("sheets")
     async def find_row_by_external_id(self, external_id: str) -> int | None:
         """
         Поиск строки по значению в колонке external_id.
 
+        Сначала используется локальная связка строк, затем колонка external_id таблицы.
+
         Args:
             external_id: Значение для поиска
 
@@ -193,17 +378,17 @@ class SheetsClient:
                 return None
 
             col_index = headers.index("external_id") + 1
-            col_values = worksheet.col_values(col_index)
+            return find_value_row(worksheet.col_values(col_index), external_id)
 
-            for i, value in enumerate(col_values[1:], start=2):
-                if value == external_id:
-                    return i
-
-            return None
+        row_index = await mapping_store.find_row_by_external_id(external_id)
+        if row_index:
+            logger.info("Найдена строка %s с external_id=%s в локальной связке", row_index, external_id)
+            return row_index
 
-        row_index = await asyncio.to_thread(find_row_sync)
+        row_index = await sheets_executor.run(find_row_sync)
         if row_index:
             logger.info("Найдена строка %s с external_id=%s", row_index, external_id)
+            await self._record_mapping({row_index: {"external_id": external_id}})
         else:
             logger.info("Строка с external_id=%s не найдена", external_id)
         return row_index
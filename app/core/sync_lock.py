@@ -1,97 +1,647 @@
 import asyncio
 import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
 
 from redis import asyncio as aioredis  # type: ignore[import-not-found, import-untyped]
+from redis.exceptions import ConnectionError as RedisConnectionError  # type: ignore[import-not-found, import-untyped]
+from redis.exceptions import TimeoutError as RedisTimeoutError  # type: ignore[import-not-found, import-untyped]
 
+from app.core.metrics import timed
 from app.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-class SyncLock:
+# Ошибки, означающие недоступность Redis (переход на локальные блокировки и переподключение).
+# Ошибки команд и Lua-скриптов (ResponseError) - не сбой Redis: они пробрасываются вызывающему коду.
+_OUTAGE_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionError, TimeoutError)
+
+CREATION_ACQUIRED = "acquired"
+CREATION_BUSY = "busy"
+CREATION_ECHO = "echo"
+
+# KEYS[1] - отпечаток значений, записанных из AmoCRM, KEYS[2] - блокировка создания сделки.
+# ARGV[1] - отпечаток входящих данных строки.
+# Возвращает {1 если вебхук - эхо нашей записи, 1 если идет создание сделки}.
+# Несовпадающий отпечаток удаляется: строку изменил пользователь, записанные значения устарели.
+_CHECK_ROW_SCRIPT = """
+local written = redis.call('GET', KEYS[1])
+local echo = 0
+if written then
+    if written == ARGV[1] then
+        echo = 1
+    else
+        redis.call('DEL', KEYS[1])
+    end
+end
+return {echo, redis.call('EXISTS', KEYS[2])}
+"""
+
+# KEYS - отпечатки значений, записанных из AmoCRM, ARGV - отпечатки входящих данных тех же строк.
+# Возвращает по строке 1, если вебхук - эхо нашей записи; несовпадающие отпечатки удаляются, как в _CHECK_ROW_SCRIPT.
+_FIND_ECHOES_SCRIPT = """
+local echoes = {}
+for i, key in ipairs(KEYS) do
+    local written = redis.call('GET', key)
+    echoes[i] = 0
+    if written then
+        if written == ARGV[i] then
+            echoes[i] = 1
+        else
+            redis.call('DEL', key)
+        end
+    end
+end
+return echoes
+"""
+
+# KEYS[1] - отпечаток значений, записанных из AmoCRM, KEYS[2] - блокировка создания сделки.
+# ARGV[1] - отпечаток входящих данных строки, ARGV[2] - TTL блокировки создания в секундах.
+_CHECK_ECHO_AND_ACQUIRE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return -1
+end
+if redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] - ключ аренды, ARGV[1] - владелец, ARGV[2] - TTL в секундах (0 - удалить ключ).
+# Продлевает или снимает аренду, только если она принадлежит владельцу. Отсутствующая аренда
+# продлевается заново (ключ потерян при перезапуске Redis).
+_RENEW_LEASE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+elseif current then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+
+def _written_key(row_index: int) -> str:
+    return f"sync:amocrm_written:{row_index}"
+
+
+def _creation_key(row_index: int) -> str:
+    return f"creating_lead:{row_index}"
+
+
+def _lead_version_key(lead_id: int) -> str:
+    return f"sync:amocrm_applied:{lead_id}"
+
+
+def _lease_key(name: str) -> str:
+    return f"lease:{name}"
+
+
+
+class LocalLockStore:
+    """Локальное хранилище блокировок и отпечатков процесса (TTL-словарь) на время недоступности Redis."""
+
+    def __init__(self) -> None:
+        """Инициализация хранилища."""
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._lock = asyncio.Lock()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def _get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    async def get(self, keys: list[str]) -> list[str | None]:
+        """Получение значений ключей."""
+        async with self._lock:
+            self._purge()
+            return [self._get(key) for key in keys]
+
+    async def set(self, items: dict[str, str], ttl: float, nx: bool = False) -> list[bool]:
+        """Установка ключей с TTL; при nx=True только отсутствующих."""
+        async with self._lock:
+            self._purge()
+            expires_at = time.monotonic() + ttl
+            results = []
+            for key, value in items.items():
+                if nx and key in self._entries:
+                    results.append(False)
+                    continue
+                self._entries[key] = (value, expires_at)
+                results.append(True)
+            return results
+
+    async def check_row(self, written_key: str, fingerprint: str, creation_key: str) -> list[int]:
+        """Аналог _CHECK_ROW_SCRIPT."""
+        async with self._lock:
+            self._purge()
+            written = self._get(written_key)
+            echo = 0
+            if written is not None:
+                if written == fingerprint:
+                    echo = 1
+                else:
+                    del self._entries[written_key]
+            return [echo, int(creation_key in self._entries)]
+
+    async def find_echoes(self, written_keys: list[str], fingerprints: list[str]) -> list[int]:
+        """Аналог _FIND_ECHOES_SCRIPT."""
+        async with self._lock:
+            self._purge()
+            echoes = []
+            for key, fingerprint in zip(written_keys, fingerprints):
+                written = self._get(key)
+                echoes.append(int(written == fingerprint))
+                if written is not None and written != fingerprint:
+                    del self._entries[key]
+            return echoes
+
+    async def check_and_set(self, written_key: str, fingerprint: str, creation_key: str, ttl: float) -> int:
+        """Аналог _CHECK_ECHO_AND_ACQUIRE_SCRIPT."""
+        async with self._lock:
+            self._purge()
+            if self._get(written_key) == fingerprint:
+                return -1
+            if creation_key in self._entries:
+                return 0
+            self._entries[creation_key] = ("1", time.monotonic() + ttl)
+            return 1
+
+    async def renew(self, key: str, owner: str, ttl: float) -> int:
+        """Аналог _RENEW_LEASE_SCRIPT (ttl <= 0 - снять аренду)."""
+        async with self._lock:
+            self._purge()
+            current = self._get(key)
+            if current is not None and current != owner:
+                return 0
+            if ttl > 0:
+                self._entries[key] = (owner, time.monotonic() + ttl)
+            else:
+                self._entries.pop(key, None)
+            return 1
+
+    async def delete(self, keys: list[str]) -> None:
+        """Удаление ключей."""
+        async with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class SyncLock:  # pylint: disable=too-many-instance-attributes
     """Управление блокировками синхронизации через Redis."""
 
     def __init__(self) -> None:
         """Инициализация Redis клиента."""
         self._client: aioredis.Redis | None = None  # type: ignore[name-defined]
-        self._initialized = False
+        self._check_row: Any = None
+        self._find_echoes: Any = None
+        self._check_and_acquire: Any = None
+        self._renew_lease: Any = None
+        self._healthy = False
+        self._last_error: str | None = None
+        self._state_changed_at = time.time()
+        self._reconnect_attempts = 0
+        self._reconnect_task: asyncio.Task[None] | None = None
         self._init_lock = asyncio.Lock()
+        self._local = LocalLockStore()
+
+    @property
+    def enabled(self) -> bool:
+        """Настроен ли Redis: при пустом REDIS_HOST приложение работает одним процессом без Redis."""
+        return bool(settings.REDIS_HOST)
+
+    @property
+    def is_healthy(self) -> bool:
+        """Доступен ли Redis."""
+        return self._healthy
+
+    def health(self) -> dict[str, Any]:
+        """Состояние подключения к Redis."""
+        return {
+            "status": ("up" if self._healthy else "down") if self.enabled else "disabled",
+            "since": self._state_changed_at,
+            "last_error": self._last_error,
+            "reconnect_attempts": self._reconnect_attempts,
+        }
+
+    def _create_client(self) -> aioredis.Redis:  # type: ignore[name-defined]
+        pool = aioredis.ConnectionPool.from_url(
+            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
+            password=settings.REDIS_PASSWORD or None,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+            health_check_interval=30,
+        )
+        return aioredis.Redis.from_pool(pool)
+
+    async def _connect(self) -> bool:
+        """Одна попытка подключения к Redis."""
+        try:
+            if self._client is None:
+                self._client = self._create_client()
+                self._check_row = self._client.register_script(_CHECK_ROW_SCRIPT)
+                self._find_echoes = self._client.register_script(_FIND_ECHOES_SCRIPT)
+                self._check_and_acquire = self._client.register_script(_CHECK_ECHO_AND_ACQUIRE_SCRIPT)
+                self._renew_lease = self._client.register_script(_RENEW_LEASE_SCRIPT)
+            await self._client.ping()  # type: ignore[misc]
+        except Exception as e:
+            self._set_unhealthy(e)
+            return False
+
+        self._healthy = True
+        self._last_error = None
+        self._state_changed_at = time.time()
+        self._reconnect_attempts = 0
+        logger.info("Подключение к Redis установлено: %s:%s", settings.REDIS_HOST, settings.REDIS_PORT)
+        return True
+
+    def _set_unhealthy(self, error: Exception) -> None:
+        if self._healthy or self._last_error is None:
+            logger.warning(
+                "Redis недоступен: %s. Используются локальные блокировки процесса до переподключения.", error
+            )
+            self._state_changed_at = time.time()
+        self._healthy = False
+        self._last_error = str(error)
+        self._start_reconnect()
+
+    def _start_reconnect(self) -> None:
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
+        self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        """Фоновое переподключение к Redis с экспоненциальной задержкой."""
+        delay = settings.REDIS_RECONNECT_MIN_DELAY
+        while not self._healthy:
+            await asyncio.sleep(delay)
+            self._reconnect_attempts += 1
+            if await self._connect():
+                return
+            logger.debug("Попытка переподключения к Redis #%s не удалась", self._reconnect_attempts)
+            delay = min(delay * 2, settings.REDIS_RECONNECT_MAX_DELAY)
 
     async def _get_client(self) -> aioredis.Redis | None:  # type: ignore[name-defined]
-        """Получение Redis клиента с ленивой инициализацией."""
-        if not self._initialized:
+        """Получение Redis клиента; None, если Redis сейчас недоступен или не настроен."""
+        if not self.enabled:
+            return None
+        if self._client is None:
             async with self._init_lock:
-                if not self._initialized:
-                    try:
-                        connection_params: dict[str, str | int | bool] = {
-                            "decode_responses": True,
-                            "socket_timeout": 2,
-                            "socket_connect_timeout": 2,
-                        }
-
-                        if settings.REDIS_PASSWORD:
-                            connection_params["password"] = settings.REDIS_PASSWORD
-
-                        self._client = await aioredis.from_url(
-                            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
-                            **connection_params,
-                        )
-                        await self._client.ping()  # type: ignore[misc]
-                        logger.info("Подключение к Redis установлено: %s:%s", settings.REDIS_HOST, settings.REDIS_PORT)
-                        self._initialized = True
-                    except Exception as e:
-                        logger.warning(
-                            "Не удалось подключиться к Redis: %s. Синхронизация продолжится без защиты от циклов.", e
-                        )
-                        self._client = None
-                        self._initialized = True
-
-        return self._client
-
-    async def set_amocrm_to_sheets_lock(self, row_index: int) -> None:
-        """
-        Установить блокировку: обновление идет из AmoCRM в Sheets.
+                if self._client is None:
+                    await self._connect()
+
+        return self._client if self._healthy else None
+
+    async def connect(self) -> bool:
+        """
+        Подключение к Redis заранее (прогрев при старте).
+
+        Returns:
+            bool: True если Redis доступен
+        """
+        return await self._get_client() is not None
+
+    async def run(
+        self,
+        action: str,
+        redis_op: Callable[[Any], Awaitable[T]],
+        local_op: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        Выполнение операции в Redis с переходом на локальные блокировки, если Redis недоступен.
+
+        Недоступностью считаются только ошибки соединения и таймауты; остальные ошибки Redis
+        (например, ошибка Lua-скрипта) не переключают процесс на локальные блокировки и пробрасываются.
+        Через этот метод общий клиент Redis используют и другие модули (например, хранилище токенов AmoCRM).
+        """
+        client = await self._get_client()
+        if client is not None:
+            try:
+                return await redis_op(client)
+            except _OUTAGE_ERRORS as e:
+                logger.warning("Не удалось %s в Redis: %s", action, e)
+                self._set_unhealthy(e)
+        return await local_op()
+
+    async def remember_amocrm_write(self, row_index: int, fingerprint: str) -> None:
+        """
+        Запомнить отпечаток значений строки, записанных из AmoCRM в Sheets.
 
         Args:
             row_index: Номер строки в таблице
+            fingerprint: Отпечаток строки после записи (см. sync_fingerprint)
         """
-        client = await self._get_client()
-        if client is None:
+        await self.remember_amocrm_writes({row_index: fingerprint})
+
+    @timed("redis")
+    async def remember_amocrm_writes(self, fingerprints: dict[int, str]) -> None:
+        """
+        Запомнить отпечатки записанных из AmoCRM строк за один запрос к Redis.
+
+        Args:
+            fingerprints: Словарь {номер_строки: отпечаток}
+        """
+        items = {_written_key(row_index): fingerprint for row_index, fingerprint in fingerprints.items()}
+        if not items:
             return
 
-        key = f"sync:amocrm_to_sheets:{row_index}"
-        try:
-            await client.setex(key, settings.SYNC_LOCK_TTL, "1")
-            logger.debug("Установлена блокировка AmoCRM→Sheets для строки %s на %s сек", row_index, settings.SYNC_LOCK_TTL)
-        except Exception as e:
-            logger.warning("Не удалось установить блокировку в Redis: %s", e)
+        async def redis_op(client: Any) -> None:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, fingerprint in items.items():
+                    pipe.set(key, fingerprint, ex=settings.SYNC_ECHO_TTL)
+                await pipe.execute()
+
+        async def local_op() -> None:
+            await self._local.set(items, settings.SYNC_ECHO_TTL)
 
-    async def check_amocrm_to_sheets_lock(self, row_index: int) -> bool:
+        await self.run("сохранить записанные значения", redis_op, local_op)
+        logger.debug("Сохранены отпечатки записи AmoCRM→Sheets для строк %s", sorted(fingerprints))
+
+    @timed("redis")
+    async def find_amocrm_echoes(self, fingerprints: dict[int, str]) -> set[int]:
         """
-        Проверить, активна ли блокировка AmoCRM→Sheets.
+        Найти строки, данные которых совпадают с записанными из AmoCRM, одним Lua-скриптом.
+
+        Как и в check_row_locks, несовпадающие отпечатки удаляются: строку изменил пользователь.
+
+        Args:
+            fingerprints: Словарь {номер_строки: отпечаток входящих данных}
+
+        Returns:
+            set[int]: Строки, вебхуки которых являются эхом записи из AmoCRM
+        """
+        rows = list(fingerprints)
+        if not rows:
+            return set()
+        keys = [_written_key(row_index) for row_index in rows]
+        args = [fingerprints[row_index] for row_index in rows]
+
+        async def redis_op(_client: Any) -> list[Any]:
+            return await self._find_echoes(keys=keys, args=args)  # type: ignore[no-any-return]
+
+        async def local_op() -> list[Any]:
+            return await self._local.find_echoes(keys, args)  # type: ignore[return-value]
+
+        found = await self.run("проверить записанные значения", redis_op, local_op)
+        echoes = {row_index for row_index, echo in zip(rows, found) if int(echo)}
+        if echoes:
+            logger.info("Данные строк %s совпадают с записанными из AmoCRM, пропускаем обработку", sorted(echoes))
+        return echoes
+
+    @timed("redis")
+    async def check_row_locks(self, row_index: int, fingerprint: str) -> tuple[bool, bool]:
+        """
+        Проверить, является ли вебхук эхом записи из AmoCRM, и блокировку создания сделки одним Lua-скриптом.
+
+        Если в строке уже другие значения, сохраненный отпечаток удаляется.
 
         Args:
             row_index: Номер строки в таблице
+            fingerprint: Отпечаток входящих данных строки
 
         Returns:
-            True если блокировка активна (нужно пропустить обработку)
+            tuple[bool, bool]: (вебхук - эхо записи из AmoCRM, идет создание сделки)
         """
-        client = await self._get_client()
-        if client is None:
-            return False
+        keys = [_written_key(row_index), _creation_key(row_index)]
 
-        key = f"sync:amocrm_to_sheets:{row_index}"
-        try:
-            exists = await client.exists(key)
-            if exists:
-                logger.info("Обнаружена блокировка AmoCRM→Sheets для строки %s, пропускаем обработку", row_index)
-            return bool(exists)
-        except Exception as e:
-            logger.warning("Не удалось проверить блокировку в Redis: %s", e)
+        async def redis_op(_client: Any) -> list[Any]:
+            return await self._check_row(keys=keys, args=[fingerprint])  # type: ignore[no-any-return]
+
+        async def local_op() -> list[Any]:
+            return await self._local.check_row(keys[0], fingerprint, keys[1])  # type: ignore[return-value]
+
+        is_echo, creation_exists = await self.run("проверить блокировки строки", redis_op, local_op)
+        if is_echo:
+            logger.info("Данные строки %s совпадают с записанными из AmoCRM, пропускаем обработку", row_index)
+        return bool(is_echo), bool(creation_exists)
+
+    @timed("redis")
+    async def check_echo_and_acquire_creation_lock(self, row_index: int, fingerprint: str) -> str:
+        """
+        Проверить эхо записи из AmoCRM и захватить блокировку создания сделки одним Lua-скриптом.
+
+        Args:
+            row_index: Номер строки в таблице
+            fingerprint: Отпечаток входящих данных строки
+
+        Returns:
+            str: CREATION_ECHO - данные совпадают с записанными из AmoCRM,
+                CREATION_ACQUIRED - блокировка создания захвачена,
+                CREATION_BUSY - сделка уже создается другим обработчиком
+        """
+        written_key, creation_key = _written_key(row_index), _creation_key(row_index)
+
+        async def redis_op(_client: Any) -> int:
+            return int(
+                await self._check_and_acquire(
+                    keys=[written_key, creation_key],
+                    args=[fingerprint, settings.LEAD_CREATION_LOCK_TTL],
+                )
+            )
+
+        async def local_op() -> int:
+            return await self._local.check_and_set(
+                written_key, fingerprint, creation_key, settings.LEAD_CREATION_LOCK_TTL
+            )
+
+        result = await self.run("захватить блокировку создания", redis_op, local_op)
+        if result == -1:
+            logger.info("Данные строки %s совпадают с записанными из AmoCRM, пропускаем обработку", row_index)
+            return CREATION_ECHO
+        if result == 1:
+            logger.info("Установлена блокировка создания для строки %s", row_index)
+            return CREATION_ACQUIRED
+        return CREATION_BUSY
+
+    @timed("redis")
+    async def acquire_creation_locks(self, row_indices: Iterable[int]) -> set[int]:
+        """
+        Захватить блокировки создания сделок для нескольких строк за один запрос к Redis.
+
+        Args:
+            row_indices: Номера строк в таблице
+
+        Returns:
+            set[int]: Строки, для которых блокировка захвачена
+        """
+        rows = list(dict.fromkeys(row_indices))
+        if not rows:
+            return set()
+        keys = [_creation_key(row_index) for row_index in rows]
+
+        async def redis_op(client: Any) -> list[Any]:
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, "1", ex=settings.LEAD_CREATION_LOCK_TTL, nx=True)
+                return await pipe.execute()  # type: ignore[no-any-return]
+
+        async def local_op() -> list[Any]:
+            items = dict.fromkeys(keys, "1")
+            return await self._local.set(items, settings.LEAD_CREATION_LOCK_TTL, nx=True)  # type: ignore[return-value]
+
+        results = await self.run("захватить блокировки создания", redis_op, local_op)
+        return {row_index for row_index, acquired in zip(rows, results) if acquired}
+
+    @timed("redis")
+    async def release_creation_locks(self, row_indices: Iterable[int]) -> None:
+        """
+        Снять блокировки создания сделок одной командой DEL.
+
+        Args:
+            row_indices: Номера строк в таблице
+        """
+        keys = [_creation_key(row_index) for row_index in dict.fromkeys(row_indices)]
+        if not keys:
+            return
+
+        async def redis_op(client: Any) -> None:
+            await client.delete(*keys)
+
+        async def local_op() -> None:
+            await self._local.delete(keys)
+
+        await self.run("снять блокировки создания", redis_op, local_op)
+        await self._local.delete(keys)
+        logger.debug("Сняты блокировки создания: %s", keys)
+
+    @timed("redis")
+    async def filter_new_lead_versions(self, versions: dict[int, int]) -> set[int]:
+        """
+        Отобрать сделки, изменения которых еще не применены к таблице.
+
+        Общая дедупликация вебхука AmoCRM и опроса по updated_at: изменение сделки считается
+        примененным, если сохранена версия (updated_at) не меньше текущей.
+
+        Args:
+            versions: Словарь {lead_id: updated_at}
+
+        Returns:
+            set[int]: ID сделок с непримененными изменениями
+        """
+        if not versions:
+            return set()
+        lead_ids = list(versions)
+        keys = [_lead_version_key(lead_id) for lead_id in lead_ids]
+
+        async def redis_op(client: Any) -> list[Any]:
+            return await client.mget(keys)  # type: ignore[no-any-return]
+
+        async def local_op() -> list[Any]:
+            return await self._local.get(keys)
+
+        applied = await self.run("проверить примененные изменения сделок", redis_op, local_op)
+        return {
+            lead_id
+            for lead_id, stored in zip(lead_ids, applied)
+            if stored is None or int(stored) < int(versions[lead_id])
+        }
+
+    @timed("redis")
+    async def remember_lead_versions(self, versions: dict[int, int]) -> None:
+        """
+        Запомнить примененные к таблице версии сделок (на SYNC_ECHO_TTL секунд).
+
+        Args:
+            versions: Словарь {lead_id: updated_at}
+        """
+        if not versions:
+            return
+        items = {_lead_version_key(lead_id): str(version) for lead_id, version in versions.items()}
+
+        async def redis_op(client: Any) -> None:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, value, ex=settings.SYNC_ECHO_TTL)
+                await pipe.execute()
+
+        async def local_op() -> None:
+            await self._local.set(items, settings.SYNC_ECHO_TTL)
+
+        await self.run("сохранить примененные версии сделок", redis_op, local_op)
+
+    @timed("redis")
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        """
+        Захватить аренду (лидерство) среди воркеров и узлов.
+
+        Пока Redis недоступен, аренда не выдается: локальная аренда процесса не исключает другого владельца
+        на других воркерах и узлах. Без Redis (REDIS_HOST пустой) процесс единственный, и аренда выдается локально.
+
+        Args:
+            name: Имя аренды
+            owner: Уникальный идентификатор владельца
+            ttl: Время жизни аренды (сек); владелец должен продлевать ее через renew_lease
+
+        Returns:
+            bool: True если аренда захвачена
+        """
+        key = _lease_key(name)
+
+        async def redis_op(client: Any) -> bool:
+            return bool(await client.set(key, owner, ex=ttl, nx=True))
+
+        async def local_op() -> bool:
+            if not self.enabled:
+                return (await self._local.set({key: owner}, ttl, nx=True))[0]
+            logger.warning("Redis недоступен, аренда %s не захвачена", name)
             return False
 
+        acquired = await self.run("захватить аренду", redis_op, local_op)
+        if acquired:
+            logger.info("Захвачена аренда %s владельцем %s", name, owner)
+        return acquired
+
+    @timed("redis")
+    async def renew_lease(self, name: str, owner: str, ttl: int) -> bool:
+        """
+        Продлить аренду, если она все еще принадлежит владельцу.
+
+        Returns:
+            bool: False если аренда истекла, захвачена другим владельцем или Redis недоступен
+        """
+        key = _lease_key(name)
+
+        async def redis_op(_client: Any) -> int:
+            return int(await self._renew_lease(keys=[key], args=[owner, ttl]))
+
+        async def local_op() -> int:
+            if not self.enabled:
+                return await self._local.renew(key, owner, ttl)
+            logger.warning("Redis недоступен, аренда %s не продлена", name)
+            return 0
+
+        return bool(await self.run("продлить аренду", redis_op, local_op))
+
+    @timed("redis")
+    async def release_lease(self, name: str, owner: str) -> None:
+        """Снять аренду, если она принадлежит владельцу."""
+        key = _lease_key(name)
+
+        async def redis_op(_client: Any) -> int:
+            return int(await self._renew_lease(keys=[key], args=[owner, 0]))
+
+        async def local_op() -> int:
+            return await self._local.renew(key, owner, 0) if not self.enabled else 0
+
+        await self.run("снять аренду", redis_op, local_op)
+        logger.info("Снята аренда %s владельцем %s", name, owner)
+
     async def close(self) -> None:
         """Закрыть соединение с Redis."""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
         if self._client:
             try:
                 await self._client.aclose()  # type: ignore[attr-defined]
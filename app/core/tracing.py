@@ -0,0 +1,187 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, ParamSpec, TypeVar
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Максимум дочерних спанов у одного спана (остальные только считаются)
+MAX_CHILDREN = 200
+
+
+class Span:
+    """Участок обработки запроса: имя, длительность, атрибуты и вложенные участки."""
+
+    __slots__ = ("name", "attrs", "started", "duration", "children", "dropped")
+
+    def __init__(self, name: str, attrs: dict[str, Any]) -> None:
+        """
+        Инициализация спана.
+
+        Args:
+            name: Имя участка (шаг сервиса или вызов клиента)
+            attrs: Атрибуты участка
+        """
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.duration: float | None = None
+        self.children: list[Span] = []
+        self.dropped = 0
+
+    def to_dict(self, parent_started: float | None = None) -> dict[str, Any]:
+        """Дерево спана для структурного лога (время в миллисекундах от начала родителя)."""
+        result: dict[str, Any] = {"name": self.name}
+        if parent_started is not None:
+            result["start_ms"] = round((self.started - parent_started) * 1000, 1)
+        result["ms"] = round((self.duration if self.duration is not None else 0.0) * 1000, 1)
+        if self.attrs:
+            result["attrs"] = self.attrs
+        if self.children:
+            result["children"] = [child.to_dict(self.started) for child in self.children]
+        if self.dropped:
+            result["dropped_children"] = self.dropped
+        return result
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    """Текущий спан (None вне трассируемого запроса)."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Открыть вложенный спан в текущем контексте.
+
+    Задачи asyncio копируют контекст при создании, поэтому спаны внутри asyncio.gather
+    попадают в дерево спана, открытого до gather.
+
+    Args:
+        name: Имя участка
+        **attrs: Атрибуты участка
+    """
+    parent = _current_span.get()
+    current = Span(name, attrs)
+    if parent is not None:
+        if len(parent.children) < MAX_CHILDREN:
+            parent.children.append(current)
+        else:
+            parent.dropped += 1
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.started
+        _current_span.reset(token)
+
+
+def add_event(name: str, **attrs: Any) -> None:
+    """Отметить мгновенное событие (повтор, ожидание) в текущем спане."""
+    parent = _current_span.get()
+    if parent is not None and len(parent.children) < MAX_CHILDREN:
+        event = Span(name, attrs)
+        event.duration = 0.0
+        parent.children.append(event)
+
+
+def traced(name: str | None = None) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """
+    Декоратор async-функции: выполнение в спане.
+
+    Args:
+        name: Имя спана (по умолчанию - имя функции)
+    """
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def run_in_executor(
+    executor: Executor | None,
+    func: Callable[..., R],
+    /,
+    *args: Any,
+) -> R:
+    """
+    Выполнение синхронной функции в пуле потоков в спане: отдельно учитывается ожидание
+    свободного потока (queued_ms). Контекст (текущий спан) передается в поток, как в asyncio.to_thread.
+
+    Args:
+        executor: Пул потоков (None - пул по умолчанию)
+        func: Синхронная функция
+        *args: Позиционные аргументы
+    """
+    submitted = time.perf_counter()
+    queued: list[float] = []
+    context = contextvars.copy_context()
+
+    def run() -> R:
+        queued.append(time.perf_counter() - submitted)
+        return context.run(func, *args)
+
+    with span("to_thread", func=getattr(func, "__qualname__", repr(func))) as current:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, run)
+        finally:
+            if queued:
+                current.attrs["queued_ms"] = round(queued[0] * 1000, 1)
+
+
+async def to_thread(func: Callable[..., R], /, *args: Any, **kwargs: Any) -> R:
+    """
+    asyncio.to_thread в спане (пул потоков по умолчанию).
+
+    Args:
+        func: Синхронная функция
+        *args: Позиционные аргументы
+        **kwargs: Именованные аргументы
+    """
+    return await run_in_executor(None, functools.partial(func, **kwargs) if kwargs else func, *args)
+
+
+async def trace_requests(request: Any, call_next: Callable[[Any], Awaitable[Any]]) -> Any:
+    """
+    HTTP middleware: корневой спан запроса.
+
+    Если запрос длился дольше TRACE_SLOW_REQUEST_THRESHOLD секунд, все дерево спанов
+    пишется в лог одной строкой JSON.
+    """
+    threshold = settings.TRACE_SLOW_REQUEST_THRESHOLD
+    if threshold <= 0:
+        return await call_next(request)
+
+    with span(f"{request.method} {request.url.path}") as root:
+        response = await call_next(request)
+        root.attrs["status"] = response.status_code
+
+    if root.duration is not None and root.duration >= threshold:
+        logger.warning("Медленный запрос: %s", json.dumps(root.to_dict(), ensure_ascii=False, default=str))
+    return response
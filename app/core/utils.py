@@ -1,6 +1,9 @@
 import hashlib
 import re
-import time
+from typing import Iterable, Sequence
+
+
+_NON_DIGITS_RE = re.compile(r"\D")
 
 
 def normalize_phone(raw: str | None) -> str | None:
@@ -16,7 +19,7 @@ def normalize_phone(raw: str | None) -> str | None:
     if not raw:
         return None
 
-    digits = re.sub(r"\D", "", raw)
+    digits = raw if raw.isdecimal() else _NON_DIGITS_RE.sub("", raw)
 
     if not digits:
         return None
@@ -26,32 +29,128 @@ def normalize_phone(raw: str | None) -> str | None:
     elif digits.startswith("9") and len(digits) == 10:
         digits = "7" + digits
 
-    if len(digits) == 11 and digits.startswith("7"):
-        return f"+{digits}"
-
     return f"+{digits}"
 
 
-def make_external_id(phone: str | None, email: str | None) -> str:
+def normalize_phones(raws: Iterable[str | None]) -> list[str | None]:
+    """
+    Нормализация колонки телефонов (повторяющиеся значения нормализуются один раз).
+
+    Args:
+        raws: Исходные телефоны
+
+    Returns:
+        list[str | None]: Нормализованные телефоны в том же порядке
+    """
+    cache: dict[str | None, str | None] = {}
+    result: list[str | None] = []
+    for raw in raws:
+        if raw not in cache:
+            cache[raw] = normalize_phone(raw)
+        result.append(cache[raw])
+    return result
+
+
+def _external_id_key(
+    phone: str | None,
+    email: str | None,
+    name: str | None,
+    sheet_key: str,
+    row_index: int | None,
+) -> str:
+    """Строка, из которой считается external_id (phone - уже нормализованный)."""
+    if phone and email:
+        return f"{phone}|{email.lower().strip()}"
+    if phone:
+        return phone
+    if email:
+        return email.lower().strip()
+    # Без телефона и email ID строится по содержимому и положению строки, а не по времени:
+    # повторная обработка той же строки дает тот же ID
+    return f"{sheet_key}|{row_index or ''}|{(name or '').strip().lower()}"
+
+
+def make_external_id(
+    phone: str | None,
+    email: str | None,
+    name: str | None = None,
+    sheet_key: str = "",
+    row_index: int | None = None,
+) -> str:
     """
     Создание внешнего ID на основе телефона и email.
 
+    Если нет ни телефона, ни email, ID детерминированно строится по имени, листу и номеру строки.
+
     Args:
         phone: Телефон
         email: Email
+        name: Имя (для строк без телефона и email)
+        sheet_key: Идентификатор листа таблицы (для строк без телефона и email)
+        row_index: Номер строки (для строк без телефона и email)
 
     Returns:
         str: Хэш внешнего ID
     """
-    parts = []
-
     if phone:
-        parts.append(normalize_phone(phone) or phone)
-    if email:
-        parts.append(email.lower().strip())
+        phone = normalize_phone(phone) or phone
+    combined = _external_id_key(phone, email, name, sheet_key, row_index)
+    return hashlib.md5(combined.encode()).hexdigest()[:16]
 
-    if not parts:
-        parts.append(str(time.time()))
 
+def make_external_ids(
+    phones: Sequence[str | None],
+    emails: Sequence[str | None],
+    names: Sequence[str | None],
+    sheet_key: str,
+    row_indices: Sequence[int],
+) -> list[str]:
+    """
+    Создание внешних ID для колонок строк; результат совпадает с make_external_id для каждой строки.
+
+    Args:
+        phones: Нормализованные телефоны (результат normalize_phones)
+        emails: Email
+        names: Имена
+        sheet_key: Идентификатор листа таблицы
+        row_indices: Номера строк
+
+    Returns:
+        list[str]: Внешние ID в том же порядке
+    """
+    md5 = hashlib.md5
+    return [
+        md5(_external_id_key(phone, email, name, sheet_key, row_index).encode()).hexdigest()[:16]
+        for phone, email, name, row_index in zip(phones, emails, names, row_indices, strict=True)
+    ]
+
+
+def sync_fingerprint(name: str | None, phone: str | None, email: str | None, budget: float | str | None) -> str:
+    """
+    Отпечаток синхронизируемых полей строки для распознавания эхо-вебхуков.
+
+    Значения нормализуются так же, как при обработке вебхука, поэтому "1000" и 1000.0,
+    "8 (999) 123-45-67" и "+79991234567" дают одинаковый отпечаток.
+
+    Args:
+        name: Имя
+        phone: Телефон
+        email: Email
+        budget: Бюджет
+
+    Returns:
+        str: Хэш значений полей
+    """
+    try:
+        budget_value = float(budget) if budget not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        budget_value = 0.0
+
+    parts = [
+        (name or "").strip(),
+        normalize_phone(phone) or "",
+        (email or "").lower().strip(),
+        f"{budget_value:g}",
+    ]
     combined = "|".join(parts)
-    return hashlib.md5(combined.encode()).hexdigest()[:16]
+    return hashlib.md5(combined.encode()).hexdigest()
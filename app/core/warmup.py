@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.core.amocrm_client import amocrm_client
+from app.core.settings import settings
+from app.core.sheets_client import sheets_client
+from app.core.sync_lock import sync_lock
+
+logger = logging.getLogger(__name__)
+
+# Результат последнего прогрева: {шаг: {"status": ok|failed|timeout, "ms": ..., "error": ...}}
+warmup_state: dict[str, dict[str, Any]] = {}
+
+
+async def _redis_connect() -> None:
+    if sync_lock.enabled and not await sync_lock.connect():
+        raise ConnectionError("Redis недоступен, используются локальные блокировки")
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[Any]], timeout: float) -> None:
+    """Один шаг прогрева с таймаутом; ошибка шага не останавливает запуск приложения."""
+    started = time.perf_counter()
+    state: dict[str, Any] = {"status": "ok"}
+    try:
+        await asyncio.wait_for(step(), timeout)
+    except asyncio.TimeoutError:
+        state = {"status": "timeout"}
+        logger.warning("Прогрев %s не завершился за %s сек, инициализация при первом запросе", name, timeout)
+    except Exception as e:
+        state = {"status": "failed", "error": str(e)}
+        logger.warning("Ошибка прогрева %s: %s. Инициализация повторится при первом запросе", name, e)
+    state["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state[name] = state
+
+
+async def warm_up() -> dict[str, dict[str, Any]]:
+    """
+    Параллельный прогрев клиентов при старте: токены AmoCRM и справочник статусов,
+    авторизация Google Sheets и заголовки листа, подключение к Redis.
+
+    Каждый шаг ограничен WARMUP_TIMEOUT секунд. Клиенты инициализируются лениво, поэтому
+    неудачный шаг повторяется при первом обращении к клиенту.
+
+    Returns:
+        dict[str, dict[str, Any]]: Результат каждого шага
+    """
+    timeout = settings.WARMUP_TIMEOUT
+    steps: dict[str, Callable[[], Awaitable[Any]]] = {
+        "amocrm": amocrm_client.warm_up,
+        "sheets": sheets_client.warm_up,
+        "redis": _redis_connect,
+    }
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_step(name, step, timeout) for name, step in steps.items()))
+    logger.info("Прогрев клиентов завершен за %.2f сек: %s", time.perf_counter() - started, warmup_state)
+    return warmup_state
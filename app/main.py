@@ -1,44 +1,89 @@
 import logging
 
-from fastapi import FastAPI  # type: ignore[import-not-found, import-untyped] # pylint: disable=import-error
+from fastapi import FastAPI, Request  # type: ignore[import-not-found, import-untyped] # pylint: disable=import-error
+from fastapi.responses import JSONResponse
 
-from app.api import health, import_routes, webhook_amocrm, webhook_sheets
-from app.core.settings import settings
+from app.api import (
+    debug_routes,
+    health,
+    import_routes,
+    mapping_routes,
+    metrics_routes,
+    reconcile_routes,
+    webhook_amocrm,
+    webhook_sheets,
+)
+from app.core.amocrm_tokens import amo_token_manager
+from app.core.capture import capture_webhooks, webhook_capture
+from app.core.concurrency import ExecutorSaturated
+from app.core.executors import executors
+from app.core.logs import configure_logging
+from app.core.mapping_store import mapping_store
+from app.core.outbox import sheets_outbox
 from app.core.sync_lock import sync_lock
-from app.services.import_service import import_existing_rows
+from app.core.tracing import trace_requests
+from app.core.warmup import warm_up
+from app.services.amocrm_service import amocrm_poller
+from app.services.import_jobs import import_jobs
+from app.services.import_state import import_state
+from app.services.reconcile_service import reconciler
+from app.services.sheets_watcher import sheets_watcher
 
-logging.basicConfig(
-    level=settings.log_level_value,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AmoCRM-GSheets Integration")
+app.middleware("http")(trace_requests)
+app.middleware("http")(capture_webhooks)
 
 app.include_router(health.router)
 app.include_router(webhook_sheets.router)
 app.include_router(webhook_amocrm.router)
 app.include_router(import_routes.router)
+app.include_router(mapping_routes.router)
+app.include_router(reconcile_routes.router)
+app.include_router(metrics_routes.router)
+app.include_router(debug_routes.router)
+
+
+@app.exception_handler(ExecutorSaturated)
+async def on_executor_saturated(_request: Request, error: ExecutorSaturated) -> JSONResponse:
+    """Сброс нагрузки: пул потоков внешней системы заполнен - 503 с Retry-After."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(error), "executor": error.executor},
+        headers={"Retry-After": str(max(int(error.retry_after), 1))},
+    )
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    """Автоимпорт существующих строк при старте приложения."""
-    logger.info("Запуск автоимпорта строк при старте приложения...")
-    try:
-        result = await import_existing_rows()
-        logger.info(
-            "Автоимпорт завершен: создано=%s, пропущено=%s, ошибок=%s",
-            result["created"],
-            result["skipped"],
-            result["errors"],
-        )
-    except Exception as e:
-        logger.error("Ошибка при автоимпорте: %s", e, exc_info=True)
+    """
+    Прогрев клиентов, запуск фонового обновления токенов AmoCRM, записи outbox, автоимпорта строк,
+    периодической сверки и опросов изменений.
+    """
+    await warm_up()
+    amo_token_manager.start()
+    sheets_outbox.start()
+    import_jobs.start_on_startup()
+    reconciler.start()
+    amocrm_poller.start()
+    sheets_watcher.start()
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     """Закрытие соединений при остановке приложения."""
+    await sheets_watcher.stop()
+    await amocrm_poller.stop()
+    await reconciler.stop()
+    await import_jobs.shutdown()
+    import_state.close()
+    await sheets_outbox.stop()
+    mapping_store.close()
+    await amo_token_manager.stop()
     logger.info("Закрытие соединения с Redis...")
     await sync_lock.close()
+    for executor in executors:
+        executor.shutdown()
+    webhook_capture.close()
@@ -16,3 +16,9 @@ class WebhookRow(BaseModel):
 
     row_index: int = Field(..., ge=2, description="Номер строки в таблице (начиная с 2)")
     data: SheetLead = Field(..., description="Данные лида")
+
+
+class WebhookBatch(BaseModel):
+    """Модель пакетного вебхука от Google Sheets (все строки отредактированного диапазона)."""
+
+    rows: list[WebhookRow] = Field(..., min_length=1, max_length=1000, description="Строки диапазона")
@@ -1,26 +1,137 @@
+import asyncio
 import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Any
 
 from fastapi import HTTPException, Request, status
 
 from app.core.amocrm_client import amocrm_client
+from app.core.concurrency import ExecutorSaturated, background
+from app.core.executors import check_capacity
+from app.core.local_db import LocalDB
+from app.core.mapping_store import mapping_store
+from app.core.metrics import observe_webhook
+from app.core.outbox import sheets_outbox
+from app.core.settings import settings
 from app.core.sheets_client import sheets_client
 from app.core.sync_lock import sync_lock
+from app.core.tracing import traced
+from app.core.utils import sync_fingerprint
 
 logger = logging.getLogger(__name__)
 
+_POLL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS poll_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+AMOCRM_POLL_LEASE = "amocrm_poll"
+
+
+def lead_row_mapping(lead_info: dict[str, Any], contact_info: dict[str, Any] | None) -> dict[str, str]:
+    """
+    Значения колонок строки по данным сделки и контакта AmoCRM.
+
+    Args:
+        lead_info: Данные сделки (get_lead_info / get_leads_by_ids)
+        contact_info: Данные контакта (get_contact_info / get_contacts_by_ids)
+
+    Returns:
+        dict[str, str]: Словарь {название_колонки: значение}
+    """
+    mapping = {}
+
+    if lead_info.get("name"):
+        mapping["name"] = str(lead_info["name"])
+
+    if lead_info.get("price") is not None:
+        mapping["budget"] = str(lead_info["price"])
+
+    if lead_info.get("status_name"):
+        mapping["status"] = str(lead_info["status_name"])
+
+    if contact_info:
+        if contact_info.get("phone"):
+            mapping["phone"] = str(contact_info["phone"])
+
+        if contact_info.get("email"):
+            mapping["email"] = str(contact_info["email"])
+
+        if contact_info.get("name"):
+            mapping["name"] = str(contact_info["name"])
+
+    return mapping
+
+
+def _row_matches_deal(row: dict[str, Any] | None, deal_id: int, pending_write: bool) -> bool:
+    """
+    Принадлежит ли строка сделке.
+
+    Пустой amo_deal_id допускается только для строки из outbox (ID сделки еще не записан в таблицу);
+    строка из локальной связки или колонки таблицы должна содержать ровно этот ID - иначе строки сдвинулись.
+
+    Args:
+        row: Текущие значения строки или None, если строки нет
+        deal_id: ID сделки
+        pending_write: Номер строки взят из outbox
+
+    Returns:
+        bool: Строку можно обновлять данными сделки
+    """
+    row_deal_id = str((row or {}).get("amo_deal_id", "")).strip()
+    return row_deal_id == str(deal_id) or (pending_write and not row_deal_id)
+
+
+def _written_fingerprint(current_row: dict[str, Any] | None, mapping: dict[str, str]) -> str:
+    """Отпечаток строки после записи mapping (для распознавания эхо-вебхуков Sheets)."""
+    written_row = {**(current_row or {}), **mapping}
+    return sync_fingerprint(
+        written_row.get("name"),
+        written_row.get("phone"),
+        written_row.get("email"),
+        written_row.get("budget"),
+    )
+
+
+async def read_webhook_form(request: Request) -> dict[str, Any]:
+    """
+    Поля вебхука AmoCRM: form-urlencoded или JSON с теми же ключами (leads[update][0][id] и т.д.).
+
+    Args:
+        request: Запрос вебхука
+
+    Returns:
+        dict[str, Any]: Словарь {ключ_поля: значение}
+    """
+    if "application/json" in request.headers.get("content-type", ""):
+        return dict(await request.json())
+    return dict(await request.form())
+
 
 async def process_webhook_amocrm(request: Request) -> dict[str, str]:
     """Обработка вебхука от AmoCRM."""
+    check_capacity()
+    started = time.perf_counter()
     try:
-        content_type = request.headers.get("content-type", "")
+        result = await _process_webhook_amocrm_internal(request)
+    except Exception:
+        observe_webhook("amocrm", started, None)
+        raise
+    observe_webhook("amocrm", started, result)
+    return result
 
-        if "application/json" in content_type:
-            form_data = await request.json()
-        else:
-            form = await request.form()
-            form_data = dict(form)
 
-        logger.info("Получен вебхук от AmoCRM, Content-Type: %s", content_type)
+async def _process_webhook_amocrm_internal(request: Request) -> dict[str, str]:
+    """Внутренняя обработка вебхука от AmoCRM."""
+    try:
+        form_data = await read_webhook_form(request)
+        logger.info("Получен вебхук от AmoCRM, Content-Type: %s", request.headers.get("content-type", ""))
 
         lead_id_str = form_data.get("leads[update][0][id]")
         if not lead_id_str:
@@ -30,13 +141,26 @@ async def process_webhook_amocrm(request: Request) -> dict[str, str]:
         lead_id = int(lead_id_str)
         logger.info("Обработка обновления сделки: lead_id=%s", lead_id)
 
-        row_index = await sheets_client.find_row_by_deal_id(lead_id)
+        row_index = await sheets_outbox.find_row_by_deal_id(lead_id)
+        pending_write = row_index is not None
+        if not row_index:
+            row_index = await sheets_client.find_row_by_deal_id(lead_id)
         if not row_index:
             logger.warning("Строка для сделки %s не найдена в таблице", lead_id)
             return {"status": "ok", "message": "lead not found in sheets"}
 
-        rows = await sheets_client.read_all_rows()
-        current_row = rows[row_index - 2] if row_index - 2 < len(rows) else None
+        current_row = (await sheets_client.read_rows_at([row_index])).get(row_index)
+        if not _row_matches_deal(current_row, lead_id, pending_write):
+            # Строки сдвинулись: связка перестраивается по всей таблице, только если строка связки чужая
+            logger.warning("Локальная связка для сделки %s устарела (строка %s), перестраиваем", lead_id, row_index)
+            rows = await sheets_client.read_all_rows()
+            await mapping_store.rebuild(rows)
+            row_index = await mapping_store.find_row_by_deal_id(lead_id)
+            if not row_index:
+                logger.warning("Строка для сделки %s не найдена в таблице", lead_id)
+                return {"status": "ok", "message": "lead not found in sheets"}
+            current_row = rows[row_index - 2]
+
         stored_contact_id = None
         if current_row and str(current_row.get("amo_contact_id", "")).strip():
             try:
@@ -49,41 +173,198 @@ async def process_webhook_amocrm(request: Request) -> dict[str, str]:
             logger.warning("Не удалось получить информацию о сделке %s", lead_id)
             return {"status": "ok", "message": "lead info not available"}
 
-        mapping = {}
-
-        if lead_info.get("name"):
-            mapping["name"] = str(lead_info["name"])
-
-        if lead_info.get("price") is not None:
-            mapping["budget"] = str(lead_info["price"])
-
-        if lead_info.get("status_name"):
-            mapping["status"] = str(lead_info["status_name"])
+        updated_at = lead_info.get("updated_at")
+        if updated_at and lead_id not in await sync_lock.filter_new_lead_versions({lead_id: updated_at}):
+            logger.info("Изменение сделки %s (updated_at=%s) уже применено к таблице", lead_id, updated_at)
+            return {"status": "ok", "message": "already applied"}
 
         contact_id = lead_info.get("contact_id") or stored_contact_id
-
-        if contact_id:
-            contact_info = await amocrm_client.get_contact_info(contact_id)
-            if contact_info:
-                if contact_info.get("phone"):
-                    mapping["phone"] = str(contact_info["phone"])
-
-                if contact_info.get("email"):
-                    mapping["email"] = str(contact_info["email"])
-
-                if contact_info.get("name"):
-                    mapping["name"] = str(contact_info["name"])
+        contact_info = await amocrm_client.get_contact_info(contact_id) if contact_id else None
+        mapping = lead_row_mapping(lead_info, contact_info)
 
         if mapping:
-            await sync_lock.set_amocrm_to_sheets_lock(row_index)
+            await sync_lock.remember_amocrm_write(row_index, _written_fingerprint(current_row, mapping))
             await sheets_client.update_cells(row_index=row_index, mapping=mapping)
-            logger.info("Обновлена строка %s для сделки %s: %s (с блокировкой синхронизации)", row_index, lead_id, mapping)
+            logger.info("Обновлена строка %s для сделки %s: %s (отпечаток записи сохранен)", row_index, lead_id, mapping)
+
+        if updated_at:
+            await sync_lock.remember_lead_versions({lead_id: updated_at})
 
         return {"status": "ok", "updated": "1"}
 
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         logger.error("Ошибка обработки вебхука AmoCRM: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
+
+
+@traced()
+async def apply_lead_changes(leads: list[dict[str, Any]]) -> int:
+    """
+    Пакетное применение изменений сделок к таблице.
+
+    Сделки с уже примененной версией (updated_at) пропускаются - дедупликация общая с вебхуком.
+    Строки находятся по локальной связке, контакты получаются одним пакетным запросом,
+    а все строки записываются одним batch_update.
+
+    Args:
+        leads: Данные сделок (get_leads_updated_since)
+
+    Returns:
+        int: Количество обновленных строк
+    """
+    versions = {lead["id"]: lead["updated_at"] for lead in leads if lead.get("updated_at")}
+    new_ids = await sync_lock.filter_new_lead_versions(versions)
+
+    leads_by_row: dict[int, dict[str, Any]] = {}
+    outbox_rows: set[int] = set()
+    for lead in leads:
+        if lead["id"] not in new_ids:
+            continue
+        row_index = await sheets_outbox.find_row_by_deal_id(lead["id"])
+        if row_index:
+            outbox_rows.add(row_index)
+        else:
+            row_index = await mapping_store.find_row_by_deal_id(lead["id"])
+        if row_index:
+            leads_by_row[row_index] = lead
+    if not leads_by_row:
+        return 0
+
+    current_rows = await sheets_client.read_rows_at(sorted(leads_by_row))
+    for row_index, lead in list(leads_by_row.items()):
+        if not _row_matches_deal(current_rows.get(row_index), lead["id"], row_index in outbox_rows):
+            logger.warning("Локальная связка для сделки %s устарела (строка %s), пропускаем", lead["id"], row_index)
+            if row_index in current_rows:
+                await mapping_store.record({row_index: current_rows[row_index]})
+            else:
+                await mapping_store.forget_rows([row_index])
+            del leads_by_row[row_index]
+
+    contact_ids = {}
+    for row_index, lead in leads_by_row.items():
+        stored_contact_id = str(current_rows.get(row_index, {}).get("amo_contact_id", "")).strip()
+        contact_id = lead.get("contact_id") or (int(stored_contact_id) if stored_contact_id.isdigit() else None)
+        if contact_id:
+            contact_ids[row_index] = contact_id
+    contacts = await amocrm_client.get_contacts_by_ids(list(contact_ids.values()))
+
+    updates: dict[int, dict[str, str]] = {}
+    fingerprints: dict[int, str] = {}
+    for row_index, lead in leads_by_row.items():
+        contact_id = contact_ids.get(row_index)
+        mapping = lead_row_mapping(lead, contacts.get(contact_id) if contact_id else None)
+        if mapping:
+            updates[row_index] = mapping
+            fingerprints[row_index] = _written_fingerprint(current_rows.get(row_index), mapping)
+
+    if updates:
+        await sync_lock.remember_amocrm_writes(fingerprints)
+        await sheets_client.update_rows(updates)
+        logger.info("Применены изменения %s сделок к строкам %s", len(updates), sorted(updates))
+
+    await sync_lock.remember_lead_versions(
+        {lead["id"]: versions[lead["id"]] for lead in leads_by_row.values() if lead["id"] in versions}
+    )
+    return len(updates)
+
+
+class AmoCRMPoller:
+    """
+    Опрос AmoCRM по updated_at - резервный канал изменений на случай потерянных вебхуков.
+
+    Курсор (максимальный обработанный updated_at) хранится локально; за один опрос
+    запрашиваются только сделки, измененные с момента курсора, постранично.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация опроса."""
+        self._db = LocalDB("amocrm_poll.sqlite3", _POLL_SCHEMA)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: asyncio.Task[None] | None = None
+
+    async def get_cursor(self) -> int | None:
+        """Сохраненный курсор updated_at."""
+
+        def get_sync(conn: sqlite3.Connection) -> int | None:
+            row = conn.execute("SELECT value FROM poll_state WHERE key = 'cursor'").fetchone()
+            return int(row["value"]) if row else None
+
+        return await self._db.run(get_sync)
+
+    async def _set_cursor(self, cursor: int) -> None:
+        def set_sync(conn: sqlite3.Connection) -> None:
+            conn.execute("INSERT OR REPLACE INTO poll_state (key, value) VALUES ('cursor', ?)", (str(cursor),))
+
+        await self._db.run(set_sync)
+
+    @background("poll")
+    async def poll(self, lease_ttl: int | None = None) -> dict[str, int]:
+        """
+        Один опрос: сделки, измененные с курсора, применяются постранично (по PAGE_SIZE).
+
+        Курсор сохраняется после каждой примененной страницы, и только после этого запрашивается
+        следующая. Граница курсора включительная, повторно полученные сделки отсекаются дедупликацией
+        по версии. Если передан lease_ttl, аренда опроса продлевается после каждой страницы; при потере
+        аренды опрос останавливается (следующий владелец продолжит с сохраненного курсора).
+
+        Args:
+            lease_ttl: TTL аренды опроса (сек) или None, если опрос выполняется без аренды
+
+        Returns:
+            dict[str, int]: Счетчики leads (получено) и updated (обновлено строк)
+        """
+        cursor = await self.get_cursor()
+        if cursor is None:
+            cursor = int(time.time() - settings.AMO_POLL_INTERVAL)
+
+        leads = updated = 0
+        async for batch in amocrm_client.get_leads_updated_since(cursor):
+            updated += await apply_lead_changes(batch)
+            leads += len(batch)
+            cursor = max([cursor, *(lead["updated_at"] for lead in batch if lead.get("updated_at"))])
+            await self._set_cursor(cursor)
+            if lease_ttl and not await sync_lock.renew_lease(AMOCRM_POLL_LEASE, self._owner, lease_ttl):
+                logger.warning("Аренда опроса AmoCRM потеряна, опрос остановлен на курсоре %s", cursor)
+                break
+
+        if leads:
+            logger.info("Опрос AmoCRM: получено %s сделок, обновлено строк %s", leads, updated)
+        return {"leads": leads, "updated": updated}
+
+    async def _loop(self) -> None:
+        """
+        Периодический опрос на одном воркере: аренда на интервал не снимается и продлевается между
+        страницами; владелец, чья аренда еще действует, продлевает ее и опрашивает дальше.
+        """
+        interval = settings.AMO_POLL_INTERVAL
+        ttl = max(int(interval), 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await sync_lock.acquire_lease(AMOCRM_POLL_LEASE, self._owner, ttl) or await sync_lock.renew_lease(
+                    AMOCRM_POLL_LEASE, self._owner, ttl
+                ):
+                    await self.poll(ttl)
+            except Exception as e:
+                logger.error("Ошибка опроса AmoCRM: %s", e, exc_info=True)
+
+    def start(self) -> None:
+        """Запустить опрос каждые AMO_POLL_INTERVAL секунд (при AMO_POLL_INTERVAL > 0)."""
+        if settings.AMO_POLL_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить опрос."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._db.close()
+
+
+amocrm_poller = AmoCRMPoller()
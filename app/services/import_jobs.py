@@ -0,0 +1,473 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Any
+
+from app.core.concurrency import background
+from app.core.local_db import LocalDB
+from app.core.settings import settings
+from app.core.sync_lock import sync_lock
+from app.services.import_service import import_existing_rows, import_limiter
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    checkpoint_row INTEGER NOT NULL DEFAULT 1,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    created INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    run_started_at REAL,
+    run_processed_base INTEGER NOT NULL DEFAULT 0,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS import_jobs_status ON import_jobs (status);
+CREATE TABLE IF NOT EXISTS import_job_owners (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL
+);
+"""
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_CANCELLING = "cancelling"
+STATUS_CANCELLED = "cancelled"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING, STATUS_CANCELLING)
+
+STARTUP_LEASE = "startup_import"
+
+
+class ImportCancelledError(Exception):
+    """Задача импорта отменена."""
+
+
+def _process_alive(owner: str) -> bool:
+    """
+    Жив ли процесс-владелец задачи ("хост:pid:..."); процессы других хостов считаются живыми.
+
+    Args:
+        owner: Владелец задачи
+    """
+    host, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # процесс есть, но принадлежит другому пользователю
+    return True
+
+
+class _JobProgress:
+    """Запись чекпоинтов задачи импорта."""
+
+    def __init__(self, manager: "ImportJobManager", job_id: str, resumed: bool) -> None:
+        self._manager = manager
+        self._job_id = job_id
+        self._resumed = resumed
+
+    async def started(self, pending: int, skipped: int) -> None:
+        """Строки просканированы."""
+
+        def started_sync(conn: sqlite3.Connection) -> None:
+            if self._resumed:
+                conn.execute("UPDATE import_jobs SET total = processed + ? WHERE id = ?", (pending, self._job_id))
+            else:
+                conn.execute(
+                    "UPDATE import_jobs SET total = ?, skipped = ? WHERE id = ?", (pending, skipped, self._job_id)
+                )
+
+        await self._manager.db.run(started_sync)
+
+    async def chunk_done(self, last_row: int, created: int, errors: int) -> None:
+        """Чекпоинт после пачки строк; прерывает импорт, если задачу отменили."""
+
+        def checkpoint_sync(conn: sqlite3.Connection) -> str:
+            conn.execute(
+                "UPDATE import_jobs SET checkpoint_row = ?, processed = processed + ?, created = created + ?, "
+                "errors = errors + ?, heartbeat_at = ? WHERE id = ?",
+                (last_row, created + errors, created, errors, time.time(), self._job_id),
+            )
+            row = conn.execute("SELECT status FROM import_jobs WHERE id = ?", (self._job_id,)).fetchone()
+            return str(row["status"])
+
+        status = await self._manager.db.run(checkpoint_sync)
+        logger.info("Импорт %s: чекпоинт на строке %s", self._job_id, last_row)
+        if status == STATUS_CANCELLING:
+            raise ImportCancelledError()
+
+
+class ImportJobManager:
+    """Задачи импорта строк с чекпоинтами, продолжением после перезапуска и отменой."""
+
+    def __init__(self) -> None:
+        """Инициализация менеджера."""
+        self.db = LocalDB("import_jobs.sqlite3", _SCHEMA)
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._startup_task: asyncio.Task[None] | None = None
+        self.startup_state: dict[str, Any] = {"state": "disabled", "role": None, "job_id": None, "error": None}
+
+    async def _set(self, job_id: str, **values: Any) -> None:
+        def set_sync(conn: sqlite3.Connection) -> None:
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            conn.execute(f"UPDATE import_jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+
+        await self.db.run(set_sync)
+
+    async def get(self, job_id: str) -> dict[str, Any] | None:
+        """
+        Состояние задачи импорта с пропускной способностью, оценкой оставшегося времени
+        и текущим лимитом параллелизма (для задачи, выполняющейся в этом процессе).
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            dict[str, Any] | None: Состояние задачи или None, если задача не найдена
+        """
+
+        def get_sync(conn: sqlite3.Connection) -> sqlite3.Row | None:
+            return conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+
+        row = await self.db.run(get_sync)
+        if row is None:
+            return None
+
+        job = dict(row)
+        end = job["finished_at"] or time.time()
+        processed_in_run = job["processed"] - job["run_processed_base"]
+        elapsed = end - job["run_started_at"] if job["run_started_at"] else 0
+        rate = processed_in_run / elapsed if elapsed > 0 else 0.0
+        remaining = (job["total"] or 0) - job["processed"]
+
+        job["rows_per_second"] = round(rate, 3)
+        job["eta_seconds"] = round(remaining / rate, 1) if rate > 0 and job["status"] == STATUS_RUNNING else None
+        job["concurrency_limit"] = import_limiter.limit if job_id in self._tasks else None
+        return job
+
+    async def _active_jobs(self) -> list[dict[str, Any]]:
+        """Активные задачи с владельцем (процессом, который их выполняет) по времени создания."""
+
+        def active_sync(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+            rows = conn.execute(
+                "SELECT j.id, j.status, j.created_at, j.heartbeat_at, o.owner FROM import_jobs j "
+                "LEFT JOIN import_job_owners o ON o.job_id = j.id "
+                f"WHERE j.status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) ORDER BY j.created_at",
+                ACTIVE_STATUSES,
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+        return await self.db.run(active_sync)
+
+    def _orphaned(self, job: dict[str, Any]) -> bool:
+        """
+        Задача без живого исполнителя: ее задача asyncio не в этом процессе, и процесс-владелец завершился
+        или чекпоинта не было дольше IMPORT_JOB_STALE_AFTER.
+        """
+        if job["id"] in self._tasks:
+            return False
+        owner = job["owner"]
+        if owner == self._owner or (owner and not _process_alive(owner)):
+            return True
+        heartbeat = job["heartbeat_at"] if job["heartbeat_at"] is not None else job["created_at"]
+        return heartbeat < time.time() - settings.IMPORT_JOB_STALE_AFTER
+
+    async def _claim(self, job_id: str, previous_owner: str | None) -> bool:
+        """
+        Стать владельцем задачи, если владелец не сменился с момента проверки (другой процесс
+        мог уже подхватить ту же задачу).
+        """
+
+        def claim_sync(conn: sqlite3.Connection) -> bool:
+            row = conn.execute("SELECT owner FROM import_job_owners WHERE job_id = ?", (job_id,)).fetchone()
+            if (row["owner"] if row else None) != previous_owner:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO import_job_owners (job_id, owner) VALUES (?, ?)", (job_id, self._owner)
+            )
+            conn.execute("UPDATE import_jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            return True
+
+        return await self.db.run(claim_sync)
+
+    async def _recover(self, job: dict[str, Any]) -> bool:
+        """
+        Подхватить задачу без исполнителя: отменяемая завершается как отмененная, остальные продолжаются
+        с чекпоинта в этом процессе.
+
+        Returns:
+            bool: True если задача продолжена
+        """
+        if not await self._claim(job["id"], job["owner"]):
+            return False
+        if job["status"] == STATUS_CANCELLING:
+            await self._set(job["id"], status=STATUS_CANCELLED, finished_at=time.time())
+            logger.info("Прерванная задача импорта %s отменена", job["id"])
+            return False
+        logger.info("Продолжение прерванной задачи импорта %s", job["id"])
+        self._launch(job["id"], resumed=True)
+        return True
+
+    async def start(self) -> dict[str, Any]:
+        """
+        Запустить новую задачу импорта в фоне.
+
+        Если уже есть активная задача, возвращается она. Задача, оставшаяся активной после падения
+        или перезапуска процесса (см. _orphaned), продолжается в этом процессе, а отменяемая - завершается.
+
+        Returns:
+            dict[str, Any]: Состояние задачи
+        """
+        for job in await self._active_jobs():
+            if not self._orphaned(job) or await self._recover(job):
+                logger.info("Импорт уже выполняется: %s", job["id"])
+                return await self.get(job["id"])  # type: ignore[return-value]
+
+        job_id = uuid.uuid4().hex
+
+        def create_sync(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT INTO import_jobs (id, status, created_at) VALUES (?, ?, ?)",
+                (job_id, STATUS_PENDING, time.time()),
+            )
+            conn.execute("INSERT INTO import_job_owners (job_id, owner) VALUES (?, ?)", (job_id, self._owner))
+
+        await self.db.run(create_sync)
+        self._launch(job_id, resumed=False)
+        logger.info("Создана задача импорта %s", job_id)
+        return await self.get(job_id)  # type: ignore[return-value]
+
+    async def cancel(self, job_id: str) -> dict[str, Any] | None:
+        """
+        Отменить задачу импорта (после текущей пачки строк).
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            dict[str, Any] | None: Состояние задачи или None, если задача не найдена
+        """
+
+        def cancel_sync(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE import_jobs SET status = ? WHERE id = ? AND status IN (?, ?)",
+                (STATUS_CANCELLING, job_id, STATUS_PENDING, STATUS_RUNNING),
+            )
+
+        await self.db.run(cancel_sync)
+        return await self.get(job_id)
+
+    async def resume_unfinished(self) -> list[str]:
+        """
+        Продолжить задачи, прерванные падением или перезапуском процесса (см. _orphaned).
+
+        Returns:
+            list[str]: ID продолженных задач
+        """
+        return [job["id"] for job in await self._active_jobs() if self._orphaned(job) and await self._recover(job)]
+
+    async def wait(self, job_id: str) -> dict[str, Any] | None:
+        """Дождаться завершения задачи, запущенной в этом процессе."""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.wait([task])
+        return await self.get(job_id)
+
+    def _launch(self, job_id: str, resumed: bool) -> None:
+        task = asyncio.create_task(self._run(job_id, resumed))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.IMPORT_JOB_STALE_AFTER / 4)
+            await self._set(job_id, heartbeat_at=time.time())
+
+    @background("import")
+    async def _run(self, job_id: str, resumed: bool) -> None:
+        """Выполнение задачи импорта."""
+        def begin_sync(conn: sqlite3.Connection) -> sqlite3.Row | None:
+            # Проверка статуса и переход в running одной транзакцией: отмена между ними не теряется
+            now = time.time()
+            conn.execute(
+                "UPDATE import_jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (STATUS_CANCELLED, now, job_id, STATUS_CANCELLING),
+            )
+            conn.execute(
+                "UPDATE import_jobs SET status = ?, run_started_at = ?, run_processed_base = processed, heartbeat_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (STATUS_RUNNING, now, now, job_id, STATUS_PENDING, STATUS_RUNNING),
+            )
+            return conn.execute(
+                "SELECT checkpoint_row FROM import_jobs WHERE id = ? AND status = ?", (job_id, STATUS_RUNNING)
+            ).fetchone()
+
+        job = await self.db.run(begin_sync)
+        if job is None:
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await import_existing_rows(
+                start_after=job["checkpoint_row"],
+                progress=_JobProgress(self, job_id, resumed),
+            )
+        except ImportCancelledError:
+            await self._set(job_id, status=STATUS_CANCELLED, finished_at=time.time())
+            logger.info("Задача импорта %s отменена", job_id)
+            return
+        except Exception as e:
+            await self._set(job_id, status=STATUS_FAILED, error=str(e)[:500], finished_at=time.time())
+            logger.error("Ошибка задачи импорта %s: %s", job_id, e, exc_info=True)
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._set(job_id, status=STATUS_COMPLETED, finished_at=time.time())
+        logger.info(
+            "Задача импорта %s завершена: создано=%s, пропущено=%s, ошибок=%s",
+            job_id,
+            result["created"],
+            result["skipped"],
+            result["errors"],
+        )
+
+    def start_on_startup(self) -> None:
+        """
+        Запустить в фоне продолжение прерванных задач и, при IMPORT_ON_STARTUP, автоимпорт
+        (выполняет только воркер, захвативший аренду лидера).
+        """
+        self.startup_state["state"] = "electing"
+        self._startup_task = asyncio.create_task(self._run_startup(settings.IMPORT_ON_STARTUP))
+
+    async def _run_startup(self, start_new: bool) -> None:
+        """
+        Выборы лидера и автоимпорт: продолжение прерванной задачи или запуск новой (если start_new).
+
+        Воркер без аренды остается в резерве и повторяет захват, пока автоимпорт не завершится. Лидер,
+        потерявший аренду, приостанавливает задачу автоимпорта и тоже возвращается в резерв: задачу
+        с чекпоинта продолжает воркер, захвативший аренду следующим.
+        """
+        ttl = settings.IMPORT_LEADER_LEASE_TTL
+        started_at = time.time()
+        while await self._acquire_startup_lease(ttl, started_at):
+            self.startup_state.update(state="running", role="leader", job_id=None)
+            lost = asyncio.Event()
+            renew = asyncio.create_task(self._renew_startup_lease(ttl, lost))
+            try:
+                resumed = await self.resume_unfinished()
+                if not resumed and not start_new:
+                    self.startup_state["state"] = "disabled"
+                    return
+                if not resumed and await self._finished_since(started_at):
+                    self.startup_state["state"] = "skipped"
+                    return
+                job = await self.get(resumed[0]) if resumed else await self.start()
+                self.startup_state["job_id"] = job["id"]  # type: ignore[index]
+                if lost.is_set():
+                    await self._suspend([job["id"]])  # type: ignore[index]
+                result = await self.wait(job["id"])  # type: ignore[index]
+                if result and result["status"] in ACTIVE_STATUSES:
+                    self.startup_state["state"] = "suspended"
+                elif result:
+                    self.startup_state["state"] = result["status"]
+                    logger.info(
+                        "Автоимпорт завершен: статус=%s, создано=%s, пропущено=%s, ошибок=%s",
+                        result["status"],
+                        result["created"],
+                        result["skipped"],
+                        result["errors"],
+                    )
+            except Exception as e:
+                self.startup_state.update(state=STATUS_FAILED, error=str(e)[:500])
+                logger.error("Ошибка при автоимпорте: %s", e, exc_info=True)
+                return
+            finally:
+                # После потери аренды задача продления сама завершается, приостановив задачу автоимпорта
+                if not lost.is_set():
+                    renew.cancel()
+                await asyncio.gather(renew, return_exceptions=True)
+                await sync_lock.release_lease(STARTUP_LEASE, self._owner)
+            if not lost.is_set():
+                return
+
+        self.startup_state.update(state="skipped", role="follower")
+        logger.info("Автоимпорт при старте выполнил другой воркер")
+
+    async def _acquire_startup_lease(self, ttl: int, started_at: float) -> bool:
+        """
+        Захватить аренду автоимпорта; без аренды повторять с растущей задержкой (до ttl).
+
+        Захват повторяется и пока Redis недоступен, поэтому автоимпорт выполнится после переподключения.
+
+        Returns:
+            bool: True если аренда захвачена; False если задача импорта завершилась после started_at
+                (автоимпорт выполнил другой воркер)
+        """
+        delay = ttl / 10
+        while not await sync_lock.acquire_lease(STARTUP_LEASE, self._owner, ttl):
+            if self.startup_state["role"] != "follower":
+                self.startup_state.update(state="waiting", role="follower")
+                logger.info("Аренду автоимпорта держит другой воркер или Redis недоступен, ожидание")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, ttl)
+            if await self._finished_since(started_at):
+                return False
+        return True
+
+    async def _finished_since(self, since: float) -> bool:
+        """Завершилась ли какая-либо задача импорта после момента since."""
+
+        def finished_sync(conn: sqlite3.Connection) -> bool:
+            return conn.execute("SELECT 1 FROM import_jobs WHERE finished_at >= ? LIMIT 1", (since,)).fetchone() is not None
+
+        return await self.db.run(finished_sync)
+
+    async def _renew_startup_lease(self, ttl: int, lost: asyncio.Event) -> None:
+        """Продление аренды лидера; при потере аренды приостанавливается только задача автоимпорта."""
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await sync_lock.renew_lease(STARTUP_LEASE, self._owner, ttl):
+                logger.warning("Аренда автоимпорта потеряна, задача автоимпорта в этом процессе приостановлена")
+                lost.set()
+                if self.startup_state["job_id"]:
+                    await self._suspend([self.startup_state["job_id"]])
+                return
+
+    async def _suspend(self, job_ids: list[str]) -> None:
+        """Остановить задачи этого процесса так, чтобы их сразу продолжил другой процесс или следующий запуск."""
+        tasks = [self._tasks[job_id] for job_id in job_ids if job_id in self._tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job_id in job_ids:
+            await self._set(job_id, heartbeat_at=0)
+
+    async def shutdown(self) -> None:
+        """Остановить задачи этого процесса; они будут продолжены после перезапуска."""
+        if self._startup_task is not None:
+            self._startup_task.cancel()
+        await self._suspend(list(self._tasks))
+        if self._startup_task is not None:
+            await asyncio.gather(self._startup_task, return_exceptions=True)
+        self.db.close()
+
+
+import_jobs = ImportJobManager()
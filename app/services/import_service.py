@@ -1,62 +1,268 @@
 import asyncio
 import logging
+from typing import Any, Protocol
 
 from app.core.amocrm_client import amocrm_client
+from app.core.concurrency import AdaptiveLimiter, LimiterConfig
+from app.core.mapping_store import mapping_store
+from app.core.outbox import sheets_outbox
+from app.core.settings import settings
 from app.core.sheets_client import sheets_client
-from app.core.utils import make_external_id, normalize_phone
+from app.core.utils import make_external_ids, normalize_phones, sync_fingerprint
+from app.services.import_state import import_state
 
 logger = logging.getLogger(__name__)
 
+# (номер_строки, name, phone, email, budget, external_id)
+PendingRow = tuple[int, str, str | None, str, float, str]
 
-async def import_existing_rows() -> dict[str, int]:  # pylint: disable=too-many-locals
-    """Импорт строк без amo_deal_id из Google Sheets."""
-    rows = await sheets_client.read_all_rows()
+import_limiter = AdaptiveLimiter(
+    "import",
+    lambda: LimiterConfig(
+        initial=settings.IMPORT_CONCURRENCY_INITIAL,
+        minimum=settings.IMPORT_CONCURRENCY_MIN,
+        maximum=settings.IMPORT_CONCURRENCY_MAX,
+        latency_target=settings.IMPORT_LATENCY_TARGET,
+    ),
+)
 
-    semaphore = asyncio.Semaphore(2)
 
-    tasks = []
+class ImportProgress(Protocol):
+    """Получатель прогресса импорта (чекпоинты после каждой пачки строк)."""
+
+    async def started(self, pending: int, skipped: int) -> None:
+        """Строки просканированы: pending строк будет импортировано, skipped пропущено."""
+
+    async def chunk_done(self, last_row: int, created: int, errors: int) -> None:
+        """Пачка строк до last_row включительно обработана. Может прервать импорт исключением."""
+
+
+async def _read_candidate_rows() -> tuple[dict[int, dict[str, Any]], dict[int, str], int]:
+    """
+    Чтение строк-кандидатов на импорт.
+
+    Первый импорт (нет high-water mark) читает таблицу целиком и перестраивает локальную связку строк.
+    Последующие читают диапазоном только строки после отметки и отдельными диапазонами -
+    отслеживаемые строки ниже отметки.
+
+    Returns:
+        tuple: ({номер_строки: строка}, отслеживаемые строки {номер_строки: отпечаток}, прежняя отметка)
+    """
+    high_water_mark = await import_state.get_high_water_mark()
+    if high_water_mark is None:
+        rows = await sheets_client.read_all_rows()
+        await mapping_store.rebuild(rows)
+        return dict(enumerate(rows, start=2)), {}, 1
+
+    watched = await import_state.watched_rows()
+    candidates = await sheets_client.read_rows_at(sorted(watched))
+    candidates.update(await sheets_client.read_rows_from(high_water_mark + 1))
+    logger.info(
+        "Инкрементальный импорт: отметка=%s, новых строк=%s, отслеживаемых=%s",
+        high_water_mark,
+        len(candidates) - len(watched),
+        len(watched),
+    )
+    return candidates, watched, high_water_mark
+
+
+async def import_existing_rows(  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    start_after: int = 1,
+    progress: ImportProgress | None = None,
+) -> dict[str, int]:
+    """
+    Импорт строк без amo_deal_id из Google Sheets.
+
+    Импорт инкрементальный: после завершения сохраняется high-water mark и отпечатки строк, которые
+    не удалось импортировать (нет имени, ошибка). Следующий импорт читает только строки после отметки
+    и отслеживаемые строки, а неизменившиеся отслеживаемые строки пропускает (см. ImportStateStore).
+
+    Строки обрабатываются пачками по IMPORT_CHUNK_SIZE; после каждой пачки вызывается progress.chunk_done.
+    Строки пачки с одинаковым телефоном или email группируются (group_pending_rows): контакт группы
+    ищется или создается один раз и переиспользуется для всех ее сделок и в следующих пачках.
+    Параллелизм ограничивает import_limiter.
+
+    Args:
+        start_after: Номер последней уже обработанной строки (для продолжения с чекпоинта)
+        progress: Получатель прогресса импорта
+
+    Returns:
+        dict[str, int]: Счетчики created, skipped, errors
+    """
+    candidates, watched, high_water_mark = await _read_candidate_rows()
+    pending_rows = await sheets_outbox.pending_rows()
+
+    selected: list[tuple[int, str, str, str, float]] = []
+    watch: dict[int, str] = {}
+    forget: list[int] = []
     created = 0
     skipped = 0
     errors = 0
 
-    for i, row in enumerate(rows, start=2):
+    for i, row in sorted(candidates.items()):
         amo_deal_id = row.get("amo_deal_id", "").strip()
         external_id_existing = row.get("external_id", "").strip()
 
-        if amo_deal_id or external_id_existing:
-            skipped += 1
+        if amo_deal_id or external_id_existing or i in pending_rows:
+            if i in watched:
+                forget.append(i)
+            if i > start_after:
+                skipped += 1
             continue
 
         name = row.get("name", "").strip()
-        if not name:
-            skipped += 1
-            continue
-
         phone_raw = row.get("phone", "").strip()
         email = row.get("email", "").strip()
         budget_raw = row.get("budget", "0").strip()
+        fingerprint = sync_fingerprint(name, phone_raw, email, budget_raw)
+
+        if not name or watched.get(i) == fingerprint:
+            watch[i] = fingerprint
+            if i > start_after:
+                skipped += 1
+            continue
+
+        if i <= start_after:
+            # Строка до чекпоинта не импортирована (ошибка) - повторить при следующем импорте
+            watch[i] = ""
+            continue
 
         try:
             budget = float(budget_raw) if budget_raw else 0
         except ValueError:
             budget = 0
 
-        phone = normalize_phone(phone_raw)
-        external_id = make_external_id(phone, email)
+        selected.append((i, name, phone_raw, email, budget))
+
+    # Нормализация и external_id - одним проходом по колонкам отобранных строк
+    columns: list[list[Any]] = [list(column) for column in zip(*selected)] or [[] for _ in range(5)]
+    row_indices, names, phones_raw, emails, budgets = columns
+    phones = normalize_phones(phones_raw)
+    external_ids = make_external_ids(phones, emails, names, sheets_client.sheet_key, row_indices)
+    pending = list(zip(row_indices, names, phones, emails, budgets, external_ids))
+
+    if progress:
+        await progress.started(pending=len(pending), skipped=skipped)
 
-        tasks.append(_process_row(i, name, phone, email, budget, external_id, semaphore))
+    # Ключ контакта ("phone:..." / "email:...") -> ID контакта, найденного или созданного в этом импорте
+    contact_cache: dict[str, int] = {}
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for chunk_start in range(0, len(pending), settings.IMPORT_CHUNK_SIZE):
+        chunk = pending[chunk_start : chunk_start + settings.IMPORT_CHUNK_SIZE]
+        group_results = await asyncio.gather(
+            *(_process_group(group, contact_cache) for group in group_pending_rows(chunk))
+        )
+        results_by_row = {row_index: result for group in group_results for row_index, result in group.items()}
+        results = [results_by_row.get(item[0], False) for item in chunk]
 
-    for result in results:
-        if isinstance(result, Exception):
-            errors += 1
-        elif result:
-            created += 1
+        for item, result in zip(chunk, results):
+            if result is True:
+                created += 1
+                forget.append(item[0])
+            else:
+                errors += 1
+                watch[item[0]] = ""
 
+        if progress:
+            await progress.chunk_done(
+                last_row=chunk[-1][0],
+                created=sum(1 for result in results if result is True),
+                errors=sum(1 for result in results if result is not True),
+            )
+
+    await import_state.save(max([high_water_mark, *candidates]), watch, forget)
     return {"created": created, "skipped": skipped, "errors": errors}
 
 
+def _contact_keys(item: PendingRow) -> list[str]:
+    """Ключи контакта строки: нормализованные телефон и email."""
+    _, _, phone, email, _, _ = item
+    keys = []
+    if phone:
+        keys.append(f"phone:{phone}")
+    if email and email.strip():
+        keys.append(f"email:{email.lower().strip()}")
+    return keys
+
+
+def group_pending_rows(items: list[PendingRow]) -> list[list[PendingRow]]:
+    """
+    Группировка строк, относящихся к одному контакту.
+
+    Строки попадают в одну группу, если у них совпадает нормализованный телефон или email
+    (в том числе через цепочку строк). Строки без телефона и email - отдельные группы.
+
+    Args:
+        items: Строки к импорту
+
+    Returns:
+        list[list[PendingRow]]: Группы строк в порядке первой строки группы
+    """
+    parent = list(range(len(items)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    first_by_key: dict[str, int] = {}
+    for index, item in enumerate(items):
+        for key in _contact_keys(item):
+            if key in first_by_key:
+                parent[find(index)] = find(first_by_key[key])
+            else:
+                first_by_key[key] = index
+
+    groups: dict[int, list[PendingRow]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(find(index), []).append(item)
+    return list(groups.values())
+
+
+async def _process_group(group: list[PendingRow], contact_cache: dict[str, int]) -> dict[int, bool]:
+    """
+    Импорт группы строк одного контакта: контакт ищется или создается один раз, сделки - для каждой строки.
+
+    Args:
+        group: Строки группы
+        contact_cache: Уже найденные в этом импорте контакты {ключ_контакта: ID}
+
+    Returns:
+        dict[int, bool]: {номер_строки: True если строка импортирована}
+    """
+    keys = [key for item in group for key in _contact_keys(item)]
+    contact_id = next((contact_cache[key] for key in keys if key in contact_cache), None)
+
+    if contact_id is None:
+        # Для поиска берется строка с наибольшим числом контактных данных
+        _, name, phone, email, _, _ = max(group, key=lambda item: len(_contact_keys(item)))
+        try:
+            async with import_limiter.slot():
+                contact_id = await amocrm_client.upsert_contact(name=name, phone=phone, email=email)
+        except Exception as e:
+            for item in group:
+                await _mark_error(item[0], item[5], e)
+            return {item[0]: False for item in group}
+
+    if len(group) > 1:
+        logger.info("Строки %s относятся к одному контакту %s", [item[0] for item in group], contact_id)
+    contact_cache.update(dict.fromkeys(keys, contact_id))
+
+    results = await asyncio.gather(*(_process_row(*item, contact_id=contact_id) for item in group))
+    return {item[0]: result for item, result in zip(group, results)}
+
+
+async def _mark_error(row_index: int, external_id: str, error: Exception) -> None:
+    """Запись ошибки импорта в колонку status."""
+    logger.error("Ошибка импорта строки %s, external_id=%s: %s", row_index, external_id, error)
+
+    try:
+        await sheets_client.update_cells(row_index=row_index, mapping={"status": f"error:{str(error)[:50]}"})
+    except Exception:
+        pass
+
+
 async def _process_row(  # pylint: disable=too-many-positional-arguments
     row_index: int,
     name: str,
@@ -64,38 +270,31 @@ async def _process_row(  # pylint: disable=too-many-positional-arguments
     email: str | None,
     budget: float,
     external_id: str,
-    semaphore: asyncio.Semaphore,
+    contact_id: int,
 ) -> bool:
-    """Обработка одной строки при импорте с ограничением параллелизма."""
-    async with semaphore:
-        try:
-            contact_id = await amocrm_client.upsert_contact(name=name, phone=phone, email=email)
+    """Создание сделки для строки при импорте с адаптивным ограничением параллелизма."""
+    try:
+        async with import_limiter.slot():
             lead_id = await amocrm_client.create_lead(name=name, contact_id=contact_id, budget=budget)
-            lead_link = amocrm_client.lead_link(lead_id)
-
             lead_info = await amocrm_client.get_lead_info(lead_id)
-            status = lead_info.get("status_name", "created") if lead_info else "created"
-
-            await sheets_client.update_cells(
-                row_index=row_index,
-                mapping={
-                    "amo_deal_id": str(lead_id),
-                    "amo_contact_id": str(contact_id),
-                    "amo_link": lead_link,
-                    "status": status,
-                    "external_id": external_id,
-                },
-            )
 
-            logger.info("Импортирована строка %s: lead_id=%s, external_id=%s", row_index, lead_id, external_id)
-            return True
+        lead_link = amocrm_client.lead_link(lead_id)
+        status = lead_info.get("status_name", "created") if lead_info else "created"
 
-        except Exception as e:
-            logger.error("Ошибка импорта строки %s, external_id=%s: %s", row_index, external_id, e)
+        await sheets_outbox.write(
+            row_index,
+            {
+                "amo_deal_id": str(lead_id),
+                "amo_contact_id": str(contact_id),
+                "amo_link": lead_link,
+                "status": status,
+                "external_id": external_id,
+            },
+        )
 
-            try:
-                await sheets_client.update_cells(row_index=row_index, mapping={"status": f"error:{str(e)[:50]}"})
-            except Exception:
-                pass
+        logger.info("Импортирована строка %s: lead_id=%s, external_id=%s", row_index, lead_id, external_id)
+        return True
 
-            return False
+    except Exception as e:
+        await _mark_error(row_index, external_id, e)
+        return False
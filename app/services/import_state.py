@@ -0,0 +1,93 @@
+import logging
+import sqlite3
+
+from app.core.local_db import LocalDB
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS import_watched_rows (
+    row_index INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+"""
+
+_HIGH_WATER_MARK = "high_water_mark"
+
+
+class ImportStateStore:
+    """
+    Состояние инкрементального импорта.
+
+    - high-water mark - последняя строка, до которой таблица полностью просмотрена;
+    - отслеживаемые строки ниже отметки, которые еще не импортированы (нет имени, ошибка),
+      с отпечатками их данных: при следующем импорте они перечитываются и обрабатываются,
+      только если отпечаток изменился. Пустой отпечаток означает "повторить в любом случае".
+    """
+
+    def __init__(self) -> None:
+        """Инициализация хранилища."""
+        self._db = LocalDB("import_state.sqlite3", _SCHEMA)
+
+    async def get_high_water_mark(self) -> int | None:
+        """Последняя полностью просмотренная строка или None, если импорт еще не выполнялся."""
+
+        def get_sync(conn: sqlite3.Connection) -> int | None:
+            row = conn.execute("SELECT value FROM import_state WHERE key = ?", (_HIGH_WATER_MARK,)).fetchone()
+            return int(row["value"]) if row else None
+
+        return await self._db.run(get_sync)
+
+    async def watched_rows(self) -> dict[int, str]:
+        """Отслеживаемые строки ниже отметки: {номер_строки: отпечаток}."""
+
+        def watched_sync(conn: sqlite3.Connection) -> dict[int, str]:
+            rows = conn.execute("SELECT row_index, fingerprint FROM import_watched_rows").fetchall()
+            return {row["row_index"]: row["fingerprint"] for row in rows}
+
+        return await self._db.run(watched_sync)
+
+    async def save(self, high_water_mark: int, watch: dict[int, str], forget: list[int]) -> None:
+        """
+        Сохранить результат импорта.
+
+        Args:
+            high_water_mark: Последняя просмотренная строка
+            watch: Строки для отслеживания {номер_строки: отпечаток}
+            forget: Строки, которые больше не нужно отслеживать (импортированы)
+        """
+
+        def save_sync(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT OR REPLACE INTO import_state (key, value) VALUES (?, ?)",
+                (_HIGH_WATER_MARK, str(high_water_mark)),
+            )
+            conn.executemany("DELETE FROM import_watched_rows WHERE row_index = ?", [(row,) for row in forget])
+            conn.executemany(
+                "INSERT OR REPLACE INTO import_watched_rows (row_index, fingerprint) VALUES (?, ?)",
+                list(watch.items()),
+            )
+
+        await self._db.run(save_sync)
+        logger.info("Отметка импорта: строка %s, отслеживается строк: +%s/-%s", high_water_mark, len(watch), len(forget))
+
+    async def reset(self) -> None:
+        """Сбросить состояние: следующий импорт прочитает таблицу целиком."""
+
+        def reset_sync(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM import_state")
+            conn.execute("DELETE FROM import_watched_rows")
+
+        await self._db.run(reset_sync)
+        logger.info("Состояние инкрементального импорта сброшено")
+
+    def close(self) -> None:
+        """Закрыть базу."""
+        self._db.close()
+
+
+import_state = ImportStateStore()
@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.core.amocrm_client import amocrm_client, contact_fields_update
+from app.core.concurrency import background
+from app.core.local_db import LocalDB
+from app.core.settings import settings
+from app.core.sheets_client import sheets_client
+from app.core.sync_lock import sync_lock
+from app.core.utils import normalize_phone, sync_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reconcile_snapshot (
+    row_index INTEGER PRIMARY KEY,
+    deal_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    reconciled_at REAL NOT NULL
+);
+"""
+
+RECONCILE_LEASE = "reconcile"
+# TTL аренды сверки по запросу (сек): продлевается после каждой пачки
+RECONCILE_MANUAL_LEASE_TTL = 60
+
+# Синхронизируемые поля строки
+FIELDS = ("name", "phone", "email", "budget")
+
+
+def _normalized(field: str, value: Any) -> Any:
+    """Значение поля в виде для сравнения (как в sync_fingerprint)."""
+    text = str(value).strip() if value is not None else ""
+    if field == "phone":
+        return normalize_phone(text) or ""
+    if field == "email":
+        return text.lower()
+    if field == "budget":
+        try:
+            return float(text) if text else 0.0
+        except ValueError:
+            return 0.0
+    return text
+
+
+def _fingerprint(values: dict[str, Any]) -> str:
+    return sync_fingerprint(values.get("name"), values.get("phone"), values.get("email"), values.get("budget"))
+
+
+def _amo_values(lead: dict[str, Any], contact: dict[str, Any] | None) -> dict[str, str]:
+    """Значения полей строки по данным AmoCRM (как их пишет вебхук AmoCRM)."""
+    contact = contact or {}
+    return {
+        "name": str(contact.get("name") or lead.get("name") or ""),
+        "phone": str(contact.get("phone") or ""),
+        "email": str(contact.get("email") or ""),
+        "budget": str(lead["price"]) if lead.get("price") is not None else "",
+    }
+
+
+def _to_int(value: Any) -> int | None:
+    text = str(value).strip() if value is not None else ""
+    return int(text) if text.isdigit() else None
+
+
+async def _push(kind: str, update: Callable[[list[dict[str, Any]]], Awaitable[Any]], updates: list[dict[str, Any]]) -> bool:
+    """
+    Записать изменения сущностей в AmoCRM.
+
+    Args:
+        kind: Сущности для лога (сделок, контактов)
+        update: Метод пакетного обновления клиента AmoCRM
+        updates: Изменения сущностей с id
+
+    Returns:
+        bool: False если запись не удалась (ошибка записана в лог)
+    """
+    if not updates:
+        return True
+    try:
+        await update(updates)
+    except Exception as e:
+        logger.error("Не удалось записать изменения %s %s в AmoCRM: %s", kind, [item["id"] for item in updates], e)
+        return False
+    return True
+
+
+class Reconciler:  # pylint: disable=too-many-instance-attributes
+    """
+    Двусторонняя сверка таблицы и AmoCRM.
+
+    Таблица читается пачками по RECONCILE_CHUNK_SIZE строк до числа строк листа; для каждой пачки сделки и контакты
+    получаются пакетно по списку ID, сравниваются в памяти, а расхождения записываются пакетами:
+    в таблицу - одним batch_update, в AmoCRM - PATCH-запросами по нескольку сущностей.
+
+    Направление определяется по снимку значений после прошлой сверки: изменилась только таблица -
+    значения уходят в AmoCRM, изменилась только AmoCRM - в таблицу, изменились обе стороны (или
+    снимка еще нет) - применяются значения RECONCILE_CONFLICT_WINNER. Статус всегда берется из AmoCRM.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация сверки."""
+        self._db = LocalDB("reconcile.sqlite3", _SCHEMA)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._run_lock = asyncio.Lock()
+        self._loop_task: asyncio.Task[None] | None = None
+        self._run_task: asyncio.Task[dict[str, int]] | None = None
+        self.state: dict[str, Any] = {"running": False, "started_at": None, "finished_at": None, "result": None}
+
+    async def _get_snapshots(self, row_indices: list[int]) -> dict[int, tuple[str, str]]:
+        def get_sync(conn: sqlite3.Connection) -> dict[int, tuple[str, str]]:
+            rows = conn.execute(
+                f"SELECT row_index, deal_id, fingerprint FROM reconcile_snapshot "
+                f"WHERE row_index IN ({', '.join('?' * len(row_indices))})",
+                row_indices,
+            ).fetchall()
+            return {row["row_index"]: (row["deal_id"], row["fingerprint"]) for row in rows}
+
+        return await self._db.run(get_sync) if row_indices else {}
+
+    async def _save_snapshots(self, snapshots: dict[int, tuple[str, str]]) -> None:
+        now = time.time()
+
+        def save_sync(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reconcile_snapshot (row_index, deal_id, fingerprint, reconciled_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(row_index, deal_id, fingerprint, now) for row_index, (deal_id, fingerprint) in snapshots.items()],
+            )
+
+        if snapshots:
+            await self._db.run(save_sync)
+
+    @background("reconcile")
+    async def run(self, lease_ttl: int | None = None) -> dict[str, int]:
+        """
+        Сверить всю таблицу.
+
+        Если передан lease_ttl, аренда сверки продлевается после каждой пачки; при потере аренды
+        сверка останавливается, чтобы не выполняться одновременно с другим воркером.
+
+        Args:
+            lease_ttl: TTL аренды сверки (сек) или None, если сверка выполняется без аренды
+
+        Returns:
+            dict[str, int]: Счетчики rows, in_sync, to_sheets, to_amocrm, conflicts, missing, errors
+        """
+        async with self._run_lock:
+            self.state.update(running=True, started_at=time.time(), finished_at=None)
+            totals: Counter[str] = Counter()
+            try:
+                row_count = await sheets_client.get_row_count()
+                for start_row in range(2, row_count + 1, settings.RECONCILE_CHUNK_SIZE):
+                    end_row = min(start_row + settings.RECONCILE_CHUNK_SIZE - 1, row_count)
+                    # Пустой диапазон (пустые строки API не возвращает) - не конец таблицы
+                    rows = await sheets_client.read_rows_from(start_row, end_row)
+                    if rows:
+                        totals.update(await self._reconcile_chunk(rows))
+                    if lease_ttl and not await sync_lock.renew_lease(RECONCILE_LEASE, self._owner, lease_ttl):
+                        logger.warning("Аренда сверки потеряна, сверка остановлена перед строкой %s", end_row + 1)
+                        break
+            finally:
+                result = {
+                    key: totals[key]
+                    for key in ("rows", "in_sync", "to_sheets", "to_amocrm", "conflicts", "missing", "errors")
+                }
+                self.state.update(running=False, finished_at=time.time(), result=result)
+
+        logger.info("Сверка таблицы и AmoCRM завершена: %s", result)
+        return result
+
+    async def _reconcile_chunk(  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+        self, rows: dict[int, dict[str, Any]]
+    ) -> Counter[str]:
+        """Сверка пачки строк."""
+        counts: Counter[str] = Counter()
+        linked = {row_index: row for row_index, row in rows.items() if _to_int(row.get("amo_deal_id"))}
+        if not linked:
+            return counts
+        counts["rows"] = len(linked)
+
+        deal_ids = {row_index: _to_int(row["amo_deal_id"]) for row_index, row in linked.items()}
+        leads = await amocrm_client.get_leads_by_ids([deal_id for deal_id in deal_ids.values() if deal_id])
+
+        contact_ids: dict[int, int | None] = {}
+        for row_index, row in linked.items():
+            lead = leads.get(deal_ids[row_index])  # type: ignore[arg-type]
+            contact_ids[row_index] = (lead or {}).get("contact_id") or _to_int(row.get("amo_contact_id"))
+        contacts = await amocrm_client.get_contacts_by_ids([cid for cid in contact_ids.values() if cid])
+        snapshots = await self._get_snapshots(list(linked))
+
+        sheet_updates: dict[int, dict[str, Any]] = {}
+        written_fingerprints: dict[int, str] = {}
+        lead_updates: list[dict[str, Any]] = []
+        contact_updates: list[dict[str, Any]] = []
+        # Строки, значения которых уходят в AmoCRM: сделка, контакт и изменения каждого из них
+        pushed: dict[int, tuple[dict[str, Any], dict[str, Any], dict[str, Any], dict[str, Any]]] = {}
+        new_snapshots: dict[int, tuple[str, str]] = {}
+
+        for row_index, row in sorted(linked.items()):
+            deal_id = deal_ids[row_index]
+            lead = leads.get(deal_id)  # type: ignore[arg-type]
+            if lead is None:
+                counts["missing"] += 1
+                logger.warning("Сделка %s из строки %s не найдена в AmoCRM", deal_id, row_index)
+                continue
+
+            contact_id = contact_ids[row_index]
+            contact = (contacts.get(contact_id) if contact_id else None) or {}
+            sheet = {field: str(row.get(field, "")).strip() for field in FIELDS}
+            amo = _amo_values(lead, contact)
+            sheet_fp, amo_fp = _fingerprint(sheet), _fingerprint(amo)
+
+            cells: dict[str, Any] = {}
+            if lead.get("status_name") and str(row.get("status", "")).strip() != lead["status_name"]:
+                cells["status"] = lead["status_name"]
+
+            result_fp = sheet_fp
+            if sheet_fp == amo_fp:
+                counts["in_sync"] += 1
+            else:
+                snapshot = snapshots.get(row_index)
+                base = snapshot[1] if snapshot and snapshot[0] == str(deal_id) else None
+                if amo_fp == base:
+                    direction = "sheets"
+                elif sheet_fp == base:
+                    direction = "amocrm"
+                else:
+                    direction = settings.RECONCILE_CONFLICT_WINNER
+                    counts["conflicts"] += 1
+
+                if direction == "amocrm":
+                    changed = {
+                        field: amo[field]
+                        for field in FIELDS
+                        if amo[field] and _normalized(field, amo[field]) != _normalized(field, sheet[field])
+                    }
+                    cells.update(changed)
+                    result_fp = _fingerprint({**sheet, **changed})
+                    counts["to_sheets"] += 1
+                else:
+                    lead_changes: dict[str, Any] = {}
+                    if sheet["name"] and sheet["name"] != str(lead.get("name") or ""):
+                        lead_changes["name"] = sheet["name"]
+                    budget = _normalized("budget", sheet["budget"])
+                    if sheet["budget"] and budget != _normalized("budget", amo["budget"]):
+                        lead_changes["price"] = int(budget)
+                    if lead_changes:
+                        lead_updates.append({"id": deal_id, **lead_changes})
+
+                    contact_changes: dict[str, Any] = {}
+                    if contact_id:
+                        if sheet["name"] and sheet["name"] != amo["name"]:
+                            contact_changes["name"] = sheet["name"]
+                        phone = _normalized("phone", sheet["phone"])
+                        email = sheet["email"]
+                        if phone and phone != _normalized("phone", amo["phone"]):
+                            contact_changes["phone"] = phone
+                        if email and _normalized("email", email) != _normalized("email", amo["email"]):
+                            contact_changes["email"] = email
+                    if contact_changes:
+                        contact_update: dict[str, Any] = {"id": contact_id}
+                        if "name" in contact_changes:
+                            contact_update["name"] = contact_changes["name"]
+                        fields = contact_fields_update(contact_changes.get("phone"), contact_changes.get("email"), contact)
+                        if fields:
+                            contact_update["custom_fields_values"] = fields
+                        contact_updates.append(contact_update)
+
+                    pushed[row_index] = (lead, contact, lead_changes, contact_changes)
+                    counts["to_amocrm"] += 1
+
+            if cells:
+                sheet_updates[row_index] = cells
+                written_fingerprints[row_index] = result_fp
+            new_snapshots[row_index] = (str(deal_id), result_fp)
+
+        leads_ok = await _push("сделок", amocrm_client.update_leads, lead_updates)
+        contacts_ok = await _push("контактов", amocrm_client.update_contacts, contact_updates)
+        for row_index, (lead, contact, lead_changes, contact_changes) in pushed.items():
+            if (leads_ok or not lead_changes) and (contacts_ok or not contact_changes):
+                continue
+            # Снимок - значения, которые теперь в AmoCRM: записанная часть не станет конфликтом при следующей сверке
+            counts["errors"] += 1
+            applied = _amo_values(
+                {**lead, **(lead_changes if leads_ok else {})}, {**contact, **(contact_changes if contacts_ok else {})}
+            )
+            new_snapshots[row_index] = (str(deal_ids[row_index]), _fingerprint(applied))
+
+        if sheet_updates:
+            try:
+                await sync_lock.remember_amocrm_writes(written_fingerprints)
+                await sheets_client.update_rows(sheet_updates)
+            except Exception as e:
+                logger.error("Не удалось записать изменения из AmoCRM в строки %s: %s", sorted(sheet_updates), e)
+                counts["errors"] += len(sheet_updates)
+                for row_index in sheet_updates:
+                    new_snapshots.pop(row_index, None)
+
+        await self._save_snapshots(new_snapshots)
+        return counts
+
+    def start(self) -> None:
+        """Запустить фоновую сверку каждые RECONCILE_INTERVAL секунд (при RECONCILE_INTERVAL > 0)."""
+        if settings.RECONCILE_INTERVAL > 0 and (self._loop_task is None or self._loop_task.done()):
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def trigger(self) -> bool:
+        """
+        Запустить сверку в фоне по запросу под арендой сверки (как и фоновую сверку).
+
+        Returns:
+            bool: False если сверка уже выполняется здесь или аренду держит другой воркер
+        """
+        if self.state["running"] or (self._run_task is not None and not self._run_task.done()):
+            return False
+        ttl = RECONCILE_MANUAL_LEASE_TTL
+        if not (
+            await sync_lock.acquire_lease(RECONCILE_LEASE, self._owner, ttl)
+            or await sync_lock.renew_lease(RECONCILE_LEASE, self._owner, ttl)
+        ):
+            logger.info("Сверка по запросу не запущена: аренду сверки держит другой воркер")
+            return False
+        self._run_task = asyncio.create_task(self.run(ttl))
+        return True
+
+    async def _loop(self) -> None:
+        """
+        Периодическая сверка.
+
+        Аренда захватывается на интервал и не снимается после сверки, поэтому за интервал
+        сверку выполняет только один воркер.
+        """
+        interval = settings.RECONCILE_INTERVAL
+        ttl = max(int(interval), 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await sync_lock.acquire_lease(RECONCILE_LEASE, self._owner, ttl):
+                    await self.run(ttl)
+            except Exception as e:
+                logger.error("Ошибка фоновой сверки: %s", e, exc_info=True)
+
+    async def stop(self) -> None:
+        """Остановить фоновую сверку."""
+        for task in (self._loop_task, self._run_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._loop_task = None
+        self._run_task = None
+        self._db.close()
+
+
+reconciler = Reconciler()
@@ -1,15 +1,23 @@
 import asyncio
 import logging
+import time
 from typing import Any
 
 from fastapi import HTTPException, status
 
-from app.core.amocrm_client import amocrm_client
+from app.core.amocrm_client import amocrm_client, contact_fields_update
+from app.core.concurrency import ExecutorSaturated
+from app.core.executors import check_capacity
+from app.core.mapping_store import mapping_store
+from app.core.metrics import WEBHOOK_SKIPPED, observe_webhook
+from app.core.outbox import sheets_outbox
 from app.core.settings import settings
 from app.core.sheets_client import sheets_client
-from app.core.sync_lock import sync_lock
-from app.core.utils import make_external_id, normalize_phone
-from app.models.webhook_row import WebhookRow
+from app.core.sync_lock import CREATION_BUSY, CREATION_ECHO, sync_lock
+from app.core.tracing import span, traced
+from app.core.utils import make_external_id, make_external_ids, normalize_phone, normalize_phones, sync_fingerprint
+from app.models.webhook_row import WebhookBatch, WebhookRow
+from app.services.import_service import PendingRow, group_pending_rows, import_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -21,15 +29,23 @@ async def process_webhook_sheets(
     """Обработка вебхука от Google Sheets с валидацией и обработкой ошибок."""
     if x_webhook_secret != settings.WEBHOOK_SECRET:
         raise HTTPException(status_code=403, detail="Invalid webhook secret")
+    check_capacity()
 
+    started = time.perf_counter()
     row_index = payload.row_index
     lead_data = payload.data
     phone = normalize_phone(lead_data.phone)
-    external_id = make_external_id(phone, lead_data.email)
+    external_id = make_external_id(phone, lead_data.email, lead_data.name, sheets_client.sheet_key, row_index)
 
     try:
-        return await _process_webhook_sheets_internal(payload, row_index, phone, external_id)
+        result = await _process_webhook_sheets_internal(payload, row_index, phone, external_id)
+        observe_webhook("sheets", started, result)
+        return result
+    except ExecutorSaturated:
+        observe_webhook("sheets", started, None)
+        raise
     except Exception as e:
+        observe_webhook("sheets", started, None)
         error_msg = str(e)[:50]
         logger.error(
             "Ошибка обработки webhook: row=%s, external_id=%s, error=%s",
@@ -49,6 +65,297 @@ async def process_webhook_sheets(
         ) from e
 
 
+async def process_webhook_sheets_batch(payload: WebhookBatch, x_webhook_secret: str) -> dict[str, Any]:
+    """Обработка пакетного вебхука от Google Sheets (все строки отредактированного диапазона)."""
+    if x_webhook_secret != settings.WEBHOOK_SECRET:
+        raise HTTPException(status_code=403, detail="Invalid webhook secret")
+    check_capacity()
+
+    started = time.perf_counter()
+    try:
+        results = await process_sheet_rows(payload.rows)
+    except ExecutorSaturated:
+        observe_webhook("sheets_batch", started, None)
+        raise
+    except Exception as e:
+        observe_webhook("sheets_batch", started, None)
+        error_msg = str(e)[:50]
+        logger.error("Ошибка обработки пакетного webhook: rows=%s, error=%s", len(payload.rows), error_msg, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_msg) from e
+
+    for result in results.values():
+        if result.get("skipped"):
+            WEBHOOK_SKIPPED.inc(source="sheets_batch", reason=result["skipped"])
+    observe_webhook("sheets_batch", started, None, _batch_outcome(results))
+    return {
+        "success": all(result.get("success") for result in results.values()),
+        "results": [results[row_index] for row_index in sorted(results)],
+    }
+
+
+def _batch_outcome(results: dict[int, dict[str, Any]]) -> str:
+    """Исход пакетного вебхука по строкам: error - ошибка хотя бы в одной строке, skipped - все строки пропущены."""
+    if any(result.get("error") for result in results.values()):
+        return "error"
+    if results and all(result.get("skipped") for result in results.values()):
+        return "skipped"
+    return "ok"
+
+
+def _int_or_none(value: Any) -> int | None:
+    text = str(value).strip() if value is not None else ""
+    return int(text) if text.isdigit() else None
+
+
+@traced()
+async def _read_rows_ids(external_ids: dict[int, str]) -> dict[int, tuple[int | None, int | None]]:
+    """
+    Получение amo_deal_id и amo_contact_id нескольких строк.
+
+    Как и _read_row_ids: сначала outbox, затем локальная связка, а оставшиеся строки
+    читаются из таблицы одним запросом batch_get.
+
+    Args:
+        external_ids: Словарь {номер_строки: external_id}
+
+    Returns:
+        dict[int, tuple[int | None, int | None]]: {номер_строки: (lead_id, contact_id)}
+    """
+    pending = await sheets_outbox.pending_rows()
+    result: dict[int, tuple[int | None, int | None]] = {}
+    unresolved = []
+    for row_index, external_id in external_ids.items():
+        pending_row = pending.get(row_index)
+        if pending_row and _int_or_none(pending_row.get("amo_deal_id")):
+            result[row_index] = (_int_or_none(pending_row["amo_deal_id"]), _int_or_none(pending_row.get("amo_contact_id")))
+            continue
+        known = await mapping_store.get_row(row_index)
+        if known and known["amo_deal_id"] and known["external_id"] == external_id:
+            result[row_index] = (_int_or_none(known["amo_deal_id"]), _int_or_none(known["amo_contact_id"]))
+            continue
+        unresolved.append(row_index)
+
+    current_rows = await sheets_client.read_rows_at(unresolved)
+    for row_index in unresolved:
+        current_row = current_rows.get(row_index, {})
+        result[row_index] = (_int_or_none(current_row.get("amo_deal_id")), _int_or_none(current_row.get("amo_contact_id")))
+    return result
+
+
+async def process_sheet_rows(  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    payloads: list[WebhookRow],
+) -> dict[int, dict[str, Any]]:
+    """
+    Пакетная обработка строк таблицы (пакетный вебхук, опрос изменений).
+
+    Вместо вызовов API на каждую строку:
+    - эхо записи из AmoCRM и блокировки создания проверяются для всех строк одним запросом к Redis;
+    - ID сделок и контактов берутся из outbox/локальной связки, остальные строки читаются одним batch_get;
+    - строки без контакта группируются по телефону/email (group_pending_rows), контакт ищется
+      или создается один раз на группу;
+    - существующие контакты и сделки обновляются PATCH-пакетами, новые сделки создаются POST-пакетами;
+    - статусы получаются одним запросом, а результат пишется в таблицу одним batch_update через outbox.
+
+    Args:
+        payloads: Строки к обработке (для повторяющихся номеров строк берется последняя)
+
+    Returns:
+        dict[int, dict[str, Any]]: Результат по каждой строке {номер_строки: результат}
+    """
+    rows = {payload.row_index: payload.data for payload in payloads}
+    row_indices = sorted(rows)
+    phones = normalize_phones([rows[row_index].phone for row_index in row_indices])
+    emails = [rows[row_index].email for row_index in row_indices]
+    names = [rows[row_index].name for row_index in row_indices]
+    external_ids = dict(
+        zip(row_indices, make_external_ids(phones, emails, names, sheets_client.sheet_key, row_indices))
+    )
+    phone_by_row = dict(zip(row_indices, phones))
+
+    results: dict[int, dict[str, Any]] = {}
+    fingerprints = {
+        row_index: sync_fingerprint(lead.name, lead.phone, lead.email, lead.budget) for row_index, lead in rows.items()
+    }
+    for row_index in await sync_lock.find_amocrm_echoes(fingerprints):
+        results[row_index] = {"success": True, "skipped": "sync_lock_active", "row_index": row_index}
+
+    active = {row_index: external_ids[row_index] for row_index in row_indices if row_index not in results}
+    row_ids = await _read_rows_ids(active)
+
+    new_rows = [row_index for row_index in active if not row_ids[row_index][0]]
+    locked = await sync_lock.acquire_creation_locks(new_rows)
+    for row_index in new_rows:
+        if row_index not in locked:
+            logger.info("Сделка для строки %s уже создаётся, пропускаем", row_index)
+            results[row_index] = {"success": False, "skipped": "lead_creating", "row_index": row_index}
+
+    errors: dict[int, str] = {}
+    try:
+        # Контакты: существующие обновляются пакетно, остальные ищутся/создаются по группам строк
+        contact_ids: dict[int, int] = {}
+        contact_updates: dict[int, dict[str, Any]] = {}
+        without_contact: list[PendingRow] = []
+        # Текущие телефоны и email контактов: запись сохраняет остальные значения полей
+        linked_contacts = {
+            row_index: row_ids[row_index][1] for row_index in active if row_index not in results and row_ids[row_index][1]
+        }
+        current_contacts: dict[int, dict[str, Any]] = {}
+        if linked_contacts:
+            try:
+                async with import_limiter.slot():
+                    current_contacts = await amocrm_client.get_contacts_by_ids(list(linked_contacts.values()))
+            except Exception as e:
+                errors.update({row_index: str(e)[:50] for row_index in linked_contacts})
+        for row_index in active:
+            if row_index in results or row_index in errors:
+                continue
+            lead = rows[row_index]
+            contact_id = row_ids[row_index][1]
+            if contact_id:
+                contact_ids[row_index] = contact_id
+                update: dict[str, Any] = {"id": contact_id}
+                if lead.name:
+                    update["name"] = lead.name
+                fields = contact_fields_update(phone_by_row[row_index], lead.email, current_contacts.get(contact_id))
+                if fields:
+                    update["custom_fields_values"] = fields
+                contact_updates[contact_id] = update
+            else:
+                without_contact.append(
+                    (row_index, lead.name, phone_by_row[row_index], lead.email or "", lead.budget, active[row_index])
+                )
+
+        async def resolve_group(group: list[PendingRow]) -> None:
+            _, name, phone, email, _, _ = max(group, key=lambda item: sum(1 for value in item[2:4] if value))
+            try:
+                async with import_limiter.slot():
+                    contact_id = await amocrm_client.upsert_contact(name=name, phone=phone, email=email or None)
+            except Exception as e:
+                errors.update({item[0]: str(e)[:50] for item in group})
+                return
+            contact_ids.update({item[0]: contact_id for item in group})
+
+        groups = group_pending_rows(without_contact)
+        if len(groups) < len(without_contact):
+            logger.info("Строки пакета сгруппированы по контактам: %s групп на %s строк", len(groups), len(without_contact))
+        with span("resolve_contacts", groups=len(groups), rows=len(without_contact)):
+            await asyncio.gather(*(resolve_group(group) for group in groups))
+
+        if contact_updates:
+            try:
+                async with import_limiter.slot():
+                    await amocrm_client.update_contacts(list(contact_updates.values()))
+            except Exception as e:
+                updated_contacts = set(contact_updates)
+                errors.update(
+                    {row_index: str(e)[:50] for row_index, cid in contact_ids.items() if cid in updated_contacts}
+                )
+
+        # Сделки: существующие обновляются PATCH-пакетами, новые создаются POST-пакетами
+        lead_ids: dict[int, int] = {}
+        lead_updates: list[dict[str, Any]] = []
+        to_create: list[int] = []
+        for row_index in active:
+            if row_index in results or row_index in errors or row_index not in contact_ids:
+                continue
+            lead = rows[row_index]
+            existing_lead_id = row_ids[row_index][0]
+            if existing_lead_id:
+                lead_ids[row_index] = existing_lead_id
+                lead_update: dict[str, Any] = {"id": existing_lead_id}
+                if lead.name:
+                    lead_update["name"] = lead.name
+                if lead.budget:
+                    lead_update["price"] = int(lead.budget)
+                if len(lead_update) > 1:
+                    lead_updates.append(lead_update)
+            else:
+                to_create.append(row_index)
+
+        if lead_updates:
+            try:
+                async with import_limiter.slot():
+                    await amocrm_client.update_leads(lead_updates)
+            except Exception as e:
+                updated_leads = {update["id"] for update in lead_updates}
+                errors.update({row_index: str(e)[:50] for row_index, lid in lead_ids.items() if lid in updated_leads})
+
+        if to_create:
+            new_leads = [
+                {"name": rows[row_index].name, "price": rows[row_index].budget, "contact_id": contact_ids[row_index]}
+                for row_index in to_create
+            ]
+            try:
+                async with import_limiter.slot():
+                    created = await amocrm_client.create_leads(new_leads)
+                lead_ids.update(zip(to_create, created))
+            except Exception as e:
+                errors.update({row_index: str(e)[:50] for row_index in to_create})
+
+        # Статусы одним запросом и одна запись в таблицу
+        done = {row_index: lead_id for row_index, lead_id in lead_ids.items() if row_index not in errors}
+        leads_info = await amocrm_client.get_leads_by_ids(sorted(set(done.values()))) if done else {}
+        write_back: dict[int, dict[str, Any]] = {}
+        for row_index, lead_id in done.items():
+            status = (leads_info.get(lead_id) or {}).get("status_name") or "created"
+            write_back[row_index] = {
+                "amo_deal_id": str(lead_id),
+                "amo_contact_id": str(contact_ids[row_index]),
+                "amo_link": amocrm_client.lead_link(lead_id),
+                "status": status,
+                "external_id": external_ids[row_index],
+            }
+            results[row_index] = {"success": True, "lead_id": lead_id, "contact_id": contact_ids[row_index]}
+
+        for row_index, error_msg in errors.items():
+            logger.error("Ошибка обработки строки %s, external_id=%s: %s", row_index, external_ids[row_index], error_msg)
+            write_back[row_index] = {"status": f"error:{error_msg}"}
+            results[row_index] = {"success": False, "error": error_msg, "row_index": row_index}
+
+        await sheets_outbox.write_many(write_back)
+
+    finally:
+        if locked:
+            await sync_lock.release_creation_locks(locked)
+
+    logger.info(
+        "Обработан пакет из %s строк: успешно=%s, ошибок=%s",
+        len(rows),
+        sum(1 for result in results.values() if result.get("success")),
+        len(errors),
+    )
+    return results
+
+
+@traced()
+async def _read_row_ids(row_index: int, external_id: str) -> tuple[int | None, int | None]:
+    """
+    Получение amo_deal_id и amo_contact_id строки.
+
+    Сначала проверяется outbox (значения, еще не записанные в таблицу), затем локальная связка строк
+    (если external_id строки не изменился), и только потом сама таблица.
+    """
+    pending = await sheets_outbox.get_pending(row_index)
+    if pending and str(pending.get("amo_deal_id", "")).strip():
+        logger.info("Найден lead_id=%s для строки %s в outbox", pending["amo_deal_id"], row_index)
+        contact_id = str(pending.get("amo_contact_id", "")).strip()
+        return int(pending["amo_deal_id"]), int(contact_id) if contact_id else None
+
+    known = await mapping_store.get_row(row_index)
+    if known and known["amo_deal_id"] and known["external_id"] == external_id:
+        logger.info("Найден lead_id=%s для строки %s в локальной связке", known["amo_deal_id"], row_index)
+        contact_id = known["amo_contact_id"]
+        return int(known["amo_deal_id"]), int(contact_id) if contact_id else None
+
+    current_row = (await sheets_client.read_rows_at([row_index])).get(row_index)
+    if not current_row:
+        return None, None
+
+    lead_id = str(current_row.get("amo_deal_id", "")).strip()
+    contact_id = str(current_row.get("amo_contact_id", "")).strip()
+    return int(lead_id) if lead_id else None, int(contact_id) if contact_id else None
+
+
 async def _process_webhook_sheets_internal(  # pylint: disable=too-many-locals,too-many-statements
     payload: WebhookRow,
     row_index: int,
@@ -57,10 +364,12 @@ async def _process_webhook_sheets_internal(  # pylint: disable=too-many-locals,t
 ) -> dict[str, Any]:
     """Внутренняя обработка вебхука от Google Sheets."""
     lead_data = payload.data
+    fingerprint = sync_fingerprint(lead_data.name, lead_data.phone, lead_data.email, lead_data.budget)
 
-    if await sync_lock.check_amocrm_to_sheets_lock(row_index):
+    is_echo, creation_locked = await sync_lock.check_row_locks(row_index, fingerprint)
+    if is_echo:
         logger.info(
-            "Пропускаем обработку строки %s - недавно обновлено из AmoCRM (защита от цикла)",
+            "Пропускаем обработку строки %s - данные совпадают с записанными из AmoCRM (защита от цикла)",
             row_index,
         )
         return {"success": True, "skipped": "sync_lock_active", "row_index": row_index}
@@ -68,53 +377,43 @@ async def _process_webhook_sheets_internal(  # pylint: disable=too-many-locals,t
     existing_lead_id = None
     existing_contact_id = None
     try:
-        rows = await sheets_client.read_all_rows()
-        current_row = rows[row_index - 2] if row_index - 2 < len(rows) else None
-        if current_row:
-            if str(current_row.get("amo_deal_id", "")).strip():
-                existing_lead_id = int(current_row["amo_deal_id"])
-                logger.info("Найден существующий lead_id=%s в строке %s", existing_lead_id, row_index)
-            if str(current_row.get("amo_contact_id", "")).strip():
-                existing_contact_id = int(current_row["amo_contact_id"])
-                logger.info("Найден существующий contact_id=%s в строке %s", existing_contact_id, row_index)
+        existing_lead_id, existing_contact_id = await _read_row_ids(row_index, external_id)
+        if existing_lead_id:
+            logger.info("Найден существующий lead_id=%s в строке %s", existing_lead_id, row_index)
+        if existing_contact_id:
+            logger.info("Найден существующий contact_id=%s в строке %s", existing_contact_id, row_index)
     except Exception as e:
         logger.warning("Не удалось прочитать строку %s: %s", row_index, e)
 
-    client = await sync_lock._get_client()  # pylint: disable=protected-access
-    lock_key = f"creating_lead:{row_index}"
     locked_by_me = False
 
     if not existing_lead_id:
-        if client:
-            is_locked = await client.exists(lock_key)
-
-            if is_locked:  # pylint: disable=too-many-nested-blocks
-                logger.info("Сделка для строки %s создается, ожидаем запись amo_deal_id в таблицу (3 сек)", row_index)
+        if creation_locked:
+            logger.info("Сделка для строки %s создается, ожидаем запись amo_deal_id в таблицу (3 сек)", row_index)
+            with span("wait_lead_creation", seconds=3):
                 await asyncio.sleep(3)
 
-                try:
-                    rows = await sheets_client.read_all_rows()
-                    current_row = rows[row_index - 2] if row_index - 2 < len(rows) else None
-                    if current_row and str(current_row.get("amo_deal_id", "")).strip():
-                        existing_lead_id = int(current_row["amo_deal_id"])
-                        logger.info("После ожидания найден amo_deal_id=%s, продолжаем обновление", existing_lead_id)
-                        if str(current_row.get("amo_contact_id", "")).strip():
-                            existing_contact_id = int(current_row["amo_contact_id"])
-                    else:
-                        logger.info("После ожидания amo_deal_id не найден, пропускаем webhook")
-                        return {"success": False, "skipped": "lead_still_creating", "row_index": row_index}
-                except Exception as e:
-                    logger.warning("Не удалось перечитать строку %s после ожидания: %s", row_index, e)
-                    return {"success": False, "skipped": "read_error_after_wait", "row_index": row_index}
-
-            if not existing_lead_id:
-                locked_by_me = await client.set(lock_key, "1", ex=10, nx=True)
-
-                if not locked_by_me:
-                    logger.info("Сделка для строки %s уже создаётся, пропускаем webhook", row_index)
-                    return {"success": False, "skipped": "lead_creating", "row_index": row_index}
-
-                logger.info("Установлена блокировка создания для строки %s", row_index)
+            try:
+                existing_lead_id, existing_contact_id = await _read_row_ids(row_index, external_id)
+                if existing_lead_id:
+                    logger.info("После ожидания найден amo_deal_id=%s, продолжаем обновление", existing_lead_id)
+                else:
+                    logger.info("После ожидания amo_deal_id не найден, пропускаем webhook")
+                    return {"success": False, "skipped": "lead_still_creating", "row_index": row_index}
+            except Exception as e:
+                logger.warning("Не удалось перечитать строку %s после ожидания: %s", row_index, e)
+                return {"success": False, "skipped": "read_error_after_wait", "row_index": row_index}
+
+        if not existing_lead_id:
+            creation_state = await sync_lock.check_echo_and_acquire_creation_lock(row_index, fingerprint)
+
+            if creation_state == CREATION_ECHO:
+                return {"success": True, "skipped": "sync_lock_active", "row_index": row_index}
+            if creation_state == CREATION_BUSY:
+                logger.info("Сделка для строки %s уже создаётся, пропускаем webhook", row_index)
+                return {"success": False, "skipped": "lead_creating", "row_index": row_index}
+
+            locked_by_me = True
 
     if existing_lead_id:
         logger.info("Сделка существует (id=%s), обновляем БЕЗ блокировки", existing_lead_id)
@@ -177,9 +476,9 @@ async def _process_webhook_sheets_internal(  # pylint: disable=too-many-locals,t
         lead_info = await amocrm_client.get_lead_info(lead_id)
         status = lead_info.get("status_name", "created") if lead_info else "created"
 
-        await sheets_client.update_cells(
-            row_index=row_index,
-            mapping={
+        await sheets_outbox.write(
+            row_index,
+            {
                 "amo_deal_id": str(lead_id),
                 "amo_contact_id": str(contact_id),
                 "amo_link": lead_link,
@@ -198,9 +497,5 @@ async def _process_webhook_sheets_internal(  # pylint: disable=too-many-locals,t
         return {"success": True, "lead_id": lead_id, "contact_id": contact_id}
 
     finally:
-        if locked_by_me and client:
-            try:
-                await client.delete(lock_key)
-                logger.debug("Снята блокировка создания для строки %s", row_index)
-            except Exception as e:
-                logger.warning("Не удалось снять блокировку строки %s: %s", row_index, e)
+        if locked_by_me:
+            await sync_lock.release_creation_locks([row_index])
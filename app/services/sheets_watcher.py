@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import uuid
+from typing import Any
+
+from app.core.concurrency import background
+from app.core.local_db import LocalDB
+from app.core.settings import settings
+from app.core.sheets_client import sheets_client
+from app.core.sync_lock import sync_lock
+from app.core.utils import sync_fingerprint
+from app.models.webhook_row import SheetLead, WebhookRow
+from app.services.sheets_service import process_sheet_rows
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_snapshot (
+    row_index INTEGER PRIMARY KEY,
+    row_hash TEXT NOT NULL
+);
+"""
+
+SHEETS_WATCH_LEASE = "sheets_watch"
+
+
+def _row_hash(row: dict[str, Any]) -> str:
+    """Хэш синхронизируемых полей строки (служебные колонки amo_* и status не учитываются)."""
+    return sync_fingerprint(row.get("name"), row.get("phone"), row.get("email"), row.get("budget"))
+
+
+def _row_payload(row_index: int, row: dict[str, Any]) -> WebhookRow | None:
+    """Строка таблицы в формате вебхука Apps Script; None для пустой строки."""
+    name = str(row.get("name", "")).strip()
+    phone = str(row.get("phone", "")).strip()
+    email = str(row.get("email", "")).strip()
+    if not name and not phone and not email:
+        return None
+
+    budget_raw = str(row.get("budget", "")).strip()
+    try:
+        budget = float(budget_raw) if budget_raw else 0
+    except ValueError:
+        budget = 0
+
+    return WebhookRow(row_index=row_index, data=SheetLead(name=name, phone=phone, email=email, budget=budget))
+
+
+class SheetsChangeDetector:
+    """
+    Обнаружение изменений таблицы опросом - альтернатива вебхукам Apps Script.
+
+    Таблица читается диапазонами по SHEETS_POLL_CHUNK_SIZE строк до числа строк листа (пустые диапазоны
+    не останавливают проход), хэши строк сравниваются со снимком
+    прошлого прохода (sheets_watch.sqlite3), и только измененные строки передаются пачкой
+    в process_sheet_rows. Вставка сразу многих строк обрабатывается за один проход.
+
+    Первый проход только сохраняет снимок: существующие строки импортирует автоимпорт.
+    Строки, которые не удалось обработать, остаются со старым хэшем и повторяются в следующем проходе.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация детектора."""
+        self._db = LocalDB("sheets_watch.sqlite3", _SCHEMA)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._scan_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+
+    async def _has_snapshot(self) -> bool:
+        def has_sync(conn: sqlite3.Connection) -> bool:
+            return conn.execute("SELECT 1 FROM sheet_snapshot LIMIT 1").fetchone() is not None
+
+        return await self._db.run(has_sync)
+
+    async def _get_hashes(self, start_row: int, end_row: int) -> dict[int, str]:
+        def get_sync(conn: sqlite3.Connection) -> dict[int, str]:
+            rows = conn.execute(
+                "SELECT row_index, row_hash FROM sheet_snapshot WHERE row_index BETWEEN ? AND ?",
+                (start_row, end_row),
+            ).fetchall()
+            return {row["row_index"]: row["row_hash"] for row in rows}
+
+        return await self._db.run(get_sync)
+
+    async def _save_hashes(self, hashes: dict[int, str]) -> None:
+        def save_sync(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sheet_snapshot (row_index, row_hash) VALUES (?, ?)",
+                list(hashes.items()),
+            )
+
+        if hashes:
+            await self._db.run(save_sync)
+
+    async def _forget_missing(self, start_row: int, end_row: int, rows: dict[int, Any]) -> None:
+        """Удалить из снимка строки диапазона, которых нет в ответе (пустые строки в конце диапазона)."""
+        missing = [(row_index,) for row_index in range(start_row, end_row + 1) if row_index not in rows]
+
+        def forget_sync(conn: sqlite3.Connection) -> None:
+            conn.executemany("DELETE FROM sheet_snapshot WHERE row_index = ?", missing)
+
+        if missing:
+            await self._db.run(forget_sync)
+
+    async def _forget_from(self, start_row: int) -> None:
+        """Удалить из снимка строки начиная с start_row (таблица стала короче)."""
+
+        def forget_sync(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM sheet_snapshot WHERE row_index >= ?", (start_row,))
+
+        await self._db.run(forget_sync)
+
+    @background("poll")
+    async def scan(self) -> dict[str, int]:
+        """
+        Один проход по таблице.
+
+        Returns:
+            dict[str, int]: Счетчики rows (прочитано), changed (передано в обработку), errors
+        """
+        async with self._scan_lock:
+            baseline = not await self._has_snapshot()
+            rows_total = changed_total = errors = 0
+            row_count = await sheets_client.get_row_count()
+            for start_row in range(2, row_count + 1, settings.SHEETS_POLL_CHUNK_SIZE):
+                end_row = min(start_row + settings.SHEETS_POLL_CHUNK_SIZE - 1, row_count)
+                rows = await sheets_client.read_rows_from(start_row, end_row)
+                # Пустые строки в конце диапазона API не возвращает: это не конец таблицы
+                await self._forget_missing(start_row, end_row, rows)
+                if not rows:
+                    continue
+                rows_total += len(rows)
+
+                snapshot = await self._get_hashes(start_row, end_row)
+                hashes = {row_index: _row_hash(row) for row_index, row in rows.items()}
+                changed = {row_index: value for row_index, value in hashes.items() if snapshot.get(row_index) != value}
+
+                payloads = [_row_payload(row_index, rows[row_index]) for row_index in sorted(changed)]
+                batch = [payload for payload in payloads if payload is not None and not baseline]
+                if batch:
+                    logger.info("Обнаружены изменения строк %s", [payload.row_index for payload in batch])
+                    results = await process_sheet_rows(batch)
+                    for row_index, result in results.items():
+                        if not result.get("success"):
+                            # Хэш не сохраняется - строка повторится в следующем проходе
+                            changed.pop(row_index, None)
+                            errors += 1
+                    changed_total += len(batch)
+
+                await self._save_hashes(changed)
+
+            await self._forget_from(max(row_count + 1, 2))
+
+        result = {"rows": rows_total, "changed": changed_total, "errors": errors}
+        if baseline:
+            logger.info("Сохранен начальный снимок таблицы: %s строк", rows_total)
+        elif changed_total:
+            logger.info("Проход по таблице завершен: %s", result)
+        return result
+
+    async def _loop(self) -> None:
+        """Периодический опрос на одном воркере (аренда на интервал не снимается)."""
+        interval = settings.SHEETS_POLL_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await sync_lock.acquire_lease(SHEETS_WATCH_LEASE, self._owner, max(int(interval), 1)):
+                    await self.scan()
+            except Exception as e:
+                logger.error("Ошибка опроса изменений таблицы: %s", e, exc_info=True)
+
+    def start(self) -> None:
+        """Запустить опрос каждые SHEETS_POLL_INTERVAL секунд (при SHEETS_POLL_INTERVAL > 0)."""
+        if settings.SHEETS_POLL_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить опрос."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._db.close()
+
+
+sheets_watcher = SheetsChangeDetector()
@@ -0,0 +1,84 @@
+"""
+Микробенчмарк нормализации строк при импорте.
+
+Сравнивает построчную нормализацию (normalize_phone + make_external_id для каждой строки)
+с пакетной (normalize_phones + make_external_ids по колонкам).
+
+Запуск:
+    python -m benchmarks.bench_normalization [--rows 100000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+from typing import Callable
+
+from app.core.utils import make_external_id, make_external_ids, normalize_phone, normalize_phones
+
+SHEET_KEY = "benchmark/Лист1"
+
+_PHONE_FORMATS = [
+    "8{}",
+    "+7{}",
+    "+7 ({}{}{}) {}{}{}-{}{}-{}{}",
+    "8 {}{}{} {}{}{} {}{} {}{}",
+    "{}",
+]
+
+
+def make_rows(count: int, seed: int = 42) -> tuple[list[str], list[str], list[str], list[int]]:
+    """Синтетические колонки name/phone/email: часть строк без контактов, часть - с повторами."""
+    rnd = random.Random(seed)
+    names, phones, emails = [], [], []
+    for i in range(count):
+        digits = f"9{rnd.randrange(10**9):09d}"
+        fmt = rnd.choice(_PHONE_FORMATS)
+        phone = fmt.format(*digits) if fmt.count("{}") == 10 else fmt.format(digits)
+        kind = rnd.random()
+        names.append(f"Клиент {i}")
+        phones.append("" if kind < 0.1 else phone)
+        emails.append("" if kind < 0.2 or kind > 0.8 else f"User{i % (count // 2 or 1)}@Example.com ")
+    return names, phones, emails, list(range(2, count + 2))
+
+
+def per_row(names: list[str], phones: list[str], emails: list[str], rows: list[int]) -> list[str]:
+    """Построчная нормализация."""
+    result = []
+    for name, phone_raw, email, row_index in zip(names, phones, emails, rows):
+        phone = normalize_phone(phone_raw)
+        result.append(make_external_id(phone, email, name, SHEET_KEY, row_index))
+    return result
+
+
+def bulk(names: list[str], phones: list[str], emails: list[str], rows: list[int]) -> list[str]:
+    """Пакетная нормализация по колонкам."""
+    return make_external_ids(normalize_phones(phones), emails, names, SHEET_KEY, rows)
+
+
+def measure(func: Callable[..., list[str]], columns: tuple[list[str], list[str], list[str], list[int]], repeat: int) -> float:
+    """Лучшее время из repeat запусков (сек)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*columns)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    columns = make_rows(args.rows)
+    assert per_row(*columns) == bulk(*columns), "Пакетная нормализация расходится с построчной"
+
+    for label, func in (("per-row", per_row), ("bulk", bulk)):
+        elapsed = measure(func, columns, args.repeat)
+        print(f"{label:8} {args.rows} строк: {elapsed * 1000:8.1f} мс, {args.rows / elapsed:12,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Локальные заглушки AmoCRM API v4 и Google Sheets API v4 для нагрузочного теста.
+
+Заглушки подключаются как транспортные адаптеры requests к сессиям amocrm.v2 и gspread: клиенты
+приложения работают без изменений, а запросы обрабатываются в памяти процесса с настраиваемой
+задержкой, долей ответов 429 и размером аккаунта и таблицы. Задержка выдерживается в потоке пула,
+выполняющего вызов, как у настоящего сетевого запроса.
+"""
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from gspread.utils import a1_range_to_grid_range
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+
+# Сценарий нагрузки, к которому относятся вызовы API (фоновые задачи приложения - background)
+current_scenario: ContextVar[str] = ContextVar("current_scenario", default="background")
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+Params = dict[str, list[str]]
+
+
+class FakeService(BaseAdapter):  # type: ignore[misc]
+    """Заглушка внешнего API: задержка, отказы 429 и подсчет вызовов по сценариям нагрузки."""
+
+    name = ""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0, seed: int = 42) -> None:
+        """
+        Инициализация заглушки.
+
+        Args:
+            latency: Задержка ответа (сек)
+            jitter: Разброс задержки (доля от latency)
+            rate_limit: Доля запросов, получающих 429
+            seed: Зерно генератора задержек и отказов
+        """
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.calls: Counter[tuple[str, str]] = Counter()
+        self.rejected: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        """Обработка запроса клиента (вызывается requests вместо сетевого адаптера)."""
+        url = urlsplit(request.url)
+        path = unquote(url.path)
+        params = parse_qs(url.query, keep_blank_values=True)
+        body = json.loads(request.body) if request.body else None
+        scenario = current_scenario.get()
+
+        with self._lock:
+            self.calls[(scenario, self.endpoint(request.method or "GET", path))] += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            limited = self._random.random() < self.rate_limit
+        if delay > 0:
+            time.sleep(delay)
+        if limited:
+            with self._lock:
+                self.rejected[scenario] += 1
+            return self._response(request, 429, self.rate_limited())
+
+        with self._lock:
+            status, payload = self.handle(request.method or "GET", path, params, body)
+        return self._response(request, status, payload)
+
+    def close(self) -> None:
+        """Соединений нет - закрывать нечего."""
+
+    def endpoint(self, method: str, path: str) -> str:
+        """Имя эндпоинта для подсчета вызовов (ID в пути заменяются на {id})."""
+        return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+    def rate_limited(self) -> Any:
+        """Тело ответа 429."""
+        return {"status": 429, "title": "Too Many Requests"}
+
+    def handle(self, method: str, path: str, params: Params, body: Any) -> tuple[int, Any]:
+        """
+        Ответ на запрос (выполняется под блокировкой состояния заглушки).
+
+        Returns:
+            tuple[int, Any]: HTTP-статус и тело ответа (None - без тела)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _response(request: PreparedRequest, status: int, payload: Any) -> Response:
+        response = Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response.request = request
+        response.url = request.url or ""
+        response.encoding = "utf-8"
+        response._content = b"" if payload is None else json.dumps(payload).encode()  # pylint: disable=protected-access
+        if payload is not None:
+            response.headers["Content-Type"] = "application/json"
+        return response
+
+
+CONTACT_CUSTOM_FIELDS = [
+    {"id": 1, "name": "Телефон", "code": "PHONE", "type": "multitext", "sort": 1},
+    {"id": 2, "name": "Email", "code": "EMAIL", "type": "multitext", "sort": 2},
+]
+_FIELD_NAMES = {field["code"]: field["name"] for field in CONTACT_CUSTOM_FIELDS}
+
+
+class FakeAmoCRM(FakeService):
+    """
+    Заглушка AmoCRM API v4: сделки, контакты, воронки и кастомные поля контактов.
+
+    Поддерживаются запросы, которые выполняют amocrm.v2 и AmoCRMClient: списки с пагинацией,
+    фильтрами filter[id][] и filter[updated_at], поиском query и сортировкой order[...],
+    получение по ID, пакетное создание и обновление (POST/PATCH) и привязка контактов к сделкам.
+    """
+
+    name = "amocrm"
+
+    def __init__(self, pipeline_id: int, status_id: int, **kwargs: Any) -> None:
+        """
+        Инициализация пустого аккаунта с одной воронкой.
+
+        Args:
+            pipeline_id: ID воронки
+            status_id: ID этапа новых сделок
+            **kwargs: Параметры FakeService
+        """
+        super().__init__(**kwargs)
+        statuses = [
+            {"id": status_id, "name": "Новая заявка", "sort": 10, "pipeline_id": pipeline_id},
+            {"id": status_id + 1, "name": "В работе", "sort": 20, "pipeline_id": pipeline_id},
+            {"id": status_id + 2, "name": "Успешно реализовано", "sort": 30, "pipeline_id": pipeline_id},
+        ]
+        self.pipelines = {
+            pipeline_id: {"id": pipeline_id, "name": "Воронка", "sort": 1, "is_main": True, "_embedded": {"statuses": statuses}}
+        }
+        self.pipeline_id = pipeline_id
+        self.status_id = status_id
+        self.leads: dict[int, dict[str, Any]] = {}
+        self.contacts: dict[int, dict[str, Any]] = {}
+        self._search: dict[str, set[int]] = {}
+        self._ids = itertools.count(1_000_001)
+        self._clock = int(time.time())
+
+    def _tick(self) -> int:
+        """Монотонное время изменения (updated_at у последовательных изменений различается)."""
+        self._clock = max(self._clock + 1, int(time.time()))
+        return self._clock
+
+    def add_contact(self, name: str, phone: str | None, email: str | None) -> int:
+        """Добавить контакт в аккаунт (наполнение перед тестом)."""
+        fields = [
+            {"field_code": code, "values": [{"value": value, "enum_code": "WORK"}]}
+            for code, value in (("PHONE", phone), ("EMAIL", email))
+            if value
+        ]
+        with self._lock:
+            return int(self._create("contacts", {"name": name, "custom_fields_values": fields})["id"])
+
+    def add_lead(self, name: str, price: int, contact_id: int | None, lead_id: int | None = None) -> int:
+        """Добавить сделку в аккаунт (наполнение перед тестом); lead_id - ID сделки из записанного вебхука."""
+        data: dict[str, Any] = {"name": name, "price": price}
+        if contact_id:
+            data["_embedded"] = {"contacts": [{"id": contact_id}]}
+        with self._lock:
+            return int(self._create("leads", data, lead_id)["id"])
+
+    def touch_lead(self, lead_id: int, price: int) -> None:
+        """Изменить сделку, как менеджер в интерфейсе AmoCRM (перед вебхуком AmoCRM)."""
+        with self._lock:
+            self._update("leads", lead_id, {"price": price})
+
+    def _index(self, contact: dict[str, Any]) -> None:
+        for field in contact.get("custom_fields_values") or []:
+            for value in field.get("values") or []:
+                self._search.setdefault(str(value["value"]).lower(), set()).add(contact["id"])
+
+    def _create(self, entity: str, data: dict[str, Any], object_id: int | None = None) -> dict[str, Any]:
+        now = self._tick()
+        record = {key: value for key, value in data.items() if key != "_embedded"}
+        record.update(id=object_id or next(self._ids), created_at=now, updated_at=now, account_id=1, is_deleted=False)
+        if entity == "leads":
+            record.setdefault("pipeline_id", self.pipeline_id)
+            record.setdefault("status_id", self.status_id)
+            record.setdefault("price", 0)
+            contacts = (data.get("_embedded") or {}).get("contacts") or []
+            record["_embedded"] = {"contacts": [{"id": item["id"], "is_main": i == 0} for i, item in enumerate(contacts)]}
+            self.leads[record["id"]] = record
+        else:
+            record["custom_fields_values"] = self._fields([], data.get("custom_fields_values") or [])
+            record["_embedded"] = {}
+            self.contacts[record["id"]] = record
+            self._index(record)
+        return {"id": record["id"], "request_id": str(record["id"])}
+
+    @staticmethod
+    def _fields(current: list[dict[str, Any]], update: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Замена значений кастомных полей по коду поля."""
+        by_code = {field["field_code"]: field for field in current}
+        for field in update:
+            code = field.get("field_code")
+            by_code[code] = {
+                "field_id": field.get("field_id"),
+                "field_code": code,
+                "field_name": _FIELD_NAMES.get(code, code),
+                "values": [{"value": value["value"], "enum_code": value.get("enum_code", "WORK")} for value in field["values"]],
+            }
+        return list(by_code.values())
+
+    def _update(self, entity: str, object_id: int, data: dict[str, Any]) -> dict[str, Any] | None:
+        store = self.leads if entity == "leads" else self.contacts
+        record = store.get(object_id)
+        if record is None:
+            return None
+        for key, value in data.items():
+            if key == "custom_fields_values":
+                record[key] = self._fields(record.get(key) or [], value or [])
+            elif key not in ("id", "_embedded"):
+                record[key] = value
+        record["updated_at"] = self._tick()
+        if entity == "contacts":
+            self._index(record)
+        return {"id": object_id, "updated_at": record["updated_at"]}
+
+    def _link(self, lead_id: int, links: list[dict[str, Any]]) -> None:
+        lead = self.leads.get(lead_id)
+        if lead is None:
+            return
+        contacts = lead["_embedded"]["contacts"]
+        for link in links:
+            if link.get("to_entity_type") == "contacts" and all(item["id"] != link["to_entity_id"] for item in contacts):
+                contacts.append({"id": link["to_entity_id"], "is_main": not contacts})
+
+    def _select(self, entity: str, store: dict[int, dict[str, Any]], params: Params) -> list[dict[str, Any]]:
+        """Отбор сущностей списка по фильтрам, поиску и сортировке."""
+        if "filter[id][]" in params:
+            items = [store[int(value)] for value in params["filter[id][]"] if int(value) in store]
+        else:
+            items = list(store.values())
+        if "filter[updated_at][from]" in params:
+            low = int(params["filter[updated_at][from]"][0])
+            high = int(params.get("filter[updated_at][to]", [str(2**62)])[0])
+            items = [item for item in items if low <= item["updated_at"] <= high]
+        query = params.get("query", [""])[0].lower()
+        if query and entity == "contacts":
+            found = self._search.get(query, set())
+            items = [item for item in items if item["id"] in found]
+        elif query:
+            items = [item for item in items if query in str(item.get("name", "")).lower()]
+        for key, value in params.items():
+            if key.startswith("order["):
+                field = key[len("order[") : -1]
+                items.sort(key=lambda item, field=field: item.get(field) or 0, reverse=value[0] == "desc")
+        return items
+
+    @staticmethod
+    def _page(items: list[dict[str, Any]], field: str, path: str, params: Params) -> tuple[int, Any]:
+        """Страница списка в формате HAL (_embedded, _links.next); пустой список - 204."""
+        page = int(params.get("page", ["1"])[0])
+        limit = int(params.get("limit", ["250"])[0])
+        chunk = items[(page - 1) * limit : page * limit]
+        if not chunk:
+            return 204, None
+        links: dict[str, Any] = {"self": {"href": f"{path}?page={page}"}}
+        if page * limit < len(items):
+            links["next"] = {"href": f"{path}?page={page + 1}"}
+        return 200, {"_page": page, "_links": links, "_embedded": {field: chunk}}
+
+    def handle(self, method: str, path: str, params: Params, body: Any) -> tuple[int, Any]:
+        parts = path.split("/api/v4/", 1)[-1].strip("/").split("/")
+        if parts[:2] == ["leads", "pipelines"]:
+            if len(parts) == 2:
+                return self._page(list(self.pipelines.values()), "pipelines", path, params)
+            pipeline = self.pipelines.get(int(parts[2]))
+            return (200, pipeline) if pipeline else (204, None)
+
+        entity = parts[0]
+        store = {"leads": self.leads, "contacts": self.contacts}.get(entity)
+        if store is None:
+            return 404, {"status": 404, "title": "Not Found"}
+        if parts[1:] == ["custom_fields"]:
+            return self._page(CONTACT_CUSTOM_FIELDS if entity == "contacts" else [], "custom_fields", path, params)
+
+        if len(parts) == 1:
+            if method == "GET":
+                return self._page(self._select(entity, store, params), entity, path, params)
+            if method == "POST":
+                return 200, {"_embedded": {entity: [self._create(entity, item) for item in body]}}
+            if method == "PATCH":
+                updated = [self._update(entity, int(item["id"]), item) for item in body]
+                return 200, {"_embedded": {entity: [item for item in updated if item]}}
+
+        object_id = int(parts[1])
+        if object_id not in store:
+            return 204, None
+        if len(parts) == 2 and method == "GET":
+            return 200, store[object_id]
+        if len(parts) == 2 and method == "PATCH":
+            return 200, self._update(entity, object_id, body)
+        if parts[2:] == ["link"] and method == "POST":
+            if entity == "leads":
+                self._link(object_id, body)
+            return 200, {"_embedded": {"links": body}}
+        return 405, {"status": 405, "title": "Method Not Allowed"}
+
+
+class FakeSheets(FakeService):
+    """
+    Заглушка Google Sheets API v4 для одного листа: метаданные таблицы, values.get,
+    values:batchGet и values:batchUpdate с диапазонами в нотации A1.
+    """
+
+    name = "sheets"
+
+    def __init__(self, spreadsheet_id: str, title: str, headers: list[str], **kwargs: Any) -> None:
+        """
+        Инициализация таблицы со строкой заголовков.
+
+        Args:
+            spreadsheet_id: ID таблицы
+            title: Имя листа
+            headers: Заголовки колонок (строка 1)
+            **kwargs: Параметры FakeService
+        """
+        super().__init__(**kwargs)
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.headers = headers
+        self.values: list[list[str]] = [list(headers)]
+
+    def append_row(self, row: dict[str, Any]) -> int:
+        """Добавить строку {название_колонки: значение}; возвращает номер строки."""
+        with self._lock:
+            self.values.append([str(row.get(header, "")) for header in self.headers])
+            return len(self.values)
+
+    def row(self, row_index: int) -> dict[str, str]:
+        """Значения строки по заголовкам."""
+        with self._lock:
+            values = self.values[row_index - 1] if row_index <= len(self.values) else []
+        return {header: values[i] if i < len(values) else "" for i, header in enumerate(self.headers)}
+
+    def endpoint(self, method: str, path: str) -> str:
+        rest = path.split(self.spreadsheet_id, 1)[-1]
+        if rest.startswith("/values/"):
+            return f"{method} values.get"
+        return f"{method} {rest.lstrip('/:') or 'metadata'}"
+
+    def rate_limited(self) -> Any:
+        return {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}
+
+    def _grid(self, range_name: str) -> dict[str, int]:
+        """Диапазон A1 ('Лист1'!A2:D, A:A, 1:1, имя листа) в индексы сетки."""
+        a1 = range_name.split("!", 1)[1] if "!" in range_name else range_name
+        if a1.strip("'") in ("", self.title):
+            return {}
+        return dict(a1_range_to_grid_range(a1))
+
+    def _value_range(self, range_name: str, major: str) -> dict[str, Any]:
+        grid = self._grid(range_name)
+        start_column, end_column = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        rows = [row[start_column:end_column] for row in self.values[grid.get("startRowIndex", 0) : grid.get("endRowIndex")]]
+        if major == "COLUMNS":
+            width = max((len(row) for row in rows), default=0)
+            rows = [[row[i] if i < len(row) else "" for row in rows] for i in range(width)]
+        values = [row[: max((i + 1 for i, value in enumerate(row) if value != ""), default=0)] for row in rows]
+        while values and not values[-1]:
+            values.pop()
+        result: dict[str, Any] = {"range": range_name, "majorDimension": major}
+        if values:
+            result["values"] = values
+        return result
+
+    def _write(self, range_name: str, values: list[list[Any]]) -> int:
+        grid = self._grid(range_name)
+        start_row, start_column = grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0)
+        for i, row_values in enumerate(values):
+            while len(self.values) <= start_row + i:
+                self.values.append([])
+            row = self.values[start_row + i]
+            row.extend([""] * (start_column + len(row_values) - len(row)))
+            row[start_column : start_column + len(row_values)] = [str(value) for value in row_values]
+        return sum(len(row) for row in values)
+
+    def handle(self, method: str, path: str, params: Params, body: Any) -> tuple[int, Any]:
+        rest = path.split(self.spreadsheet_id, 1)[-1]
+        major = params.get("majorDimension", ["ROWS"])[0]
+        if rest == "" and method == "GET":
+            grid = {"rowCount": max(len(self.values), 1000), "columnCount": max(len(self.headers), 26)}
+            sheet = {"sheetId": 0, "title": self.title, "index": 0, "sheetType": "GRID", "gridProperties": grid}
+            return 200, {
+                "spreadsheetId": self.spreadsheet_id,
+                "properties": {"title": "Load test", "locale": "ru_RU", "timeZone": "Europe/Moscow"},
+                "sheets": [{"properties": sheet}],
+            }
+        if rest.startswith("/values/") and method == "GET":
+            return 200, self._value_range(rest[len("/values/") :], major)
+        if rest == "/values:batchGet" and method == "GET":
+            ranges = [self._value_range(range_name, major) for range_name in params.get("ranges", [])]
+            return 200, {"spreadsheetId": self.spreadsheet_id, "valueRanges": ranges}
+        if rest == "/values:batchUpdate" and method == "POST":
+            cells = sum(self._write(item["range"], item["values"]) for item in body.get("data", []))
+            return 200, {"spreadsheetId": self.spreadsheet_id, "totalUpdatedCells": cells, "responses": []}
+        return 404, {"error": {"code": 404, "message": f"Unsupported request {method} {rest}", "status": "NOT_FOUND"}}
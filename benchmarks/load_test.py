@@ -0,0 +1,482 @@
+"""
+Нагрузочный тест приложения без доступа к AmoCRM, Google Sheets и Redis.
+
+Приложение запускается в процессе теста (startup, прогрев, фоновые задачи), внешние API заменены
+заглушками benchmarks.fakes с заданной задержкой, долей ответов 429 и размером таблицы и аккаунта,
+Redis - fakeredis, локальными блокировками процесса или сервером из REDIS_HOST/REDIS_PORT.
+Драйвер отправляет смесь запросов POST /webhook/sheets, POST /webhook/amocrm и POST /import
+напрямую в ASGI-приложение: замкнутым циклом (--concurrency) или с постоянной частотой (--rate).
+
+Отчет по каждому сценарию: число запросов и ответы по статусам, пропускная способность,
+задержка p50/p99 и вызовы AmoCRM и Sheets на один запрос; вызовы фоновых задач (outbox, импорт
+при старте) - отдельной строкой background.
+
+Запуск:
+    python -m benchmarks.load_test [--duration 30] [--concurrency 16] [--mix sheets=70,amocrm=30,import=0]
+        [--rows 2000] [--linked 0.5] [--amo-latency 0.15] [--sheets-latency 0.2] [--amo-429 0.01]
+        [--redis fake|off|server] [--output report.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from typing import Any
+from urllib.parse import urlencode
+
+import gspread
+import jwt
+from amocrm.v2 import interaction, tokens  # type: ignore[import-untyped]
+from requests import Session
+
+from app.core.amocrm_client import amocrm_client
+from app.core.sheets_client import sheets_client
+from app.core.sync_lock import sync_lock
+from app.core.utils import make_external_id, normalize_phone
+from benchmarks.fakes import FakeAmoCRM, FakeSheets, current_scenario
+
+SPREADSHEET_ID = "loadtest"
+WORKSHEET_NAME = "Лист1"
+PIPELINE_ID = 7000
+STATUS_ID = 7100
+WEBHOOK_SECRET = "loadtest"
+HEADERS = ["name", "phone", "email", "budget", "status", "external_id", "amo_contact_id", "amo_deal_id", "amo_link"]
+SCENARIOS = ("sheets", "amocrm", "import")
+
+Scenario = Callable[[], Awaitable[int]]
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Окружение приложения для теста: фиктивные учетные данные, временный STATE_DIR, без фоновых опросов."""
+    os.environ.update(
+        GOOGLE_SPREADSHEET_ID=SPREADSHEET_ID,
+        GOOGLE_WORKSHEET_NAME=WORKSHEET_NAME,
+        AMO_CLIENT_ID="loadtest",
+        AMO_CLIENT_SECRET="loadtest",
+        AMO_AUTH_CODE="loadtest",
+        AMO_ACCESS_TOKEN="loadtest",
+        AMO_REFRESH_TOKEN="loadtest",
+        AMO_PIPELINE_ID=str(PIPELINE_ID),
+        AMO_STATUS_ID=str(STATUS_ID),
+        WEBHOOK_SECRET=WEBHOOK_SECRET,
+        STATE_DIR=tempfile.mkdtemp(prefix="loadtest-state-"),
+        LOG_LEVEL=args.log_level,
+        IMPORT_ON_STARTUP="false",
+        RECONCILE_INTERVAL="0",
+        AMO_POLL_INTERVAL="0",
+        SHEETS_POLL_INTERVAL="0",
+    )
+
+
+def seed(amocrm: FakeAmoCRM, sheets: FakeSheets, rows: int, linked: float, extra_leads: int, rnd: random.Random) -> None:
+    """
+    Наполнение таблицы и аккаунта: доля linked строк уже связана со сделками и контактами,
+    остальные строки новые; extra_leads сделок аккаунта не связаны с таблицей.
+    """
+    sheet_key = f"{SPREADSHEET_ID}/{WORKSHEET_NAME}"
+    for i in range(rows):
+        row_index = i + 2
+        name, phone, email = f"Клиент {i}", f"+79{rnd.randrange(10**9):09d}", f"client{i}@example.com"
+        budget = rnd.randrange(1, 100) * 1000
+        row: dict[str, Any] = {"name": name, "phone": phone, "email": email, "budget": budget}
+        if rnd.random() < linked:
+            contact_id = amocrm.add_contact(name, phone, email)
+            lead_id = amocrm.add_lead(name, budget, contact_id)
+            row.update(
+                status="Новая заявка",
+                external_id=make_external_id(normalize_phone(phone), email, name, sheet_key, row_index),
+                amo_contact_id=contact_id,
+                amo_deal_id=lead_id,
+                amo_link=f"https://{SPREADSHEET_ID}.amocrm.ru/leads/detail/{lead_id}",
+            )
+        sheets.append_row(row)
+    for i in range(extra_leads):
+        amocrm.add_lead(f"Сделка {i}", rnd.randrange(1, 100) * 1000, amocrm.add_contact(f"Контакт {i}", None, None))
+
+
+def install_fakes(amocrm: FakeAmoCRM, sheets: FakeSheets) -> None:
+    """Подключение заглушек к сессиям amocrm.v2 и gspread и токен AmoCRM без обмена auth_code."""
+    interaction._session.mount("https://", amocrm)  # pylint: disable=protected-access
+    storage = tokens.MemoryTokensStorage()
+    storage.save_tokens(jwt.encode({"exp": int(time.time()) + 86400}, "loadtest" * 4, algorithm="HS256"), "loadtest")
+    tokens.default_token_manager(
+        client_id="loadtest", client_secret="loadtest", subdomain=SPREADSHEET_ID, redirect_url="", storage=storage
+    )
+    amocrm_client._tokens_ready = True  # pylint: disable=protected-access
+
+    session = Session()
+    session.mount("https://", sheets)
+    sheets_client._client = gspread.Client(auth=None, session=session)  # pylint: disable=protected-access
+
+
+def configure_redis(mode: str) -> None:
+    """
+    Redis для теста: fake - fakeredis в памяти процесса, off - локальные блокировки процесса
+    (Redis недоступен), server - сервер из REDIS_HOST/REDIS_PORT/REDIS_DB (отдельная база для теста).
+    """
+    if mode == "fake":
+        try:
+            import fakeredis  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise SystemExit("Для --redis fake установите fakeredis: pip install fakeredis") from e
+        server = fakeredis.FakeServer()
+        sync_lock._create_client = lambda: fakeredis.aioredis.FakeRedis(  # pylint: disable=protected-access
+            server=server, decode_responses=True
+        )
+    elif mode == "off":
+
+        def unavailable() -> Any:
+            raise ConnectionError("Redis выключен в нагрузочном тесте")
+
+        sync_lock._create_client = unavailable  # pylint: disable=protected-access
+
+
+class ASGIClient:
+    """Минимальный клиент ASGI: запросы и события lifespan без сети и HTTP-сервера."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._lifespan: asyncio.Task[None] | None = None
+        self._lifespan_receive: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._lifespan_send: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def _lifespan_event(self, event: str) -> None:
+        if self._lifespan is None:
+            scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+            self._lifespan = asyncio.create_task(self.app(scope, self._lifespan_receive.get, self._lifespan_send.put))
+        await self._lifespan_receive.put({"type": f"lifespan.{event}"})
+        message = await self._lifespan_send.get()
+        if message["type"] != f"lifespan.{event}.complete":
+            raise RuntimeError(f"lifespan.{event}: {message.get('message')}")
+
+    async def startup(self) -> None:
+        """Запуск приложения (обработчики startup)."""
+        await self._lifespan_event("startup")
+
+    async def shutdown(self) -> None:
+        """Остановка приложения (обработчики shutdown)."""
+        await self._lifespan_event("shutdown")
+        if self._lifespan is not None:
+            await self._lifespan
+
+    async def request(
+        self, method: str, path: str, body: bytes = b"", content_type: str | None = None, headers: dict[str, str] | None = None
+    ) -> tuple[int, bytes]:
+        """
+        Запрос к приложению.
+
+        Returns:
+            tuple[int, bytes]: HTTP-статус и тело ответа
+        """
+        path, _, query = path.partition("?")
+        raw_headers = [(b"host", b"loadtest"), (b"content-length", str(len(body)).encode())]
+        if content_type:
+            raw_headers.append((b"content-type", content_type.encode()))
+        raw_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        done = asyncio.Event()
+        sent_body = False
+        status = 0
+        chunks: list[bytes] = []
+
+        async def receive() -> dict[str, Any]:
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status, b"".join(chunks)
+
+    async def post_json(self, path: str, payload: Any, headers: dict[str, str] | None = None) -> tuple[int, bytes]:
+        """POST с телом JSON."""
+        return await self.request("POST", path, json.dumps(payload).encode(), "application/json", headers)
+
+
+class LoadDriver:
+    """Генерация запросов сценариев и учет задержек и статусов ответов."""
+
+    def __init__(self, client: ASGIClient, amocrm: FakeAmoCRM, sheets: FakeSheets, rnd: random.Random) -> None:
+        self.client = client
+        self.amocrm = amocrm
+        self.sheets = sheets
+        self.rnd = rnd
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter[int]] = defaultdict(Counter)
+        self.import_jobs: set[str] = set()
+        self.scenarios: dict[str, Scenario] = {
+            "sheets": self.webhook_sheets,
+            "amocrm": self.webhook_amocrm,
+            "import": self.start_import,
+        }
+
+    async def webhook_sheets(self) -> int:
+        """Правка случайной строки таблицы: новый бюджет, вебхук Apps Script."""
+        row_index = self.rnd.randrange(2, len(self.sheets.values) + 1)
+        row = self.sheets.row(row_index)
+        data = {"name": row["name"], "phone": row["phone"] or None, "email": row["email"] or None}
+        data["budget"] = self.rnd.randrange(1, 100) * 1000
+        status, _ = await self.client.post_json(
+            "/webhook/sheets", {"row_index": row_index, "data": data}, {"X-Webhook-Secret": WEBHOOK_SECRET}
+        )
+        return status
+
+    async def webhook_amocrm(self) -> int:
+        """Изменение сделки, связанной со строкой таблицы, и вебхук AmoCRM (form-urlencoded)."""
+        column = HEADERS.index("amo_deal_id")
+        lead_ids = [int(row[column]) for row in self.sheets.values[1:] if len(row) > column and row[column].isdigit()]
+        if not lead_ids:
+            return await self.webhook_sheets()
+        lead_id = self.rnd.choice(lead_ids)
+        self.amocrm.touch_lead(lead_id, self.rnd.randrange(1, 100) * 1000)
+        body = urlencode({"leads[update][0][id]": lead_id, "leads[update][0][status_id]": STATUS_ID}).encode()
+        status, _ = await self.client.request("POST", "/webhook/amocrm", body, "application/x-www-form-urlencoded")
+        return status
+
+    async def start_import(self) -> int:
+        """Запуск импорта (при активной задаче возвращается она)."""
+        status, body = await self.client.request("POST", "/import")
+        if status == 202:
+            self.import_jobs.add(json.loads(body)["id"])
+        return status
+
+    async def one(self, scenario: str, scheduled: float, send: Scenario | None = None) -> None:
+        """
+        Один запрос сценария; задержка считается от запланированного момента отправки.
+
+        Args:
+            scenario: Сценарий (для отчета и учета вызовов заглушек)
+            scheduled: Запланированный момент отправки (time.perf_counter)
+            send: Отправка запроса вместо запроса сценария (воспроизведение записи)
+        """
+        token = current_scenario.set(scenario)
+        try:
+            status = await (send or self.scenarios[scenario])()
+        except Exception:
+            status = 0
+        finally:
+            current_scenario.reset(token)
+        self.latencies[scenario].append(time.perf_counter() - scheduled)
+        self.statuses[scenario][status] += 1
+
+    def pick(self, mix: dict[str, float]) -> str:
+        """Сценарий следующего запроса по весам смеси."""
+        return self.rnd.choices(list(mix), weights=list(mix.values()))[0]
+
+    async def closed_loop(self, mix: dict[str, float], concurrency: int, deadline: float, total: int | None) -> None:
+        """concurrency клиентов отправляют запросы друг за другом до deadline или total запросов."""
+        sent = 0
+
+        async def worker() -> None:
+            nonlocal sent
+            while time.perf_counter() < deadline and (total is None or sent < total):
+                sent += 1
+                await self.one(self.pick(mix), time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, mix: dict[str, float], rate: float, deadline: float, total: int | None) -> None:
+        """Запросы с постоянной частотой rate в секунду независимо от времени ответа."""
+        tasks = []
+        scheduled = time.perf_counter()
+        while scheduled < deadline and (total is None or len(tasks) < total):
+            await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+            tasks.append(asyncio.create_task(self.one(self.pick(mix), scheduled)))
+            scheduled += 1 / rate
+        await asyncio.gather(*tasks)
+
+    async def drain_imports(self, timeout: float) -> list[dict[str, Any]]:
+        """Ожидание завершения запущенных задач импорта; возвращает их состояние."""
+        jobs: list[dict[str, Any]] = []
+        deadline = time.perf_counter() + timeout
+        for job_id in sorted(self.import_jobs):
+            while True:
+                _, body = await self.client.request("GET", f"/import/{job_id}")
+                job = json.loads(body)
+                if job.get("status") not in ("pending", "running", "cancelling") or time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.5)
+            jobs.append(job)
+        return jobs
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль q (0..1) по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def build_report(
+    driver: LoadDriver, fakes: list[FakeAmoCRM | FakeSheets], elapsed: float, jobs: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """Отчет: сценарии, задержки, вызовы API на запрос и задачи импорта."""
+    scenarios: dict[str, Any] = {}
+    for scenario in [*SCENARIOS, "background"]:
+        count = len(driver.latencies.get(scenario, []))
+        calls = {fake.name: sum(n for (name, _), n in fake.calls.items() if name == scenario) for fake in fakes}
+        if not count and not any(calls.values()):
+            continue
+        latencies = driver.latencies.get(scenario, [])
+        endpoints = {
+            f"{fake.name} {endpoint}": n for fake in fakes for (name, endpoint), n in fake.calls.items() if name == scenario
+        }
+        scenarios[scenario] = {
+            "requests": count,
+            "statuses": {str(status): n for status, n in sorted(driver.statuses.get(scenario, {}).items())},
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "api_calls": calls,
+            "api_calls_per_request": {name: round(n / count, 2) for name, n in calls.items()} if count else {},
+            "rate_limited": {fake.name: fake.rejected.get(scenario, 0) for fake in fakes},
+            "endpoints": dict(sorted(endpoints.items(), key=lambda item: -item[1])),
+        }
+    total = sum(len(values) for values in driver.latencies.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "scenarios": scenarios,
+        "import_jobs": [
+            {key: job.get(key) for key in ("id", "status", "total", "processed", "created", "errors", "rows_per_second")}
+            for job in jobs
+        ],
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    """Отчет в виде таблицы."""
+    print(f"\n{report['requests']} запросов за {report['elapsed_s']} с: {report['throughput_rps']} запр/с\n")
+    print(
+        f"{'сценарий':12} {'запросов':>9} {'запр/с':>8} {'p50 мс':>9} {'p99 мс':>9} "
+        f"{'amocrm/запр':>12} {'sheets/запр':>12}  статусы"
+    )
+    for scenario, item in report["scenarios"].items():
+        per_request = item["api_calls_per_request"]
+        print(
+            f"{scenario:12} {item['requests']:9} {item['throughput_rps']:8} {item['p50_ms']:9} {item['p99_ms']:9} "
+            f"{per_request.get('amocrm', '-'):>12} {per_request.get('sheets', '-'):>12}  "
+            f"{item['statuses'] or item['api_calls']}"
+        )
+    for scenario, item in report["scenarios"].items():
+        print(f"\n{scenario}: вызовы API (429: {item['rate_limited']})")
+        for endpoint, count in list(item["endpoints"].items())[:10]:
+            print(f"    {count:8}  {endpoint}")
+    for job in report["import_jobs"]:
+        print(f"\nимпорт {job['id']}: {job}")
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Смесь сценариев: 'sheets=70,amocrm=30,import=0'."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Неизвестный сценарий {name!r}, доступны: {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Хотя бы один сценарий должен иметь ненулевой вес")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Наполнение заглушек, запуск приложения, нагрузка и отчет."""
+    rnd = random.Random(args.seed)
+    amocrm = FakeAmoCRM(
+        PIPELINE_ID, STATUS_ID, latency=args.amo_latency, jitter=args.jitter, rate_limit=args.amo_429, seed=args.seed
+    )
+    sheets = FakeSheets(
+        SPREADSHEET_ID, WORKSHEET_NAME, HEADERS, latency=args.sheets_latency, jitter=args.jitter, rate_limit=args.sheets_429
+    )
+    seed(amocrm, sheets, args.rows, args.linked, args.extra_leads, rnd)
+    install_fakes(amocrm, sheets)
+    configure_redis(args.redis)
+
+    # Импорт после configure_environment: app.main настраивает логирование по настройкам окружения
+    from app.main import app  # pylint: disable=import-outside-toplevel
+
+    client = ASGIClient(app)
+    await client.startup()
+    if args.warm_mapping:
+        await client.request("POST", "/mapping/rebuild")
+    for fake in (amocrm, sheets):
+        fake.calls.clear()
+        fake.rejected.clear()
+
+    driver = LoadDriver(client, amocrm, sheets, rnd)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    if args.rate:
+        await driver.open_loop(args.mix, args.rate, deadline, args.requests)
+    else:
+        await driver.closed_loop(args.mix, args.concurrency, deadline, args.requests)
+    elapsed = time.perf_counter() - started
+    jobs = await driver.drain_imports(args.drain)
+    await client.shutdown()
+    return build_report(driver, [amocrm, sheets], elapsed, jobs)
+
+
+def main() -> None:
+    """Запуск нагрузочного теста."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность нагрузки (сек)")
+    parser.add_argument("--requests", type=int, default=None, help="Остановиться после N запросов")
+    parser.add_argument("--concurrency", type=int, default=16, help="Клиентов в замкнутом цикле")
+    parser.add_argument("--rate", type=float, default=0.0, help="Запросов в секунду (открытый цикл); 0 - замкнутый цикл")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("sheets=70,amocrm=30"), help="Веса сценариев")
+    parser.add_argument("--rows", type=int, default=2000, help="Строк в таблице")
+    parser.add_argument("--linked", type=float, default=0.5, help="Доля строк, уже связанных со сделками")
+    parser.add_argument("--extra-leads", type=int, default=0, help="Сделок аккаунта, не связанных с таблицей")
+    parser.add_argument("--amo-latency", type=float, default=0.15, help="Задержка ответа AmoCRM (сек)")
+    parser.add_argument("--sheets-latency", type=float, default=0.2, help="Задержка ответа Google Sheets (сек)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Разброс задержки (доля)")
+    parser.add_argument("--amo-429", type=float, default=0.0, help="Доля ответов 429 от AmoCRM")
+    parser.add_argument("--sheets-429", type=float, default=0.0, help="Доля ответов 429 от Google Sheets")
+    parser.add_argument("--redis", choices=("fake", "off", "server"), default="fake", help="Redis для теста")
+    parser.add_argument("--cold-mapping", dest="warm_mapping", action="store_false", help="Не строить связку строк заранее")
+    parser.add_argument("--drain", type=float, default=60.0, help="Ожидание завершения импорта после нагрузки (сек)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Микробенчмарки горячих путей на чистом Python с базовыми значениями и порогом регрессии.
+
+Пути:
+    normalize_phone, make_external_id, make_external_ids - нормализация строк импорта;
+    read_all_rows_10k, read_all_rows_100k - значения листа в словари (rows_to_dicts в read_all_rows);
+    update_cells_headers - поиск колонок по заголовкам при записи строки (_cell_updates);
+    find_row_by_deal_id - поиск ID сделки в колонке таблицы (find_value_row);
+    amocrm_webhook_form - разбор form-urlencoded вебхука AmoCRM с массовым изменением сделок.
+
+Для каждого пути измеряется пропускная способность (элементов в секунду, лучший из --repeat запусков,
+для базового значения - медиана) и пиковая память (tracemalloc, отдельный запуск). Результаты
+сравниваются с benchmarks/baselines.json: команда завершается с кодом 1, если пропускная способность упала или память выросла больше чем
+на --tolerance. Базовые значения зависят от машины - обновляйте их (--update) там же, где проверяете.
+
+Запуск:
+    python -m benchmarks.microbench [--only read_all_rows_100k,find_row_by_deal_id] [--tolerance 0.25]
+    python -m benchmarks.microbench --update
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import urlencode
+
+from starlette.requests import Request
+
+from app.core.sheets_client import SheetsClient, find_value_row, rows_to_dicts
+from app.core.utils import make_external_id, make_external_ids, normalize_phone, normalize_phones
+from app.services.amocrm_service import read_webhook_form
+from benchmarks.bench_normalization import SHEET_KEY, make_rows
+
+BASELINES = Path(__file__).with_name("baselines.json")
+
+HEADERS = ["name", "phone", "email", "budget", "status", "external_id", "amo_contact_id", "amo_deal_id", "amo_link"]
+
+
+class Benchmark(NamedTuple):
+    """Путь для измерения: setup готовит данные вне замера и возвращает функцию и число элементов."""
+
+    name: str
+    unit: str
+    setup: Callable[[], tuple[Callable[[], Any], int]]
+
+
+def _normalize_phone() -> tuple[Callable[[], Any], int]:
+    _, phones, _, _ = make_rows(100_000)
+    return lambda: [normalize_phone(phone) for phone in phones], len(phones)
+
+
+def _make_external_id() -> tuple[Callable[[], Any], int]:
+    names, phones, emails, rows = make_rows(100_000)
+    normalized = normalize_phones(phones)
+
+    def run() -> list[str]:
+        return [
+            make_external_id(phone, email, name, SHEET_KEY, row_index)
+            for name, phone, email, row_index in zip(names, normalized, emails, rows)
+        ]
+
+    return run, len(rows)
+
+
+def _make_external_ids() -> tuple[Callable[[], Any], int]:
+    names, phones, emails, rows = make_rows(100_000)
+    normalized = normalize_phones(phones)
+    return lambda: make_external_ids(normalized, emails, names, SHEET_KEY, rows), len(rows)
+
+
+def _sheet_values(count: int) -> list[list[str]]:
+    """Значения листа: заголовки и строки, часть без ID AmoCRM (короче заголовков)."""
+    rnd = random.Random(42)
+    values = [list(HEADERS)]
+    for i in range(count):
+        row = [f"Клиент {i}", f"+79{rnd.randrange(10**9):09d}", f"user{i}@example.com", str(rnd.randrange(100) * 1000)]
+        if rnd.random() < 0.7:
+            lead_id = 1_000_000 + i
+            row += ["Новая заявка", f"{rnd.getrandbits(128):032x}", str(2_000_000 + i), str(lead_id), f"/leads/{lead_id}"]
+        values.append(row)
+    return values
+
+
+def _read_all_rows(count: int) -> Callable[[], tuple[Callable[[], Any], int]]:
+    def setup() -> tuple[Callable[[], Any], int]:
+        values = _sheet_values(count)
+        return lambda: rows_to_dicts(values), count
+
+    return setup
+
+
+def _update_cells_headers() -> tuple[Callable[[], Any], int]:
+    client = SheetsClient()
+    client._headers = HEADERS + [f"extra_{i}" for i in range(20)]  # pylint: disable=protected-access
+    mapping = {"amo_deal_id": "1000001", "amo_contact_id": "2000001", "amo_link": "/leads/1000001", "status": "ok"}
+    count = 20_000
+
+    def run() -> list[list[dict[str, Any]]]:
+        cell_updates = client._cell_updates  # pylint: disable=protected-access
+        return [cell_updates(row_index, mapping) for row_index in range(2, count + 2)]
+
+    return run, count
+
+
+def _find_row_by_deal_id() -> tuple[Callable[[], Any], int]:
+    column = ["amo_deal_id"] + [str(1_000_000 + i) if i % 10 else "" for i in range(100_000)]
+    targets = [column[-1], "missing", column[len(column) // 2], "0"] * 5
+
+    def run() -> list[int | None]:
+        return [find_value_row(column, target) for target in targets]
+
+    scanned = sum((find_value_row(column, target) or len(column)) - 1 for target in targets)
+    return run, scanned
+
+
+def _amocrm_webhook_form() -> tuple[Callable[[], Any], int]:
+    fields: dict[str, Any] = {}
+    for i in range(25):
+        prefix = f"leads[update][{i}]"
+        fields.update(
+            {
+                f"{prefix}[id]": 1_000_000 + i,
+                f"{prefix}[name]": f"Сделка {i}",
+                f"{prefix}[status_id]": 7100,
+                f"{prefix}[old_status_id]": 7101,
+                f"{prefix}[price]": 15000,
+                f"{prefix}[responsible_user_id]": 123,
+                f"{prefix}[last_modified]": 1_700_000_000 + i,
+                f"{prefix}[modified_user_id]": 123,
+                f"{prefix}[created_user_id]": 123,
+                f"{prefix}[date_create]": 1_690_000_000,
+                f"{prefix}[pipeline_id]": 7000,
+                f"{prefix}[account_id]": 1,
+                f"{prefix}[custom_fields][0][id]": 555,
+                f"{prefix}[custom_fields][0][values][0][value]": "Комментарий менеджера",
+            }
+        )
+    fields.update({"account[subdomain]": "example", "account[id]": 1})
+    body = urlencode(fields).encode()
+    headers = [(b"content-type", b"application/x-www-form-urlencoded"), (b"content-length", str(len(body)).encode())]
+    count = 200
+
+    async def parse_all() -> list[dict[str, Any]]:
+        async def receive() -> dict[str, Any]:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        result = []
+        for _ in range(count):
+            scope = {"type": "http", "method": "POST", "path": "/webhook/amocrm", "headers": headers, "query_string": b""}
+            result.append(await read_webhook_form(Request(scope, receive)))
+        return result
+
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(parse_all()), count
+
+
+BENCHMARKS = [
+    Benchmark("normalize_phone", "строк", _normalize_phone),
+    Benchmark("make_external_id", "строк", _make_external_id),
+    Benchmark("make_external_ids", "строк", _make_external_ids),
+    Benchmark("read_all_rows_10k", "строк", _read_all_rows(10_000)),
+    Benchmark("read_all_rows_100k", "строк", _read_all_rows(100_000)),
+    Benchmark("update_cells_headers", "строк", _update_cells_headers),
+    Benchmark("find_row_by_deal_id", "ячеек", _find_row_by_deal_id),
+    Benchmark("amocrm_webhook_form", "вебхуков", _amocrm_webhook_form),
+]
+
+
+def _reference() -> list[dict[str, str]]:
+    """Эталонная нагрузка (строки и словари) для поправки на текущую скорость машины."""
+    return [{"key": str(i)} for i in range(100_000)]
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def measure(func: Callable[[], Any], repeat: int) -> tuple[float, float, float]:
+    """
+    Лучшее время из repeat запусков и отношения ко времени эталонной нагрузки.
+
+    Эталон замеряется перед каждым запуском: отношение мало зависит от частоты CPU и соседей по машине,
+    поэтому регрессия определяется по нему, а не по абсолютной скорости.
+
+    Returns:
+        tuple[float, float, float]: Время (сек), лучшее и медианное отношение ко времени эталона
+    """
+    best = float("inf")
+    ratios = []
+    for _ in range(repeat):
+        reference = _timed(_reference)
+        elapsed = _timed(func)
+        best = min(best, elapsed)
+        ratios.append(elapsed / reference)
+    return best, min(ratios), statistics.median(ratios)
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """Пиковая память одного запуска, включая результат (байт)."""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any] | None, tolerance: float) -> list[str]:
+    """Регрессии пути относительно базового значения (пустой список - регрессий нет)."""
+    if baseline is None or baseline["items"] != result["items"]:
+        return []
+    problems = []
+    if result["items_per_reference"] < baseline["items_per_reference"] * (1 - tolerance):
+        problems.append(
+            f"скорость {result['items_per_reference']:,.0f} < {baseline['items_per_reference']:,.0f} элементов на эталон"
+        )
+    if result["peak_memory_bytes"] > baseline["peak_memory_bytes"] * (1 + tolerance):
+        problems.append(f"память {result['peak_memory_bytes']:,} > {baseline['peak_memory_bytes']:,} байт")
+    return problems
+
+
+def main() -> None:
+    """Запуск бенчмарков, сравнение с базовыми значениями или их обновление."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="Пути через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимое ухудшение (доля)")
+    parser.add_argument("--update", action="store_true", help="Сохранить результаты как базовые значения")
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    args = parser.parse_args()
+
+    selected = set(args.only.split(",")) if args.only else {benchmark.name for benchmark in BENCHMARKS}
+    unknown = selected - {benchmark.name for benchmark in BENCHMARKS}
+    if unknown:
+        parser.error(f"Неизвестные пути: {', '.join(sorted(unknown))}")
+
+    stored = json.loads(args.baselines.read_text(encoding="utf-8")) if args.baselines.exists() else {"benchmarks": {}}
+    baselines: dict[str, Any] = stored["benchmarks"]
+    regressions: dict[str, list[str]] = {}
+
+    print(f"{'путь':22} {'элементов':>10} {'элементов/с':>14} {'база/с':>14} {'изм.':>7} {'пик памяти':>12}  статус")
+    for benchmark in BENCHMARKS:
+        if benchmark.name not in selected:
+            continue
+        func, items = benchmark.setup()
+        elapsed, ratio, median_ratio = measure(func, args.repeat)
+        if args.update:
+            # База - типичный запуск, проверка - лучший: шум машины не дает ложных регрессий
+            ratio = median_ratio
+        result = {
+            "unit": benchmark.unit,
+            "items": items,
+            "items_per_second": round(items / elapsed, 1),
+            "items_per_reference": round(items / ratio, 1),
+            "peak_memory_bytes": peak_memory(func),
+        }
+        baseline = baselines.get(benchmark.name)
+        problems = compare(result, baseline, args.tolerance)
+        if problems and not args.update:
+            # Повторный замер: единичный выброс (соседи по машине, троттлинг CPU) не считается регрессией
+            _, ratio, _ = measure(func, args.repeat)
+            result["items_per_reference"] = max(result["items_per_reference"], round(items / ratio, 1))
+            problems = compare(result, baseline, args.tolerance)
+        if problems:
+            regressions[benchmark.name] = problems
+        if baseline is None or baseline["items"] != items:
+            change, state = "", "нет базы"
+        else:
+            change = f"{(result['items_per_reference'] / baseline['items_per_reference'] - 1) * 100:+.0f}%"
+            state = "РЕГРЕССИЯ" if problems else "ok"
+        base_rate = f"{baseline['items_per_second']:,.0f}" if baseline else "-"
+        print(
+            f"{benchmark.name:22} {items:10} {result['items_per_second']:14,.0f} {base_rate:>14} {change:>7} "
+            f"{result['peak_memory_bytes'] / 2**20:10.1f}МБ  {state}"
+        )
+        if args.update:
+            baselines[benchmark.name] = result
+
+    if args.update:
+        stored["meta"] = {"python": platform.python_version(), "machine": platform.machine(), "updated_at": int(time.time())}
+        args.baselines.write_text(json.dumps(stored, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\nБазовые значения сохранены в {args.baselines}")
+        return
+
+    for name, problems in regressions.items():
+        print(f"\nРегрессия {name}: {'; '.join(problems)} (допуск {args.tolerance:.0%})")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
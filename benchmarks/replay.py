@@ -0,0 +1,235 @@
+"""
+Воспроизведение записанных вебхуков (WEBHOOK_CAPTURE_FILE) против приложения с заглушками.
+
+Запросы из файла записи отправляются в приложение в исходном порядке и с исходными интервалами
+(--speed 1), ускоренно в N раз (--speed N) или без пауз (--speed 0). Внешние API, Redis и состояние
+приложения подготавливаются как в benchmarks.load_test; таблица наполняется так, чтобы в ней были все
+строки из записанных вебхуков Google Sheets, а сделки из вебхуков AmoCRM создаются в заглушке с теми же ID
+и связываются со строками таблицы. Замаскированный X-Webhook-Secret заменяется секретом теста.
+
+Отчет такой же, как у нагрузочного теста: по сценариям sheets и amocrm - ответы по статусам, задержка
+p50/p99 и вызовы AmoCRM и Sheets на один вебхук.
+
+Запуск:
+    python -m benchmarks.replay .state/webhooks.jsonl [--speed 10] [--limit 5000]
+        [--rows 2000] [--amo-latency 0.15] [--sheets-latency 0.2] [--redis fake|off|server] [--output report.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl
+
+from app.core.capture import REDACTED, record_body
+from app.core.utils import make_external_id, normalize_phone
+from benchmarks.fakes import FakeAmoCRM, FakeSheets
+from benchmarks.load_test import (
+    HEADERS,
+    PIPELINE_ID,
+    SPREADSHEET_ID,
+    STATUS_ID,
+    WEBHOOK_SECRET,
+    WORKSHEET_NAME,
+    ASGIClient,
+    LoadDriver,
+    build_report,
+    configure_environment,
+    configure_redis,
+    install_fakes,
+    print_report,
+    seed,
+)
+
+# Поле ID сделки в form-urlencoded вебхуке AmoCRM: leads[update][0][id], leads[status][3][id] ...
+_LEAD_ID_FIELD = re.compile(r"^leads\[\w+\]\[\d+\]\[id\]$")
+
+
+def load_records(path: Path, limit: int | None) -> list[dict[str, Any]]:
+    """
+    Записи из файла по времени прихода.
+
+    Оборванная последняя строка (остановка приложения во время записи) пропускается.
+    """
+    records = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                skipped += 1
+            if limit is not None and len(records) >= limit:
+                break
+    if skipped:
+        print(f"Пропущено поврежденных строк: {skipped}")
+    return sorted(records, key=lambda record: record["t"])
+
+
+def scenario_of(record: dict[str, Any]) -> str:
+    """Сценарий отчета по пути вебхука: /webhook/sheets/batch -> sheets."""
+    parts = record["p"].strip("/").split("/")
+    return parts[1] if len(parts) > 1 else parts[0]
+
+
+def referenced_rows(records: list[dict[str, Any]]) -> int:
+    """Наибольший номер строки в записанных вебхуках Google Sheets."""
+    last = 1
+    for record in records:
+        if scenario_of(record) != "sheets":
+            continue
+        try:
+            payload = json.loads(record_body(record))
+        except ValueError:
+            continue
+        for row in (payload.get("rows") or [payload]) if isinstance(payload, dict) else []:
+            if isinstance(row, dict) and isinstance(row.get("row_index"), int):
+                last = max(last, row["row_index"])
+    return last
+
+
+def referenced_leads(records: list[dict[str, Any]]) -> set[int]:
+    """ID сделок из записанных вебхуков AmoCRM."""
+    lead_ids = set()
+    for record in records:
+        if scenario_of(record) != "amocrm":
+            continue
+        for name, value in parse_qsl(record_body(record).decode("utf-8", "replace")):
+            if _LEAD_ID_FIELD.match(name) and value.isdigit():
+                lead_ids.add(int(value))
+    return lead_ids
+
+
+def seed_leads(amocrm: FakeAmoCRM, sheets: FakeSheets, lead_ids: set[int], rnd: random.Random) -> None:
+    """Сделки с ID из записи и связанные с ними строки таблицы."""
+    sheet_key = f"{SPREADSHEET_ID}/{WORKSHEET_NAME}"
+    for lead_id in sorted(lead_ids):
+        name, phone, email = f"Клиент {lead_id}", f"+79{rnd.randrange(10**9):09d}", f"lead{lead_id}@example.com"
+        budget = rnd.randrange(1, 100) * 1000
+        contact_id = amocrm.add_contact(name, phone, email)
+        amocrm.add_lead(name, budget, contact_id, lead_id)
+        row_index = len(sheets.values) + 1
+        sheets.append_row(
+            {
+                "name": name,
+                "phone": phone,
+                "email": email,
+                "budget": budget,
+                "status": "Новая заявка",
+                "external_id": make_external_id(normalize_phone(phone), email, name, sheet_key, row_index),
+                "amo_contact_id": contact_id,
+                "amo_deal_id": lead_id,
+                "amo_link": f"https://{SPREADSHEET_ID}.amocrm.ru/leads/detail/{lead_id}",
+            }
+        )
+
+
+def replay_headers(record: dict[str, Any]) -> dict[str, str]:
+    """Заголовки для повтора: секрет вебхука - секрет теста, остальные замаскированные не передаются."""
+    headers = {}
+    for name, value in record["h"].items():
+        if value != REDACTED:
+            headers[name] = value
+        elif name == "x-webhook-secret":
+            headers[name] = WEBHOOK_SECRET
+    return headers
+
+
+async def replay(driver: LoadDriver, records: list[dict[str, Any]], speed: float) -> None:
+    """Отправка записей с исходными интервалами, деленными на speed (0 - без пауз)."""
+    client = driver.client
+    tasks = []
+    first = records[0]["t"]
+    started = time.perf_counter()
+    for record in records:
+        scheduled = started + ((record["t"] - first) / speed if speed > 0 else 0.0)
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+
+        async def send(record: dict[str, Any] = record) -> int:
+            path = f"{record['p']}?{record['q']}" if record.get("q") else record["p"]
+            status, _ = await client.request(record["m"], path, record_body(record), headers=replay_headers(record))
+            return status
+
+        tasks.append(asyncio.create_task(driver.one(scenario_of(record), scheduled, send)))
+    await asyncio.gather(*tasks)
+
+
+async def run(args: argparse.Namespace, records: list[dict[str, Any]]) -> dict[str, Any]:
+    """Наполнение заглушек по записи, запуск приложения, воспроизведение и отчет."""
+    rnd = random.Random(args.seed)
+    amocrm = FakeAmoCRM(
+        PIPELINE_ID, STATUS_ID, latency=args.amo_latency, jitter=args.jitter, rate_limit=args.amo_429, seed=args.seed
+    )
+    sheets = FakeSheets(
+        SPREADSHEET_ID,
+        WORKSHEET_NAME,
+        HEADERS,
+        latency=args.sheets_latency,
+        jitter=args.jitter,
+        rate_limit=args.sheets_429,
+    )
+    seed(amocrm, sheets, max(args.rows, referenced_rows(records) - 1), args.linked, 0, rnd)
+    seed_leads(amocrm, sheets, referenced_leads(records), rnd)
+    install_fakes(amocrm, sheets)
+    configure_redis(args.redis)
+
+    # Импорт после configure_environment: app.main настраивает логирование по настройкам окружения
+    from app.main import app  # pylint: disable=import-outside-toplevel
+
+    client = ASGIClient(app)
+    await client.startup()
+    if args.warm_mapping:
+        await client.request("POST", "/mapping/rebuild")
+    for fake in (amocrm, sheets):
+        fake.calls.clear()
+        fake.rejected.clear()
+
+    driver = LoadDriver(client, amocrm, sheets, rnd)
+    started = time.perf_counter()
+    await replay(driver, records, args.speed)
+    elapsed = time.perf_counter() - started
+    await client.shutdown()
+    report = build_report(driver, [amocrm, sheets], elapsed, [])
+    report["captured_s"] = round(records[-1]["t"] - records[0]["t"], 2)
+    report["speed"] = args.speed
+    return report
+
+
+def main() -> None:
+    """Воспроизведение записи вебхуков."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", type=Path, help="Файл записи (WEBHOOK_CAPTURE_FILE в каталоге STATE_DIR)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Ускорение относительно записи; 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=None, help="Воспроизвести только первые N записей")
+    parser.add_argument("--rows", type=int, default=2000, help="Минимум строк в таблице")
+    parser.add_argument("--linked", type=float, default=0.5, help="Доля строк, уже связанных со сделками")
+    parser.add_argument("--amo-latency", type=float, default=0.15, help="Задержка ответа AmoCRM (сек)")
+    parser.add_argument("--sheets-latency", type=float, default=0.2, help="Задержка ответа Google Sheets (сек)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Разброс задержки (доля)")
+    parser.add_argument("--amo-429", type=float, default=0.0, help="Доля ответов 429 от AmoCRM")
+    parser.add_argument("--sheets-429", type=float, default=0.0, help="Доля ответов 429 от Google Sheets")
+    parser.add_argument("--redis", choices=("fake", "off", "server"), default="fake", help="Redis для теста")
+    parser.add_argument("--cold-mapping", dest="warm_mapping", action="store_false", help="Не строить связку строк заранее")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    records = load_records(args.capture, args.limit)
+    if not records:
+        raise SystemExit(f"В {args.capture} нет записанных запросов")
+    configure_environment(args)
+    report = asyncio.run(run(args, records))
+    print(f"\nЗапись {report['captured_s']} с, ускорение {args.speed or 'без пауз'}")
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-const WEBHOOK_URL = "https://your-domain.com/webhook/sheets";
+const WEBHOOK_URL = "https://your-domain.com/webhook/sheets/batch";
 const WEBHOOK_SECRET = "your-super-secret-key-here";
+const MAX_ROWS_PER_REQUEST = 1000;
 
 function handleEdit(e) {
   try {
@@ -8,64 +9,75 @@ function handleEdit(e) {
       return;
     }
 
-    Utilities.sleep(3000)
+    const sheet = e.range.getSheet();
+    const firstRow = Math.max(e.range.getRow(), 2);
+    const lastRow = e.range.getLastRow();
+    if (lastRow < firstRow) return;
 
-    const sheet = e.source.getActiveSheet();
-    const row = e.range.getRow();
-    if (row === 1) return;
+    const lastColumn = sheet.getLastColumn();
+    const headers = sheet.getRange(1, 1, 1, lastColumn).getValues()[0]
+      .map((header) => String(header).trim().toLowerCase());
+    const values = sheet.getRange(firstRow, 1, lastRow - firstRow + 1, lastColumn).getValues();
 
-    const headers = sheet.getRange(1, 1, 1, sheet.getLastColumn()).getValues()[0];
-    const values = sheet.getRange(row, 1, 1, sheet.getLastColumn()).getValues()[0];
+    const rows = [];
+    values.forEach((rowValues, offset) => {
+      const data = {};
+      headers.forEach((header, i) => {
+        data[header] = rowValues[i] ?? "";
+      });
 
-    const data = {};
-    headers.forEach((header, i) => {
-      data[header.trim().toLowerCase()] = values[i] ?? "";
-    });
+      const name = String(data.name || "");
+      const phone = String(data.phone || "");
+      const email = String(data.email || "");
+      const budget = parseFloat(data.budget) || 0;
+
+      if (!name && !phone && !email) {
+        return;
+      }
 
-    const name = data.name || "";
-    const phone = String(data.phone || "");
-    const email = String(data.email || "");
-    const budget = parseFloat(data.budget) || 0;
-    const amoDealId = String(data.amo_deal_id || "");
+      rows.push({
+        row_index: firstRow + offset,
+        data: {
+          name,
+          phone,
+          email,
+          budget,
+          external_id: null
+        }
+      });
+    });
 
-    if (!name && !phone && !email) {
-      Logger.log(`Пустая строка ${row} — пропуск`);
+    if (rows.length === 0) {
+      Logger.log(`Пустые строки ${firstRow}-${lastRow} — пропуск`);
       return;
     }
 
-    const payload = {
-      row_index: row,
-      data: {
-        name,
-        phone,
-        email,
-        budget,
-        amo_deal_id: amoDealId,
-        external_id: null
-      }
-    };
-
-    const options = {
-      method: "post",
-      contentType: "application/json",
-      headers: {
-        "X-Webhook-Secret": WEBHOOK_SECRET
-      },
-      payload: JSON.stringify(payload),
-      muteHttpExceptions: true
-    };
+    for (let start = 0; start < rows.length; start += MAX_ROWS_PER_REQUEST) {
+      const batch = rows.slice(start, start + MAX_ROWS_PER_REQUEST);
+      const options = {
+        method: "post",
+        contentType: "application/json",
+        headers: {
+          "X-Webhook-Secret": WEBHOOK_SECRET
+        },
+        payload: JSON.stringify({ rows: batch }),
+        muteHttpExceptions: true
+      };
 
-    const response = UrlFetchApp.fetch(WEBHOOK_URL, options);
-    const code = response.getResponseCode();
-    const text = response.getContentText();
+      const response = UrlFetchApp.fetch(WEBHOOK_URL, options);
+      const code = response.getResponseCode();
+      const text = response.getContentText();
+      const first = batch[0].row_index;
+      const last = batch[batch.length - 1].row_index;
 
-    if (code >= 200 && code < 300) {
-      Logger.log(`Вебхук успешно отправлен для строки ${row}: ${code}`);
-    } else {
-      Logger.log(`Ошибка при отправке строки ${row}: ${code} ${text}`);
+      if (code >= 200 && code < 300) {
+        Logger.log(`Вебхук успешно отправлен для строк ${first}-${last}: ${code}`);
+      } else {
+        Logger.log(`Ошибка при отправке строк ${first}-${last}: ${code} ${text}`);
+      }
     }
 
   } catch (err) {
     Logger.log(`Exception: ${err.message}`);
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,28 @@
+import os
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+# Обязательные настройки приложения: тесты не читают .env и не обращаются к AmoCRM, Google Sheets и Redis
+for _name in (
+    "GOOGLE_SPREADSHEET_ID",
+    "AMO_CLIENT_ID",
+    "AMO_CLIENT_SECRET",
+    "AMO_AUTH_CODE",
+    "AMO_ACCESS_TOKEN",
+    "AMO_REFRESH_TOKEN",
+    "WEBHOOK_SECRET",
+):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="tests-state-"))
+
+from app.core.settings import get_settings  # noqa: E402  pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def state_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Отдельный каталог STATE_DIR теста: хранилища, созданные в тесте, пишут свои SQLite базы в него."""
+    monkeypatch.setattr(get_settings(), "STATE_DIR", str(tmp_path))
+    yield tmp_path
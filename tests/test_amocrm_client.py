@@ -0,0 +1,38 @@
+from app.core.amocrm_client import contact_fields_update
+
+
+class TestContactFieldsUpdate:
+    """Тесты значений телефона и email для пакетного обновления контактов."""
+
+    def test_without_current_values(self) -> None:
+        """Тест: у контакта без известных значений пишется одно рабочее значение."""
+        assert contact_fields_update("+79990000000", None) == [
+            {"field_code": "PHONE", "values": [{"value": "+79990000000", "enum_code": "WORK"}]}
+        ]
+
+    def test_other_values_kept(self) -> None:
+        """Тест: остальные адреса контакта сохраняются, прежний рабочий становится OTHER."""
+        current = {
+            "emails": [
+                {"value": "old@example.com", "enum_code": "WORK"},
+                {"value": "home@example.com", "enum_code": "PRIV"},
+            ]
+        }
+        assert contact_fields_update(None, "new@example.com", current) == [
+            {
+                "field_code": "EMAIL",
+                "values": [
+                    {"value": "new@example.com", "enum_code": "WORK"},
+                    {"value": "old@example.com", "enum_code": "OTHER"},
+                    {"value": "home@example.com", "enum_code": "PRIV"},
+                ],
+            }
+        ]
+
+    def test_existing_value_not_duplicated(self) -> None:
+        """Тест: значение, которое уже есть у контакта в другом написании, не дублируется."""
+        current = {"phones": [{"value": "8 (999) 000-00-00", "enum_code": "MOB"}, {"value": "+79991111111", "enum_code": None}]}
+        assert contact_fields_update("+79990000000", None, current)[0]["values"] == [
+            {"value": "+79990000000", "enum_code": "WORK"},
+            {"value": "+79991111111", "enum_code": "OTHER"},
+        ]
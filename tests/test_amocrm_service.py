@@ -0,0 +1,213 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.core.mapping_store import MappingStore
+from app.core.outbox import SheetsOutbox
+from app.core.sync_lock import SyncLock
+from app.core.utils import sync_fingerprint
+from app.services import amocrm_service
+
+
+class FakeRequest:
+    """Вебхук AmoCRM в form-urlencoded."""
+
+    def __init__(self, form: dict[str, str]) -> None:
+        self.headers = {"content-type": "application/x-www-form-urlencoded"}
+        self._form = form
+
+    async def form(self) -> dict[str, str]:
+        return self._form
+
+
+@pytest.fixture
+def sheet(state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[dict[str, Any]]:
+    """Таблица из трех строк и сделка 7 в AmoCRM; записи и полные чтения таблицы учитываются."""
+    state: dict[str, Any] = {
+        "rows": {
+            2: {"name": "Иван", "amo_deal_id": "5", "amo_contact_id": ""},
+            3: {"name": "Петр", "amo_deal_id": "7", "amo_contact_id": ""},
+        },
+        "full_reads": 0,
+        "written": {},
+    }
+    store = MappingStore()
+    outbox = SheetsOutbox()
+
+    async def read_rows_at(indices: list[int]) -> dict[int, dict[str, Any]]:
+        return {i: dict(state["rows"][i]) for i in indices if i in state["rows"]}
+
+    async def read_all_rows() -> list[dict[str, Any]]:
+        state["full_reads"] += 1
+        return [state["rows"][i] for i in sorted(state["rows"])]
+
+    async def find_row_by_deal_id(deal_id: int) -> int | None:
+        return await store.find_row_by_deal_id(deal_id)
+
+    async def update_cells(row_index: int, mapping: dict[str, Any]) -> None:
+        state["written"][row_index] = mapping
+
+    async def update_rows(updates: dict[int, dict[str, Any]]) -> None:
+        state["written"].update(updates)
+
+    async def get_lead_info(lead_id: int) -> dict[str, Any]:
+        return {"id": lead_id, "name": "Петр", "price": 500}
+
+    async def get_contacts_by_ids(_contact_ids: list[int]) -> dict[int, dict[str, Any]]:
+        return {}
+
+    monkeypatch.setattr(amocrm_service, "mapping_store", store)
+    monkeypatch.setattr(amocrm_service, "sheets_outbox", outbox)
+    monkeypatch.setattr(amocrm_service.sheets_client, "read_rows_at", read_rows_at)
+    monkeypatch.setattr(amocrm_service.sheets_client, "read_all_rows", read_all_rows)
+    monkeypatch.setattr(amocrm_service.sheets_client, "find_row_by_deal_id", find_row_by_deal_id)
+    monkeypatch.setattr(amocrm_service.sheets_client, "update_cells", update_cells)
+    monkeypatch.setattr(amocrm_service.sheets_client, "update_rows", update_rows)
+    monkeypatch.setattr(amocrm_service.amocrm_client, "get_lead_info", get_lead_info)
+    monkeypatch.setattr(amocrm_service.amocrm_client, "get_contacts_by_ids", get_contacts_by_ids)
+    yield state
+    store.close()
+    outbox._db.close()  # pylint: disable=protected-access
+
+
+def _deliver(lead_id: int) -> dict[str, str]:
+    request: Any = FakeRequest({"leads[update][0][id]": str(lead_id)})
+    return asyncio.run(amocrm_service._process_webhook_amocrm_internal(request))  # pylint: disable=protected-access
+
+
+class TestAmoCRMWebhook:
+    """Тесты поиска строки вебхуком AmoCRM."""
+
+    def test_reads_only_mapped_row(self, sheet: dict[str, Any]) -> None:
+        """Тест: строка из связки читается отдельно, вся таблица не читается."""
+        asyncio.run(amocrm_service.mapping_store.record({3: {"amo_deal_id": "7"}}))
+        assert _deliver(7)["status"] == "ok"
+        assert sheet["full_reads"] == 0
+        assert sheet["written"] == {3: {"name": "Петр", "budget": "500"}}
+
+    def test_stale_mapping_rebuilds_from_sheet(self, sheet: dict[str, Any]) -> None:
+        """Тест: строка связки с другой сделкой - связка перестраивается по всей таблице."""
+        asyncio.run(amocrm_service.mapping_store.record({2: {"amo_deal_id": "7"}}))
+        sheet["rows"][2]["amo_deal_id"] = "5"
+        assert _deliver(7)["status"] == "ok"
+        assert sheet["full_reads"] == 1
+        assert list(sheet["written"]) == [3]
+
+    def test_shifted_blank_row_rebuilds_from_sheet(self, sheet: dict[str, Any]) -> None:
+        """Тест: строка связки сдвинулась на пустую строку без amo_deal_id - чужая строка не перезаписывается."""
+        asyncio.run(amocrm_service.mapping_store.record({4: {"amo_deal_id": "7"}}))
+        sheet["rows"][4] = {"name": "Новый клиент", "amo_deal_id": "", "amo_contact_id": ""}
+        assert _deliver(7)["status"] == "ok"
+        assert sheet["full_reads"] == 1
+        assert list(sheet["written"]) == [3]
+
+    def test_outbox_row_without_deal_id_written(self, sheet: dict[str, Any]) -> None:
+        """Тест: строка из outbox с еще не записанным amo_deal_id обновляется без чтения таблицы."""
+        asyncio.run(amocrm_service.sheets_outbox.add(4, {"amo_deal_id": "7"}))
+        sheet["rows"][4] = {"name": "Петр", "amo_deal_id": "", "amo_contact_id": ""}
+        assert _deliver(7)["status"] == "ok"
+        assert sheet["full_reads"] == 0
+        assert list(sheet["written"]) == [4]
+
+    def test_poll_skips_shifted_blank_row(self, sheet: dict[str, Any]) -> None:
+        """Тест: опрос не пишет сделку в пустую строку, на которую указывает устаревшая связка, и снимает связку."""
+        asyncio.run(amocrm_service.mapping_store.record({4: {"amo_deal_id": "7"}}))
+        sheet["rows"][4] = {"name": "Новый клиент", "amo_deal_id": "", "amo_contact_id": ""}
+        assert asyncio.run(amocrm_service.apply_lead_changes([{"id": 7, "name": "Петр", "updated_at": 1000}])) == 0
+        assert not sheet["written"]
+        assert asyncio.run(amocrm_service.mapping_store.find_row_by_deal_id(7)) is None
+
+
+    def test_written_values_recognized_as_echo(self, sheet: dict[str, Any], monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: вебхук Sheets с записанными значениями - эхо, правка пользователя сразу после записи - нет."""
+        monkeypatch.setattr(amocrm_service.settings, "REDIS_HOST", "")
+        lock = SyncLock()
+        monkeypatch.setattr(amocrm_service, "sync_lock", lock)
+        asyncio.run(amocrm_service.mapping_store.record({3: {"amo_deal_id": "7"}}))
+        assert _deliver(7)["status"] == "ok"
+
+        async def check() -> list[set[int]]:
+            return [
+                await lock.find_amocrm_echoes({3: sync_fingerprint("Петр", None, None, 500.0)}),
+                await lock.find_amocrm_echoes({3: sync_fingerprint("Петр", None, None, 600.0)}),
+                # Пользователь вернул записанные значения: это уже его правка, а не эхо
+                await lock.find_amocrm_echoes({3: sync_fingerprint("Петр", None, None, 500.0)}),
+            ]
+
+        assert sheet["written"] == {3: {"name": "Петр", "budget": "500"}}
+        assert asyncio.run(check()) == [{3}, set(), set()]
+
+
+@pytest.fixture
+def poller(state_dir: Path) -> Iterator[amocrm_service.AmoCRMPoller]:
+    """Опрос с курсором в каталоге теста."""
+    instance = amocrm_service.AmoCRMPoller()
+    yield instance
+    instance._db.close()  # pylint: disable=protected-access
+
+
+class TestAmoCRMPoller:
+    """Тесты постраничного опроса AmoCRM."""
+
+    def test_cursor_saved_per_page_and_stops_without_lease(
+        self, poller: amocrm_service.AmoCRMPoller, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: курсор сохраняется после каждой страницы, при потере аренды следующая страница не запрашивается."""
+        pages = [[{"id": 1, "updated_at": 110}, {"id": 2, "updated_at": 120}], [{"id": 3, "updated_at": 130}]]
+        requested: list[int] = []
+        cursors: list[int | None] = []
+
+        async def get_leads_updated_since(since: int) -> Any:
+            for page in pages:
+                requested.append(since)
+                yield page
+
+        async def apply_lead_changes(leads: list[dict[str, Any]]) -> int:
+            cursors.append(await poller.get_cursor())
+            return len(leads)
+
+        async def renew_lease(_name: str, _owner: str, _ttl: int) -> bool:
+            return False
+
+        monkeypatch.setattr(amocrm_service.amocrm_client, "get_leads_updated_since", get_leads_updated_since)
+        monkeypatch.setattr(amocrm_service, "apply_lead_changes", apply_lead_changes)
+        monkeypatch.setattr(amocrm_service.sync_lock, "renew_lease", renew_lease)
+
+        async def run() -> tuple[dict[str, int], int | None]:
+            await poller._set_cursor(100)  # pylint: disable=protected-access
+            return await poller.poll(60), await poller.get_cursor()
+
+        result, cursor = asyncio.run(run())
+        assert result == {"leads": 2, "updated": 2}
+        assert cursor == 120
+        assert requested == [100]
+        assert cursors == [100]
+
+    def test_without_lease_all_pages_applied(
+        self, poller: amocrm_service.AmoCRMPoller, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: без аренды применяются все страницы, курсор - последняя версия."""
+        pages = [[{"id": 1, "updated_at": 110}], [{"id": 2, "updated_at": 130}]]
+        cursors: list[int | None] = []
+
+        async def get_leads_updated_since(_since: int) -> Any:
+            for page in pages:
+                yield page
+
+        async def apply_lead_changes(leads: list[dict[str, Any]]) -> int:
+            cursors.append(await poller.get_cursor())
+            return len(leads)
+
+        monkeypatch.setattr(amocrm_service.amocrm_client, "get_leads_updated_since", get_leads_updated_since)
+        monkeypatch.setattr(amocrm_service, "apply_lead_changes", apply_lead_changes)
+
+        async def run() -> int | None:
+            await poller._set_cursor(100)  # pylint: disable=protected-access
+            await poller.poll()
+            return await poller.get_cursor()
+
+        assert asyncio.run(run()) == 130
+        assert cursors == [100, 110]
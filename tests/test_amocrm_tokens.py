@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import jwt
+import pytest
+
+from app.core import amocrm_tokens as amocrm_tokens_module
+from app.core.amocrm_tokens import AmoTokenManager, SharedTokensStorage
+from app.core.sync_lock import SyncLock
+
+
+def _token(expires_in: float) -> str:
+    """Access token (JWT) с заданным сроком действия."""
+    return jwt.encode({"exp": int(time.time() + expires_in)}, "test-secret-" + "0" * 32, algorithm="HS256")
+
+
+EXPIRING_TOKEN = _token(10)
+FRESH_TOKEN = _token(3600)
+
+
+@pytest.fixture
+def refreshes(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Обновление токенов в AmoCRM без сети: записывает выданный refresh token каждого вызова."""
+    calls: list[str] = []
+    guard = threading.Lock()
+
+    def get_new_tokens() -> tuple[str, str]:
+        time.sleep(0.1)
+        with guard:
+            calls.append(f"r{len(calls) + 1}")
+            return FRESH_TOKEN, calls[-1]
+
+    monkeypatch.setattr(amocrm_tokens_module.tokens.default_token_manager, "_get_new_tokens", get_new_tokens)
+    monkeypatch.setattr(amocrm_tokens_module, "REFRESH_WAIT_INTERVAL", 0.01)
+    return calls
+
+
+def _use_lock(monkeypatch: pytest.MonkeyPatch, lock: SyncLock) -> SyncLock:
+    """Подменить общий SyncLock модуля токенов."""
+    monkeypatch.setattr(amocrm_tokens_module, "sync_lock", lock)
+    return lock
+
+
+def _fake_redis_lock(monkeypatch: pytest.MonkeyPatch) -> SyncLock:
+    """SyncLock с fakeredis: один сервер Redis на все менеджеры теста (воркеры и узлы)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    lock = SyncLock()
+
+    def create_client() -> Any:
+        return fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    lock._create_client = create_client  # type: ignore[method-assign]  # pylint: disable=protected-access
+    return _use_lock(monkeypatch, lock)
+
+
+def _manager(directory: Path) -> AmoTokenManager:
+    """Менеджер токенов процесса с истекающим access token и файловой копией в каталоге теста."""
+    directory.mkdir(parents=True, exist_ok=True)
+    manager = AmoTokenManager()
+    manager.storage = SharedTokensStorage(str(directory))
+    manager.storage.load(EXPIRING_TOKEN, "r0")
+    return manager
+
+
+class TestTokenRefresh:
+    """Тесты заблаговременного обновления токенов AmoCRM."""
+
+    def test_single_flight_in_process(self, tmp_path: Path, refreshes: list[str], monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: одновременные проверки в одном процессе обновляют токены один раз."""
+        lock = _fake_redis_lock(monkeypatch)
+        manager = _manager(tmp_path)
+
+        async def run() -> list[bool]:
+            await lock.connect()
+            return list(await asyncio.gather(*(manager.refresh_if_needed() for _ in range(5))))
+
+        assert sorted(asyncio.run(run())) == [False, False, False, False, True]
+        assert len(refreshes) == 1
+        assert manager.storage.get_access_token() == FRESH_TOKEN
+
+    def test_tokens_shared_between_processes(
+        self, tmp_path: Path, refreshes: list[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: токены обновляет один воркер под арендой, остальные берут новые токены из Redis."""
+        lock = _fake_redis_lock(monkeypatch)
+        workers = [_manager(tmp_path / str(i)) for i in range(3)]
+
+        async def run() -> tuple[str, str] | None:
+            await lock.connect()
+            await amocrm_tokens_module.save_shared_tokens(EXPIRING_TOKEN, "r0")
+            await asyncio.gather(*(worker.refresh_if_needed() for worker in workers))
+            return await amocrm_tokens_module.get_shared_tokens()
+
+        assert asyncio.run(run()) == (FRESH_TOKEN, "r1")
+        assert len(refreshes) == 1
+        assert [worker.storage.get_refresh_token() for worker in workers] == ["r1", "r1", "r1"]
+
+    def test_without_redis(self, tmp_path: Path, refreshes: list[str], monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: без Redis (пустой REDIS_HOST) процесс обновляет свои токены сам, общих токенов нет."""
+        monkeypatch.setattr(amocrm_tokens_module.settings, "REDIS_HOST", "")
+        _use_lock(monkeypatch, SyncLock())
+        manager = _manager(tmp_path)
+
+        async def run() -> tuple[bool, tuple[str, str] | None]:
+            refreshed = await manager.refresh_if_needed()
+            return refreshed, await amocrm_tokens_module.get_shared_tokens()
+
+        assert asyncio.run(run()) == (True, None)
+        assert len(refreshes) == 1
+        assert manager.storage.get_access_token() == FRESH_TOKEN
+        assert (tmp_path / "access_token.txt").read_text() == FRESH_TOKEN
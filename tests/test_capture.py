@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+import pytest
+
+from app.core import capture
+from app.core.capture import REDACTED, WebhookCapture, capture_record, record_body
+
+
+@pytest.fixture(autouse=True)
+def redact_names(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Скрываемые имена заголовков и полей."""
+    monkeypatch.setattr(capture.settings, "WEBHOOK_CAPTURE_REDACT_HEADERS", "x-webhook-secret,token")
+
+
+def _record(body: bytes, content_type: str, query: str = "") -> dict[str, object]:
+    headers = [("content-type", content_type), ("x-webhook-secret", "s3cr3t"), ("host", "example.com")]
+    return capture_record(1.0, "POST", "/webhook/sheets", query, headers, body)
+
+
+class TestCaptureRedaction:
+    """Тесты скрытия секретов в записи вебхуков."""
+
+    def test_headers_and_query(self) -> None:
+        """Тест: заголовки и параметры запроса скрываются по имени, служебные заголовки не пишутся."""
+        record = _record(b"{}", "application/json", "token=abc&page=2")
+        assert record["h"] == {"content-type": "application/json", "x-webhook-secret": REDACTED}
+        assert parse_qsl(str(record["q"])) == [("token", REDACTED), ("page", "2")]
+
+    def test_json_fields(self) -> None:
+        """Тест: значения ключей JSON скрываются на любой глубине, остальной текст не меняется."""
+        body = {"rows": [{"row_index": 2, "data": {"name": "token s3cr3t", "token": "abc"}}]}
+        record = _record(json.dumps(body).encode(), "application/json")
+        data = json.loads(record_body(record))
+        assert data["rows"][0]["data"] == {"name": "token s3cr3t", "token": REDACTED}
+
+    def test_form_fields(self) -> None:
+        """Тест: поля формы скрываются по имени или последнему сегменту имени."""
+        body = b"leads%5Bupdate%5D%5B0%5D%5Bid%5D=7&account%5Btoken%5D=abc"
+        fields = dict(parse_qsl(record_body(_record(body, "application/x-www-form-urlencoded")).decode()))
+        assert fields == {"leads[update][0][id]": "7", "account[token]": REDACTED}
+
+    def test_body_without_secrets_unchanged(self) -> None:
+        """Тест: тело без скрываемых полей сохраняется байт в байт."""
+        body = b'{"row_index": 2,  "data": {"name": "x-webhook-secret"}}'
+        assert record_body(_record(body, "application/json")) == body
+
+
+class TestWebhookCapture:
+    """Тесты записи в файл потоком записи."""
+
+    def test_write_and_close(self, state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: записи из очереди дописываются в файл к закрытию."""
+        monkeypatch.setattr(capture.settings, "WEBHOOK_CAPTURE_FILE", "webhooks.jsonl")
+        writer = WebhookCapture()
+        for i in range(3):
+            writer.write(_record(json.dumps({"row_index": i}).encode(), "application/json"))
+        writer.close()
+        lines = (state_dir / "webhooks.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(record_body(json.loads(line)))["row_index"] for line in lines] == [0, 1, 2]
+
+    def test_stops_at_max_size(self, state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: по достижении WEBHOOK_CAPTURE_MAX_MB запись останавливается."""
+        monkeypatch.setattr(capture.settings, "WEBHOOK_CAPTURE_FILE", "webhooks.jsonl")
+        monkeypatch.setattr(capture.settings, "WEBHOOK_CAPTURE_MAX_MB", 300 / 2**20)
+        writer = WebhookCapture()
+        for i in range(5):
+            writer.write(_record(json.dumps({"row_index": i}).encode(), "application/json"))
+        writer.close()
+        assert not writer.enabled
+        assert 0 < len((state_dir / "webhooks.jsonl").read_text(encoding="utf-8").splitlines()) < 5
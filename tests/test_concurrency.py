@@ -0,0 +1,99 @@
+import asyncio
+import contextlib
+
+import pytest
+from amocrm.v2.exceptions import AmoApiException  # type: ignore[import-untyped]
+
+from app.core import concurrency as concurrency_module
+from app.core.concurrency import AdaptiveLimiter, ExecutorSaturated, LimiterConfig, is_overload_error
+
+
+@pytest.fixture(autouse=True)
+def no_registered_limiters(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ограничители тестов не попадают в общий список метрик."""
+    monkeypatch.setattr(concurrency_module, "limiters", [])
+
+
+def _limiter(initial: int, minimum: int = 1, maximum: int = 8, latency_target: float = 60.0) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test", lambda: LimiterConfig(initial, minimum, maximum, latency_target))
+
+
+async def _call(limiter: AdaptiveLimiter, error: BaseException | None = None) -> None:
+    """Вызов в слоте ограничителя, завершающийся ошибкой error."""
+    with contextlib.suppress(Exception):
+        async with limiter.slot():
+            if error is not None:
+                raise error
+
+
+class TestAdaptiveLimiter:
+    """Тесты адаптивного ограничения параллелизма (AIMD)."""
+
+    def test_additive_increase(self) -> None:
+        """Тест: лимит растет на 1 после `limit` быстрых успешных вызовов и не выходит за максимум."""
+        limiter = _limiter(2, maximum=4)
+
+        async def run() -> list[int]:
+            limits = []
+            for _ in range(9):
+                await _call(limiter)
+                limits.append(limiter.limit)
+            return limits
+
+        assert asyncio.run(run()) == [2, 3, 3, 3, 4, 4, 4, 4, 4]
+
+    def test_multiplicative_decrease_on_overload(self) -> None:
+        """Тест: 429 от AmoCRM вдвое снижает лимит, ответы тех же запросов повторно не снижают."""
+        limiter = _limiter(8)
+
+        async def run() -> list[int]:
+            await _call(limiter, AmoApiException("Wrong status 429 (Too Many Requests)"))
+            first = limiter.limit
+            await _call(limiter, AmoApiException("Wrong status 503 (Service Unavailable)"))
+            return [first, limiter.limit]
+
+        assert asyncio.run(run()) == [4, 4]
+
+    def test_decrease_on_latency_and_minimum(self) -> None:
+        """Тест: задержка выше целевой снижает лимит, но не ниже минимума."""
+        limiter = _limiter(3, minimum=2, latency_target=0.0)
+
+        async def run() -> list[int]:
+            limits = []
+            for _ in range(2):
+                await limiter.acquire()
+                await limiter.release(latency=1.0)
+                limits.append(limiter.limit)
+            return limits
+
+        assert asyncio.run(run()) == [2, 2]
+
+    def test_other_errors_do_not_decrease(self) -> None:
+        """Тест: ошибка, не означающая перегрузку API, лимит не снижает."""
+        limiter = _limiter(4)
+
+        async def run() -> int:
+            await _call(limiter, ValueError("bad row"))
+            return limiter.limit
+
+        assert asyncio.run(run()) == 4
+        assert not is_overload_error(AmoApiException("Wrong status 400 (Bad Request)"))
+        assert is_overload_error(ExecutorSaturated("amocrm", 1.0))
+
+    def test_slots_limited(self) -> None:
+        """Тест: одновременно выполняется не больше `limit` вызовов."""
+        limiter = _limiter(2, maximum=2)
+        peak = 0
+
+        async def call() -> None:
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        async def run() -> None:
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(run())
+        assert peak == 2
+        assert limiter.in_flight == 0
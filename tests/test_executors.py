@@ -0,0 +1,150 @@
+import asyncio
+import threading
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from app.core import executors
+from app.core.concurrency import INTERACTIVE, ExecutorSaturated, work_class
+from app.core.executors import BoundedExecutor
+from app.core.metrics import EXECUTOR_REJECTED
+from app.models.webhook_row import WebhookBatch
+from app.services import sheets_service
+
+
+@pytest.fixture
+def executor(monkeypatch: pytest.MonkeyPatch) -> Iterator[BoundedExecutor]:
+    """Пул на 4 потока и 2 вызова в очереди: фоновым задачам гарантирован 1 поток и доступно не больше 2."""
+    monkeypatch.setattr(executors.settings, "EXECUTOR_BACKGROUND_MAX_SHARE", 0.5)
+    monkeypatch.setattr(executors.settings, "EXECUTOR_BACKGROUND_MIN_SHARE", 0.25)
+    pool = BoundedExecutor("test", lambda: 4, lambda: 2)
+    yield pool
+    pool.shutdown()
+
+
+class TestExecutorPriority:
+    """Тесты приоритетов классов работы в пуле потоков."""
+
+    def test_threads_granted_by_priority_and_shares(self, executor: BoundedExecutor) -> None:
+        """Тест: опрос получает гарантированный фону поток раньше импорта, остальные - вебхуки, затем фон до своей доли."""
+        granted: list[str] = []
+
+        async def run() -> list[list[str]]:
+            loop = asyncio.get_running_loop()
+            for work in ["import", "import", "import", "poll", INTERACTIVE, INTERACTIVE, INTERACTIVE]:
+                waiter = loop.create_future()
+                waiter.add_done_callback(lambda _, work=work: granted.append(work))
+                executor._waiters[work].append(waiter)  # pylint: disable=protected-access
+            steps = []
+            executor._dispatch()  # pylint: disable=protected-access
+            await asyncio.sleep(0)
+            steps.append(granted[:])
+            for work in [INTERACTIVE, "import", INTERACTIVE]:
+                granted.clear()
+                executor._release(work)  # pylint: disable=protected-access
+                await asyncio.sleep(0)
+                steps.append(granted[:])
+            return steps
+
+        assert asyncio.run(run()) == [["poll", INTERACTIVE, INTERACTIVE, INTERACTIVE], ["import"], ["import"], []]
+        assert executor.running == {INTERACTIVE: 1, "poll": 1, "import": 1}
+
+    def test_saturation_counts_higher_priorities(self, executor: BoundedExecutor) -> None:
+        """Тест: очередь фоновых задач не отклоняет вебхуки, очередь вебхуков отклоняет фоновые задачи."""
+        executor.pending["import"] = executor.capacity
+        assert executor.saturated("import")
+        assert not executor.saturated(INTERACTIVE)
+        executor.pending.clear()
+        executor.pending[INTERACTIVE] = executor.capacity
+        assert executor.saturated("poll")
+        assert executor.saturated(INTERACTIVE)
+
+    def test_webhook_overtakes_queued_background_call(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: вызов вебхука выполняется раньше фонового вызова, вставшего в очередь до него."""
+        monkeypatch.setattr(executors.settings, "EXECUTOR_BACKGROUND_MAX_SHARE", 0.5)
+        pool = BoundedExecutor("test", lambda: 2, lambda: 0)
+        release = threading.Event()
+        order: list[str] = []
+
+        def call(name: str) -> None:
+            if name == "first":
+                release.wait(5)
+            order.append(name)
+
+        async def background(name: str) -> None:
+            with work_class("import"):
+                await pool.run(call, name)
+
+        async def run() -> None:
+            first = asyncio.create_task(background("first"))
+            await asyncio.sleep(0.05)
+            queued = asyncio.create_task(background("queued"))
+            await asyncio.sleep(0.05)
+            with pytest.raises(ExecutorSaturated):
+                await background("rejected")
+            await pool.run(call, "webhook")
+            release.set()
+            await asyncio.gather(first, queued)
+
+        try:
+            asyncio.run(run())
+        finally:
+            release.set()
+            pool.shutdown()
+        assert order == ["webhook", "first", "queued"]
+
+
+class TestExecutorSaturation:
+    """Тесты сброса нагрузки заполненным пулом потоков."""
+
+    def test_rejects_when_full_and_recovers(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: вызов сверх потоков и очереди сразу отклоняется с Retry-After, после разгрузки пул снова принимает вызовы."""
+        monkeypatch.setattr(executors.settings, "EXECUTOR_RETRY_AFTER", 3.0)
+        pool = BoundedExecutor("saturation-test", lambda: 1, lambda: 1)
+        release = threading.Event()
+        rejected_before = EXECUTOR_REJECTED.value(executor="saturation-test")
+
+        def call(name: str) -> str:
+            if name == "blocking":
+                release.wait(5)
+            return name
+
+        async def run() -> tuple[float, list[str], str]:
+            running = asyncio.create_task(pool.run(call, "blocking"))
+            queued = asyncio.create_task(pool.run(call, "queued"))
+            await asyncio.sleep(0.05)
+            with pytest.raises(ExecutorSaturated) as error:
+                await pool.run(call, "rejected")
+            release.set()
+            results = list(await asyncio.gather(running, queued))
+            return error.value.retry_after, results, await pool.run(call, "after")
+
+        try:
+            retry_after, results, after = asyncio.run(run())
+        finally:
+            release.set()
+            pool.shutdown()
+        assert retry_after == 3.0
+        assert results == ["blocking", "queued"]
+        assert after == "after"
+        assert EXECUTOR_REJECTED.value(executor="saturation-test") == rejected_before + 1
+        assert not +pool.pending and not +pool.running
+
+    def test_webhook_rejected_before_work(self, executor: BoundedExecutor, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: при заполненном пуле вебхук отклоняется до начала обработки строк."""
+        processed: list[Any] = []
+
+        async def process_sheet_rows(rows: Any) -> dict[int, dict[str, Any]]:
+            processed.append(rows)
+            return {}
+
+        executor.pending[INTERACTIVE] = executor.capacity
+        monkeypatch.setattr(executors, "executors", [executor])
+        monkeypatch.setattr(sheets_service, "process_sheet_rows", process_sheet_rows)
+        batch = WebhookBatch(rows=[{"row_index": 2, "data": {"name": "Клиент"}}])
+
+        with pytest.raises(ExecutorSaturated) as error:
+            asyncio.run(sheets_service.process_webhook_sheets_batch(batch, executors.settings.WEBHOOK_SECRET))
+        assert error.value.executor == "test"
+        assert not processed
@@ -0,0 +1,98 @@
+import argparse
+from typing import Any
+
+import gspread
+import pytest
+from requests import Session
+
+from benchmarks.fakes import FakeAmoCRM, FakeSheets, current_scenario
+from benchmarks.load_test import parse_mix, percentile
+
+AMO_URL = "https://test.amocrm.ru/api/v4"
+SHEETS_URL = "https://sheets.googleapis.com/v4/spreadsheets/sheet-1"
+
+
+def _session(fake: Any) -> Session:
+    session = Session()
+    session.mount("https://", fake)
+    return session
+
+
+class TestFakeAmoCRM:
+    """Тесты заглушки AmoCRM API v4."""
+
+    def test_create_search_and_pages(self) -> None:
+        """Тест: созданный контакт находится поиском, списки отдаются страницами, пустая страница - 204."""
+        amocrm = FakeAmoCRM(pipeline_id=1, status_id=10)
+        session = _session(amocrm)
+        created = session.post(
+            f"{AMO_URL}/contacts",
+            json=[{"name": "Иван", "custom_fields_values": [{"field_code": "PHONE", "values": [{"value": "+79991234567"}]}]}],
+        ).json()
+        contact_id = created["_embedded"]["contacts"][0]["id"]
+        for i in range(3):
+            amocrm.add_lead(f"Сделка {i}", 100 * i, contact_id)
+
+        found = session.get(f"{AMO_URL}/contacts", params={"query": "+79991234567"}).json()
+        first = session.get(f"{AMO_URL}/leads", params={"limit": 2, "page": 1}).json()
+        last = session.get(f"{AMO_URL}/leads", params={"limit": 2, "page": 2}).json()
+        assert [item["id"] for item in found["_embedded"]["contacts"]] == [contact_id]
+        assert len(first["_embedded"]["leads"]) == 2 and "next" in first["_links"]
+        assert len(last["_embedded"]["leads"]) == 1 and "next" not in last["_links"]
+        assert session.get(f"{AMO_URL}/leads", params={"limit": 2, "page": 3}).status_code == 204
+        lead = first["_embedded"]["leads"][0]
+        assert lead["status_id"] == 10 and lead["_embedded"]["contacts"] == [{"id": contact_id, "is_main": True}]
+
+    def test_rate_limit_and_call_counts(self) -> None:
+        """Тест: доля ответов 429 и вызовы считаются по сценарию нагрузки и эндпоинту (ID заменяются на {id})."""
+        amocrm = FakeAmoCRM(pipeline_id=1, status_id=10, rate_limit=1.0)
+        session = _session(amocrm)
+        token = current_scenario.set("sheets")
+        try:
+            response = session.get(f"{AMO_URL}/leads/5")
+        finally:
+            current_scenario.reset(token)
+        assert response.status_code == 429
+        assert amocrm.rejected == {"sheets": 1}
+        assert amocrm.calls == {("sheets", "GET /api/v4/leads/{id}"): 1}
+
+
+class TestFakeSheets:
+    """Тесты заглушки Google Sheets API v4."""
+
+    def test_gspread_reads_and_writes(self) -> None:
+        """Тест: gspread читает и пишет лист заглушки; пустые строки в конце диапазона не возвращаются."""
+        sheets = FakeSheets("sheet-1", "Лист1", ["name", "phone", "budget"])
+        sheets.append_row({"name": "Иван", "phone": "+79991234567", "budget": 100})
+        sheets.append_row({})
+        worksheet = gspread.Client(auth=None, session=_session(sheets)).open_by_key("sheet-1").worksheet("Лист1")
+
+        worksheet.batch_update([{"range": "C2", "values": [[500]]}])
+        assert worksheet.get_all_values() == [["name", "phone", "budget"], ["Иван", "+79991234567", "500"]]
+        assert worksheet.row_count >= 3
+        assert sheets.row(2) == {"name": "Иван", "phone": "+79991234567", "budget": "500"}
+
+    def test_unsupported_request(self) -> None:
+        """Тест: неподдерживаемый запрос - 404 в формате ошибки Google API."""
+        response = _session(FakeSheets("sheet-1", "Лист1", ["name"])).delete(f"{SHEETS_URL}/values/A1")
+        assert response.status_code == 404
+        assert response.json()["error"]["status"] == "NOT_FOUND"
+
+
+class TestLoadDriverHelpers:
+    """Тесты разбора параметров и отчета нагрузочного теста."""
+
+    def test_percentile(self) -> None:
+        """Тест: перцентиль по ближайшему рангу, пустой список - 0."""
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 0.5) == 51.0
+        assert percentile(values, 0.99) == 100.0
+        assert percentile([], 0.5) == 0.0
+
+    def test_parse_mix(self) -> None:
+        """Тест: сценарии с нулевым весом отбрасываются, неизвестный сценарий - ошибка."""
+        assert parse_mix("sheets=70,amocrm=30,import=0") == {"sheets": 70.0, "amocrm": 30.0}
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_mix("unknown=1")
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_mix("sheets=0")
@@ -0,0 +1,264 @@
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services import import_jobs as import_jobs_module
+from app.services.import_jobs import ImportJobManager
+
+
+@pytest.fixture
+def calls(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Импорт без таблицы: записывает start_after и завершается одной пачкой."""
+    started: list[int] = []
+
+    async def import_existing_rows(start_after: int = 1, progress: Any = None) -> dict[str, int]:
+        started.append(start_after)
+        await progress.started(1, 0)
+        await progress.chunk_done(start_after + 1, 1, 0)
+        return {"created": 1, "skipped": 0, "errors": 0}
+
+    monkeypatch.setattr(import_jobs_module, "import_existing_rows", import_existing_rows)
+    return started
+
+
+@pytest.fixture
+def manager(state_dir: Path) -> Iterator[ImportJobManager]:
+    """Менеджер задач с базой в каталоге теста."""
+    jobs = ImportJobManager()
+    yield jobs
+    jobs.db.close()
+
+
+def _dead_owner() -> str:
+    """Владелец задачи - завершившийся процесс этого хоста."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])  # pylint: disable=consider-using-with
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:dead"
+
+
+async def _insert(manager: ImportJobManager, status: str, owner: str | None, heartbeat_at: float) -> str:
+    def insert_sync(conn: Any) -> None:
+        conn.execute(
+            "INSERT INTO import_jobs (id, status, checkpoint_row, created_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+            ("old", status, 50, time.time(), heartbeat_at),
+        )
+        if owner:
+            conn.execute("INSERT INTO import_job_owners (job_id, owner) VALUES (?, ?)", ("old", owner))
+
+    await manager.db.run(insert_sync)
+    return "old"
+
+
+class TestImportJobs:
+    """Тесты продолжения и отмены задач импорта."""
+
+    def test_start_resumes_job_of_dead_process(self, manager: ImportJobManager, calls: list[int]) -> None:
+        """Тест: задача завершившегося процесса со свежим чекпоинтом продолжается, новая не создается."""
+
+        async def run() -> dict[str, Any] | None:
+            job_id = await _insert(manager, "running", _dead_owner(), time.time())
+            job = await manager.start()
+            assert job["id"] == job_id
+            return await manager.wait(job_id)
+
+        job = asyncio.run(run())
+        assert job is not None and job["status"] == "completed"
+        assert calls == [50]
+
+    def test_start_returns_live_job(self, manager: ImportJobManager, calls: list[int]) -> None:
+        """Тест: задачу живого процесса другого хоста со свежим чекпоинтом не трогают."""
+
+        async def run() -> dict[str, Any]:
+            await _insert(manager, "running", "other-host:1:live", time.time())
+            return await manager.start()
+
+        job = asyncio.run(run())
+        assert job["id"] == "old" and job["status"] == "running"
+        assert not calls
+
+    def test_stale_job_is_resumed(self, manager: ImportJobManager, calls: list[int]) -> None:
+        """Тест: задача без чекпоинта дольше IMPORT_JOB_STALE_AFTER продолжается с чекпоинта."""
+
+        async def run() -> list[str]:
+            await _insert(manager, "running", "other-host:1:live", 0)
+            resumed = await manager.resume_unfinished()
+            await manager.wait("old")
+            return resumed
+
+        assert asyncio.run(run()) == ["old"]
+        assert calls == [50]
+
+    def test_orphaned_cancelling_job_is_cancelled(self, manager: ImportJobManager, calls: list[int]) -> None:
+        """Тест: прерванная отменяемая задача завершается как отмененная, и запускается новая."""
+
+        async def run() -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+            await _insert(manager, "cancelling", _dead_owner(), time.time())
+            job = await manager.start()
+            return await manager.get("old"), await manager.wait(job["id"])
+
+        old, new = asyncio.run(run())
+        assert old is not None and old["status"] == "cancelled"
+        assert new is not None and new["id"] != "old" and new["status"] == "completed"
+        assert calls == [1]
+
+    def test_cancel_stops_after_chunk(self, manager: ImportJobManager, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: отмена прерывает задачу на следующем чекпоинте."""
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def import_existing_rows(start_after: int = 1, progress: Any = None) -> dict[str, int]:
+            entered.set()
+            await release.wait()
+            await progress.chunk_done(start_after + 1, 1, 0)
+            return {"created": 1, "skipped": 0, "errors": 0}
+
+        monkeypatch.setattr(import_jobs_module, "import_existing_rows", import_existing_rows)
+
+        async def run() -> dict[str, Any] | None:
+            job = await manager.start()
+            await entered.wait()
+            assert (await manager.cancel(job["id"]))["status"] == "cancelling"  # type: ignore[index]
+            release.set()
+            return await manager.wait(job["id"])
+
+        job = asyncio.run(run())
+        assert job is not None and job["status"] == "cancelled"
+        assert job["processed"] == 1
+
+    def test_cancel_right_after_start(self, manager: ImportJobManager, calls: list[int]) -> None:
+        """Тест: отмена сразу после запуска не теряется при переходе задачи в running."""
+
+        async def run() -> dict[str, Any] | None:
+            job = await manager.start()
+            await manager.cancel(job["id"])
+            return await manager.wait(job["id"])
+
+        job = asyncio.run(run())
+        assert job is not None and job["status"] == "cancelled"
+        assert len(calls) <= 1
+
+
+class FakeLease:
+    """Аренда автоимпорта в памяти: holder - текущий владелец."""
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.holder: str | None = None
+        monkeypatch.setattr(import_jobs_module.settings, "IMPORT_LEADER_LEASE_TTL", 1)
+        for name in ("acquire_lease", "renew_lease", "release_lease"):
+            monkeypatch.setattr(import_jobs_module.sync_lock, name, getattr(self, name))
+
+    async def acquire_lease(self, _name: str, owner: str, _ttl: int) -> bool:
+        if self.holder is None:
+            self.holder = owner
+        return self.holder == owner
+
+    async def renew_lease(self, _name: str, owner: str, _ttl: int) -> bool:
+        return self.holder == owner
+
+    async def release_lease(self, _name: str, owner: str) -> None:
+        if self.holder == owner:
+            self.holder = None
+
+
+async def _until(condition: Any, timeout: float = 5.0) -> None:
+    """Дождаться выполнения условия."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        await asyncio.sleep(0.01)
+
+
+class TestStartupLease:
+    """Тесты аренды лидера автоимпорта при старте."""
+
+    def test_leader_runs_startup_import(
+        self, manager: ImportJobManager, calls: list[int], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: воркер, захвативший аренду, выполняет автоимпорт и снимает аренду."""
+        lease = FakeLease(monkeypatch)
+
+        async def run() -> None:
+            await manager._run_startup(True)  # pylint: disable=protected-access
+
+        asyncio.run(run())
+        assert manager.startup_state["state"] == "completed" and manager.startup_state["role"] == "leader"
+        assert calls == [1]
+        assert lease.holder is None
+
+    def test_follower_takes_over_released_lease(
+        self, manager: ImportJobManager, calls: list[int], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: воркер без аренды (или без Redis) ждет и выполняет автоимпорт, когда аренда освобождается."""
+        lease = FakeLease(monkeypatch)
+        lease.holder = "другой воркер"
+
+        async def run() -> None:
+            manager.start_on_startup()
+            await _until(lambda: manager.startup_state["state"] == "waiting")
+            lease.holder = None
+            await manager._startup_task  # pylint: disable=protected-access
+
+        asyncio.run(run())
+        assert manager.startup_state["state"] == "completed" and manager.startup_state["role"] == "leader"
+        assert calls == [1]
+
+    def test_follower_skips_finished_import(
+        self, manager: ImportJobManager, calls: list[int], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: воркер в резерве не запускает импорт повторно, если автоимпорт уже выполнил другой воркер."""
+        lease = FakeLease(monkeypatch)
+        lease.holder = "другой воркер"
+
+        async def run() -> None:
+            manager.start_on_startup()
+            await _until(lambda: manager.startup_state["state"] == "waiting")
+            await _insert(manager, "completed", "другой воркер", time.time())
+            await manager._set("old", finished_at=time.time())  # pylint: disable=protected-access
+            lease.holder = None
+            await manager._startup_task  # pylint: disable=protected-access
+
+        asyncio.run(run())
+        assert manager.startup_state["state"] == "skipped"
+        assert not calls
+
+    def test_lost_lease_suspends_only_startup_job(
+        self, manager: ImportJobManager, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: при потере аренды приостанавливается только задача автоимпорта, другие задачи процесса продолжаются."""
+        lease = FakeLease(monkeypatch)
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def import_existing_rows(start_after: int = 1, progress: Any = None) -> dict[str, int]:
+            entered.set()
+            await release.wait()
+            await progress.chunk_done(start_after + 1, 1, 0)
+            return {"created": 1, "skipped": 0, "errors": 0}
+
+        monkeypatch.setattr(import_jobs_module, "import_existing_rows", import_existing_rows)
+
+        async def run() -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+            manager.start_on_startup()
+            await _until(lambda: entered.is_set() and manager.startup_state["job_id"] is not None)
+            startup_id = manager.startup_state["job_id"]
+            await _insert(manager, "pending", None, time.time())
+            manager._launch("old", resumed=False)  # pylint: disable=protected-access
+
+            lease.holder = "другой воркер"
+            await _until(lambda: manager.startup_state["state"] == "waiting")
+            release.set()
+            other = await manager.wait("old")
+            startup = await manager.get(startup_id)
+            manager._startup_task.cancel()  # type: ignore[union-attr]  # pylint: disable=protected-access
+            await asyncio.gather(manager._startup_task, return_exceptions=True)  # pylint: disable=protected-access
+            return startup, other
+
+        startup, other = asyncio.run(run())
+        assert other is not None and other["status"] == "completed"
+        assert startup is not None and startup["status"] == "running" and startup["heartbeat_at"] == 0
+        assert manager.startup_state["role"] == "follower"
@@ -0,0 +1,141 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services import import_service
+from app.services.import_state import ImportStateStore
+
+
+@pytest.fixture
+def import_state(state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[ImportStateStore]:
+    """Состояние импорта в каталоге теста; таблица и outbox без строк."""
+    store = ImportStateStore()
+    monkeypatch.setattr(import_service, "import_state", store)
+
+    async def no_rows(*_args: Any) -> dict[int, dict[str, Any]]:
+        return {}
+
+    async def no_sheet_rows() -> list[dict[str, Any]]:
+        return []
+
+    async def rebuild(_rows: list[dict[str, Any]]) -> int:
+        return 0
+
+    monkeypatch.setattr(import_service.sheets_client, "read_rows_at", no_rows)
+    monkeypatch.setattr(import_service.sheets_client, "read_rows_from", no_rows)
+    monkeypatch.setattr(import_service.sheets_client, "read_all_rows", no_sheet_rows)
+    monkeypatch.setattr(import_service.mapping_store, "rebuild", rebuild)
+    monkeypatch.setattr(import_service.sheets_outbox, "pending_rows", no_rows)
+    yield store
+    store.close()
+
+
+class TestIncrementalImport:
+    """Тесты состояния инкрементального импорта."""
+
+    def test_no_new_rows_keeps_high_water_mark(self, import_state: ImportStateStore) -> None:
+        """Тест импорта без новых и отслеживаемых строк."""
+
+        async def run() -> tuple[dict[str, int], int | None]:
+            await import_state.save(10, {}, [])
+            result = await import_service.import_existing_rows()
+            return result, await import_state.get_high_water_mark()
+
+        result, high_water_mark = asyncio.run(run())
+        assert result == {"created": 0, "skipped": 0, "errors": 0}
+        assert high_water_mark == 10
+
+    def test_first_import_of_empty_sheet(self, import_state: ImportStateStore) -> None:
+        """Тест первого импорта пустой таблицы."""
+
+        async def run() -> int | None:
+            await import_service.import_existing_rows()
+            return await import_state.get_high_water_mark()
+
+        assert asyncio.run(run()) == 1
+
+    def test_rows_without_name_are_watched(self, import_state: ImportStateStore, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: строка без имени отслеживается с отпечатком и пропускается, пока не изменится."""
+        rows = {11: {"name": "", "phone": "+79991234567", "email": "", "budget": "100"}}
+
+        async def read_rows_from(_start: int) -> dict[int, dict[str, Any]]:
+            return dict(rows)
+
+        async def read_rows_at(indices: list[int]) -> dict[int, dict[str, Any]]:
+            return {i: rows[i] for i in indices if i in rows}
+
+        monkeypatch.setattr(import_service.sheets_client, "read_rows_from", read_rows_from)
+        monkeypatch.setattr(import_service.sheets_client, "read_rows_at", read_rows_at)
+
+        async def run() -> tuple[int | None, dict[int, str]]:
+            await import_state.save(10, {}, [])
+            await import_service.import_existing_rows()
+            rows.clear()
+            await import_service.import_existing_rows()
+            return await import_state.get_high_water_mark(), await import_state.watched_rows()
+
+        high_water_mark, watched = asyncio.run(run())
+        assert high_water_mark == 11
+        assert list(watched) == [11]
+        assert watched[11]
+
+
+def _pending(row_index: int, phone: str | None = None, email: str = "") -> import_service.PendingRow:
+    return (row_index, f"Клиент {row_index}", phone, email, 0.0, f"ext-{row_index}")
+
+
+class TestDuplicateGrouping:
+    """Тесты группировки строк одного контакта перед обращением к AmoCRM."""
+
+    def test_group_pending_rows(self) -> None:
+        """Тест: строки объединяются по телефону или email (в том числе цепочкой), строки без контактов - отдельно."""
+        rows = [
+            _pending(2, phone="+79991234567"),
+            _pending(3, email="a@example.com"),
+            _pending(4, phone="+79991234567", email="A@Example.com "),
+            _pending(5),
+            _pending(6, phone="+79990000000"),
+            _pending(7),
+        ]
+        groups = import_service.group_pending_rows(rows)
+        assert [[item[0] for item in group] for group in groups] == [[2, 3, 4], [5], [6], [7]]
+
+    def test_contact_resolved_once_per_group(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: контакт группы ищется или создается один раз, следующие группы берут его из кэша импорта."""
+        upserts: list[str | None] = []
+        leads: list[tuple[str, int]] = []
+        written: dict[int, dict[str, Any]] = {}
+
+        async def upsert_contact(name: str, phone: str | None, email: str | None) -> int:
+            upserts.append(phone)
+            return 100
+
+        async def create_lead(name: str, contact_id: int, budget: float) -> int:
+            leads.append((name, contact_id))
+            return len(leads)
+
+        async def get_lead_info(_lead_id: int) -> dict[str, Any]:
+            return {}
+
+        async def write(row_index: int, values: dict[str, Any]) -> None:
+            written[row_index] = values
+
+        monkeypatch.setattr(import_service.amocrm_client, "upsert_contact", upsert_contact)
+        monkeypatch.setattr(import_service.amocrm_client, "create_lead", create_lead)
+        monkeypatch.setattr(import_service.amocrm_client, "get_lead_info", get_lead_info)
+        monkeypatch.setattr(import_service.sheets_outbox, "write", write)
+
+        process_group = import_service._process_group  # pylint: disable=protected-access
+
+        async def run() -> list[dict[int, bool]]:
+            cache: dict[str, int] = {}
+            group = [_pending(2, phone="+79991234567", email="a@example.com"), _pending(3, email="a@example.com")]
+            return [await process_group(group, cache), await process_group([_pending(4, phone="+79991234567")], cache)]
+
+        assert asyncio.run(run()) == [{2: True, 3: True}, {4: True}]
+        assert upserts == ["+79991234567"]
+        assert sorted(leads) == [("Клиент 2", 100), ("Клиент 3", 100), ("Клиент 4", 100)]
+        assert {row: values["amo_contact_id"] for row, values in written.items()} == {2: "100", 3: "100", 4: "100"}
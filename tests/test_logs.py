@@ -0,0 +1,122 @@
+import json
+import logging
+import queue
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import logs
+from app.core.logs import JsonFormatter, LoopSafeQueueHandler, SamplingFilter, parse_sampling
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+
+def _record(
+    name: str = "app.services.sheets_service", level: int = logging.INFO, msg: str = "Строка %s", args: tuple = (1,)
+) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class TestSampling:
+    """Тесты семплирования записей по модулям."""
+
+    def test_parse_sampling(self) -> None:
+        """Тест: доли ограничиваются диапазоном 0..1, пустые и неполные элементы пропускаются."""
+        assert parse_sampling("app.core=0.5, app.services.sheets_service=2,,app.api=,=0.3") == {
+            "app.core": 0.5,
+            "app.services.sheets_service": 1.0,
+        }
+        assert not parse_sampling("")
+
+    def test_longest_prefix(self) -> None:
+        """Тест: доля логгера - по самому длинному совпавшему префиксу, совпадение только по границе имени."""
+        sampling_filter = SamplingFilter("app=0.5,app.services.sheets_service=0.1", rate_limit=0)
+        assert sampling_filter.ratio("app.services.sheets_service") == 0.1
+        assert sampling_filter.ratio("app.services.sheets_service.rows") == 0.1
+        assert sampling_filter.ratio("app.services.sheets_serviceX") == 0.5
+        assert sampling_filter.ratio("uvicorn.access") == 1.0
+
+    def test_sampled_records_dropped(self) -> None:
+        """Тест: записи INFO модуля с долей 0 отбрасываются и считаются, WARNING проходит всегда."""
+        sampling_filter = SamplingFilter("app.services=0", rate_limit=0)
+        dropped_before = LOG_RECORDS_DROPPED.value(reason="sampled")
+        assert not sampling_filter.filter(_record())
+        assert sampling_filter.filter(_record(level=logging.WARNING))
+        assert sampling_filter.filter(_record(name="app.core.sync_lock"))
+        assert LOG_RECORDS_DROPPED.value(reason="sampled") == dropped_before + 1
+
+
+class TestRateLimit:
+    """Тесты ограничения частоты одинаковых записей."""
+
+    def test_rate_limit_window(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: сверх лимита записи с одним шаблоном отбрасываются, в следующей секунде - число пропущенных."""
+        now = [100.0]
+        monkeypatch.setattr(logs, "time", SimpleNamespace(monotonic=lambda: now[0]))
+        sampling_filter = SamplingFilter("", rate_limit=2)
+        dropped_before = LOG_RECORDS_DROPPED.value(reason="rate_limited")
+
+        assert [sampling_filter.filter(_record(args=(i,))) for i in range(5)] == [True, True, False, False, False]
+        assert sampling_filter.filter(_record(msg="Другая строка %s"))
+        assert sampling_filter.filter(_record(name="app.core.sync_lock"))
+        assert sampling_filter.filter(_record(level=logging.ERROR))
+        assert LOG_RECORDS_DROPPED.value(reason="rate_limited") == dropped_before + 3
+
+        now[0] += 1.0
+        record = _record(args=(5,))
+        assert sampling_filter.filter(record)
+        assert record.getMessage() == "Строка 5 (пропущено похожих записей: 3)"
+        next_record = _record(args=(6,))
+        assert sampling_filter.filter(next_record)
+        assert next_record.getMessage() == "Строка 6"
+
+    def test_no_limit(self) -> None:
+        """Тест: LOG_RATE_LIMIT=0 - ограничение выключено."""
+        sampling_filter = SamplingFilter("", rate_limit=0)
+        assert all(sampling_filter.filter(_record()) for _ in range(100))
+
+
+class TestQueueHandler:
+    """Тесты обработчика очереди логов."""
+
+    def test_mutable_args_formatted_on_enqueue(self) -> None:
+        """Тест: запись с неизменяемыми аргументами уходит как есть, с изменяемыми - сообщение фиксируется сразу."""
+        records: queue.Queue[logging.LogRecord] = queue.Queue()
+        handler = LoopSafeQueueHandler(records)
+        payload = {"row": 1}
+        immutable = _record(args=("text",))
+        handler.emit(immutable)
+        handler.emit(_record(msg="Payload: %s", args=(payload,)))
+        payload["row"] = 2
+
+        assert records.get_nowait() is immutable
+        prepared = records.get_nowait()
+        assert prepared.getMessage() == "Payload: {'row': 1}"
+        assert prepared.args is None
+
+    def test_full_queue_drops(self) -> None:
+        """Тест: при переполнении очереди запись отбрасывается без ожидания и считается."""
+        handler = LoopSafeQueueHandler(queue.Queue(maxsize=1))
+        dropped_before = LOG_RECORDS_DROPPED.value(reason="queue_full")
+        handler.emit(_record())
+        handler.emit(_record())
+        assert LOG_RECORDS_DROPPED.value(reason="queue_full") == dropped_before + 1
+
+
+class TestJsonFormatter:
+    """Тесты формата JSON."""
+
+    def test_format(self) -> None:
+        """Тест: запись - одна строка JSON с полями extra и текстом исключения."""
+        record = _record(msg="Импорт %s", args=("завершен",))
+        record.job_id = "job-1"
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record.exc_info = sys.exc_info()
+        data = json.loads(JsonFormatter().format(record))
+        assert data["level"] == "INFO"
+        assert data["logger"] == "app.services.sheets_service"
+        assert data["message"] == "Импорт завершен"
+        assert data["job_id"] == "job-1"
+        assert "ValueError: boom" in data["exc_info"]
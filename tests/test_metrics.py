@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Any
+
+from amocrm.v2.exceptions import AmoApiException  # type: ignore[import-untyped]
+
+from app.api import metrics_routes
+from app.core.concurrency import ExecutorSaturated
+from app.core.metrics import (
+    UPSTREAM_DURATION,
+    UPSTREAM_REQUESTS,
+    WEBHOOK_DURATION,
+    WEBHOOK_SKIPPED,
+    Counter,
+    Histogram,
+    observe_webhook,
+    timed,
+)
+
+
+class TestMetricTypes:
+    """Тесты текстового формата Prometheus."""
+
+    def test_counter_render(self) -> None:
+        """Тест: значения счетчика выводятся по меткам, кавычки и переводы строк экранируются."""
+        counter = Counter("test_total", "Тестовый счетчик", ("reason",))
+        counter.inc(reason='a"b')
+        counter.inc(2, reason="line\nbreak")
+        assert counter.render().splitlines() == [
+            "# HELP test_total Тестовый счетчик",
+            "# TYPE test_total counter",
+            'test_total{reason="a\\"b"} 1',
+            'test_total{reason="line\\nbreak"} 2',
+        ]
+
+    def test_histogram_buckets(self) -> None:
+        """Тест: корзины гистограммы накопительные, сумма и количество наблюдений выводятся отдельно."""
+        histogram = Histogram("test_seconds", "Тестовая гистограмма", ("operation",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, operation="read")
+        assert histogram.count(operation="read") == 3
+        assert histogram.samples() == [
+            'test_seconds_bucket{operation="read",le="0.1"} 1',
+            'test_seconds_bucket{operation="read",le="1"} 2',
+            'test_seconds_bucket{operation="read",le="+Inf"} 3',
+            'test_seconds_sum{operation="read"} 5.55',
+            'test_seconds_count{operation="read"} 3',
+        ]
+
+
+class TestUpstreamMetrics:
+    """Тесты учета вызовов внешних систем."""
+
+    def test_timed_outcomes(self) -> None:
+        """Тест: вызовы учитываются по результату (ok, throttled, rejected, error) и по длительности."""
+
+        @timed("amocrm")
+        async def metrics_test_call(error: BaseException | None = None) -> None:
+            if error is not None:
+                raise error
+
+        errors: list[BaseException | None] = [
+            None,
+            AmoApiException("Wrong status 429 (Too Many Requests)"),
+            ExecutorSaturated("amocrm", 1.0),
+            ValueError("boom"),
+        ]
+
+        async def run() -> None:
+            for error in errors:
+                try:
+                    await metrics_test_call(error)
+                except Exception:
+                    pass
+
+        asyncio.run(run())
+        labels: dict[str, Any] = {"backend": "amocrm", "operation": "metrics_test_call"}
+        outcomes = ("ok", "throttled", "rejected", "error")
+        assert [UPSTREAM_REQUESTS.value(**labels, outcome=outcome) for outcome in outcomes] == [1, 1, 1, 1]
+        assert UPSTREAM_DURATION.count(**labels) == 4
+
+    def test_webhook_skip_reason(self) -> None:
+        """Тест: пропуск вебхука учитывается по причине и исходом skipped."""
+        skipped_before = WEBHOOK_SKIPPED.value(source="metrics_test", reason="sync_lock_active")
+        observe_webhook("metrics_test", time.perf_counter(), {"status": "ok", "skipped": "sync_lock_active"})
+        observe_webhook("metrics_test", time.perf_counter(), None)
+        assert WEBHOOK_SKIPPED.value(source="metrics_test", reason="sync_lock_active") == skipped_before + 1
+        assert WEBHOOK_DURATION.count(source="metrics_test", outcome="skipped") == 1
+        assert WEBHOOK_DURATION.count(source="metrics_test", outcome="error") == 1
+
+    def test_metrics_endpoint(self) -> None:
+        """Тест: /metrics отдает все зарегистрированные метрики в текстовом формате."""
+        body = asyncio.run(metrics_routes.metrics()).body.decode()
+        for name in ("upstream_requests_total", "upstream_request_duration_seconds", "webhook_skipped_total"):
+            assert f"# TYPE {name} " in body
+        assert "# TYPE concurrency_limiter gauge" in body
@@ -0,0 +1,62 @@
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from benchmarks import microbench
+from benchmarks.microbench import BASELINES, BENCHMARKS, Benchmark, compare
+
+
+def _result(items: int = 1000, per_reference: float = 100.0, memory: int = 1000) -> dict[str, Any]:
+    return {"unit": "строк", "items": items, "items_per_reference": per_reference, "peak_memory_bytes": memory}
+
+
+def _microbench(monkeypatch: pytest.MonkeyPatch, *args: str) -> int:
+    """Запуск команды microbench с одним небольшим путем; возвращает код завершения."""
+
+    def setup() -> tuple[Any, int]:
+        return lambda: [str(i) for i in range(10_000)], 10_000
+
+    monkeypatch.setattr(microbench, "BENCHMARKS", [Benchmark("small", "строк", setup)])
+    monkeypatch.setattr(sys, "argv", ["microbench", "--repeat", "1", *args])
+    try:
+        microbench.main()
+    except SystemExit as e:
+        return int(e.code or 0)
+    return 0
+
+
+class TestRegressionCheck:
+    """Тесты сравнения микробенчмарков с базовыми значениями."""
+
+    def test_compare(self) -> None:
+        """Тест: регрессия - падение скорости или рост памяти больше допуска; без базы или при другом объеме - нет."""
+        baseline = _result()
+        assert not compare(_result(per_reference=80.0, memory=1200), baseline, 0.25)
+        assert len(compare(_result(per_reference=70.0), baseline, 0.25)) == 1
+        assert len(compare(_result(memory=1300), baseline, 0.25)) == 1
+        assert len(compare(_result(per_reference=70.0, memory=1300), baseline, 0.25)) == 2
+        assert not compare(_result(items=2000, per_reference=10.0), baseline, 0.25)
+        assert not compare(_result(per_reference=10.0), None, 0.25)
+
+    def test_baselines_cover_all_paths(self) -> None:
+        """Тест: для каждого пути в репозитории есть базовое значение."""
+        stored = json.loads(BASELINES.read_text(encoding="utf-8"))["benchmarks"]
+        assert {benchmark.name for benchmark in BENCHMARKS} <= set(stored)
+
+    def test_command_fails_on_regression(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """Тест: команда сохраняет базу (--update) и завершается с кодом 1 при регрессии относительно нее."""
+        baselines = tmp_path / "baselines.json"
+        assert _microbench(monkeypatch, "--update", "--baselines", str(baselines)) == 0
+        stored = json.loads(baselines.read_text(encoding="utf-8"))
+        assert set(stored["benchmarks"]) == {"small"}
+
+        stored["benchmarks"]["small"]["items_per_reference"] *= 100
+        baselines.write_text(json.dumps(stored), encoding="utf-8")
+        capsys.readouterr()
+        assert _microbench(monkeypatch, "--baselines", str(baselines)) == 1
+        assert "РЕГРЕССИЯ" in capsys.readouterr().out
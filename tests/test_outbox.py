@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.core import outbox
+from app.core.outbox import SheetsOutbox
+
+
+class FakeSheet:
+    """Запись строк таблицы: вызовы update_cells/update_rows и управляемые ошибки."""
+
+    def __init__(self) -> None:
+        self.written: list[dict[int, dict[str, Any]]] = []
+        self.fail = False
+        self.during_write: Any = None
+
+    async def update_rows(self, rows: dict[int, dict[str, Any]]) -> None:
+        if self.during_write is not None:
+            await self.during_write()
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        self.written.append({row_index: dict(mapping) for row_index, mapping in rows.items()})
+
+    async def update_cells(self, row_index: int, mapping: dict[str, Any]) -> None:
+        await self.update_rows({row_index: mapping})
+
+
+@pytest.fixture
+def sheet(monkeypatch: pytest.MonkeyPatch) -> FakeSheet:
+    """Таблица вместо sheets_client."""
+    fake = FakeSheet()
+    monkeypatch.setattr(outbox.sheets_client, "update_rows", fake.update_rows)
+    monkeypatch.setattr(outbox.sheets_client, "update_cells", fake.update_cells)
+    return fake
+
+
+@pytest.fixture
+def store(state_dir: Path) -> Iterator[SheetsOutbox]:
+    """Outbox в каталоге теста."""
+    instance = SheetsOutbox()
+    yield instance
+    instance._db.close()  # pylint: disable=protected-access
+
+
+class TestSheetsOutbox:
+    """Тесты объединения и удаления записей outbox."""
+
+    def test_failed_write_stays_pending(self, store: SheetsOutbox, sheet: FakeSheet) -> None:
+        """Тест: при ошибке записи значения остаются в outbox и находятся по ID сделки."""
+        sheet.fail = True
+
+        async def run() -> tuple[bool, dict[int, dict[str, Any]], int | None]:
+            written = await store.write(5, {"amo_deal_id": "101", "amo_contact_id": "201"})
+            return written, await store.pending_rows(), await store.find_row_by_deal_id(101)
+
+        written, pending, row_index = asyncio.run(run())
+        assert written is False
+        assert pending == {5: {"amo_deal_id": "101", "amo_contact_id": "201"}}
+        assert row_index == 5
+
+    def test_later_write_includes_pending_values(self, store: SheetsOutbox, sheet: FakeSheet) -> None:
+        """Тест: запись только статуса после неудачной записи ID пишет в таблицу и ID."""
+
+        async def run() -> dict[int, dict[str, Any]]:
+            sheet.fail = True
+            await store.write(5, {"amo_deal_id": "101", "amo_contact_id": "201"})
+            sheet.fail = False
+            assert await store.write_many({5: {"status": "Ошибка"}})
+            return await store.pending_rows()
+
+        assert asyncio.run(run()) == {}
+        assert sheet.written == [{5: {"amo_deal_id": "101", "amo_contact_id": "201", "status": "Ошибка"}}]
+
+    def test_values_added_during_write_are_kept(self, store: SheetsOutbox, sheet: FakeSheet) -> None:
+        """Тест: значения, добавленные во время записи, не удаляются из outbox."""
+
+        async def add_concurrently() -> None:
+            sheet.during_write = None
+            await store.add(5, {"amo_deal_id": "102"})
+
+        sheet.during_write = add_concurrently
+
+        async def run() -> dict[int, dict[str, Any]]:
+            await store.write(5, {"status": "Новая заявка"})
+            return await store.pending_rows()
+
+        assert asyncio.run(run()) == {5: {"status": "Новая заявка", "amo_deal_id": "102"}}
+
+    def test_flush_writes_due_rows(self, store: SheetsOutbox, sheet: FakeSheet, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: фоновая запись пишет строки, у которых подошло время повтора, и удаляет их."""
+        monkeypatch.setattr(outbox.settings, "OUTBOX_RETRY_DELAY", 0.0)
+
+        async def run() -> tuple[int, dict[int, dict[str, Any]]]:
+            sheet.fail = True
+            await store.write_many({2: {"amo_deal_id": "1"}, 3: {"amo_deal_id": "2"}})
+            sheet.fail = False
+            return await store.flush(), await store.pending_rows()
+
+        flushed, pending = asyncio.run(run())
+        assert flushed == 2
+        assert pending == {}
+        assert sheet.written[-1] == {2: {"amo_deal_id": "1"}, 3: {"amo_deal_id": "2"}}
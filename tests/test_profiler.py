@@ -0,0 +1,44 @@
+import threading
+import time
+
+from app.core.profiler import SamplingProfiler
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+class TestSamplingProfiler:
+    """Тесты семплирующего профилировщика."""
+
+    def test_folded_stacks(self) -> None:
+        """Тест: профиль содержит стеки других потоков в формате folded, поток профилировщика не учитывается."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_loop, args=(stop,), name="profiled-worker")
+        worker.start()
+        try:
+            result = SamplingProfiler().profile(seconds=0.1, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert result is not None
+        stacks = [line.rsplit(" ", 1) for line in result.strip().splitlines()]
+        worker_stacks = [stack for stack, _ in stacks if stack.startswith("profiled-worker;")]
+        assert worker_stacks and all("_busy_loop (test_profiler.py:" in stack for stack in worker_stacks)
+        assert all(int(count) > 0 for _, count in stacks)
+        assert not any("SamplingProfiler" in stack or "profile (profiler.py:" in stack for stack, _ in stacks)
+
+    def test_single_profile_at_a_time(self) -> None:
+        """Тест: пока идет профилирование, повторный запуск сразу возвращает None."""
+        profiler = SamplingProfiler()
+        results: list[str | None] = []
+        first = threading.Thread(target=lambda: results.append(profiler.profile(seconds=0.2, interval=0.01)))
+        first.start()
+        while not profiler.running:
+            time.sleep(0.001)
+        assert profiler.profile(seconds=0.1, interval=0.01) is None
+        first.join()
+        assert results and results[0] is not None
+        assert not profiler.running
@@ -0,0 +1,257 @@
+import asyncio
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services import reconcile_service
+from app.services.reconcile_service import Reconciler
+
+
+class FakeAmoCRM:
+    """Сделка 7 с контактом 70 и записи PATCH; управляемые ошибки записи сделок и контактов."""
+
+    def __init__(self) -> None:
+        self.leads = {7: {"id": 7, "name": "Петр", "price": 100, "contact_id": 70, "status_name": "Новая"}}
+        self.contacts = {70: {"id": 70, "name": "Петр", "phone": "+79990000000", "email": "p@example.com"}}
+        self.lead_updates: list[dict[str, Any]] = []
+        self.contact_updates: list[dict[str, Any]] = []
+        self.fail_contacts = False
+
+    async def get_leads_by_ids(self, ids: list[int]) -> dict[int, dict[str, Any]]:
+        return {i: dict(self.leads[i]) for i in ids if i in self.leads}
+
+    async def get_contacts_by_ids(self, ids: list[int]) -> dict[int, dict[str, Any]]:
+        return {i: dict(self.contacts[i]) for i in ids if i in self.contacts}
+
+    async def update_leads(self, updates: list[dict[str, Any]]) -> None:
+        self.lead_updates.extend(updates)
+        for update in updates:
+            self.leads[update["id"]].update({k: v for k, v in update.items() if k != "id"})
+
+    async def update_contacts(self, updates: list[dict[str, Any]]) -> None:
+        if self.fail_contacts:
+            raise RuntimeError("AmoCRM недоступен")
+        self.contact_updates.extend(updates)
+
+
+@pytest.fixture
+def amocrm(state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> FakeAmoCRM:
+    """AmoCRM вместо amocrm_client; записи в таблицу собираются в written."""
+    fake = FakeAmoCRM()
+    for name in ("get_leads_by_ids", "get_contacts_by_ids", "update_leads", "update_contacts"):
+        monkeypatch.setattr(reconcile_service.amocrm_client, name, getattr(fake, name))
+    return fake
+
+
+@pytest.fixture
+def written(monkeypatch: pytest.MonkeyPatch) -> list[dict[int, dict[str, Any]]]:
+    """Записи в таблицу."""
+    updates: list[dict[int, dict[str, Any]]] = []
+
+    async def update_rows(rows: dict[int, dict[str, Any]]) -> None:
+        updates.append(rows)
+
+    async def remember_amocrm_writes(_fingerprints: dict[int, str]) -> None:
+        return None
+
+    monkeypatch.setattr(reconcile_service.sheets_client, "update_rows", update_rows)
+    monkeypatch.setattr(reconcile_service.sync_lock, "remember_amocrm_writes", remember_amocrm_writes)
+    return updates
+
+
+@pytest.fixture
+def reconciler(amocrm: FakeAmoCRM, written: list[dict[int, dict[str, Any]]]) -> Iterator[Reconciler]:
+    """Сверка со снимками в каталоге теста."""
+    instance = Reconciler()
+    yield instance
+    instance._db.close()  # pylint: disable=protected-access
+
+
+def _row(**values: str) -> dict[int, dict[str, Any]]:
+    row = {"name": "Петр", "phone": "+79990000000", "email": "p@example.com", "budget": "100", "status": "Новая"}
+    return {2: {**row, "amo_deal_id": "7", "amo_contact_id": "70", **values}}
+
+
+def _reconcile(reconciler: Reconciler, rows: dict[int, dict[str, Any]]) -> Counter[str]:
+    return asyncio.run(reconciler._reconcile_chunk(rows))  # pylint: disable=protected-access
+
+
+class TestReconcileDiff:
+    """Тесты направления сверки по снимку."""
+
+    def test_in_sync(self, reconciler: Reconciler, amocrm: FakeAmoCRM, written: list[Any]) -> None:
+        """Тест: совпадающие строка и сделка ничего не пишут."""
+        assert _reconcile(reconciler, _row())["in_sync"] == 1
+        assert not amocrm.lead_updates and not written
+
+    def test_sheet_change_goes_to_amocrm(self, reconciler: Reconciler, amocrm: FakeAmoCRM, written: list[Any]) -> None:
+        """Тест: изменилась только таблица - бюджет уходит в AmoCRM."""
+        _reconcile(reconciler, _row())
+        counts = _reconcile(reconciler, _row(budget="250"))
+        assert counts["to_amocrm"] == 1 and counts["conflicts"] == 0
+        assert amocrm.lead_updates == [{"id": 7, "price": 250}]
+        assert not written
+
+    def test_amocrm_change_goes_to_sheet(self, reconciler: Reconciler, amocrm: FakeAmoCRM, written: list[Any]) -> None:
+        """Тест: изменилась только AmoCRM - бюджет пишется в таблицу."""
+        _reconcile(reconciler, _row())
+        amocrm.leads[7]["price"] = 300
+        counts = _reconcile(reconciler, _row())
+        assert counts["to_sheets"] == 1 and counts["conflicts"] == 0
+        assert written == [{2: {"budget": "300"}}]
+        assert not amocrm.lead_updates
+
+    def test_both_changed_is_conflict(
+        self, reconciler: Reconciler, amocrm: FakeAmoCRM, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: изменились обе стороны - применяются значения RECONCILE_CONFLICT_WINNER."""
+        monkeypatch.setattr(reconcile_service.settings, "RECONCILE_CONFLICT_WINNER", "sheets")
+        _reconcile(reconciler, _row())
+        amocrm.leads[7]["price"] = 300
+        counts = _reconcile(reconciler, _row(budget="250"))
+        assert counts["conflicts"] == 1 and counts["to_amocrm"] == 1
+        assert amocrm.lead_updates == [{"id": 7, "price": 250}]
+
+    def test_failed_contacts_keep_written_leads(self, reconciler: Reconciler, amocrm: FakeAmoCRM) -> None:
+        """Тест: ошибка записи контакта не делает записанную сделку конфликтом при следующей сверке."""
+        _reconcile(reconciler, _row())
+        amocrm.fail_contacts = True
+        counts = _reconcile(reconciler, _row(budget="250", email="new@example.com"))
+        assert counts["errors"] == 1
+        assert amocrm.lead_updates == [{"id": 7, "price": 250}]
+
+        amocrm.fail_contacts = False
+        counts = _reconcile(reconciler, _row(budget="250", email="new@example.com"))
+        assert counts["conflicts"] == 0 and counts["errors"] == 0 and counts["to_amocrm"] == 1
+        assert amocrm.lead_updates == [{"id": 7, "price": 250}]
+        assert [update["id"] for update in amocrm.contact_updates] == [70]
+
+    def test_failed_contacts_do_not_fail_lead_only_rows(self, reconciler: Reconciler, amocrm: FakeAmoCRM) -> None:
+        """Тест: строка, для которой менялась только сделка, не считается ошибкой при сбое записи контактов."""
+        amocrm.leads[8] = {"id": 8, "name": "Анна", "price": 100, "contact_id": 80, "status_name": "Новая"}
+        amocrm.contacts[80] = {"id": 80, "name": "Анна", "phone": "+79991111111", "email": "a@example.com"}
+        rows = {
+            **_row(),
+            3: {
+                "name": "Анна",
+                "phone": "+79991111111",
+                "email": "a@example.com",
+                "budget": "100",
+                "status": "Новая",
+                "amo_deal_id": "8",
+                "amo_contact_id": "80",
+            },
+        }
+        _reconcile(reconciler, rows)
+        amocrm.fail_contacts = True
+        rows[2] = {**rows[2], "email": "new@example.com"}
+        rows[3] = {**rows[3], "budget": "500"}
+        counts = _reconcile(reconciler, rows)
+        assert counts["errors"] == 1 and counts["to_amocrm"] == 2
+        assert amocrm.lead_updates == [{"id": 8, "price": 500}]
+
+    def test_contact_keeps_other_phones(self, reconciler: Reconciler, amocrm: FakeAmoCRM) -> None:
+        """Тест: новый телефон из таблицы становится рабочим, остальные телефоны контакта сохраняются."""
+        amocrm.contacts[70]["phones"] = [
+            {"value": "+79990000000", "enum_code": "WORK"},
+            {"value": "+79995555555", "enum_code": "MOB"},
+        ]
+        _reconcile(reconciler, _row())
+        _reconcile(reconciler, _row(phone="+79997777777"))
+        assert amocrm.contact_updates == [
+            {
+                "id": 70,
+                "custom_fields_values": [
+                    {
+                        "field_code": "PHONE",
+                        "values": [
+                            {"value": "+79997777777", "enum_code": "WORK"},
+                            {"value": "+79990000000", "enum_code": "OTHER"},
+                            {"value": "+79995555555", "enum_code": "MOB"},
+                        ],
+                    }
+                ],
+            }
+        ]
+
+
+@pytest.fixture
+def sheet_rows(monkeypatch: pytest.MonkeyPatch) -> dict[int, dict[str, Any]]:
+    """Таблица из 9 строк, читаемая пачками по 2 строки; пустые строки в ответ не попадают."""
+    rows = {**_row(), 7: {**_row(budget="250")[2]}}
+
+    async def get_row_count() -> int:
+        return 9
+
+    async def read_rows_from(start_row: int, end_row: int) -> dict[int, dict[str, Any]]:
+        return {i: row for i, row in rows.items() if start_row <= i <= end_row}
+
+    monkeypatch.setattr(reconcile_service.settings, "RECONCILE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(reconcile_service.sheets_client, "get_row_count", get_row_count)
+    monkeypatch.setattr(reconcile_service.sheets_client, "read_rows_from", read_rows_from)
+    return rows
+
+
+class FakeLease:
+    """Аренда сверки: holder - текущий владелец; продлений до потери аренды - renewals."""
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.holder: str | None = None
+        self.renewals: int | None = None
+        monkeypatch.setattr(reconcile_service.sync_lock, "acquire_lease", self.acquire_lease)
+        monkeypatch.setattr(reconcile_service.sync_lock, "renew_lease", self.renew_lease)
+
+    async def acquire_lease(self, _name: str, owner: str, _ttl: int) -> bool:
+        if self.holder is None:
+            self.holder = owner
+            return True
+        return False
+
+    async def renew_lease(self, _name: str, owner: str, _ttl: int) -> bool:
+        if self.renewals is not None:
+            self.renewals -= 1
+            if self.renewals < 0:
+                self.holder = None
+        return self.holder == owner
+
+
+class TestReconcileRun:
+    """Тесты прохода сверки по таблице."""
+
+    def test_trigger_takes_lease(
+        self, reconciler: Reconciler, sheet_rows: dict[int, Any], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: сверка по запросу не запускается, пока аренду держит другой воркер, и запускается под арендой."""
+        lease = FakeLease(monkeypatch)
+        lease.holder = "другой воркер"
+
+        async def run() -> tuple[bool, bool, dict[str, int]]:
+            refused = await reconciler.trigger()
+            lease.holder = None
+            started = await reconciler.trigger()
+            assert reconciler._run_task is not None  # pylint: disable=protected-access
+            return refused, started, await reconciler._run_task  # pylint: disable=protected-access
+
+        refused, started, result = asyncio.run(run())
+        assert not refused and started
+        assert result["rows"] == 2
+        assert lease.holder == reconciler._owner  # pylint: disable=protected-access
+
+    def test_lost_lease_stops_run(
+        self, reconciler: Reconciler, sheet_rows: dict[int, Any], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Тест: при потере аренды сверка останавливается после текущей пачки."""
+        lease = FakeLease(monkeypatch)
+        lease.holder = reconciler._owner  # pylint: disable=protected-access
+        lease.renewals = 0
+        result = asyncio.run(reconciler.run(60))
+        assert result["rows"] == 1
+
+    def test_rows_after_blank_chunk_reconciled(self, reconciler: Reconciler, sheet_rows: dict[int, Any]) -> None:
+        """Тест: пустой диапазон посреди таблицы не останавливает сверку."""
+        result = asyncio.run(reconciler.run())
+        assert result["rows"] == 2 and result["in_sync"] == 1
+        assert result["conflicts"] == 1
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core.settings import get_settings, settings
+
+ROOT = Path(__file__).parent.parent
+
+# Импорт всех модулей приложения, кроме точки входа app.main (она настраивает логирование из настроек)
+_IMPORT_ALL = """
+import importlib
+import pkgutil
+
+import app
+from app.core.settings import get_settings
+
+for module in pkgutil.walk_packages(app.__path__, "app."):
+    if module.name != "app.main":
+        importlib.import_module(module.name)
+print(get_settings.cache_info().currsize)
+"""
+
+
+class TestLazySettings:
+    """Тесты ленивых настроек."""
+
+    def test_import_does_not_read_settings(self, tmp_path: Path) -> None:
+        """Тест: импорт модулей не читает окружение и .env - обязательные настройки не нужны."""
+        env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(ROOT)}
+        result = subprocess.run(
+            [sys.executable, "-c", _IMPORT_ALL], cwd=tmp_path, env=env, capture_output=True, text=True, check=False
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "0"
+
+    def test_proxy_reads_and_writes_cached_settings(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: прокси settings читает и меняет один и тот же объект get_settings()."""
+        assert settings.WEBHOOK_SECRET == get_settings().WEBHOOK_SECRET
+        monkeypatch.setattr(settings, "SYNC_ECHO_TTL", 7)
+        assert get_settings().SYNC_ECHO_TTL == 7
+        assert get_settings() is get_settings()
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Any
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.metrics import WEBHOOK_DURATION
+from app.core.settings import settings
+from app.models.webhook_row import WebhookBatch
+from app.services import sheets_service
+
+
+def _batch(*row_indices: int) -> WebhookBatch:
+    return WebhookBatch(rows=[{"row_index": i, "data": {"name": f"Клиент {i}"}} for i in row_indices])
+
+
+def _observe(monkeypatch: pytest.MonkeyPatch, results: Any) -> dict[str, int]:
+    """Пакетный вебхук с заданными результатами строк; прирост наблюдений по исходам."""
+
+    async def process_sheet_rows(_rows: Any) -> dict[int, dict[str, Any]]:
+        if isinstance(results, Exception):
+            raise results
+        return results
+
+    monkeypatch.setattr(sheets_service, "check_capacity", lambda: None)
+    monkeypatch.setattr(sheets_service, "process_sheet_rows", process_sheet_rows)
+    before = {outcome: WEBHOOK_DURATION.count(source="sheets_batch", outcome=outcome) for outcome in ("ok", "skipped", "error")}
+    try:
+        asyncio.run(sheets_service.process_webhook_sheets_batch(_batch(2, 3), settings.WEBHOOK_SECRET))
+    except HTTPException as e:
+        assert e.status_code == 500
+    return {
+        outcome: WEBHOOK_DURATION.count(source="sheets_batch", outcome=outcome) - count for outcome, count in before.items()
+    }
+
+
+class TestSheetsBatchOutcome:
+    """Тесты исхода пакетного вебхука в метриках."""
+
+    def test_ok(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: обработана хотя бы одна строка без ошибок - ok."""
+        results = {2: {"success": True, "lead_id": 1}, 3: {"success": True, "skipped": "sync_lock_active"}}
+        assert _observe(monkeypatch, results) == {"ok": 1, "skipped": 0, "error": 0}
+
+    def test_all_skipped(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: все строки пропущены - skipped."""
+        results = {2: {"success": True, "skipped": "sync_lock_active"}, 3: {"success": False, "skipped": "lead_creating"}}
+        assert _observe(monkeypatch, results) == {"ok": 0, "skipped": 1, "error": 0}
+
+    def test_row_error(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: ошибка в строке - error."""
+        results = {2: {"success": True, "lead_id": 1}, 3: {"success": False, "error": "quota"}}
+        assert _observe(monkeypatch, results) == {"ok": 0, "skipped": 0, "error": 1}
+
+    def test_unexpected_error(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: исключение обработки учитывается как error и возвращает 500."""
+        assert _observe(monkeypatch, RuntimeError("boom")) == {"ok": 0, "skipped": 0, "error": 1}
+
+
+class TestReadRowIds:
+    """Тесты чтения amo_deal_id и amo_contact_id одной строки."""
+
+    def test_reads_only_requested_row(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: без outbox и связки читается только сама строка, а не вся таблица."""
+        requested: list[list[int]] = []
+
+        async def no_pending(_row_index: int) -> None:
+            return None
+
+        async def read_rows_at(indices: list[int]) -> dict[int, dict[str, Any]]:
+            requested.append(indices)
+            return {5: {"amo_deal_id": "10", "amo_contact_id": "20"}}
+
+        async def read_all_rows() -> list[dict[str, Any]]:
+            raise AssertionError("таблица читается целиком")
+
+        monkeypatch.setattr(sheets_service.sheets_outbox, "get_pending", no_pending)
+        monkeypatch.setattr(sheets_service.mapping_store, "get_row", no_pending)
+        monkeypatch.setattr(sheets_service.sheets_client, "read_rows_at", read_rows_at)
+        monkeypatch.setattr(sheets_service.sheets_client, "read_all_rows", read_all_rows)
+
+        assert asyncio.run(sheets_service._read_row_ids(5, "ext")) == (10, 20)  # pylint: disable=protected-access
+        assert asyncio.run(sheets_service._read_row_ids(6, "ext")) == (None, None)  # pylint: disable=protected-access
+        assert requested == [[5], [6]]
@@ -0,0 +1,113 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.models.webhook_row import WebhookRow
+from app.services import sheets_watcher
+from app.services.sheets_watcher import SheetsChangeDetector
+
+
+class FakeSheet:
+    """Лист таблицы и обработка строк: строки из failing обрабатываются с ошибкой."""
+
+    def __init__(self) -> None:
+        self.rows: dict[int, dict[str, Any]] = {
+            row_index: {"name": f"Клиент {row_index}", "phone": "", "email": "", "budget": "100"}
+            for row_index in range(2, 7)
+        }
+        self.processed: list[list[int]] = []
+        self.failing: set[int] = set()
+
+    async def get_row_count(self) -> int:
+        return max(self.rows, default=1) + 3
+
+    async def read_rows_from(self, start_row: int, end_row: int | None = None) -> dict[int, dict[str, Any]]:
+        """Как Sheets API: пустые (удаленные из rows) строки в ответ не попадают."""
+        last = end_row or max(self.rows, default=1)
+        return {i: dict(row) for i, row in self.rows.items() if start_row <= i <= last}
+
+    async def process_sheet_rows(self, payloads: list[WebhookRow]) -> dict[int, dict[str, Any]]:
+        self.processed.append([payload.row_index for payload in payloads])
+        return {
+            payload.row_index: {"success": payload.row_index not in self.failing, "row_index": payload.row_index}
+            for payload in payloads
+        }
+
+
+@pytest.fixture
+def sheet(state_dir: Path, monkeypatch: pytest.MonkeyPatch) -> FakeSheet:
+    """Лист вместо sheets_client и process_sheet_rows; пачки по две строки."""
+    fake = FakeSheet()
+    monkeypatch.setattr(sheets_watcher.sheets_client, "get_row_count", fake.get_row_count)
+    monkeypatch.setattr(sheets_watcher.sheets_client, "read_rows_from", fake.read_rows_from)
+    monkeypatch.setattr(sheets_watcher, "process_sheet_rows", fake.process_sheet_rows)
+    monkeypatch.setattr(sheets_watcher.settings, "SHEETS_POLL_CHUNK_SIZE", 2)
+    return fake
+
+
+@pytest.fixture
+def watcher(sheet: FakeSheet) -> Iterator[SheetsChangeDetector]:
+    """Детектор со снимком в каталоге теста."""
+    detector = SheetsChangeDetector()
+    yield detector
+    detector._db.close()  # pylint: disable=protected-access
+
+
+def _scan(watcher: SheetsChangeDetector) -> dict[str, int]:
+    return asyncio.run(watcher.scan())
+
+
+class TestSheetsWatcherSnapshot:
+    """Тесты снимка таблицы при опросе изменений."""
+
+    def test_first_scan_only_saves_snapshot(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: первый проход сохраняет снимок и ничего не обрабатывает."""
+        assert _scan(watcher) == {"rows": 5, "changed": 0, "errors": 0}
+        assert not sheet.processed
+
+    def test_only_changed_rows_processed(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: обрабатываются только измененные и новые строки, служебные колонки не считаются изменением."""
+        _scan(watcher)
+        sheet.rows[3]["budget"] = "500"
+        sheet.rows[4]["amo_deal_id"] = "7"
+        sheet.rows[7] = {"name": "Новый", "phone": "+79990000000", "email": "", "budget": ""}
+        assert _scan(watcher)["changed"] == 2
+        assert sheet.processed == [[3], [7]]
+        assert _scan(watcher)["changed"] == 0
+
+    def test_failed_rows_retried(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: строка с ошибкой обработки сохраняет старый хэш и повторяется в следующем проходе."""
+        _scan(watcher)
+        sheet.rows[5]["name"] = "Другое имя"
+        sheet.failing = {5}
+        assert _scan(watcher)["errors"] == 1
+        sheet.failing = set()
+        assert _scan(watcher) == {"rows": 5, "changed": 1, "errors": 0}
+        assert sheet.processed == [[5], [5]]
+
+    def test_truncated_sheet_forgets_rows(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: удаленные с конца строки забываются, и строка на их месте - новая."""
+        _scan(watcher)
+        del sheet.rows[6], sheet.rows[5]
+        assert _scan(watcher)["changed"] == 0
+        sheet.rows[5] = {"name": "Клиент 5", "phone": "", "email": "", "budget": "100"}
+        assert _scan(watcher)["changed"] == 1
+        assert sheet.processed == [[5]]
+
+    def test_empty_rows_are_not_processed(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: очищенная строка запоминается в снимке без обработки."""
+        _scan(watcher)
+        sheet.rows[2] = {"name": "", "phone": "", "email": "", "budget": ""}
+        assert _scan(watcher)["changed"] == 0
+        assert not sheet.processed
+
+    def test_rows_below_blank_band_are_watched(self, watcher: SheetsChangeDetector, sheet: FakeSheet) -> None:
+        """Тест: пустой диапазон посреди таблицы не останавливает проход, изменения ниже него обнаруживаются."""
+        del sheet.rows[4], sheet.rows[5]
+        assert _scan(watcher)["rows"] == 3
+        sheet.rows[6]["budget"] = "900"
+        assert _scan(watcher)["changed"] == 1
+        assert sheet.processed == [[6]]
@@ -0,0 +1,203 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from app.core import sync_lock as sync_lock_module
+from app.core.sync_lock import SyncLock
+
+
+def _fake_redis_lock() -> SyncLock:
+    """SyncLock с fakeredis (Lua-скрипты выполняются fakeredis)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    lock = SyncLock()
+
+    def create_client() -> Any:
+        return fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    lock._create_client = create_client  # type: ignore[method-assign]  # pylint: disable=protected-access
+    return lock
+
+
+def _local_lock() -> SyncLock:
+    """SyncLock без Redis: операции выполняются локальными блокировками процесса."""
+    lock = SyncLock()
+
+    async def no_client() -> Any:
+        return None
+
+    lock._get_client = no_client  # type: ignore[method-assign]  # pylint: disable=protected-access
+    return lock
+
+
+@pytest.fixture(params=["redis", "local"])
+def lock(request: pytest.FixtureRequest) -> SyncLock:
+    """SyncLock с Redis (fakeredis) и без него."""
+    return _fake_redis_lock() if request.param == "redis" else _local_lock()
+
+
+class TestAmoCRMEchoes:
+    """Тесты распознавания эхо-вебхуков записи из AmoCRM."""
+
+    def test_batch_echo_and_stale_cleanup(self, lock: SyncLock) -> None:
+        """Тест: совпавший отпечаток - эхо, несовпавший удаляется и не мешает следующей записи."""
+
+        async def run() -> tuple[set[int], set[int]]:
+            await lock.remember_amocrm_writes({2: "a", 3: "b"})
+            first = await lock.find_amocrm_echoes({2: "a", 3: "changed", 4: "c"})
+            # Пользователь вернул прежние значения строки 3: это уже не эхо записи из AmoCRM
+            return first, await lock.find_amocrm_echoes({2: "a", 3: "b"})
+
+        first, second = asyncio.run(run())
+        assert first == {2}
+        assert second == {2}
+
+
+class TestCompositeOperations:
+    """Тесты составных операций SyncLock (один конвейер или Lua-скрипт на вызов)."""
+
+    def test_echo_write_sets_ttl(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: отпечатки нескольких строк записываются одним конвейером с TTL SYNC_ECHO_TTL."""
+        monkeypatch.setattr(sync_lock_module.settings, "SYNC_ECHO_TTL", 120)
+        lock = _fake_redis_lock()
+
+        async def run() -> tuple[list[Any], list[int]]:
+            await lock.remember_amocrm_writes({2: "a", 3: "b"})
+            client = await lock._get_client()  # pylint: disable=protected-access
+            keys = [sync_lock_module._written_key(2), sync_lock_module._written_key(3)]  # pylint: disable=protected-access
+            return await client.mget(keys), [await client.ttl(key) for key in keys]
+
+        values, ttls = asyncio.run(run())
+        assert values == ["a", "b"]
+        assert all(0 < ttl <= 120 for ttl in ttls)
+
+    def test_check_echo_and_acquire(self, lock: SyncLock) -> None:
+        """Тест: эхо записи не захватывает блокировку создания, измененная строка захватывает ее один раз."""
+
+        async def run() -> list[str]:
+            await lock.remember_amocrm_write(2, "a")
+            return [
+                await lock.check_echo_and_acquire_creation_lock(2, "a"),
+                await lock.check_echo_and_acquire_creation_lock(2, "changed"),
+                await lock.check_echo_and_acquire_creation_lock(2, "changed"),
+            ]
+
+        assert asyncio.run(run()) == [
+            sync_lock_module.CREATION_ECHO,
+            sync_lock_module.CREATION_ACQUIRED,
+            sync_lock_module.CREATION_BUSY,
+        ]
+
+    def test_check_row_locks(self, lock: SyncLock) -> None:
+        """Тест: эхо и блокировка создания строки проверяются одним вызовом."""
+
+        async def run() -> list[tuple[bool, bool]]:
+            await lock.remember_amocrm_write(2, "a")
+            results = [await lock.check_row_locks(2, "a")]
+            await lock.acquire_creation_locks([3])
+            results.append(await lock.check_row_locks(3, "b"))
+            return results
+
+        assert asyncio.run(run()) == [(True, False), (False, True)]
+
+    def test_batch_creation_locks(self, lock: SyncLock) -> None:
+        """Тест: пакетный захват выдает блокировку только свободным строкам, снятие освобождает все."""
+
+        async def run() -> tuple[set[int], set[int], set[int]]:
+            first = await lock.acquire_creation_locks([2, 3])
+            second = await lock.acquire_creation_locks([3, 4, 4])
+            await lock.release_creation_locks([2, 3, 4])
+            return first, second, await lock.acquire_creation_locks([2, 3, 4])
+
+        assert asyncio.run(run()) == ({2, 3}, {4}, {2, 3, 4})
+
+
+class TestRedisOutage:
+    """Тесты перехода на локальные блокировки и аренд без Redis."""
+
+    def test_command_error_is_not_outage(self) -> None:
+        """Тест: ошибка команды или Lua-скрипта пробрасывается и не переключает на локальные блокировки."""
+        redis_exceptions = pytest.importorskip("redis.exceptions")
+        lock = _fake_redis_lock()
+
+        async def redis_op(_client: Any) -> int:
+            raise redis_exceptions.ResponseError("ERR Error running script")
+
+        async def local_op() -> int:
+            return 0
+
+        async def run() -> None:
+            await lock.connect()
+            with pytest.raises(redis_exceptions.ResponseError):
+                await lock.run("выполнить скрипт", redis_op, local_op)
+
+        asyncio.run(run())
+        assert lock.is_healthy
+
+    def test_connection_error_falls_back(self) -> None:
+        """Тест: ошибка соединения - Redis недоступен, операция выполняется локально."""
+        redis_exceptions = pytest.importorskip("redis.exceptions")
+        lock = _fake_redis_lock()
+
+        async def redis_op(_client: Any) -> str:
+            raise redis_exceptions.ConnectionError("Connection refused")
+
+        async def local_op() -> str:
+            return "local"
+
+        async def run() -> str:
+            await lock.connect()
+            return await lock.run("выполнить команду", redis_op, local_op)
+
+        assert asyncio.run(run()) == "local"
+        assert not lock.is_healthy
+
+    def test_leases_not_granted_without_redis(self) -> None:
+        """Тест: без Redis аренда не захватывается и не продлевается (в том числе до первого подключения)."""
+        lock = _local_lock()
+
+        async def run() -> tuple[bool, bool]:
+            acquired = await lock.acquire_lease("test", "owner", 10)
+            renewed = await lock.renew_lease("test", "owner", 10)
+            await lock.release_lease("test", "owner")
+            return acquired, renewed
+
+        assert asyncio.run(run()) == (False, False)
+
+    def test_lease_with_redis(self) -> None:
+        """Тест: аренда в Redis принадлежит одному владельцу до снятия."""
+        lock = _fake_redis_lock()
+
+        async def run() -> list[bool]:
+            results = [
+                await lock.acquire_lease("test", "a", 10),
+                await lock.acquire_lease("test", "b", 10),
+                await lock.renew_lease("test", "b", 10),
+                await lock.renew_lease("test", "a", 10),
+            ]
+            await lock.release_lease("test", "a")
+            results.append(await lock.acquire_lease("test", "b", 10))
+            return results
+
+        assert asyncio.run(run()) == [True, False, False, True, True]
+
+    def test_local_leases_when_redis_not_configured(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: без настроенного Redis (пустой REDIS_HOST) процесс единственный, и аренда выдается локально."""
+        monkeypatch.setattr(sync_lock_module.settings, "REDIS_HOST", "")
+        lock = SyncLock()
+
+        async def run() -> list[bool]:
+            results = [
+                await lock.acquire_lease("test", "a", 10),
+                await lock.acquire_lease("test", "b", 10),
+                await lock.renew_lease("test", "b", 10),
+                await lock.renew_lease("test", "a", 10),
+            ]
+            await lock.release_lease("test", "a")
+            results.append(await lock.acquire_lease("test", "b", 10))
+            return results
+
+        assert asyncio.run(run()) == [True, False, False, True, True]
+        assert lock.health()["status"] == "disabled"
+
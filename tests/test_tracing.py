@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+from typing import Any
+
+import pytest
+
+from app.core import tracing
+from app.core.tracing import add_event, current_span, span, to_thread, trace_requests, traced
+
+
+class FakeURL:
+    path = "/webhook/sheets"
+
+
+class FakeRequest:
+    """HTTP-запрос для middleware трассировки."""
+
+    method = "POST"
+    url = FakeURL()
+
+
+class FakeResponse:
+    status_code = 200
+
+
+def _names(tree: dict[str, Any]) -> list[str]:
+    return [child["name"] for child in tree.get("children", [])]
+
+
+class TestSpans:
+    """Тесты дерева спанов запроса."""
+
+    def test_span_tree(self) -> None:
+        """Тест: спаны шагов, задач gather и вызовов в потоке попадают в дерево родителя, контекст доходит до потока."""
+
+        @traced()
+        async def step(delay: float) -> None:
+            await asyncio.sleep(delay)
+
+        def blocking() -> str | None:
+            current = current_span()
+            return current.name if current else None
+
+        async def run() -> tuple[dict[str, Any], str | None]:
+            with span("request", source="test") as root:
+                await asyncio.gather(step(0.01), step(0.02))
+                thread_span = await to_thread(blocking)
+                add_event("retry amocrm.find_contact", attempt=1)
+            return root.to_dict(), thread_span
+
+        tree, thread_span = asyncio.run(run())
+        assert tree["attrs"] == {"source": "test"}
+        assert _names(tree) == ["step", "step", "to_thread", "retry amocrm.find_contact"]
+        assert tree["children"][1]["ms"] >= 20
+        assert "queued_ms" in tree["children"][2]["attrs"]
+        assert thread_span == "request"
+
+    def test_error_and_dropped_children(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: ошибка отмечается в спане, сверх MAX_CHILDREN дочерние спаны только считаются."""
+        monkeypatch.setattr(tracing, "MAX_CHILDREN", 2)
+        with span("request") as root:
+            for _ in range(3):
+                with span("call"):
+                    pass
+            with pytest.raises(ValueError):
+                with span("failed"):
+                    raise ValueError("boom")
+        tree = root.to_dict()
+        assert _names(tree) == ["call", "call"]
+        assert tree["dropped_children"] == 2
+        assert current_span() is None
+
+
+class TestSlowRequests:
+    """Тесты лога медленных запросов."""
+
+    @staticmethod
+    def _request(monkeypatch: pytest.MonkeyPatch, threshold: float, delay: float) -> None:
+        monkeypatch.setattr(tracing.settings, "TRACE_SLOW_REQUEST_THRESHOLD", threshold)
+
+        async def call_next(_request: Any) -> FakeResponse:
+            with span("sheets.update_cells"):
+                await asyncio.sleep(delay)
+            return FakeResponse()
+
+        asyncio.run(trace_requests(FakeRequest(), call_next))
+
+    def test_slow_request_logged(self, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+        """Тест: запрос дольше порога пишется в лог одной строкой JSON с деревом спанов."""
+        with caplog.at_level(logging.WARNING, logger=tracing.__name__):
+            self._request(monkeypatch, threshold=0.01, delay=0.02)
+        [record] = caplog.records
+        tree = json.loads(record.getMessage().split(": ", 1)[1])
+        assert tree["name"] == "POST /webhook/sheets"
+        assert tree["attrs"] == {"status": 200}
+        assert _names(tree) == ["sheets.update_cells"]
+
+    def test_fast_request_not_logged(self, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+        """Тест: быстрый запрос и выключенная трассировка (порог 0) в лог не пишутся."""
+        with caplog.at_level(logging.WARNING, logger=tracing.__name__):
+            self._request(monkeypatch, threshold=10.0, delay=0.0)
+            self._request(monkeypatch, threshold=0.0, delay=0.02)
+        assert not caplog.records
+
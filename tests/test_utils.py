@@ -1,6 +1,6 @@
 import pytest
 
-from app.utils import make_external_id, normalize_phone
+from app.core.utils import make_external_id, make_external_ids, normalize_phone, normalize_phones, sync_fingerprint
 
 
 class TestNormalizePhone:
@@ -66,3 +66,55 @@ class TestMakeExternalId:
         result2 = make_external_id("+79991234568", "test@example.com")
         assert result1 != result2
 
+    def test_make_external_id_without_contacts_deterministic(self) -> None:
+        """Тест детерминированного ID без телефона и email."""
+        result1 = make_external_id(None, None, "Иван", "sheet/Лист1", 5)
+        result2 = make_external_id(None, None, "Иван", "sheet/Лист1", 5)
+        assert result1 == result2
+        assert result1 != make_external_id(None, None, "Иван", "sheet/Лист1", 6)
+        assert result1 != make_external_id(None, None, "Иван", "other/Лист1", 5)
+
+    def test_make_external_id_normalizes_phone(self) -> None:
+        """Тест нормализации телефона."""
+        assert make_external_id("8 (999) 123-45-67", None) == make_external_id("+79991234567", None)
+
+
+class TestBulkNormalization:
+    """Тесты пакетной нормализации колонок."""
+
+    def test_normalize_phones(self) -> None:
+        """Тест совпадения с normalize_phone."""
+        raws = ["89991234567", "+7 (999) 123-45-67", "", None, "abc", "89991234567"]
+        assert normalize_phones(raws) == [normalize_phone(raw) for raw in raws]
+
+    def test_make_external_ids(self) -> None:
+        """Тест совпадения с make_external_id."""
+        phones = ["+79991234567", None, None, "+79991234568"]
+        emails = ["test@example.com", "Test@Example.com ", None, ""]
+        names = ["a", "b", "c", "d"]
+        rows = [2, 3, 4, 5]
+        expected = [
+            make_external_id(phone, email, name, "sheet/Лист1", row)
+            for phone, email, name, row in zip(phones, emails, names, rows)
+        ]
+        assert make_external_ids(phones, emails, names, "sheet/Лист1", rows) == expected
+
+
+class TestSyncFingerprint:
+    """Тесты отпечатка синхронизируемых полей."""
+
+    def test_sync_fingerprint_normalizes_values(self) -> None:
+        """Тест нормализации значений."""
+        result1 = sync_fingerprint(" Иван ", "8 (999) 123-45-67", "Test@Example.com", "1000")
+        result2 = sync_fingerprint("Иван", "+79991234567", "test@example.com", 1000.0)
+        assert result1 == result2
+
+    def test_sync_fingerprint_different(self) -> None:
+        """Тест различия."""
+        result1 = sync_fingerprint("Иван", "+79991234567", "test@example.com", 1000)
+        result2 = sync_fingerprint("Иван", "+79991234567", "test@example.com", 2000)
+        assert result1 != result2
+
+    def test_sync_fingerprint_invalid_budget(self) -> None:
+        """Тест невалидного бюджета."""
+        assert sync_fingerprint("Иван", None, None, "abc") == sync_fingerprint("Иван", None, None, 0)
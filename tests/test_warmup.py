@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core import warmup
+
+
+class TestWarmUp:
+    """Тесты прогрева клиентов при старте."""
+
+    def test_steps_run_concurrently_with_timeout(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: шаги выполняются параллельно, ошибка и таймаут шага не останавливают прогрев."""
+
+        async def ok() -> None:
+            await asyncio.sleep(0.1)
+
+        async def failed() -> None:
+            await asyncio.sleep(0.1)
+            raise RuntimeError("нет доступа к таблице")
+
+        async def hangs() -> None:
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(warmup.settings, "WARMUP_TIMEOUT", 0.2)
+        monkeypatch.setattr(warmup.amocrm_client, "warm_up", ok)
+        monkeypatch.setattr(warmup.sheets_client, "warm_up", failed)
+        monkeypatch.setattr(warmup, "_redis_connect", hangs)
+        monkeypatch.setattr(warmup, "warmup_state", {})
+
+        started = time.perf_counter()
+        state = asyncio.run(warmup.warm_up())
+        assert time.perf_counter() - started < 0.35
+        assert {name: step["status"] for name, step in state.items()} == {
+            "amocrm": "ok",
+            "sheets": "failed",
+            "redis": "timeout",
+        }
+        assert state["sheets"]["error"] == "нет доступа к таблице"
+
+    def test_redis_step_skipped_without_redis(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест: без настроенного Redis шаг подключения не выполняется и не считается ошибкой."""
+        monkeypatch.setattr(warmup.settings, "REDIS_HOST", "")
+        asyncio.run(warmup._redis_connect())  # pylint: disable=protected-access